@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+
+"""
+Check effective privileges
+
+This checks that UserResourceEffectivePrivilege agrees with the privileges computed from
+UserResourcePrivilege, GroupResourcePrivilege and UserGroupPrivilege.
+
+* By default, prints the differences on stdout.
+* Optional argument --rebuild also rewrites the rows that differ.
+"""
+
+from django.core.management.base import BaseCommand
+from hs_access_control.models import UserResourceEffectivePrivilege, PrivilegeCodes
+
+
+class Command(BaseCommand):
+    help = "Check the effective privilege table against the privilege tables."
+
+    def add_arguments(self, parser):
+
+        # Named (optional) arguments
+        parser.add_argument(
+            '--rebuild',
+            action='store_true',  # True for presence, False for absence
+            dest='rebuild',  # value is options['rebuild']
+            help='rewrite the rows that differ from the privilege tables'
+        )
+
+    def handle(self, *args, **options):
+        expected = UserResourceEffectivePrivilege.compute()
+        actual = dict(((user_id, resource_id), privilege)
+                      for user_id, resource_id, privilege in UserResourceEffectivePrivilege
+                      .objects.values_list('user_id', 'resource_id', 'privilege'))
+
+        differences = 0
+        for key in sorted(set(expected) | set(actual)):
+            want = expected.get(key, PrivilegeCodes.NONE)
+            have = actual.get(key, PrivilegeCodes.NONE)
+            if want != have:
+                differences += 1
+                print("user {} resource {}: table holds {}, privileges grant {}"
+                      .format(key[0], key[1], PrivilegeCodes.NAMES[have],
+                              PrivilegeCodes.NAMES[want]))
+        print("{} effective privileges checked, {} differences"
+              .format(len(expected), differences))
+
+        if options['rebuild']:
+            created, updated, deleted = UserResourceEffectivePrivilege.refresh()
+            print("rebuilt: {} created, {} updated, {} deleted".format(created, updated, deleted))
@@ -30,6 +30,10 @@ Notes and quandaries
 
 * In general, use get_resources_with_explicit_access to create display lists.
 
+* The combined user and group privilege of each user over each resource is materialized in
+  UserResourceEffectivePrivilege, which is kept in sync by the share, unshare, and undo_share
+  paths. The command check_effective_privileges verifies (and rebuilds) it.
+
 * In general, the system reports "effective" privilege.
 
     * effective privilege: that after accounting for resource flags (particularly, 'published'
@@ -47,6 +51,7 @@ from django.db import transaction
 from django.core.exceptions import PermissionDenied
 
 from hs_core.models import BaseResource
+from hs_access_control.request_cache import invalidate_resource_permissions
 
 ######################################
 # Access control subsystem
@@ -141,6 +146,10 @@ class PrivilegeBase(models.Model):
         There are no access control rules applied; this routine is unconditional.
         Only use this routine if you wish to completely bypass access control.
         Note also that using this routine directly breaks provenance and disables undo.
+
+        Within the transaction that changes the record, UserResourceEffectivePrivilege is
+        brought up to date by the refresh_effective_privilege() method of the privilege class,
+        called with the pair of keys of the record.
         """
         grantor = kwargs['grantor']
         privilege = kwargs.get('privilege', None)
@@ -156,12 +165,15 @@ class PrivilegeBase(models.Model):
                     record.privilege = privilege
                     record.grantor = grantor
                     record.save()
+                cls.refresh_effective_privilege(**kwargs)
         else:
             if 'privilege' in kwargs:
                 del kwargs['privilege']
             del kwargs['grantor']
-            cls.objects.filter(**kwargs) \
-               .delete()
+            with transaction.atomic():
+                cls.objects.filter(**kwargs) \
+                   .delete()
+                cls.refresh_effective_privilege(**kwargs)
 
     @classmethod
     def share(cls, **kwargs):
@@ -380,6 +392,14 @@ class UserGroupPrivilege(PrivilegeBase):
             assert len(kwargs) == 2
         return UserGroupProvenance.get_undo_users(**kwargs)
 
+    @classmethod
+    def refresh_effective_privilege(cls, user, group):
+        """ Recompute the user's effective privilege over resources shared with the group """
+        UserResourceEffectivePrivilege.refresh(
+            users=[user],
+            resources=GroupResourcePrivilege.objects.filter(group=group)
+                                                    .values_list('resource_id', flat=True))
+
 
 class UserResourcePrivilege(PrivilegeBase):
     """ Privileges of a user over a resource
@@ -537,6 +557,11 @@ class UserResourcePrivilege(PrivilegeBase):
             assert len(kwargs) == 2
         return UserResourceProvenance.get_undo_users(**kwargs)
 
+    @classmethod
+    def refresh_effective_privilege(cls, user, resource):
+        """ Recompute the user's effective privilege over the resource """
+        UserResourceEffectivePrivilege.refresh(users=[user], resources=[resource])
+
 
 class GroupResourcePrivilege(PrivilegeBase):
     """
@@ -677,6 +702,146 @@ class GroupResourcePrivilege(PrivilegeBase):
             assert len(kwargs) == 2
         return GroupResourceProvenance.get_undo_groups(**kwargs)
 
+    @classmethod
+    def refresh_effective_privilege(cls, group, resource):
+        """ Recompute the effective privilege of all users over the resource """
+        UserResourceEffectivePrivilege.refresh(resources=[resource])
+
+
+class UserResourceEffectivePrivilege(models.Model):
+    """
+    Effective privilege of a user over a resource, combining user and group privilege.
+
+    This is a materialized view of UserResourcePrivilege, GroupResourcePrivilege and
+    UserGroupPrivilege: each row holds the highest (lowest numbered) privilege that a user
+    holds over a resource, either directly or via membership in an active group.  It allows
+    permission checks and resource listings to be a single indexed lookup.
+
+    Rows are declared privilege, before accounting for resource flags; users of this table
+    must still check the immutable and public flags.
+
+    The table is maintained by PrivilegeBase.update (and thus share, unshare, and undo_share
+    of all three privilege models), by changes to GroupAccess.active, and by
+    UserAccess.delete_group. The management command check_effective_privileges compares the
+    table with the privilege models and rebuilds it.
+    """
+
+    privilege = models.IntegerField(choices=PrivilegeCodes.CHOICES,
+                                    editable=False,
+                                    default=PrivilegeCodes.VIEW)
+
+    user = models.ForeignKey(User,
+                             null=False,
+                             editable=False,
+                             related_name='u2uerp',
+                             help_text='user holding privilege')
+
+    resource = models.ForeignKey(BaseResource,
+                                 null=False,
+                                 editable=False,
+                                 related_name='r2uerp',
+                                 help_text='resource to which privilege applies')
+
+    class Meta:
+        unique_together = ('user', 'resource')
+        index_together = (('user', 'privilege'),)
+
+    def __str__(self):
+        """ Return printed depiction for debugging """
+        return str.format("<user '{}' (id={}) holds effective {} ({})" +
+                          " over resource '{}' (id={})>",
+                          str(self.user.username), str(self.user.id),
+                          PrivilegeCodes.NAMES[self.privilege],
+                          str(self.privilege),
+                          str(self.resource.title).encode('ascii'),
+                          str(self.resource.short_id).encode('ascii'))
+
+    @classmethod
+    def compute(cls, users=None, resources=None):
+        """
+        Compute effective privileges from the privilege models.
+
+        :param users: users (or user ids) to compute, or None for all users.
+        :param resources: resources (or resource ids) to compute, or None for all resources.
+        :return: dict of (user_id, resource_id) -> privilege
+
+        This is the reference computation against which the table is maintained.
+        """
+        user_filter = {}
+        resource_filter = {}
+        if users is not None:
+            user_filter['user__in'] = users
+        if resources is not None:
+            resource_filter['resource__in'] = resources
+
+        privileges = {}
+        for user_id, resource_id, privilege in UserResourcePrivilege.objects\
+                .filter(**dict(user_filter, **resource_filter))\
+                .values_list('user_id', 'resource_id', 'privilege'):
+            privileges[(user_id, resource_id)] = privilege
+
+        # group privileges are resolved into privileges of the members of active groups
+        group_resources = {}
+        for group_id, resource_id, privilege in GroupResourcePrivilege.objects\
+                .filter(group__gaccess__active=True, **resource_filter)\
+                .values_list('group_id', 'resource_id', 'privilege'):
+            group_resources.setdefault(group_id, []).append((resource_id, privilege))
+        if group_resources:
+            for user_id, group_id in UserGroupPrivilege.objects\
+                    .filter(group__in=group_resources.keys(), **user_filter)\
+                    .values_list('user_id', 'group_id'):
+                for resource_id, privilege in group_resources[group_id]:
+                    key = (user_id, resource_id)
+                    privileges[key] = min(privilege, privileges.get(key, PrivilegeCodes.NONE))
+        return privileges
+
+    @classmethod
+    def refresh(cls, users=None, resources=None):
+        """
+        Recompute the table rows for the given users and resources.
+
+        :param users: users (or user ids) to refresh, or None for all users.
+        :param resources: resources (or resource ids) to refresh, or None for all resources.
+        :return: tuple (number of rows created, updated, deleted)
+
+        Rows are only written where they differ from the computation.
+        """
+        if users is not None:
+            users = list(users)
+        if resources is not None:
+            resources = list(resources)
+        if users == [] or resources == []:
+            return 0, 0, 0
+
+        records = cls.objects.all()
+        if users is not None:
+            records = records.filter(user__in=users)
+        if resources is not None:
+            records = records.filter(resource__in=resources)
+
+        with transaction.atomic():
+            privileges = cls.compute(users=users, resources=resources)
+            updated = 0
+            stale = []
+            for pk, user_id, resource_id, privilege in \
+                    records.select_for_update().values_list('pk', 'user_id', 'resource_id',
+                                                            'privilege'):
+                expected = privileges.pop((user_id, resource_id), None)
+                if expected is None:
+                    stale.append(pk)
+                elif expected != privilege:
+                    cls.objects.filter(pk=pk).update(privilege=expected)
+                    updated += 1
+            if stale:
+                cls.objects.filter(pk__in=stale).delete()
+            cls.objects.bulk_create([cls(user_id=user_id, resource_id=resource_id,
+                                         privilege=privilege)
+                                     for (user_id, resource_id), privilege
+                                     in privileges.items()])
+        # permissions memoized by the current request may have changed
+        invalidate_resource_permissions(resources)
+        return len(privileges), updated, len(stale)
+
 
 class ProvenanceBase(models.Model):
     """Methods reused by all provenance classes
@@ -1471,7 +1636,13 @@ class UserAccess(models.Model):
             # GroupResourcePrivilege.objects.filter(group=this_group).delete()
             # access_group.delete()
 
-            this_group.delete()
+            with transaction.atomic():
+                resource_ids = list(GroupResourcePrivilege.objects.filter(group=this_group)
+                                                                  .values_list('resource_id',
+                                                                               flat=True))
+                this_group.delete()
+                # privileges of members via the group were removed by the cascade
+                UserResourceEffectivePrivilege.refresh(resources=resource_ids)
         else:
             raise PermissionDenied("User must own group")
 
@@ -2168,10 +2339,7 @@ class UserAccess(models.Model):
         if not self.user.is_active:
             raise PermissionDenied("Requesting user is not active")
 
-        # need distinct due to duplicates invoked via Q expressions
-        return BaseResource.objects.filter(Q(r2urp__user=self.user) |
-                                           Q(r2grp__group__gaccess__active=True,
-                                               r2grp__group__g2ugp__user=self.user)).distinct()
+        return BaseResource.objects.filter(r2uerp__user=self.user)
 
     @property
     def owned_resources(self):
@@ -2202,13 +2370,9 @@ class UserAccess(models.Model):
         if not self.user.is_active:
             raise PermissionDenied("Requesting user is not active")
 
-        return BaseResource.objects.filter(Q(raccess__immutable=False) &
-                                           (Q(r2urp__user=self.user,
-                                              r2urp__privilege__lte=PrivilegeCodes.CHANGE) |
-                                            Q(r2grp__group__gaccess__active=True,
-                                                r2grp__group__g2ugp__user=self.user,
-                                              r2grp__privilege__lte=PrivilegeCodes.CHANGE)))\
-                                   .distinct()
+        return BaseResource.objects.filter(raccess__immutable=False,
+                                           r2uerp__user=self.user,
+                                           r2uerp__privilege__lte=PrivilegeCodes.CHANGE)
 
     def get_resources_with_explicit_access(self, this_privilege, via_user=True, via_group=False):
         """
@@ -2270,22 +2434,11 @@ class UserAccess(models.Model):
         # CHANGE does not include immutable resources
         elif this_privilege == PrivilegeCodes.CHANGE:
             if via_user and via_group:
-                uquery = Q(raccess__immutable=False,
-                           r2urp__privilege=PrivilegeCodes.CHANGE,
-                           r2urp__user=self.user)
-
-                gquery = Q(raccess__immutable=False,
-                           r2grp__privilege=PrivilegeCodes.CHANGE,
-                           r2grp__group__g2ugp__user=self.user)
-
-                # exclude owners; immutability doesn't matter for them
-                uexcl = Q(r2urp__privilege=PrivilegeCodes.OWNER,
-                          r2urp__user=self.user)
-
+                # combined privilege excludes owners; immutability doesn't matter for them
                 return BaseResource.objects\
-                    .filter(uquery | gquery)\
-                    .exclude(pk__in=BaseResource.objects
-                             .filter(uexcl)).distinct()
+                    .filter(raccess__immutable=False,
+                            r2uerp__privilege=PrivilegeCodes.CHANGE,
+                            r2uerp__user=self.user)
 
             elif via_user:
                 query = Q(raccess__immutable=False,
@@ -2310,41 +2463,14 @@ class UserAccess(models.Model):
             # CHANGE does not include immutable resources
 
             if via_user and via_group:
-
-                uquery = \
-                    Q(r2urp__privilege=PrivilegeCodes.VIEW,
-                      r2urp__user=self.user) | \
-                    Q(raccess__immutable=True,
-                      r2urp__privilege=PrivilegeCodes.CHANGE,
-                      r2urp__user=self.user)
-
-                gquery = \
-                    Q(r2grp__privilege=PrivilegeCodes.VIEW,
-                      r2grp__group__g2ugp__user=self.user,
-                      r2grp__group__gaccess__active=True) | \
+                # combined privilege is VIEW, or CHANGE demoted by immutability
+                query = \
+                    Q(r2uerp__privilege=PrivilegeCodes.VIEW) | \
                     Q(raccess__immutable=True,
-                      r2grp__privilege=PrivilegeCodes.CHANGE,
-                      r2grp__group__g2ugp__user=self.user,
-                      r2grp__group__gaccess__active=True)
-
-                # pick up change and owner, use to override VIEW for groups
-                uexcl = \
-                    Q(raccess__immutable=False,
-                      r2urp__privilege=PrivilegeCodes.CHANGE,
-                      r2urp__user=self.user) | \
-                    Q(r2urp__privilege=PrivilegeCodes.OWNER,
-                      r2urp__user=self.user)
-
-                # pick up non-immutable CHANGE, use to override VIEW for groups
-                gexcl = Q(raccess__immutable=False,
-                          r2grp__privilege=PrivilegeCodes.CHANGE,
-                          r2grp__group__g2ugp__user=self.user,
-                          r2grp__group__gaccess__active=True)
+                      r2uerp__privilege=PrivilegeCodes.CHANGE)
 
                 return BaseResource.objects\
-                    .filter(uquery | gquery)\
-                    .exclude(pk__in=BaseResource.objects
-                             .filter(uexcl | gexcl)).distinct()
+                    .filter(query, r2uerp__user=self.user)
 
             elif via_user:
 
@@ -2437,17 +2563,10 @@ class UserAccess(models.Model):
         if access_resource.immutable:
             return False
 
-        if UserResourcePrivilege.objects.filter(resource=this_resource,
-                                                privilege__lte=PrivilegeCodes.CHANGE,
-                                                user=self.user).exists():
-            return True
-
-        if GroupResourcePrivilege.objects.filter(resource=this_resource,
-                                                 privilege__lte=PrivilegeCodes.CHANGE,
-                                                 group__g2ugp__user=self.user).exists():
-            return True
-
-        return False
+        return UserResourceEffectivePrivilege.objects\
+            .filter(resource=this_resource,
+                    privilege__lte=PrivilegeCodes.CHANGE,
+                    user=self.user).exists()
 
     def can_change_resource_flags(self, this_resource):
         """
@@ -2501,17 +2620,10 @@ class UserAccess(models.Model):
         if self.user.is_superuser:
             return True
 
-        if UserResourcePrivilege.objects.filter(resource=this_resource,
-                                                privilege__lte=PrivilegeCodes.VIEW,
-                                                user=self.user).exists():
-            return True
-
-        if GroupResourcePrivilege.objects.filter(resource=this_resource,
-                                                 privilege__lte=PrivilegeCodes.VIEW,
-                                                 group__g2ugp__user=self.user).exists():
-            return True
-
-        return False
+        return UserResourceEffectivePrivilege.objects\
+            .filter(resource=this_resource,
+                    privilege__lte=PrivilegeCodes.VIEW,
+                    user=self.user).exists()
 
     def can_delete_resource(self, this_resource):
         """
@@ -3533,6 +3645,19 @@ class GroupAccess(models.Model):
     date_created = models.DateTimeField(editable=False, auto_now_add=True)
     picture = models.ImageField(upload_to='group', null=True, blank=True)
 
+    def save(self, *args, **kwargs):
+        """ Save the group flags, keeping effective resource privileges in sync with 'active' """
+        with transaction.atomic():
+            active_changed = self.pk is not None and \
+                not GroupAccess.objects.filter(pk=self.pk, active=self.active).exists()
+            super(GroupAccess, self).save(*args, **kwargs)
+            if active_changed:
+                # members gain or lose privileges over resources shared with the group
+                UserResourceEffectivePrivilege.refresh(
+                    resources=GroupResourcePrivilege.objects.filter(group=self.group)
+                                                            .values_list('resource_id',
+                                                                         flat=True))
+
     ####################################
     # group membership: owners, edit_users, view_users are parallel to those in resources
     ####################################
@@ -3734,6 +3859,12 @@ class ResourceAccess(models.Model):
                                                      help_text='whether to require agreement to '
                                                                'resource rights statement for '
                                                                'resource content downloads')
+
+    def save(self, *args, **kwargs):
+        """ Save the resource flags, dropping permissions memoized by the current request """
+        super(ResourceAccess, self).save(*args, **kwargs)
+        invalidate_resource_permissions([self.resource_id])
+
     #############################################
     # workalike queries adapt to old access control system
     #############################################
@@ -3749,13 +3880,9 @@ class ResourceAccess(models.Model):
         VIEW, even if the resource is immutable.
         """
 
-        return User.objects.filter(Q(is_active=True) &
-                                   (Q(u2urp__resource=self.resource,
-                                      u2urp__privilege__lte=PrivilegeCodes.VIEW) |
-                                    Q(u2ugp__group__gaccess__active=True,
-                                      u2ugp__group__g2grp__resource=self.resource,
-                                      u2ugp__group__g2grp__privilege__lte=PrivilegeCodes.VIEW)))\
-                           .distinct()
+        return User.objects.filter(is_active=True,
+                                   u2uerp__resource=self.resource,
+                                   u2uerp__privilege__lte=PrivilegeCodes.VIEW)
 
     @property
     def edit_users(self):
@@ -3770,14 +3897,9 @@ class ResourceAccess(models.Model):
         if self.immutable:
             return User.objects.none()
         else:
-            return User.objects\
-                       .filter(Q(is_active=True) &
-                               (Q(u2urp__resource=self.resource,
-                                  u2urp__privilege__lte=PrivilegeCodes.CHANGE) |
-                                Q(u2ugp__group__gaccess__active=True,
-                                  u2ugp__group__g2grp__resource=self.resource,
-                                  u2ugp__group__g2grp__privilege__lte=PrivilegeCodes.CHANGE)))\
-                .distinct()
+            return User.objects.filter(is_active=True,
+                                       u2uerp__resource=self.resource,
+                                       u2uerp__privilege__lte=PrivilegeCodes.CHANGE)
 
     @property
     def view_groups(self):
@@ -3973,9 +4095,20 @@ class ResourceAccess(models.Model):
         if not this_user.is_active:
             raise PermissionDenied("Grantee user is not active")
 
-        user_priv = self.get_effective_user_privilege(this_user)
-        group_priv = self.get_effective_group_privilege(this_user)
-        return min(user_priv, group_priv)
+        if this_user.is_superuser:
+            return PrivilegeCodes.OWNER
+
+        # the combined user and group privilege is materialized
+        try:
+            privilege = UserResourceEffectivePrivilege.objects\
+                .get(resource=self.resource, user=this_user).privilege
+        except UserResourceEffectivePrivilege.DoesNotExist:
+            return PrivilegeCodes.NONE
+
+        if self.immutable and privilege == PrivilegeCodes.CHANGE:
+            return PrivilegeCodes.VIEW
+        else:
+            return privilege
 
     @property
     def sharing_status(self):
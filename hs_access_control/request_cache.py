@@ -0,0 +1,152 @@
+"""
+Request-scoped cache of resource permissions.
+
+A single page or REST request checks the permissions of the requesting user over the same
+resource several times: in hs_core.views.utils.authorize, in page processors, in template
+tags, and through ResourcePermissionsMixin.can_*. This module memoizes, for the duration of
+one request, the resources looked up by short_id and the effective privilege of a user over
+a resource together with the resource flags, so that these checks query the database once.
+
+The memo is attached to the request object. It is invalidated for a resource when its
+sharing (UserResourceEffectivePrivilege.refresh) or flags (ResourceAccess.save) change
+during the request; these changes find the request through mezzanine's
+CurrentRequestMiddleware.
+
+Hits and misses are recorded in the 'permissions' group of hs_core.counters.
+"""
+
+from mezzanine.core.request import current_request
+
+from hs_core.counters import increment_counter
+
+PERMISSION_COUNTERS = 'permissions'
+
+_REQUEST_ATTRIBUTE = '_hs_resource_permissions'
+
+
+class ResourcePermissions(object):
+    """
+    Permissions of a user over a resource, read with one query.
+
+    The checks below agree with the corresponding methods of UserAccess, given that
+    groups cannot own resources, so that an effective privilege of OWNER means ownership.
+    """
+
+    def __init__(self, user, resource):
+        from hs_access_control.models import UserResourceEffectivePrivilege, PrivilegeCodes
+
+        raccess = resource.raccess
+        self.public = raccess.public
+        self.discoverable = raccess.discoverable
+        self.published = raccess.published
+        self.immutable = raccess.immutable
+
+        self.active = user.is_authenticated() and user.is_active
+        self.superuser = self.active and user.is_superuser
+        self.privilege = PrivilegeCodes.NONE
+        if self.active:
+            privilege = UserResourceEffectivePrivilege.objects\
+                .filter(user=user, resource=resource)\
+                .values_list('privilege', flat=True).first()
+            if privilege is not None:
+                self.privilege = privilege
+
+    @property
+    def owns(self):
+        from hs_access_control.models import PrivilegeCodes
+        return self.privilege == PrivilegeCodes.OWNER
+
+    @property
+    def is_editor(self):
+        """ whether the user is listed in ResourceAccess.edit_users """
+        from hs_access_control.models import PrivilegeCodes
+        return not self.immutable and self.privilege <= PrivilegeCodes.CHANGE
+
+    @property
+    def is_viewer(self):
+        """ whether the user is listed in ResourceAccess.view_users """
+        from hs_access_control.models import PrivilegeCodes
+        return self.privilege <= PrivilegeCodes.VIEW
+
+    @property
+    def can_view(self):
+        """ UserAccess.can_view_resource """
+        return self.public or self.superuser or self.is_viewer
+
+    @property
+    def can_change(self):
+        """ UserAccess.can_change_resource """
+        return self.superuser or self.is_editor
+
+    @property
+    def can_change_flags(self):
+        """ UserAccess.can_change_resource_flags """
+        return self.superuser or (not self.published and self.owns)
+
+    @property
+    def can_delete(self):
+        """ UserAccess.can_delete_resource """
+        return self.superuser or (self.owns and not self.published)
+
+
+def _get_request_cache(request):
+    cache = getattr(request, _REQUEST_ATTRIBUTE, None)
+    if cache is None:
+        cache = {'resources': {}, 'permissions': {}}
+        setattr(request, _REQUEST_ATTRIBUTE, cache)
+    return cache
+
+
+def get_cached_resource(request, short_id, loader):
+    """
+    Return the resource with short_id, calling loader(short_id) on first use in the request.
+
+    Exceptions raised by loader (e.g., for a missing resource) are not cached.
+    """
+    resources = _get_request_cache(request)['resources']
+    if short_id in resources:
+        increment_counter(PERMISSION_COUNTERS, 'resource_hits')
+        return resources[short_id]
+    increment_counter(PERMISSION_COUNTERS, 'resource_misses')
+    resource = loader(short_id)
+    resources[short_id] = resource
+    return resource
+
+
+def get_resource_permissions(request, user, resource):
+    """ Return the ResourcePermissions of user over resource, memoized in the request """
+    permissions = _get_request_cache(request)['permissions']
+    key = (user.pk, resource.pk)
+    if key in permissions:
+        increment_counter(PERMISSION_COUNTERS, 'hits')
+        return permissions[key]
+    increment_counter(PERMISSION_COUNTERS, 'misses')
+    resource_permissions = ResourcePermissions(user, resource)
+    permissions[key] = resource_permissions
+    return resource_permissions
+
+
+def invalidate_resource_permissions(resources=None):
+    """
+    Drop memoized permissions of the current request.
+
+    :param resources: resources (or resource ids) whose sharing or flags changed,
+        or None to drop all.
+
+    This is a no-op outside of a request (e.g., in celery tasks and management commands).
+    """
+    request = current_request()
+    cache = getattr(request, _REQUEST_ATTRIBUTE, None) if request is not None else None
+    if not cache:
+        return
+    if resources is None:
+        cache['resources'].clear()
+        cache['permissions'].clear()
+        return
+    resource_ids = set(getattr(resource, 'pk', resource) for resource in resources)
+    for short_id, resource in cache['resources'].items():
+        if resource.pk in resource_ids:
+            del cache['resources'][short_id]
+    for key in cache['permissions'].keys():
+        if key[1] in resource_ids:
+            del cache['permissions'][key]
@@ -0,0 +1,139 @@
+from django.test import TestCase
+from django.contrib.auth.models import Group
+
+from hs_access_control.models import UserResourceEffectivePrivilege, PrivilegeCodes
+
+from hs_core import hydroshare
+from hs_core.testing import MockIRODSTestCaseMixin
+
+from hs_access_control.tests.utilities import global_reset
+
+
+class T16EffectivePrivilege(MockIRODSTestCaseMixin, TestCase):
+
+    def setUp(self):
+        super(T16EffectivePrivilege, self).setUp()
+        global_reset()
+        self.group, _ = Group.objects.get_or_create(name='Hydroshare Author')
+
+        self.cat = hydroshare.create_account(
+            'cat@gmail.com',
+            username='cat',
+            first_name='not a dog',
+            last_name='last_name_cat',
+            superuser=False,
+            groups=[]
+        )
+
+        self.dog = hydroshare.create_account(
+            'dog@gmail.com',
+            username='dog',
+            first_name='a little arfer',
+            last_name='last_name_dog',
+            superuser=False,
+            groups=[]
+        )
+
+        self.holes = hydroshare.create_resource(
+            resource_type='GenericResource',
+            owner=self.cat,
+            title='all about dog holes',
+            metadata=[],
+        )
+
+        self.meowers = self.cat.uaccess.create_group(
+            title='some random meowers', description="some random group")
+
+    def assertTableCoherent(self):
+        """ the table agrees with the privilege models """
+        self.assertEqual(
+            UserResourceEffectivePrivilege.compute(),
+            dict(((u, r), p) for u, r, p in UserResourceEffectivePrivilege.objects
+                 .values_list('user_id', 'resource_id', 'privilege')))
+
+    def get_effective(self, user):
+        return self.holes.raccess.get_effective_privilege(user)
+
+    def test_01_user_and_group_sharing(self):
+        cat = self.cat
+        dog = self.dog
+        holes = self.holes
+        meowers = self.meowers
+
+        self.assertEqual(self.get_effective(cat), PrivilegeCodes.OWNER)
+        self.assertEqual(self.get_effective(dog), PrivilegeCodes.NONE)
+        self.assertTableCoherent()
+
+        # privilege via a group
+        cat.uaccess.share_resource_with_group(holes, meowers, PrivilegeCodes.CHANGE)
+        cat.uaccess.share_group_with_user(meowers, dog, PrivilegeCodes.VIEW)
+        self.assertEqual(self.get_effective(dog), PrivilegeCodes.CHANGE)
+        self.assertTrue(dog.uaccess.can_change_resource(holes))
+        self.assertIn(holes, dog.uaccess.edit_resources)
+        self.assertTableCoherent()
+
+        # user privilege does not lower group privilege
+        cat.uaccess.share_resource_with_user(holes, dog, PrivilegeCodes.VIEW)
+        self.assertEqual(self.get_effective(dog), PrivilegeCodes.CHANGE)
+        self.assertTableCoherent()
+
+        # removing the group privilege leaves the user privilege
+        cat.uaccess.unshare_resource_with_group(holes, meowers)
+        self.assertEqual(self.get_effective(dog), PrivilegeCodes.VIEW)
+        self.assertFalse(dog.uaccess.can_change_resource(holes))
+        self.assertTrue(dog.uaccess.can_view_resource(holes))
+        self.assertTableCoherent()
+
+        # undo is maintained like share and unshare
+        cat.uaccess.undo_share_resource_with_group(holes, meowers)
+        self.assertTableCoherent()
+        cat.uaccess.share_resource_with_group(holes, meowers, PrivilegeCodes.CHANGE)
+        cat.uaccess.unshare_resource_with_user(holes, dog)
+        self.assertEqual(self.get_effective(dog), PrivilegeCodes.CHANGE)
+        self.assertTableCoherent()
+
+        # leaving the group removes privilege
+        cat.uaccess.unshare_group_with_user(meowers, dog)
+        self.assertEqual(self.get_effective(dog), PrivilegeCodes.NONE)
+        self.assertNotIn(holes, dog.uaccess.view_resources)
+        self.assertTableCoherent()
+
+    def test_02_group_active_and_delete(self):
+        cat = self.cat
+        dog = self.dog
+        holes = self.holes
+        meowers = self.meowers
+
+        cat.uaccess.share_resource_with_group(holes, meowers, PrivilegeCodes.VIEW)
+        cat.uaccess.share_group_with_user(meowers, dog, PrivilegeCodes.VIEW)
+        self.assertIn(dog, holes.raccess.view_users)
+
+        # inactive groups grant no privilege
+        meowers.gaccess.active = False
+        meowers.gaccess.save()
+        self.assertNotIn(dog, holes.raccess.view_users)
+        self.assertFalse(dog.uaccess.can_view_resource(holes))
+        self.assertTableCoherent()
+
+        meowers.gaccess.active = True
+        meowers.gaccess.save()
+        self.assertTrue(dog.uaccess.can_view_resource(holes))
+        self.assertTableCoherent()
+
+        cat.uaccess.delete_group(meowers)
+        self.assertFalse(dog.uaccess.can_view_resource(holes))
+        self.assertTableCoherent()
+
+    def test_03_refresh_repairs_table(self):
+        cat = self.cat
+        dog = self.dog
+        holes = self.holes
+
+        cat.uaccess.share_resource_with_user(holes, dog, PrivilegeCodes.VIEW)
+        UserResourceEffectivePrivilege.objects.filter(user=cat).delete()
+        UserResourceEffectivePrivilege.objects.filter(user=dog)\
+            .update(privilege=PrivilegeCodes.OWNER)
+
+        self.assertEqual(UserResourceEffectivePrivilege.refresh(), (1, 1, 0))
+        self.assertTableCoherent()
+        self.assertEqual(UserResourceEffectivePrivilege.refresh(), (0, 0, 0))
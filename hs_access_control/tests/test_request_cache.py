@@ -0,0 +1,87 @@
+from django.test import TestCase, RequestFactory
+from django.contrib.auth.models import Group
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from mezzanine.core.request import CurrentRequestMiddleware
+
+from hs_access_control.models import PrivilegeCodes
+from hs_access_control.request_cache import get_resource_permissions
+
+from hs_core import hydroshare
+from hs_core.testing import MockIRODSTestCaseMixin
+from hs_core.views.utils import authorize, ACTION_TO_AUTHORIZE
+
+from hs_access_control.tests.utilities import global_reset
+
+
+class T17RequestCache(MockIRODSTestCaseMixin, TestCase):
+
+    def setUp(self):
+        super(T17RequestCache, self).setUp()
+        global_reset()
+        self.group, _ = Group.objects.get_or_create(name='Hydroshare Author')
+
+        self.cat = hydroshare.create_account(
+            'cat@gmail.com',
+            username='cat',
+            first_name='not a dog',
+            last_name='last_name_cat',
+            superuser=False,
+            groups=[]
+        )
+
+        self.dog = hydroshare.create_account(
+            'dog@gmail.com',
+            username='dog',
+            first_name='a little arfer',
+            last_name='last_name_dog',
+            superuser=False,
+            groups=[]
+        )
+
+        self.holes = hydroshare.create_resource(
+            resource_type='GenericResource',
+            owner=self.cat,
+            title='all about dog holes',
+            metadata=[],
+        )
+
+        self.request = RequestFactory().get('/')
+        self.request.user = self.dog
+        CurrentRequestMiddleware().process_request(self.request)
+
+    def test_01_permissions_are_memoized(self):
+        request = self.request
+        holes = self.holes
+
+        _, authorized, _ = authorize(request, holes.short_id,
+                                     needed_permission=ACTION_TO_AUTHORIZE.VIEW_RESOURCE,
+                                     raises_exception=False)
+        self.assertFalse(authorized)
+
+        # the resource and the privilege are not queried again in the same request
+        with CaptureQueriesContext(connection) as first:
+            authorize(request, holes.short_id,
+                      needed_permission=ACTION_TO_AUTHORIZE.EDIT_RESOURCE,
+                      raises_exception=False)
+        permissions = get_resource_permissions(request, self.dog, holes)
+        self.assertIs(permissions, get_resource_permissions(request, self.dog, holes))
+        self.assertFalse(permissions.can_change)
+        # only the requesting user is read
+        self.assertEqual(len(first), 1)
+
+    def test_02_sharing_invalidates(self):
+        request = self.request
+        holes = self.holes
+
+        self.assertFalse(get_resource_permissions(request, self.dog, holes).can_view)
+        self.cat.uaccess.share_resource_with_user(holes, self.dog, PrivilegeCodes.CHANGE)
+        self.assertTrue(get_resource_permissions(request, self.dog, holes).can_change)
+
+        # flags invalidate as well
+        holes.raccess.immutable = True
+        holes.raccess.save()
+        permissions = get_resource_permissions(request, self.dog, holes)
+        self.assertFalse(permissions.can_change)
+        self.assertTrue(permissions.can_view)
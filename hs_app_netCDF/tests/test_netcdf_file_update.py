@@ -2,13 +2,14 @@ import os
 import tempfile
 import shutil
 
-from django.test import TestCase, RequestFactory
+from django.test import TestCase, RequestFactory, override_settings
 from django.core.urlresolvers import reverse
 from django.contrib.auth.models import Group
 from django.contrib.messages.storage.fallback import FallbackStorage
 from django.core.files.uploadedfile import UploadedFile
 from django.core.exceptions import ValidationError
 
+from mock import patch
 from rest_framework import status
 
 from hs_core import hydroshare
@@ -17,6 +18,7 @@ from hs_core.testing import MockIRODSTestCaseMixin
 from hs_core.hydroshare import utils
 
 from hs_app_netCDF.views import update_netcdf_file
+from hs_file_types.models.netcdf import netcdf_file_update
 
 
 class TestUpdateNetcdfFile(MockIRODSTestCaseMixin, TestCase):
@@ -283,6 +285,25 @@ class TestUpdateNetcdfFile(MockIRODSTestCaseMixin, TestCase):
         res_metadata.refresh_from_db()
         self.assertFalse(res_metadata.is_dirty)
 
+        # the header is up to date, so writing the metadata back again uploads nothing
+        nc_res_file = self.resNetcdf.files.exclude(pk=nc_dump_res_file.pk).first()
+        with patch('hs_file_types.models.netcdf.utils.replace_resource_file_on_irods') \
+                as replace_resource_file_on_irods:
+            netcdf_file_update(self.resNetcdf, nc_res_file, nc_dump_res_file, self.john)
+        self.assertFalse(replace_resource_file_on_irods.called)
+
+        # a changed header is written to the copy of the file fetched to read the header,
+        # so that the file is fetched once even if the cache of iRODS files is disabled
+        res_metadata.update_element('title', res_metadata.title.id, value='another title')
+        storage_class = type(self.resNetcdf.get_irods_storage())
+        with override_settings(IRODS_FILE_CACHE_SIZE=0), \
+                patch.object(storage_class, 'getFile', autospec=True,
+                             side_effect=storage_class.getFile) as get_file:
+            netcdf_file_update(self.resNetcdf, nc_res_file, nc_dump_res_file, self.john)
+        self.assertEqual(get_file.call_count, 1)
+        nc_dump_res_file = self.resNetcdf.files.get(pk=nc_dump_res_file.pk)
+        self.assertIn('title = "another title"', nc_dump_res_file.resource_file.read())
+
         # test extra metadata update for setting flag
         self.assertEqual(self.resNetcdf.extra_metadata, {})
 
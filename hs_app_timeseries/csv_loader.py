@@ -0,0 +1,168 @@
+"""
+Single pass reading of timeseries csv files
+
+A timeseries csv file has a header row (a date-time column heading followed by one heading
+per data series) and one data row per date-time. TimeSeriesCSVReader validates the file
+while reading its data rows in chunks, so that validating an uploaded file and loading it
+into the ODM2 sqlite file each read it only once, in constant memory.
+"""
+
+import csv
+import re
+from itertools import islice
+
+import numpy
+from dateutil import parser
+
+CSV_CHUNK_SIZE = 10000
+
+# ISO 8601 date-times without time zone (e.g., 2008-01-01 00:30:00), which numpy parses
+# to the same values as dateutil, a chunk at a time
+_ISO_DATETIME = re.compile(r'^\d{4}-\d{2}-\d{2}([ T]\d{2}:\d{2}(:\d{2}(\.\d{1,6})?)?)?$')
+
+VALUES_INSERT_SQL = "INSERT INTO TimeSeriesResultValues (ValueID, ResultID, DataValue, " \
+                    "ValueDateTime, ValueDateTimeUTCOffset, CensorCodeCV, " \
+                    "QualityCodeCV, TimeAggregationInterval, " \
+                    "TimeAggregationIntervalUnitsID) VALUES(?,?,?,?,?,?,?,?,?)"
+
+
+class CSVValidationError(Exception):
+    """Raised with the reason why a csv file is not a valid timeseries csv file."""
+    pass
+
+
+def parse_datetimes(values):
+    """Return a list of datetime objects for a list of date-time strings.
+
+    Lists of ISO 8601 date-times are parsed by numpy in one call; other lists are parsed
+    value by value with dateutil. Raises an exception if a value is not a date-time.
+    """
+    stripped = [value.strip() for value in values]
+    if all(_ISO_DATETIME.match(value) for value in stripped):
+        try:
+            return numpy.array(stripped, dtype='datetime64[us]').tolist()
+        except ValueError:
+            pass  # e.g., hour 24; dateutil decides
+    return [parser.parse(value) for value in values]
+
+
+class TimeSeriesCSVReader(object):
+    """Validate a timeseries csv file while reading its data rows in chunks.
+
+    After read_chunks() has been consumed, header, row_count, start_date_str and
+    end_date_str describe the file.
+    """
+
+    def __init__(self, csv_file_name, chunk_size=CSV_CHUNK_SIZE):
+        self.csv_file_name = csv_file_name
+        self.chunk_size = chunk_size
+        self.header = None
+        self.row_count = 0
+        self.start_date_str = None
+        self.end_date_str = None
+
+    def _validate_header(self, header):
+        header = [el.strip() for el in header]
+        if any(len(h) == 0 for h in header):
+            raise CSVValidationError(" Column heading is missing.")
+
+        # check that there are at least 2 headings
+        if len(header) < 2:
+            raise CSVValidationError(" There needs to be at least 2 columns of data.")
+
+        # check the header has only string values
+        for hdr in header:
+            try:
+                float(hdr)
+            except ValueError:
+                continue
+            raise CSVValidationError(" Column heading must be a string.")
+
+        # check that there are no duplicate column headings
+        if len(header) != len(set(header)):
+            raise CSVValidationError(" There are duplicate column headings.")
+
+    def _validate_rows(self, rows):
+        # check that each data row has the same number of columns as the header
+        if any(len(row) != len(self.header) for row in rows):
+            raise CSVValidationError(" Number of columns in the header is not same as the "
+                                     "data columns.")
+
+        # check that the first column data is of type datetime
+        try:
+            datetimes = parse_datetimes([row[0] for row in rows])
+        except Exception:
+            raise CSVValidationError(" Data for the first column must be a date value.")
+
+        # check that the data values (2nd column onwards) are numeric
+        try:
+            numpy.array([row[1:] for row in rows]).astype(numpy.float64)
+        except ValueError:
+            raise CSVValidationError(" Data values must be numeric.")
+        return datetimes
+
+    def read_chunks(self):
+        """Yield (rows, datetimes) for each chunk of data rows, after validating it.
+
+        rows are lists of the csv values of each row; datetimes are the parsed values of the
+        first column. Raises CSVValidationError if the file is not a valid timeseries csv file.
+        """
+        with open(self.csv_file_name, 'r') as fl_obj:
+            csv_reader = csv.reader(fl_obj, delimiter=',')
+            try:
+                self.header = csv_reader.next()
+            except StopIteration:
+                raise CSVValidationError(" Column heading is missing.")
+            self._validate_header(self.header)
+
+            while True:
+                rows = list(islice(csv_reader, self.chunk_size))
+                if not rows:
+                    break
+                datetimes = self._validate_rows(rows)
+                if self.start_date_str is None:
+                    self.start_date_str = rows[0][0]
+                self.end_date_str = rows[-1][0]
+                self.row_count += len(rows)
+                yield rows, datetimes
+
+        if self.row_count == 0:
+            raise CSVValidationError(" There needs to be at least 1 row of data.")
+
+    def validate(self):
+        """Read the whole file; raises CSVValidationError if it is not valid."""
+        for _ in self.read_chunks():
+            pass
+
+
+def insert_time_series_result_values(cur, csv_reader, result_ids, utc_offset):
+    """Insert the data values of a timeseries csv file into TimeSeriesResultValues.
+
+    The file is read once, a chunk of rows at a time, and the values of each chunk are
+    inserted with one executemany. The caller owns the transaction.
+    :param cur: cursor of the ODM2 sqlite file
+    :param csv_reader: TimeSeriesCSVReader of the csv file
+    :param result_ids: dict of series label (csv column heading) -> ResultID
+    :param utc_offset: ValueDateTimeUTCOffset of all values
+    :return: number of values inserted
+    """
+    value_id = 1
+    column_result_ids = None
+    time_interval = None
+    for rows, datetimes in csv_reader.read_chunks():
+        if column_result_ids is None:
+            column_result_ids = [result_ids[label] for label in csv_reader.header[1:]]
+            # time interval (in minutes) between readings, from the first 2 rows of data
+            if len(datetimes) > 1:
+                time_interval = (datetimes[1] - datetimes[0]).seconds / 60
+            else:
+                time_interval = 0
+
+        params = []
+        for row, date_time in zip(rows, datetimes):
+            for result_id, data_value in zip(column_result_ids, row[1:]):
+                params.append((value_id, result_id, data_value, date_time, utc_offset,
+                               'Unknown', 'Unknown', time_interval, 102))
+                value_id += 1
+        cur.executemany(VALUES_INSERT_SQL, params)
+    return value_id - 1
@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+
+"""
+Benchmark loading of timeseries csv files into the ODM2 sqlite file
+
+This writes a synthetic csv file and loads its values into the TimeSeriesResultValues
+table of a copy of the blank ODM2 sqlite file, once with the single pass loader
+(hs_app_timeseries.csv_loader) and once with the previous column by column loader, and
+reports the time taken and the number of values loaded per second.
+
+* By default, benchmarks a csv file of 10000 rows and 10 data columns.
+* Optional arguments --rows and --columns set the size of the csv file.
+* Optional argument --skip_previous benchmarks only the single pass loader.
+
+Nothing is written to iRODS or Django.
+"""
+
+import csv
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from dateutil import parser
+from django.core.management.base import BaseCommand
+
+from hs_app_timeseries.csv_loader import TimeSeriesCSVReader, VALUES_INSERT_SQL, \
+    insert_time_series_result_values
+
+BLANK_SQLITE_FILE = 'hs_app_timeseries/files/ODM2.sqlite'
+
+
+def write_synthetic_csv(csv_file_name, rows, columns):
+    """ write a csv file of rows 30 minute readings of columns data series """
+    start = datetime(2008, 1, 1)
+    with open(csv_file_name, 'wb') as fl_obj:
+        csv_writer = csv.writer(fl_obj)
+        csv_writer.writerow(['ValueDateTime'] + ['Series_{}'.format(c) for c in range(columns)])
+        for r in range(rows):
+            date_time = start + timedelta(minutes=30 * r)
+            csv_writer.writerow([date_time.strftime('%Y-%m-%d %H:%M:%S')] +
+                                ['{:.4f}'.format(r * 0.001 + c) for c in range(columns)])
+
+
+def previous_load(cur, csv_file_name, result_ids, utc_offset):
+    """ load values as TimeSeriesMetaData did before the single pass loader """
+    with open(csv_file_name, 'r') as fl_obj:
+        csv_reader = csv.reader(fl_obj, delimiter=',')
+        header = csv_reader.next()
+        first_row_data = csv_reader.next()
+        second_row_data = csv_reader.next()
+        time_interval = (parser.parse(second_row_data[0]) -
+                         parser.parse(first_row_data[0])).seconds / 60
+
+    with open(csv_file_name, 'r') as fl_obj:
+        csv_reader = csv.reader(fl_obj, delimiter=',')
+        csv_reader.next()
+        value_id = 1
+        for col, value in enumerate(header[1:]):
+            result_id = result_ids[value]
+            fl_obj.seek(0)
+            csv_reader.next()
+            for row in csv_reader:
+                date_time = parser.parse(row[0])
+                cur.execute(VALUES_INSERT_SQL, (value_id, result_id, row[col + 1],
+                                                date_time, utc_offset, 'Unknown', 'Unknown',
+                                                time_interval, 102), )
+                value_id += 1
+    return value_id - 1
+
+
+class Command(BaseCommand):
+    help = "Benchmark loading of timeseries csv files into the ODM2 sqlite file."
+
+    def add_arguments(self, parser):
+
+        # Named (optional) arguments
+        parser.add_argument(
+            '--rows',
+            type=int,
+            dest='rows',  # value is options['rows']
+            default=10000,
+            help='number of data rows of the synthetic csv file'
+        )
+
+        parser.add_argument(
+            '--columns',
+            type=int,
+            dest='columns',  # value is options['columns']
+            default=10,
+            help='number of data columns of the synthetic csv file'
+        )
+
+        parser.add_argument(
+            '--skip_previous',
+            action='store_true',  # True for presence, False for absence
+            dest='skip_previous',  # value is options['skip_previous']
+            help='do not benchmark the previous column by column loader'
+        )
+
+    def handle(self, *args, **options):
+        temp_dir = tempfile.mkdtemp()
+        try:
+            csv_file_name = os.path.join(temp_dir, 'synthetic.csv')
+            write_synthetic_csv(csv_file_name, options['rows'], options['columns'])
+            result_ids = {'Series_{}'.format(c): c + 1 for c in range(options['columns'])}
+
+            loaders = [('single pass', lambda cur: insert_time_series_result_values(
+                cur, TimeSeriesCSVReader(csv_file_name), result_ids, -7))]
+            if not options['skip_previous']:
+                loaders.append(('previous', lambda cur: previous_load(
+                    cur, csv_file_name, result_ids, -7)))
+
+            for name, load in loaders:
+                sqlite_file_name = os.path.join(temp_dir, 'ODM2.sqlite')
+                shutil.copy(BLANK_SQLITE_FILE, sqlite_file_name)
+                con = sqlite3.connect(sqlite_file_name)
+                with con:
+                    cur = con.cursor()
+                    start = time.time()
+                    count = load(cur)
+                    con.commit()
+                    elapsed = time.time() - start
+                con.close()
+                os.remove(sqlite_file_name)
+                print("{} loader: {} values in {:.2f}s, {:.0f} values/s"
+                      .format(name, count, elapsed, count / elapsed if elapsed else 0))
+        finally:
+            shutil.rmtree(temp_dir)
@@ -1,6 +1,5 @@
 import os
 import sqlite3
-import csv
 import shutil
 import logging
 from uuid import uuid4
@@ -21,6 +20,8 @@ from hs_core.models import BaseResource, ResourceManager, resource_processor, Co
     AbstractMetaDataElement, Creator
 from hs_core.hydroshare import utils
 from hs_core.hydroshare import add_resource_files
+from hs_app_timeseries.csv_loader import TimeSeriesCSVReader, \
+    insert_time_series_result_values
 
 
 class TimeSeriesAbstractMetaDataElement(AbstractMetaDataElement):
@@ -1149,11 +1150,6 @@ class TimeSeriesMetaData(CoreMetaData):
             if os.path.exists(temp_csv_file):
                 shutil.rmtree(os.path.dirname(temp_csv_file))
 
-    def _read_csv_specified_column(self, csv_reader, data_column_index):
-        # generator function to read (one row) the datetime column and the specified data column
-        for row in csv_reader:
-            yield row[0], row[data_column_index]
-
     def _update_metadata_element_series_ids_with_guids(self):
         # replace sequential series ids (0, 1, 2 ...) with GUID
         # only needs to be done in case of csv file upload before
@@ -1451,49 +1447,19 @@ class TimeSeriesMetaData(CoreMetaData):
         # used for updating a sqlite file that is blank (case of CSV upload)
 
         cur.execute("DELETE FROM TimeSeriesResultValues")
-        con.commit()
-        insert_sql = "INSERT INTO TimeSeriesResultValues (ValueID, ResultID, DataValue, " \
-                     "ValueDateTime, ValueDateTimeUTCOffset, CensorCodeCV, " \
-                     "QualityCodeCV, TimeAggregationInterval, " \
-                     "TimeAggregationIntervalUnitsID) VALUES(?,?,?,?,?,?,?,?,?)"
 
-        # read the csv file to determine time interval (in minutes) between each reading
-        # we will use the first 2 rows of data to determine this value
-        utc_offset = self.utc_offset.value
-        with open(temp_csv_file, 'r') as fl_obj:
-            csv_reader = csv.reader(fl_obj, delimiter=',')
-            # read the first row (header)
-            header = csv_reader.next()
-            first_row_data = csv_reader.next()
-            second_row_data = csv_reader.next()
-            time_interval = (parser.parse(second_row_data[0]) -
-                             parser.parse(first_row_data[0])).seconds / 60
-
-        with open(temp_csv_file, 'r') as fl_obj:
-            csv_reader = csv.reader(fl_obj, delimiter=',')
-            # read the first row (header) and skip
-            csv_reader.next()
-            value_id = 1
-            data_header = header[1:]
-            for col, value in enumerate(data_header):
-                # get the ts_result object with matching series_label
-                ts_result = [ts_item for ts_item in self.time_series_results if
-                             ts_item.series_label == value][0]
-                # get the result id associated with ts_result object
-                result_data_item = [dict_item for dict_item in results_data if
-                                    dict_item['object_id'] == ts_result.id][0]
-                result_id = result_data_item['result_id']
-                data_col_index = col + 1
-                # start at the beginning of data row
-                fl_obj.seek(0)
-                csv_reader.next()
-                for date_time, data_value in self._read_csv_specified_column(
-                        csv_reader, data_col_index):
-                    date_time = parser.parse(date_time)
-                    cur.execute(insert_sql, (value_id, result_id, data_value,
-                                             date_time, utc_offset, 'Unknown', 'Unknown',
-                                             time_interval, 102), )
-                    value_id += 1
+        # result id associated with each ts_result object, by series_label (csv column heading)
+        result_ids = {}
+        for ts_result in self.time_series_results:
+            for dict_item in results_data:
+                if dict_item['object_id'] == ts_result.id:
+                    result_ids[ts_result.series_label] = dict_item['result_id']
+                    break
+
+        # the csv file is read once and the values inserted in chunks, in the same
+        # transaction as the delete above
+        insert_time_series_result_values(cur, TimeSeriesCSVReader(temp_csv_file), result_ids,
+                                         self.utc_offset.value)
 
     def _update_CV_tables(self, con, cur):
         # here 'is_dirty' true means a new term has been added
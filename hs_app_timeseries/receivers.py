@@ -2,8 +2,6 @@ import os
 import sqlite3
 import shutil
 import logging
-import csv
-from dateutil import parser
 import tempfile
 
 from django.dispatch import receiver
@@ -15,6 +13,7 @@ from hs_core.hydroshare import utils, delete_resource_file_only
 from hs_app_timeseries.models import TimeSeriesResource, CVVariableType, CVVariableName, \
     CVSpeciation, CVSiteType, CVElevationDatum, CVMethodType, CVUnitsType, CVStatus, CVMedium, \
     CVAggregationStatistic, TimeSeriesMetaData
+from hs_app_timeseries.csv_loader import TimeSeriesCSVReader, CSVValidationError
 from forms import SiteValidationForm, VariableValidationForm, MethodValidationForm, \
     ProcessingLevelValidationForm, TimeSeriesResultValidationForm, UTCOffSetValidationForm
 
@@ -149,7 +148,7 @@ def _process_uploaded_csv_file(resource, res_file, validate_files_dict, user,
                                delete_existing_metadata=True):
     # get the csv file from iRODS to a temp directory
     fl_obj_name = utils.get_file_from_irods(res_file)
-    validate_err_message = _validate_csv_file(resource, fl_obj_name)
+    validate_err_message, csv_reader = _validate_csv_file(resource, fl_obj_name)
     if not validate_err_message:
         # first delete relevant existing metadata elements
         if delete_existing_metadata:
@@ -191,32 +190,20 @@ def _process_uploaded_csv_file(resource, res_file, validate_files_dict, user,
             _create_cv_lookup_models(cur, resource.metadata, 'CV_AggregationStatistic',
                                      CVAggregationStatistic)
 
-        # save some data from the csv file
-        with open(fl_obj_name, 'r') as fl_obj:
-            csv_reader = csv.reader(fl_obj, delimiter=',')
-            # read the first row - header
-            header = csv_reader.next()
-            # read the 1st data row
-            start_date_str = csv_reader.next()[0]
-            last_row = None
-            data_row_count = 1
-            for row in csv_reader:
-                last_row = row
-                data_row_count += 1
-            end_date_str = last_row[0]
-
-            # save the series names along with number of data points for each series
-            # columns starting with the 2nd column are data series names
-            value_counts = {}
-            for data_col_name in header[1:]:
-                value_counts[data_col_name] = str(data_row_count)
-
-            TimeSeriesMetaData.objects.filter(id=resource.metadata.id).update(
-                value_counts=value_counts)
-
-            # create the temporal coverage element
-            resource.metadata.create_element('coverage', type='period',
-                                             value={'start': start_date_str, 'end': end_date_str})
+        # save some data from the csv file, recorded while validating it
+        # save the series names along with number of data points for each series
+        # columns starting with the 2nd column are data series names
+        value_counts = {}
+        for data_col_name in csv_reader.header[1:]:
+            value_counts[data_col_name] = str(csv_reader.row_count)
+
+        TimeSeriesMetaData.objects.filter(id=resource.metadata.id).update(
+            value_counts=value_counts)
+
+        # create the temporal coverage element
+        resource.metadata.create_element('coverage', type='period',
+                                         value={'start': csv_reader.start_date_str,
+                                                'end': csv_reader.end_date_str})
 
         # cleanup the temp sqlite file directory
         if os.path.exists(temp_dir):
@@ -803,65 +790,23 @@ def _delete_extracted_metadata(resource):
 
 
 def _validate_csv_file(resource, uploaded_csv_file_name):
+    """
+    Validate the uploaded csv file in a single pass.
+    :return: a tuple of the error message (None if the file is valid) and the
+    TimeSeriesCSVReader that read it, which records the header, the number of data rows
+    and the first and last date-time values
+    """
     err_message = "Uploaded file is not a valid timeseries csv file."
     log = logging.getLogger()
-    with open(uploaded_csv_file_name, 'r') as fl_obj:
-        csv_reader = csv.reader(fl_obj, delimiter=',')
-        # read the first row
-        header = csv_reader.next()
-        header = [el.strip() for el in header]
-        if any(len(h) == 0 for h in header):
-            err_message += " Column heading is missing."
-            log.error(err_message)
-            return err_message
-
-        # check that there are at least 2 headings
-        if len(header) < 2:
-            err_message += " There needs to be at least 2 columns of data."
-            log.error(err_message)
-            return err_message
-
-        # check the header has only string values
-        for hdr in header:
-            try:
-                float(hdr)
-                err_message += " Column heading must be a string."
-                log.error(err_message)
-                return err_message
-            except ValueError:
-                pass
-
-        # check that there are no duplicate column headings
-        if len(header) != len(set(header)):
-            err_message += " There are duplicate column headings."
-            log.error(err_message)
-            return err_message
-
-        # process data rows
-        for row in csv_reader:
-            # check that data row has the same number of columns as the header
-            if len(row) != len(header):
-                err_message += " Number of columns in the header is not same as the data columns."
-                log.error(err_message)
-                return err_message
-            # check that the first column data is of type datetime
-            try:
-                parser.parse(row[0])
-            except Exception:
-                err_message += " Data for the first column must be a date value."
-                log.error(err_message)
-                return err_message
-
-            # check that the data values (2nd column onwards) are of numeric
-            for data_value in row[1:]:
-                try:
-                    float(data_value)
-                except ValueError:
-                    err_message += " Data values must be numeric."
-                    log.error(err_message)
-                    return err_message
+    csv_reader = TimeSeriesCSVReader(uploaded_csv_file_name)
+    try:
+        csv_reader.validate()
+    except CSVValidationError as ex:
+        err_message += ex.args[0]
+        log.error(err_message)
+        return err_message, csv_reader
 
-    return None
+    return None, csv_reader
 
 
 def _validate_odm2_db_file(uploaded_sqlite_file_name):
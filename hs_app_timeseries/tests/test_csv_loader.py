@@ -0,0 +1,79 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+from unittest import TestCase
+
+from dateutil import parser
+
+from hs_app_timeseries.csv_loader import TimeSeriesCSVReader, CSVValidationError, \
+    insert_time_series_result_values, parse_datetimes
+
+
+class TestCSVLoader(TestCase):
+    def setUp(self):
+        super(TestCSVLoader, self).setUp()
+        self.temp_dir = tempfile.mkdtemp()
+        self.csv_file = 'hs_app_timeseries/tests/ODM2_Multi_Site_One_Variable_Test.csv'
+        self.sqlite_file = os.path.join(self.temp_dir, 'ODM2.sqlite')
+        shutil.copy('hs_app_timeseries/files/ODM2.sqlite', self.sqlite_file)
+
+    def tearDown(self):
+        super(TestCSVLoader, self).tearDown()
+        shutil.rmtree(self.temp_dir)
+
+    def test_parse_datetimes(self):
+        # ISO values (numpy) and other values (dateutil) parse to the same datetimes
+        iso_values = ['2008-01-01 00:30:00', '2008-01-01T01:00', '2008-01-02']
+        self.assertEqual(parse_datetimes(iso_values),
+                         [parser.parse(value) for value in iso_values])
+        other_values = ['01/01/2008 00:30', '2008-01-01 01:00:00']
+        self.assertEqual(parse_datetimes(other_values),
+                         [parser.parse(value) for value in other_values])
+        with self.assertRaises(Exception):
+            parse_datetimes(['2008001 00:00:00'])
+
+    def test_read_chunks(self):
+        # chunks smaller than the file are read in a single pass
+        csv_reader = TimeSeriesCSVReader(self.csv_file, chunk_size=3)
+        chunks = list(csv_reader.read_chunks())
+        self.assertEqual(len(chunks), 7)
+        self.assertEqual(csv_reader.header,
+                         ['ValueDateTime', 'Temp_DegC_Mendon', 'Temp_DegC_Paradise'])
+        self.assertEqual(csv_reader.row_count, 20)
+        self.assertEqual(csv_reader.start_date_str, '2008-01-01 00:00:00')
+        self.assertEqual(sum(len(rows) for rows, _ in chunks), 20)
+
+    def test_invalid_files(self):
+        messages = {
+            'Invalid_Headings_Test_2.csv': " Column heading is missing.",
+            'Invalid_Headings_Test_4.csv': " There are duplicate column headings.",
+            'Invalid_Headings_Test_5.csv': " Column heading must be a string.",
+            'Invalid_Data_Test_1.csv': " Data for the first column must be a date value.",
+            'Invalid_Data_Test_2.csv': " Data values must be numeric.",
+            'Invalid_Data_Test_3.csv': " Number of columns in the header is not same as "
+                                       "the data columns.",
+        }
+        for file_name, message in messages.items():
+            csv_reader = TimeSeriesCSVReader(os.path.join('hs_app_timeseries/tests', file_name))
+            with self.assertRaises(CSVValidationError) as cm:
+                csv_reader.validate()
+            self.assertEqual(cm.exception.args[0], message)
+
+    def test_insert_time_series_result_values(self):
+        con = sqlite3.connect(self.sqlite_file)
+        with con:
+            cur = con.cursor()
+            count = insert_time_series_result_values(
+                cur, TimeSeriesCSVReader(self.csv_file, chunk_size=6),
+                {'Temp_DegC_Mendon': 1, 'Temp_DegC_Paradise': 2}, -7)
+            self.assertEqual(count, 40)
+            cur.execute("SELECT COUNT(*) FROM TimeSeriesResultValues WHERE ResultID=1")
+            self.assertEqual(cur.fetchone()[0], 20)
+            cur.execute("SELECT ValueDateTime, DataValue, TimeAggregationInterval "
+                        "FROM TimeSeriesResultValues WHERE ResultID=1 ORDER BY ValueID")
+            date_time, data_value, time_interval = cur.fetchone()
+            self.assertEqual(date_time, '2008-01-01 00:00:00')
+            self.assertAlmostEqual(data_value, 0.1766667)
+            self.assertEqual(time_interval, 30)
+        con.close()
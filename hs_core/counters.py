@@ -0,0 +1,55 @@
+"""
+Named event counters for monitoring.
+
+Counters are kept in redis (settings.REDIS_CONNECTION), one hash per group of counters
+(e.g., 'bag'), so that the counts of all web processes and celery workers add up and can
+be read by any process, e.g., with get_counters() or the `counters` management command.
+Counters are advisory: changes are not recorded while redis is not available.
+"""
+
+import logging
+
+from django.conf import settings
+from redis import RedisError
+
+logger = logging.getLogger(__name__)
+
+_KEY_PREFIX = 'hs_counters'
+
+
+def _group_key(group):
+    return '{}:{}'.format(_KEY_PREFIX, group)
+
+
+def increment_counter(group, name, delta=1):
+    """Add delta to the counter group/name, creating it if necessary."""
+    try:
+        settings.REDIS_CONNECTION.hincrby(_group_key(group), name, delta)
+    except RedisError:
+        logger.warning("Counter %s.%s not incremented: redis is not available.", group, name)
+
+
+def set_counter(group, name, value):
+    """Set a gauge-like counter (e.g., a queue depth) to value."""
+    try:
+        settings.REDIS_CONNECTION.hset(_group_key(group), name, value)
+    except RedisError:
+        logger.warning("Counter %s.%s not set: redis is not available.", group, name)
+
+
+def get_counters(group):
+    """Return a dict of counter name -> value for all counters recorded in group."""
+    try:
+        values = settings.REDIS_CONNECTION.hgetall(_group_key(group))
+    except RedisError:
+        logger.warning("Counters of %s not available: redis is not available.", group)
+        return {}
+    return {name: int(value) for name, value in values.items()}
+
+
+def reset_counters(group):
+    """Remove all counters of group."""
+    try:
+        settings.REDIS_CONNECTION.delete(_group_key(group))
+    except RedisError:
+        logger.warning("Counters of %s not reset: redis is not available.", group)
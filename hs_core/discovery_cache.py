@@ -0,0 +1,68 @@
+"""
+Shared cache of the facet counts of discovery searches.
+
+Facet counts depend only on the search, not on who runs it, so they are cached in the
+Django cache under the normalized query, filters and selected facets, and shared by all
+users. Cache keys include the Solr index version (see
+hs_core.hydro_realtime_signal_processor.get_index_version), which is bumped whenever
+resources are indexed or removed, so that counts are recomputed after the index changes
+without querying Solr to find out. The index version is kept in redis, so that changes
+made by any web process or celery worker are seen by all of them. Changes made outside of
+the signal processor (e.g., by the update_index command) are picked up after
+DISCOVERY_FACET_CACHE_TIMEOUT seconds. Facet counts are not cached while the index version
+is not available.
+
+Hits and misses are recorded in the 'facets' group of hs_core.counters.
+"""
+
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+
+from hs_core.counters import increment_counter
+from hs_core.hydro_realtime_signal_processor import get_index_version
+
+FACET_COUNTERS = 'facets'
+FACET_CACHE_TIMEOUT = getattr(settings, 'DISCOVERY_FACET_CACHE_TIMEOUT', 60 * 60)
+
+
+def facet_cache_key(form, facet_fields):
+    """
+    Return the cache key of the facet counts of the search of a validated form, or None if
+    the Solr index version is not available.
+    """
+    version = get_index_version()
+    if version is None:
+        return None
+    data = form.cleaned_data
+    query = u' '.join((data.get('q') or u'').split())
+    filters = sorted((name, unicode(value)) for name, value in data.items()
+                     if name != 'q' and value not in (None, u''))
+    # selected facets without a value are ignored by the search
+    facets = sorted(set(facet for facet in form.selected_facets
+                        if u':' in facet and facet.split(u':', 1)[1]))
+    search = repr((query, filters, facets, sorted(facet_fields)))
+    return 'hs_discovery_facets:{}:{}'.format(version, hashlib.md5(search).hexdigest())
+
+
+def get_facet_counts(form, queryset, facet_fields):
+    """
+    Return the facet counts of queryset, the search of form, from the cache if possible.
+
+    Invalid forms are not cached, since their cleaned data do not describe the search.
+    """
+    if form is None or not form.is_valid():
+        return queryset.facet_counts()
+
+    key = facet_cache_key(form, facet_fields)
+    if key is None:
+        return queryset.facet_counts()
+    facets = cache.get(key)
+    if facets is not None:
+        increment_counter(FACET_COUNTERS, 'hits')
+        return facets
+    increment_counter(FACET_COUNTERS, 'misses')
+    facets = queryset.facet_counts()
+    cache.set(key, facets, FACET_CACHE_TIMEOUT)
+    return facets
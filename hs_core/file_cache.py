@@ -0,0 +1,238 @@
+"""
+Local on-disk cache of the files copied from iRODS for metadata extraction.
+
+get_file_from_irods copies resource files from iRODS to a temporary directory owned by the
+caller, who may modify or delete it. Multi-gigabyte files are often copied several times in
+a row (e.g., on upload, when setting a file type, and when updating metadata), so copies
+are served from a local cache when possible:
+
+- entries are keyed by the storage path of the file and its iRODS size and modification
+  time, so a changed file is never served stale; checksums are not used, since ichksum
+  would read whole files that iRODS has no checksum for;
+- the cache holds at most IRODS_FILE_CACHE_SIZE bytes in IRODS_FILE_CACHE_DIR, and the least
+  recently used entries are evicted first; a size of 0 disables the cache;
+- access is serialized per storage path with file locks, so that web and celery processes
+  can share the cache: a file is downloaded once however many processes ask for it, and an
+  entry is pinned (locked) while it is copied, so that it is not evicted meanwhile;
+- replace_resource_file_on_irods and ResourceFile.delete invalidate the entries of a file;
+- cached_file gives read-only access to an entry without copying it.
+
+Lock files are kept (they are empty) since removing them could let two processes lock
+different files for the same path. Hits and misses are recorded in the 'irods_file_cache'
+group of hs_core.counters.
+"""
+
+import errno
+import fcntl
+import hashlib
+import logging
+import os
+import shutil
+from contextlib import contextmanager
+from uuid import uuid4
+
+from django.conf import settings
+
+from hs_core.counters import increment_counter
+
+logger = logging.getLogger(__name__)
+
+FILE_CACHE_COUNTERS = 'irods_file_cache'
+
+
+def _cache_dir():
+    return getattr(settings, 'IRODS_FILE_CACHE_DIR',
+                   os.path.join(settings.TEMP_FILE_DIR, 'irods_file_cache'))
+
+
+def _cache_size():
+    return getattr(settings, 'IRODS_FILE_CACHE_SIZE', 0)
+
+
+def _path_key(storage_path):
+    """Return the key of a storage path, which prefixes the names of its entries."""
+    return hashlib.sha1(storage_path.encode('utf-8')).hexdigest()
+
+
+def _entry_dir(path_key, version):
+    version_key = hashlib.sha1(version.encode('utf-8')).hexdigest()
+    return os.path.join(_cache_dir(), '{}-{}'.format(path_key, version_key))
+
+
+def _file_version(res_file):
+    """Return the version of the contents of a resource file in iRODS."""
+    size, _, modified_time = res_file.get_irods_system_metadata(checksum=False)
+    return '{}:{}'.format(size, modified_time)
+
+
+@contextmanager
+def _locked(path_key, operation):
+    """Hold a lock on the entries of a storage path; yield False if a LOCK_NB one fails."""
+    with open(os.path.join(_cache_dir(), path_key + '.lock'), 'a') as lock_file:
+        try:
+            fcntl.flock(lock_file, operation)
+        except IOError as ex:
+            if ex.errno not in (errno.EAGAIN, errno.EACCES):
+                raise
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _remove_entries(path_key):
+    """Remove the entries of a storage path; the caller must hold its exclusive lock."""
+    for name in os.listdir(_cache_dir()):
+        if name.startswith(path_key + '-'):
+            shutil.rmtree(os.path.join(_cache_dir(), name), ignore_errors=True)
+
+
+def _dir_size(path):
+    return sum(os.path.getsize(os.path.join(dirpath, name))
+               for dirpath, _, names in os.walk(path) for name in names)
+
+
+def _download(istorage, storage_path, entry_dir, entry_file):
+    """Download a file to a new entry, which appears only once complete."""
+    tmp_dir = '{}.{}'.format(entry_dir, uuid4().hex)
+    os.makedirs(tmp_dir)
+    try:
+        istorage.getFile(storage_path, os.path.join(tmp_dir, os.path.basename(entry_file)))
+        os.rename(tmp_dir, entry_dir)
+    except Exception:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+
+
+def _ensure_cache_dir():
+    """Create the cache directory if needed; return False if the cache is not to be used."""
+    if _cache_size() <= 0:
+        return False
+    try:
+        os.makedirs(_cache_dir())
+    except OSError as ex:
+        if ex.errno != errno.EEXIST:
+            logger.warning("iRODS file cache disabled: {}".format(ex))
+            return False
+    return True
+
+
+@contextmanager
+def _pinned_entry(res_file, istorage):
+    """Yield the path of the cached copy of a resource file, downloading it if needed.
+
+    The entry is locked, so that it is not evicted, until the context exits.
+    """
+    storage_path = res_file.storage_path
+    path_key = _path_key(storage_path)
+    entry_dir = _entry_dir(path_key, _file_version(res_file))
+    entry_file = os.path.join(entry_dir, os.path.basename(storage_path))
+
+    # the shared lock pins the entry while it is used
+    with _locked(path_key, fcntl.LOCK_SH):
+        if os.path.exists(entry_file):
+            increment_counter(FILE_CACHE_COUNTERS, 'hits')
+            os.utime(entry_dir, None)
+            yield entry_file
+            return
+
+    with _locked(path_key, fcntl.LOCK_EX):
+        # another process may have downloaded the file while this one waited for the lock
+        if os.path.exists(entry_file):
+            increment_counter(FILE_CACHE_COUNTERS, 'hits')
+        else:
+            increment_counter(FILE_CACHE_COUNTERS, 'misses')
+            # previous versions of the file will not be used again
+            _remove_entries(path_key)
+            _download(istorage, storage_path, entry_dir, entry_file)
+        os.utime(entry_dir, None)
+        yield entry_file
+
+    evict()
+
+
+def copy_file_from_irods(res_file, istorage, target_path):
+    """
+    Copy a resource file from iRODS to target_path, through the cache.
+
+    :param res_file: an instance of ResourceFile
+    :param istorage: the IrodsStorage of the resource of res_file
+    :param target_path: path of the copy, which belongs to the caller
+    """
+    if not _ensure_cache_dir():
+        istorage.getFile(res_file.storage_path, target_path)
+        return
+
+    with _pinned_entry(res_file, istorage) as entry_file:
+        shutil.copyfile(entry_file, target_path)
+
+
+@contextmanager
+def cached_file(res_file, istorage):
+    """
+    Yield a local path of a resource file in iRODS, to be read but never modified.
+
+    Unlike copy_file_from_irods, this does not copy a cached file: the path is that of the
+    cache entry, which is pinned until the context exits. When the cache is disabled, the
+    file is downloaded to a temporary directory which is removed when the context exits.
+
+    :param res_file: an instance of ResourceFile
+    :param istorage: the IrodsStorage of the resource of res_file
+    """
+    if _ensure_cache_dir():
+        with _pinned_entry(res_file, istorage) as entry_file:
+            yield entry_file
+        return
+
+    tmp_dir = os.path.join(settings.TEMP_FILE_DIR, uuid4().hex)
+    os.makedirs(tmp_dir)
+    try:
+        tmp_file = os.path.join(tmp_dir, os.path.basename(res_file.storage_path))
+        istorage.getFile(res_file.storage_path, tmp_file)
+        yield tmp_file
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+def invalidate(storage_path):
+    """Remove the cached copies of the file at storage_path, e.g., when it changes."""
+    if not os.path.isdir(_cache_dir()):
+        return
+    path_key = _path_key(storage_path)
+    with _locked(path_key, fcntl.LOCK_EX):
+        _remove_entries(path_key)
+
+
+def evict(max_size=None):
+    """
+    Remove the least recently used entries until the cache holds at most max_size bytes
+    (IRODS_FILE_CACHE_SIZE by default). Entries in use by other processes are skipped.
+
+    :return: number of bytes removed
+    """
+    if max_size is None:
+        max_size = _cache_size()
+    entries = []
+    for name in os.listdir(_cache_dir()):
+        path = os.path.join(_cache_dir(), name)
+        try:
+            if os.path.isdir(path):
+                entries.append((os.path.getmtime(path), name, _dir_size(path)))
+        except OSError:
+            # removed by another process meanwhile
+            continue
+
+    total = sum(size for _, _, size in entries)
+    removed = 0
+    for _, name, size in sorted(entries):
+        if total - removed <= max_size:
+            break
+        with _locked(name.split('-', 1)[0], fcntl.LOCK_EX | fcntl.LOCK_NB) as locked:
+            if locked:
+                shutil.rmtree(os.path.join(_cache_dir(), name), ignore_errors=True)
+                removed += size
+    if removed:
+        increment_counter(FILE_CACHE_COUNTERS, 'evicted_bytes', removed)
+    return removed
@@ -1,23 +1,158 @@
+import time
+
+from django.conf import settings
 from django.db import models
+from haystack import connections, connection_router
 from haystack.signals import RealtimeSignalProcessor
 from haystack.exceptions import NotHandled
 import logging
 import types
 from haystack.query import SearchQuerySet
-from haystack.utils import get_identifier
+from haystack.utils import get_identifier, get_model_ct
+from redis import RedisError
+
+from hs_core.counters import increment_counter
 
 logger = logging.getLogger(__name__)
 
+# values of settings.SOLR_UPDATE_MODE
+SOLR_UPDATE_REALTIME = 'realtime'  # update Solr within the request that saves a resource
+SOLR_UPDATE_QUEUED = 'queued'      # queue resource ids for a celery task to update in batch
+SOLR_UPDATE_DISABLED = 'disabled'  # do not update Solr on save; use update_index instead
+
+# redis keys of the set of queued resource ids and of the flag for a scheduled task
+SOLR_QUEUE_KEY = 'hs_solr_queue'
+SOLR_QUEUE_SCHEDULED_KEY = 'hs_solr_queue_scheduled'
+SOLR_COUNTERS = 'solr'
+
+# redis key of the version of the Solr index, see get_index_version
+SOLR_INDEX_VERSION_KEY = 'hs_solr_index_version'
+
+
+def get_index_version():
+    """
+    Return a token that changes whenever resources are indexed or removed from Solr.
+
+    Results derived from the index (e.g., discovery facet counts) can be cached under this
+    token instead of querying Solr to find whether the index changed. The token is kept in
+    redis (settings.REDIS_CONNECTION), so that it is shared by the web processes and the
+    celery workers that update the index; if it is lost, a new, time-based token is started.
+    None is returned if redis is unavailable, in which case nothing should be cached.
+    """
+    redis = settings.REDIS_CONNECTION
+    try:
+        version = redis.get(SOLR_INDEX_VERSION_KEY)
+        if version is None:
+            redis.set(SOLR_INDEX_VERSION_KEY, int(time.time() * 1000), nx=True)
+            version = redis.get(SOLR_INDEX_VERSION_KEY)
+    except RedisError:
+        logger.warning("Solr index version not available from redis.")
+        return None
+    return version
+
+
+def bump_index_version():
+    """ Record that the Solr index changed """
+    redis = settings.REDIS_CONNECTION
+    try:
+        # a lost token is started again from the time, so that it differs from the old ones
+        redis.set(SOLR_INDEX_VERSION_KEY, int(time.time() * 1000), nx=True)
+        redis.incr(SOLR_INDEX_VERSION_KEY)
+    except RedisError:
+        logger.warning("Solr index version not bumped: redis is not available.")
+
+
+def get_solr_update_mode():
+    return getattr(settings, 'SOLR_UPDATE_MODE', SOLR_UPDATE_REALTIME)
+
+
+def queue_resource_update(resource_id):
+    """
+    Queue a resource for a batched Solr update.
+
+    Ids are kept in a redis set, so that repeated saves of a resource within
+    settings.SOLR_UPDATE_DELAY seconds are coalesced into one update. A celery task
+    is scheduled for the first id queued in that window. If redis is not available, the
+    resource is updated right away instead, so that saving it does not fail.
+    """
+    from hs_core.tasks import update_solr_index  # avoid circular import
+
+    redis = settings.REDIS_CONNECTION
+    delay = getattr(settings, 'SOLR_UPDATE_DELAY', 10)
+    try:
+        queued = redis.sadd(SOLR_QUEUE_KEY, resource_id)
+        # the flag expires in case the scheduled task is lost
+        schedule = redis.set(SOLR_QUEUE_SCHEDULED_KEY, 1, nx=True, ex=delay * 6)
+    except RedisError:
+        logger.warning("Solr update of resource %s not queued: redis is not available; "
+                       "updating it now.", resource_id)
+        update_solr_for_resources([resource_id])
+        return
+
+    increment_counter(SOLR_COUNTERS, 'queued' if queued else 'coalesced')
+    if schedule:
+        update_solr_index.apply_async(countdown=delay)
+
+
+def pop_queued_resources():
+    """ Return and clear the ids of all resources queued by queue_resource_update """
+    redis = settings.REDIS_CONNECTION
+    # ids queued from now on schedule another task
+    redis.delete(SOLR_QUEUE_SCHEDULED_KEY)
+    pipe = redis.pipeline()  # transaction: no id is queued between read and delete
+    pipe.smembers(SOLR_QUEUE_KEY)
+    pipe.delete(SOLR_QUEUE_KEY)
+    resource_ids, _ = pipe.execute()
+    return set(int(resource_id) for resource_id in resource_ids)
+
+
+def update_solr_for_resources(resource_ids):
+    """
+    Update Solr for the given resource ids with one batched update and remove per backend.
+
+    Resources that are public or discoverable are (re)indexed; all others, including
+    resources deleted since they were queued, are removed from the index.
+    """
+    from hs_core.models import BaseResource
+
+    resource_ids = set(resource_ids)
+    if not resource_ids:
+        return
+    for using in connection_router.for_write(models=[BaseResource]):
+        backend = connections[using].get_backend()
+        try:
+            index = connections[using].get_unified_index().get_index(BaseResource)
+        except NotHandled:
+            logger.exception("Failure: no Solr index for BaseResource on %s.", using)
+            continue
+
+        # index_queryset loads the index context of all resources in bulk
+        resources = list(index.index_queryset(using=using).filter(id__in=resource_ids))
+        stale_ids = sorted(resource_ids - set(res.id for res in resources))
+        for n, resource_id in enumerate(stale_ids):
+            # commit once, with the last operation of the batch
+            commit = not resources and n == len(stale_ids) - 1
+            backend.remove('{}.{}'.format(get_model_ct(BaseResource), resource_id),
+                           commit=commit)
+        if resources:
+            backend.update(index, resources, commit=True)
+
+        increment_counter(SOLR_COUNTERS, 'updated', len(resources))
+        increment_counter(SOLR_COUNTERS, 'removed', len(stale_ids))
+    bump_index_version()
+
 
 class HydroRealtimeSignalProcessor(RealtimeSignalProcessor):
 
-    """ 
+    """
     Customized for the fact that all indexed resources are subclasses of BaseResource. 
 
     Notes: 
     1. RealtimeSignalProcessor already plumbs in all class updates. We might want to be more specific. 
     2. The class sent to this is a subclass of BaseResource, or another class. 
     3. Thus, we want to capture cases in which it is an appropriate instance, and respond. 
+    4. settings.SOLR_UPDATE_MODE selects whether Solr is updated in the request ('realtime',
+       the default), in batches by a celery task ('queued'), or not at all ('disabled').
     """
 
     def handle_save(self, sender, instance, **kwargs):
@@ -27,7 +162,18 @@ class HydroRealtimeSignalProcessor(RealtimeSignalProcessor):
         """
         from hs_core.models import BaseResource
         from hs_access_control.models import ResourceAccess
-    
+
+        mode = get_solr_update_mode()
+        if mode == SOLR_UPDATE_DISABLED:
+            return
+        if mode == SOLR_UPDATE_QUEUED:
+            # only record the id; the celery task decides whether to index or remove
+            if isinstance(instance, BaseResource):
+                queue_resource_update(instance.pk)
+            elif isinstance(instance, ResourceAccess):
+                queue_resource_update(instance.resource_id)
+            return
+
         if isinstance(instance, BaseResource):
             if hasattr(instance, 'raccess') and hasattr(instance, 'metadata'): 
                 # work around for failure of super(BaseResource, instance) to work properly.
@@ -50,6 +196,7 @@ class HydroRealtimeSignalProcessor(RealtimeSignalProcessor):
                             index.remove_object(newinstance, using=using)
                         except NotHandled:
                             logger.exception("Failure: delete of %s with short_id %s failed.", str(type(instance)), newinstance.short_id)
+                bump_index_version()
 
         elif isinstance(instance, ResourceAccess):
             # automatically a BaseResource; just call the routine on it. 
@@ -66,12 +213,20 @@ class HydroRealtimeSignalProcessor(RealtimeSignalProcessor):
         from hs_core.models import BaseResource
         from hs_access_control.models import ResourceAccess
 
+        mode = get_solr_update_mode()
+        if mode == SOLR_UPDATE_DISABLED:
+            return
+
         # only delete the SOLR instance when the raccess field is recursively deleted.
         # At this point, the resource still exists.
         # Thus, the BaseResource is literally available and can be unindexed.
         # Trying to delete as a result of deleting the Resource fails, because
         # it is not possible to recover the BaseResource object.
         if isinstance(instance, ResourceAccess):
+            if mode == SOLR_UPDATE_QUEUED:
+                # by the time the queue is processed the resource is gone and is removed
+                queue_resource_update(instance.resource_id)
+                return
             newinstance = instance.resource # automatically a BaseResource
             newsender = BaseResource
             # self.handle_delete(newsender, newinstance)
@@ -82,3 +237,4 @@ class HydroRealtimeSignalProcessor(RealtimeSignalProcessor):
                     index.remove_object(newinstance, using=using)
                 except NotHandled:
                     logger.exception("Failure: delete of %s with short_id %s failed.", str(type(instance)), newinstance.short_id)
+            bump_index_version()
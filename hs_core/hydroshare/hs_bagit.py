@@ -1,17 +1,22 @@
 import os
 import shutil
 import errno
+import hashlib
+import itertools
 import tempfile
 import mimetypes
 import zipfile
 
 from uuid import uuid4
 
+from xml.sax.saxutils import escape, quoteattr
+
 from foresite import utils, Aggregation, AggregatedResource, RdfLibSerializer
 from rdflib import Namespace, URIRef
 
 import bagit
 from mezzanine.conf import settings
+from hs_core.counters import increment_counter
 from hs_core.models import Bags, ResourceFile
 
 
@@ -19,6 +24,81 @@ class HsBagitException(Exception):
     pass
 
 
+# iRODS AVUs on the resource collection recording the content hashes of the last
+# uploaded metadata documents and of the last generated bag
+METADATA_HASH_AVU = 'metadata_hash'
+RESMAP_HASH_AVU = 'resmap_hash'
+BAG_HASH_AVU = 'bag_hash'
+
+# group name of the monitoring counters in hs_core.counters
+BAG_COUNTERS = 'bag'
+
+
+def _content_hash(parts):
+    """ return the hex sha256 digest of an iterable of strings """
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(_utf8(part))
+        digest.update('\0')
+    return digest.hexdigest()
+
+
+def iter_file_manifest(resource, system_metadata=False):
+    """
+    yield tuples describing the content files of a resource in path order, streamed from
+    a single query so that memory use does not grow with the number of files.
+
+    :param resource: the resource whose files are listed
+    :param system_metadata: if True, each entry also contains the recorded size, checksum and
+    modification time of the file, so that the manifest changes when file contents change.
+    :return: iterator of tuples starting with the short path of each file
+    """
+    field = 'fed_resource_file' if resource.is_federated else 'resource_file'
+    fields = [field]
+    if system_metadata:
+        fields.extend(['_size', '_checksum', '_modified_time'])
+    prefix = resource.file_path + '/'
+    rows = ResourceFile.objects.filter(object_id=resource.id).order_by(field)\
+        .values_list(*fields).iterator()
+    for row in rows:
+        path = row[0]
+        if path.startswith(prefix):
+            path = path[len(prefix):]
+        yield (path,) + tuple(str(value) for value in row[1:])
+
+
+def get_bag_content_hash(resource, istorage=None):
+    """
+    return a hash of everything that goes into the bag of a resource: the uploaded metadata
+    documents and the recorded state of every content file.
+    """
+    if istorage is None:
+        istorage = resource.get_irods_storage()
+    res_coll = resource.root_path
+    parts = itertools.chain([istorage.getAVU(res_coll, METADATA_HASH_AVU) or '',
+                             istorage.getAVU(res_coll, RESMAP_HASH_AVU) or ''],
+                            ('\t'.join(entry) for entry in
+                             iter_file_manifest(resource, system_metadata=True)))
+    return _content_hash(parts)
+
+
+def invalidate_bag_hash(resource, istorage=None):
+    """
+    forget the content hash of the last generated bag, so that the next bag creation rebuilds
+    the bag. This is needed after file contents change in place in iRODS, since the recorded
+    file state used by get_bag_content_hash may then be unchanged (e.g., a same-size rewrite
+    of a file whose checksum and modification time were never recorded).
+    """
+    if istorage is None:
+        istorage = resource.get_irods_storage()
+    istorage.setAVU(resource.root_path, BAG_HASH_AVU, '')
+
+
+def _document_is_current(istorage, res_coll, avu_name, content_hash, path):
+    """ return True if the document at path was uploaded with content_hash """
+    return istorage.getAVU(res_coll, avu_name) == content_hash and istorage.exists(path)
+
+
 def delete_files_and_bag(resource):
     """
     delete the resource bag and all resource files.
@@ -42,21 +122,27 @@ def delete_files_and_bag(resource):
         bag.delete()
 
 
-def create_bag_files(resource):
+def create_bag_files(resource, force=False):
     """
     create and update files needed by bagit operation that is conducted on iRODS server;
     no bagit operation is performed, only files that will be included in the bag are created
     or updated.
 
+    The serialized metadata and the inputs of the resource map are hashed; a document whose
+    hash matches the one recorded when it was last uploaded is not uploaded again, and the
+    resource map is not even rebuilt. Uploads and skips are counted in the 'bag' counters.
+
     Parameters:
     :param resource: A resource whose files will be created or updated to be included in the
     resource bag.
+    :param force: if True, regenerate and upload both documents regardless of their hashes.
     :return: istorage, an IrodsStorage object that will be used by subsequent operation to
     create a bag on demand as needed.
     """
-    from hs_core.hydroshare.utils import current_site_url, get_file_mime_type
+    from hs_core.hydroshare.utils import current_site_url
 
     istorage = resource.get_irods_storage()
+    res_coll = resource.root_path
 
     # the temp_path is a temporary holding path to make the files available to iRODS
     # we have to make temp_path unique even for the same resource with same update time
@@ -83,18 +169,86 @@ def create_bag_files(resource):
     # to_file_name = '{res_id}/data/visualization/'.format(res_id=resource.short_id)
     # istorage.saveFile('', to_file_name, create_directory=True)
 
-    # create resourcemetadata.xml in local directory and upload it to iRODS
-    from_file_name = os.path.join(temp_path, 'resourcemetadata.xml')
-    with open(from_file_name, 'w') as out:
-        # resources that don't support file types this would write only resource level metadata
-        # resource types that support file types this would write resource level metadata
-        # as well as file type metadata
-        out.write(resource.get_metadata_xml())
+    # create resourcemetadata.xml in local directory and upload it to iRODS if it changed
+    # resources that don't support file types this would write only resource level metadata
+    # resource types that support file types this would write resource level metadata
+    # as well as file type metadata
+    metadata_xml = resource.get_metadata_xml()
+    metadata_hash = _content_hash([metadata_xml])
     to_file_name = os.path.join(resource.root_path, 'data', 'resourcemetadata.xml')
-    istorage.saveFile(from_file_name, to_file_name, True)
+    if not force and _document_is_current(istorage, res_coll, METADATA_HASH_AVU,
+                                          metadata_hash, to_file_name):
+        increment_counter(BAG_COUNTERS, 'metadata_skipped')
+    else:
+        from_file_name = os.path.join(temp_path, 'resourcemetadata.xml')
+        with open(from_file_name, 'w') as out:
+            out.write(metadata_xml)
+        istorage.saveFile(from_file_name, to_file_name, True)
+        istorage.setAVU(res_coll, METADATA_HASH_AVU, metadata_hash)
+        increment_counter(BAG_COUNTERS, 'metadata_uploaded')
 
     # URLs are found in the /data/ subdirectory to comply with bagit format assumptions
     current_site_url = current_site_url()
+
+    # the resource map only depends upon these inputs; skip building it if they are unchanged
+    contained_res_ids = []
+    if resource.resource_type == "CollectionResource" and resource.resources:
+        contained_res_ids = list(resource.resources.values_list('short_id', flat=True))
+    resmap_hash = _content_hash(itertools.chain(
+        [current_site_url, resource.short_id, resource.metadata.title.value,
+         resource.metadata.type.url, unicode(resource._meta.verbose_name)],
+        (path for path, in iter_file_manifest(resource)),
+        contained_res_ids))
+    to_file_name = os.path.join(resource.root_path, 'data', 'resourcemap.xml')
+    if not force and _document_is_current(istorage, res_coll, RESMAP_HASH_AVU,
+                                          resmap_hash, to_file_name):
+        increment_counter(BAG_COUNTERS, 'resmap_skipped')
+    else:
+        # create resourcemap.xml and upload it to iRODS
+        from_file_name = os.path.join(temp_path, 'resourcemap.xml')
+        with open(from_file_name, 'w') as out:
+            write_resource_map(out, resource, current_site_url,
+                               lambda: _iter_aggregated_entries(resource, current_site_url,
+                                                                contained_res_ids))
+        istorage.saveFile(from_file_name, to_file_name, False)
+        istorage.setAVU(res_coll, RESMAP_HASH_AVU, resmap_hash)
+        increment_counter(BAG_COUNTERS, 'resmap_uploaded')
+
+    istorage.setAVU(res_coll, 'metadata_dirty', "false")
+    shutil.rmtree(temp_path)
+    return istorage
+
+
+def _iter_aggregated_entries(resource, current_site_url, contained_res_ids):
+    """
+    yield (uri, format) of the content files of a resource and of the resource maps of
+    the resources contained in a collection, in the order they appear in resourcemap.xml.
+    """
+    from hs_core.hydroshare.utils import get_file_mime_type
+
+    for short_path, in iter_file_manifest(resource):
+        res_uri = '{hs_url}/resource/{res_id}/data/contents/{file_name}'.format(
+            hs_url=current_site_url,
+            res_id=resource.short_id,
+            file_name=short_path)
+        yield res_uri, get_file_mime_type(os.path.basename(short_path))
+
+    # handle collection resource type
+    # save contained resource urls into resourcemap.xml
+    for contained_res_id in contained_res_ids:
+        resource_map_url = '{hs_url}/resource/{res_id}/data/resourcemap.xml'.format(
+                hs_url=current_site_url,
+                res_id=contained_res_id)
+        yield resource_map_url, "application/rdf+xml"
+
+
+def serialize_resource_map(resource, current_site_url, entries):
+    """
+    serialize the ORE resource map of a resource as an RDF/XML string with foresite/rdflib.
+
+    This builds the whole RDF graph in memory, so it is only used directly for the constant
+    part of the map; write_resource_map streams the (uri, format) entries of aggregated files.
+    """
     # This is the qualified resource url.
     hs_res_url = os.path.join(current_site_url, 'resource', resource.short_id, 'data')
     # this is the path to the resourcemedata file for download
@@ -129,37 +283,14 @@ def create_bag_files(resource):
     resMetaFile._citoterms.documents = ag_url
     resMetaFile._ore.isAggregatedBy = ag_url
     resMetaFile._dc.format = "application/rdf+xml"
-
-    # Create a description of the content file and add it to the aggregation
-    files = ResourceFile.objects.filter(object_id=resource.id)
-    resFiles = []
-    for n, f in enumerate(files):
-        res_uri = '{hs_url}/resource/{res_id}/data/contents/{file_name}'.format(
-            hs_url=current_site_url,
-            res_id=resource.short_id,
-            file_name=f.short_path)
-        resFiles.append(AggregatedResource(res_uri))
-        resFiles[n]._ore.isAggregatedBy = ag_url
-        resFiles[n]._dc.format = get_file_mime_type(os.path.basename(f.short_path))
-
-    # Add the resource files to the aggregation
     a.add_resource(resMetaFile)
-    for f in resFiles:
-        a.add_resource(f)
-
-    # handle collection resource type
-    # save contained resource urls into resourcemap.xml
-    if resource.resource_type == "CollectionResource" and resource.resources:
-        for contained_res in resource.resources.all():
-            contained_res_id = contained_res.short_id
-            resource_map_url = '{hs_url}/resource/{res_id}/data/resourcemap.xml'.format(
-                    hs_url=current_site_url,
-                    res_id=contained_res_id)
 
-            ar = AggregatedResource(resource_map_url)
-            ar._ore.isAggregatedBy = ag_url
-            ar._dc.format = "application/rdf+xml"
-            a.add_resource(ar)
+    # Create a description of each aggregated file and add it to the aggregation
+    for uri, file_format in entries:
+        ar = AggregatedResource(uri)
+        ar._ore.isAggregatedBy = ag_url
+        ar._dc.format = file_format
+        a.add_resource(ar)
 
     # Register a serializer with the aggregation, which creates a new ResourceMap that needs a URI
     serializer = RdfLibSerializer('xml')
@@ -176,18 +307,56 @@ def create_bag_files(resource):
     # <ore:aggregates rdf:resource="[hydroshare domain]/terms/[Resource class name]"/>
     xml_string = xml_string.replace(
         '<ore:aggregates rdf:resource="%s"/>\n' % str(resource.metadata.type.url), '')
+    return xml_string
 
-    # create resourcemap.xml and upload it to iRODS
-    from_file_name = os.path.join(temp_path, 'resourcemap.xml')
-    with open(from_file_name, 'w') as out:
-        out.write(xml_string)
-    to_file_name = os.path.join(resource.root_path, 'data', 'resourcemap.xml')
-    istorage.saveFile(from_file_name, to_file_name, False)
 
-    res_coll = resource.root_path
-    istorage.setAVU(res_coll, 'metadata_dirty', "false")
-    shutil.rmtree(temp_path)
-    return istorage
+def write_resource_map(out, resource, current_site_url, get_entries):
+    """
+    write the ORE resource map of a resource as RDF/XML to the open file out.
+
+    :param out: file-like object to write to
+    :param resource: the resource being described
+    :param current_site_url: site url used to build the urls in the map
+    :param get_entries: callable returning a fresh iterator of (uri, format) pairs of the
+    aggregated files; it is called twice.
+
+    The constant part of the map (aggregation, resource map, resource type and metadata
+    document) is serialized by serialize_resource_map. The entries, whose number is
+    unbounded, are then written into that document in the same form the rdflib XML
+    serializer gives them: an ore:aggregates property of the aggregation and an
+    rdf:Description per entry. Memory use is therefore constant in the number of files.
+    The result describes the same RDF graph as serialize_resource_map with all entries.
+    """
+    header = serialize_resource_map(resource, current_site_url, [])
+    ag_url = os.path.join(current_site_url, 'resource', resource.short_id, 'data',
+                          'resourcemap.xml#aggregation')
+    ag_literal = escape(_utf8(ag_url))
+
+    # aggregates are added to the end of the description of the aggregation
+    ag_start = header.index('<rdf:Description rdf:about=%s>' % quoteattr(ag_url))
+    ag_end = header.index('</rdf:Description>', ag_start)
+    ag_end = header.rindex('\n', 0, ag_end) + 1
+    # descriptions of the entries are added at the end of the document
+    rdf_end = header.rindex('</rdf:RDF>')
+
+    out.write(header[:ag_end])
+    for uri, _ in get_entries():
+        out.write('    <ore:aggregates rdf:resource=%s/>\n' % quoteattr(_utf8(uri)))
+    out.write(header[ag_end:rdf_end])
+    for uri, file_format in get_entries():
+        out.write('  <rdf:Description rdf:about=%s>\n'
+                  '    <ore:isAggregatedBy>%s</ore:isAggregatedBy>\n'
+                  '    <dc:format>%s</dc:format>\n'
+                  '  </rdf:Description>\n'
+                  % (quoteattr(_utf8(uri)), ag_literal, escape(_utf8(file_format))))
+    out.write(header[rdf_end:])
+
+
+def _utf8(value):
+    """ encode unicode as utf-8 to match the encoding of the rdflib serialization """
+    if isinstance(value, unicode):
+        return value.encode('utf-8')
+    return value
 
 
 def create_bag(resource):
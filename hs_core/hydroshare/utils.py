@@ -26,7 +26,8 @@ from mezzanine.conf import settings
 from hs_core.signals import pre_create_resource, post_create_resource, pre_add_files_to_resource, \
     post_add_files_to_resource
 from hs_core.models import AbstractResource, BaseResource, ResourceFile
-from hs_core.hydroshare.hs_bagit import create_bag_files
+from hs_core.hydroshare.hs_bagit import create_bag_files, invalidate_bag_hash
+from hs_core import file_cache
 
 from django_irods.icommands import SessionException
 from django_irods.storage import IrodsStorage
@@ -252,12 +253,13 @@ def get_fed_zone_files(irods_fnames):
     return ret_file_list
 
 
-# TODO: make the local cache file (and cleanup) part of ResourceFile state?
 def get_file_from_irods(res_file):
     """
     Copy the file (res_file) from iRODS (local or federated zone)
     over to django (temp directory) which is
     necessary for manipulating the file (e.g. metadata extraction).
+    The copy is made from the local cache of iRODS files (see hs_core.file_cache) when
+    possible; it belongs to the caller, who may modify it.
     Note: The caller is responsible for cleaning the temp directory
 
     :param res_file: an instance of ResourceFile
@@ -271,8 +273,6 @@ def get_file_from_irods(res_file):
     tmpdir = os.path.join(settings.TEMP_FILE_DIR, uuid4().hex)
     tmpfile = os.path.join(tmpdir, file_name)
 
-    # TODO: If collisions occur, really bad things happen.
-    # TODO: Directories are never cleaned up when unused. need cache management.
     try:
         os.makedirs(tmpdir)
     except OSError as ex:
@@ -282,7 +282,7 @@ def get_file_from_irods(res_file):
         else:
             raise Exception(ex.message)
 
-    istorage.getFile(res_file_path, tmpfile)
+    file_cache.copy_file_from_irods(res_file, istorage, tmpfile)
     copied_file = tmpfile
     return copied_file
 
@@ -303,6 +303,13 @@ def replace_resource_file_on_irods(new_file, original_resource_file, user):
 
     # Note: this doesn't update metadata at all.
     istorage.saveFile(new_file, ori_storage_path, True)
+    file_cache.invalidate(ori_storage_path)
+
+    # the recorded size and checksum no longer describe the file
+    original_resource_file.reset_system_metadata()
+    # the file state recorded for a same-size replacement can match the one the last bag
+    # was built from, so make sure the bag is rebuilt
+    invalidate_bag_hash(ori_res, istorage)
 
     # do this so that the bag will be regenerated prior to download of the bag
     resource_modified(ori_res, by_user=user, overwrite_bag=False)
@@ -3,6 +3,7 @@ import os
 from datetime import datetime, timedelta
 
 from django.db import models
+from django.utils.timezone import utc
 from django.core.exceptions import PermissionDenied, ValidationError
 from mezzanine.conf import settings
 
@@ -245,3 +246,40 @@ class ResourceFileIRODSMixin(models.Model):
     def create_ticket(self, user, write=False):
         """ This creates a ticket to read or modify this file """
         return self.resource.create_ticket(user, path=self.storage_path, write=write)
+
+    def get_irods_system_metadata(self, checksum=True):
+        """
+        Return (size, checksum, modified_time) of this file as recorded by iRODS.
+
+        ichksum returns the registered checksum, computing and registering it first
+        if iRODS does not have one; it is not run if checksum is False, and the checksum
+        returned is None. modified_time is a timezone-aware datetime or None if iRODS does
+        not report it.
+        """
+        istorage = self.resource.get_irods_storage()
+        path = self.storage_path
+        size = istorage.size(path)
+
+        irods_checksum = None
+        if checksum:
+            # output is of the form "    file1.txt    sha2:XXXX" followed by a summary line
+            stdout = istorage.session.run("ichksum", None, path)[0]
+            for line in stdout.split('\n'):
+                tokens = line.split()
+                if len(tokens) >= 2 and not line.startswith('Total'):
+                    irods_checksum = tokens[-1]
+                    break
+
+        # output contains a line of the form "modify_ts: 01497976963: 2017-06-20.16:42:43"
+        stdout = istorage.session.run("isysmeta", None, 'ls', path)[0]
+        modified_time = None
+        for line in stdout.split('\n'):
+            if line.startswith('modify_ts:'):
+                try:
+                    epoch = int(line.split(':')[1])
+                except (IndexError, ValueError):
+                    break
+                modified_time = datetime.fromtimestamp(epoch, utc)
+                break
+
+        return size, irods_checksum, modified_time
@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+
+"""
+Benchmark generation of resourcemap.xml for synthetic resources with many files
+
+This uses an existing resource for the resource level metadata and a synthetic list of
+content files, and compares the streaming writer (hs_bagit.write_resource_map) with
+serializing the whole rdflib graph (hs_bagit.serialize_resource_map).
+
+* By default, benchmarks 10000 and 100000 files.
+* Optional argument --skip_graph benchmarks only the streaming writer, which is useful
+  for sizes at which the graph serializer takes too long.
+
+Nothing is written to iRODS or Django.
+"""
+
+import resource as rlimit
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand
+from hs_core.hydroshare.hs_bagit import serialize_resource_map, write_resource_map
+from hs_core.hydroshare.utils import current_site_url, get_resource_by_shortkey
+
+
+def synthetic_entries(site_url, short_id, count):
+    """ yield (uri, format) for count files spread over 100 folders """
+    for n in range(count):
+        yield ('{}/resource/{}/data/contents/folder{}/file{}.txt'
+               .format(site_url, short_id, n % 100, n), 'text/plain')
+
+
+def max_rss_mb():
+    """ peak resident set size of this process so far, in MB """
+    return rlimit.getrusage(rlimit.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+class Command(BaseCommand):
+    help = "Benchmark resourcemap.xml generation for synthetic resources."
+
+    def add_arguments(self, parser):
+
+        # resource to take resource level metadata from
+        parser.add_argument('resource_id', type=str)
+
+        # Named (optional) arguments
+        parser.add_argument(
+            '--files',
+            nargs='+',
+            type=int,
+            dest='files',  # value is options['files']
+            default=[10000, 100000],
+            help='numbers of synthetic files to benchmark'
+        )
+
+        parser.add_argument(
+            '--skip_graph',
+            action='store_true',  # True for presence, False for absence
+            dest='skip_graph',  # value is options['skip_graph']
+            help='do not benchmark the rdflib graph serializer'
+        )
+
+    def handle(self, *args, **options):
+        resource = get_resource_by_shortkey(options['resource_id'])
+        site_url = current_site_url()
+
+        for count in options['files']:
+            # the streaming writer runs first so that its peak memory is not masked
+            # by that of the graph serializer
+            with tempfile.TemporaryFile() as out:
+                start = time.time()
+                write_resource_map(out, resource, site_url,
+                                   lambda: synthetic_entries(site_url, resource.short_id, count))
+                elapsed = time.time() - start
+                size = out.tell()
+            print("streamed {} files: {:.2f}s, {} bytes, peak rss {:.1f} MB"
+                  .format(count, elapsed, size, max_rss_mb()))
+
+            if not options['skip_graph']:
+                start = time.time()
+                xml_string = serialize_resource_map(
+                    resource, site_url, synthetic_entries(site_url, resource.short_id, count))
+                elapsed = time.time() - start
+                print("rdflib graph {} files: {:.2f}s, {} bytes, peak rss {:.1f} MB"
+                      .format(count, elapsed, len(xml_string), max_rss_mb()))
@@ -100,26 +100,26 @@ class Command(BaseCommand):
 
                     if options['generate']:  # generate usable bag
 
-                        create_bag_files(resource)
+                        create_bag_files(resource, force=True)
                         print("metadata generated for {} from Django".format(rid))
                         resource.setAVU('metadata_dirty', 'false')
                         print("metadata_dirty set to false for {}".format(rid))
 
-                        create_bag_by_irods(rid)
+                        create_bag_by_irods(rid, force=True)
                         print("bag generated for {} from iRODs".format(rid))
                         resource.setAVU('bag_modified', 'false')
                         print("bag_modified set to false for {}".format(rid))
 
                     elif options['generate_metadata']:
 
-                        create_bag_files(resource)
+                        create_bag_files(resource, force=True)
                         print("metadata generated for {} from Django".format(rid))
                         resource.setAVU('metadata_dirty', 'false')
                         print("metadata_dirty set to false for {}".format(rid))
 
                     elif options['generate_bag']:
 
-                        create_bag_by_irods(rid)
+                        create_bag_by_irods(rid, force=True)
                         print("bag generated for {} from iRODs".format(rid))
                         resource.setAVU('bag_modified', 'false')
                         print("bag_modified set to false for {}".format(rid))
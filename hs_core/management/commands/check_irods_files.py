@@ -7,6 +7,8 @@ This checks that:
 
 1. every ResourceFile corresponds to an iRODS file
 2. every iRODS file in {short_id}/data/contents corresponds to a ResourceFile
+   (file sizes not yet recorded in Django are filled in; sizes, checksums and
+   modification times are re-read from iRODS with --refresh_file_metadata)
 3. every iRODS directory {short_id} corresponds to a Django resource
 
 * By default, prints errors on stdout.
@@ -78,6 +80,12 @@ class Command(BaseCommand):
             dest='clean_django',
             help='delete unreferenced Django file objects',
         )
+        parser.add_argument(
+            '--refresh_file_metadata',
+            action='store_true',  # True for presence, False for absence
+            dest='refresh_file_metadata',
+            help='re-read file sizes and checksums recorded in Django from iRODS',
+        )
         # Named (optional) arguments
         parser.add_argument(
             '--unreferenced',
@@ -108,13 +116,17 @@ class Command(BaseCommand):
                     print(' (deleting Django file objects without files)')
                 if options['sync_ispublic']:
                     print(' (correcting isPublic in iRODs)')
+                if options['refresh_file_metadata']:
+                    print(' (refreshing file sizes and checksums from iRODs)')
                 resource.check_irods_files(stop_on_error=False,
                                            echo_errors=not options['log'],
                                            log_errors=options['log'],
                                            return_errors=False,
                                            clean_irods=options['clean_irods'],
                                            clean_django=options['clean_django'],
-                                           sync_ispublic=options['sync_ispublic'])
+                                           sync_ispublic=options['sync_ispublic'],
+                                           refresh_file_metadata=options[
+                                               'refresh_file_metadata'])
 
         else:  # check all resources
             print("LOOKING FOR FILE ERRORS FOR ALL RESOURCES")
@@ -124,6 +136,8 @@ class Command(BaseCommand):
                 print(' (deleting Django file objects without files)')
             if options['sync_ispublic']:
                 print(' (correcting isPublic in iRODs)')
+            if options['refresh_file_metadata']:
+                print(' (refreshing file sizes and checksums from iRODs)')
             for r in BaseResource.objects.all():
                 r.check_irods_files(stop_on_error=False,
                                     echo_errors=not options['log'],  # Don't both log and echo
@@ -131,4 +145,5 @@ class Command(BaseCommand):
                                     return_errors=False,
                                     clean_irods=options['clean_irods'],
                                     clean_django=options['clean_django'],
-                                    sync_ispublic=options['sync_ispublic'])
+                                    sync_ispublic=options['sync_ispublic'],
+                                    refresh_file_metadata=options['refresh_file_metadata'])
@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+
+"""
+Print monitoring counters recorded by hs_core.counters
+
+* By default, prints the counters of the given groups (e.g., bag).
+* Optional argument --reset clears the counters after printing them.
+"""
+
+from django.core.management.base import BaseCommand
+from hs_core.counters import get_counters, reset_counters
+
+
+class Command(BaseCommand):
+    help = "Print monitoring counters."
+
+    def add_arguments(self, parser):
+
+        # a list of counter groups
+        parser.add_argument('groups', nargs='+', type=str)
+
+        # Named (optional) arguments
+        parser.add_argument(
+            '--reset',
+            action='store_true',  # True for presence, False for absence
+            dest='reset',  # value is options['reset']
+            help='reset counters after printing them'
+        )
+
+    def handle(self, *args, **options):
+        for group in options['groups']:
+            counters = get_counters(group)
+            if not counters:
+                print("no counters recorded for {}".format(group))
+            for name in sorted(counters):
+                print("{}.{} {}".format(group, name, counters[name]))
+            if options['reset']:
+                reset_counters(group)
@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import json
+
+from django.db import migrations, models
+
+
+# Methods in models are not available during migrations; this is a copy of
+# Coverage.get_bbox.
+def get_bbox(coverage_type, value):
+    try:
+        if coverage_type == 'box':
+            x = (float(value['eastlimit']), float(value['westlimit']))
+            y = (float(value['southlimit']), float(value['northlimit']))
+        elif coverage_type == 'point':
+            x = (float(value['east']),) * 2
+            y = (float(value['north']),) * 2
+        else:
+            return None
+    except (KeyError, TypeError, ValueError):
+        return None
+    return min(x), max(x), min(y), max(y)
+
+
+def record_coverage_bboxes(apps, schema_editor):
+    Coverage = apps.get_model('hs_core', 'Coverage')
+    coverages = Coverage.objects.filter(type__in=('box', 'point')).only('id', 'type', '_value')
+    for coverage in coverages.iterator():
+        try:
+            bbox = get_bbox(coverage.type, json.loads(coverage._value))
+        except ValueError:
+            bbox = None
+        if bbox is None:
+            print("coverage {} has an invalid value: {}".format(coverage.id, coverage._value))
+            continue
+        Coverage.objects.filter(id=coverage.id).update(_bbox_xmin=bbox[0], _bbox_xmax=bbox[1],
+                                                       _bbox_ymin=bbox[2], _bbox_ymax=bbox[3])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hs_core', '0036_resourcefile_system_metadata'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='coverage',
+            name='_bbox_xmax',
+            field=models.FloatField(db_index=True, null=True, blank=True),
+        ),
+        migrations.AddField(
+            model_name='coverage',
+            name='_bbox_xmin',
+            field=models.FloatField(db_index=True, null=True, blank=True),
+        ),
+        migrations.AddField(
+            model_name='coverage',
+            name='_bbox_ymax',
+            field=models.FloatField(db_index=True, null=True, blank=True),
+        ),
+        migrations.AddField(
+            model_name='coverage',
+            name='_bbox_ymin',
+            field=models.FloatField(db_index=True, null=True, blank=True),
+        ),
+        migrations.RunPython(record_coverage_bboxes, migrations.RunPython.noop),
+    ]
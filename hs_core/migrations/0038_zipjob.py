@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+from django.conf import settings
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('hs_core', '0037_coverage_bbox'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ZipJob',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', serialize=False, auto_created=True, primary_key=True)),
+                ('task_id', models.CharField(unique=True, max_length=64)),
+                ('operation', models.CharField(max_length=10, choices=[('zip', 'Zip'), ('unzip', 'Unzip')])),
+                ('path', models.CharField(max_length=4096)),
+                ('output_zip_fname', models.CharField(default='', max_length=4096, blank=True)),
+                ('remove_original', models.BooleanField(default=False)),
+                ('status', models.CharField(default='pending', max_length=20, choices=[('pending', 'Pending'), ('running', 'Running'), ('succeeded', 'Succeeded'), ('failed', 'Failed')])),
+                ('stage', models.CharField(default='', max_length=20, blank=True)),
+                ('progress', models.IntegerField(default=0)),
+                ('message', models.TextField(default='', blank=True)),
+                ('server_error', models.BooleanField(default=False)),
+                ('zip_size', models.BigIntegerField(null=True, blank=True)),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('updated', models.DateTimeField(auto_now=True)),
+                ('resource', models.ForeignKey(related_name='zip_jobs', to='hs_core.BaseResource')),
+                ('user', models.ForeignKey(to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
@@ -4,11 +4,14 @@ import os.path
 import json
 import arrow
 import logging
+from datetime import timedelta
 from uuid import uuid4
 from languages_iso import languages as iso_languages
 from dateutil import parser
 from lxml import etree
 
+from celery import states as celery_states
+from celery.result import AsyncResult
 from django_irods.icommands import SessionException
 
 from django.contrib.postgres.fields import HStoreField
@@ -39,6 +42,7 @@ from mezzanine.pages.managers import PageManager
 from dominate.tags import div, legend, table, tbody, tr, th, td, h4
 
 from hs_core.irods import ResourceIRODSMixin, ResourceFileIRODSMixin
+from hs_core import file_cache
 
 
 class GroupOwnership(models.Model):
@@ -133,6 +137,7 @@ class ResourcePermissionsMixin(Ownable):
 def page_permissions_page_processor(request, page):
     """Return a dict describing permissions for current user."""
     from hs_access_control.models import PrivilegeCodes
+    from hs_access_control.request_cache import get_resource_permissions
 
     cm = page.get_content_model()
     can_change_resource_flags = False
@@ -140,14 +145,17 @@ def page_permissions_page_processor(request, page):
     is_edit_user = False
     is_view_user = False
     if request.user.is_authenticated():
-        if request.user.uaccess.can_change_resource_flags(cm):
-            can_change_resource_flags = True
+        if not request.user.is_active:
+            raise PermissionDenied("Requesting user is not active")
+        # memoized for the request by hs_core.views.utils.authorize
+        permissions = get_resource_permissions(request, request.user, cm)
+        can_change_resource_flags = permissions.can_change_flags
 
-        is_owner_user = cm.raccess.owners.filter(pk=request.user.pk).exists()
+        is_owner_user = permissions.owns
         if not is_owner_user:
-            is_edit_user = cm.raccess.edit_users.filter(pk=request.user.pk).exists()
+            is_edit_user = permissions.is_editor
             if not is_edit_user:
-                is_view_user = cm.raccess.view_users.filter(pk=request.user.pk).exists()
+                is_view_user = permissions.is_viewer
 
     owners = cm.raccess.owners.all()
     editors = cm.raccess.get_users_with_explicit_access(PrivilegeCodes.CHANGE,
@@ -1054,11 +1062,61 @@ class Coverage(AbstractMetaDataElement):
     """
     _value = models.CharField(max_length=1024)
 
+    # bounding box of a box or point coverage, in the units of its coordinates. This is kept
+    # in sync with _value by save(), so that coverages can be found by location with indexed
+    # range queries (see filter_by_bbox) instead of parsing every _value.
+    _bbox_xmin = models.FloatField(null=True, blank=True, db_index=True)
+    _bbox_xmax = models.FloatField(null=True, blank=True, db_index=True)
+    _bbox_ymin = models.FloatField(null=True, blank=True, db_index=True)
+    _bbox_ymax = models.FloatField(null=True, blank=True, db_index=True)
+
     @property
     def value(self):
         """Return json representation of coverage values."""
         return json.loads(self._value)
 
+    @staticmethod
+    def get_bbox(coverage_type, value):
+        """Return (xmin, xmax, ymin, ymax) of a box or point coverage value dictionary.
+
+        Return None for period coverages and coverages with missing or non-numeric coordinates.
+        """
+        try:
+            if coverage_type == 'box':
+                x = (float(value['eastlimit']), float(value['westlimit']))
+                y = (float(value['southlimit']), float(value['northlimit']))
+            elif coverage_type == 'point':
+                x = (float(value['east']),) * 2
+                y = (float(value['north']),) * 2
+            else:
+                return None
+        except (KeyError, TypeError, ValueError):
+            return None
+        return min(x), max(x), min(y), max(y)
+
+    def save(self, *args, **kwargs):
+        """Record the bounding box of the coverage value before saving it."""
+        try:
+            bbox = self.get_bbox(self.type, self.value)
+        except ValueError:  # _value is not json
+            bbox = None
+        self._bbox_xmin, self._bbox_xmax, self._bbox_ymin, self._bbox_ymax = \
+            bbox if bbox is not None else (None, None, None, None)
+        super(Coverage, self).save(*args, **kwargs)
+
+    @classmethod
+    def filter_by_bbox(cls, north, south, east, west):
+        """Return a QuerySet of box and point coverages that intersect a bounding box.
+
+        A box intersects if it overlaps the bounding box, including along an edge; a point
+        intersects if it is inside the bounding box or on its boundary.
+        """
+        xmin, xmax = sorted((float(east), float(west)))
+        ymin, ymax = sorted((float(south), float(north)))
+        return cls.objects.filter(type__in=('box', 'point'),
+                                  _bbox_xmin__lte=xmax, _bbox_xmax__gte=xmin,
+                                  _bbox_ymin__lte=ymax, _bbox_ymax__gte=ymin)
+
     @classmethod
     def create(cls, **kwargs):
         """Define custom create method for Coverage model.
@@ -2296,7 +2354,8 @@ class AbstractResource(ResourcePermissionsMixin, ResourceIRODSMixin):
 
     def check_irods_files(self, stop_on_error=False, log_errors=True,
                           echo_errors=False, return_errors=False,
-                          sync_ispublic=False, clean_irods=False, clean_django=False):
+                          sync_ispublic=False, clean_irods=False, clean_django=False,
+                          refresh_file_metadata=False):
         """Check whether files in self.files and on iRODS agree.
 
         :param stop_on_error: whether to raise a ValidationError exception on first error
@@ -2307,6 +2366,9 @@ class AbstractResource(ResourcePermissionsMixin, ResourceIRODSMixin):
                and AVU isPublic
         :param clean_irods: whether to delete files in iRODs that are not in Django
         :param clean_django: whether to delete files in Django that are not in iRODs
+        :param refresh_file_metadata: whether to re-read size, checksum and modification time
+               of every file from iRODS and report recorded sizes and checksums that were out
+               of date. Otherwise only sizes not yet recorded are filled in.
         """
         from hs_core.hydroshare.resource import delete_resource_file
 
@@ -2367,6 +2429,21 @@ class AbstractResource(ResourcePermissionsMixin, ResourceIRODSMixin):
                     if stop_on_error:
                         raise ValidationError(msg)
 
+                # reconcile the system metadata recorded in Django with iRODS
+                elif refresh_file_metadata:
+                    if f.set_system_metadata():
+                        ecount += 1
+                        msg = "check_irods_files: recorded size/checksum of {} was out of date"\
+                            .format(f.storage_path) + " (REFRESHED FROM IRODS)"
+                        if echo_errors:
+                            print(msg)
+                        if log_errors:
+                            logger.error(msg)
+                        if return_errors:
+                            errors.append(msg)
+                elif f._size < 0:
+                    f.calculate_size()
+
             # Step 3: does every iRODS file correspond to a record in files?
             error2, ecount2 = self.__check_irods_directory(self.file_path, logger,
                                                            stop_on_error=stop_on_error,
@@ -2617,6 +2694,12 @@ class ResourceFile(ResourceFileIRODSMixin):
     logical_file_content_object = GenericForeignKey('logical_file_content_type',
                                                     'logical_file_object_id')
 
+    # System metadata cached from iRODS so that sizes and checksums are served from the
+    # database. -1/None mean "not yet recorded"; use set_system_metadata() to refresh.
+    _size = models.BigIntegerField(default=-1)
+    _checksum = models.CharField(max_length=255, null=True, blank=True)
+    _modified_time = models.DateTimeField(null=True, blank=True)
+
     def __str__(self):
         """Return resource filename or federated resource filename for string representation."""
         if self.resource.resource_federation_path:
@@ -2677,6 +2760,10 @@ class ResourceFile(ResourceFileIRODSMixin):
             else:
                 kwargs['resource_file'] = file
                 kwargs['fed_resource_file'] = None
+            try:
+                kwargs['_size'] = file.size
+            except (AttributeError, OSError):
+                pass  # recorded from iRODS on first use
 
         else:  # if file is not an open file, then it's a basename (string)
             if file is None and source is not None:
@@ -2716,6 +2803,7 @@ class ResourceFile(ResourceFileIRODSMixin):
             else:
                 kwargs['resource_file'] = target
                 kwargs['fed_resource_file'] = None
+            kwargs['_size'] = resource.get_irods_storage().size(target)
 
         # Actually create the file record
         # when file is a File, the file is copied to storage in this step
@@ -2735,6 +2823,7 @@ class ResourceFile(ResourceFileIRODSMixin):
                 self.fed_resource_file.delete()
             if self.resource_file:
                 self.resource_file.delete()
+        file_cache.invalidate(self.storage_path)
         super(ResourceFile, self).delete()
 
     @property
@@ -2742,20 +2831,85 @@ class ResourceFile(ResourceFileIRODSMixin):
         """Return content_object representing the resource from a resource file."""
         return self.content_object
 
-    # TODO: write unit test
     @property
     def size(self):
-        """Retturn file size for federated or non-federated files."""
+        """Return file size for federated or non-federated files.
+
+        This is served from the database; it is read from iRODS only if not yet recorded.
+        """
+        if self._size < 0:
+            self.calculate_size()
+        return self._size
+
+    @property
+    def checksum(self):
+        """Return the iRODS checksum of the file, reading it from iRODS if not yet recorded."""
+        if self._checksum is None:
+            self.set_system_metadata()
+        return self._checksum
+
+    @property
+    def modified_time(self):
+        """Return the iRODS modification time, reading it from iRODS if not yet recorded."""
+        if self._modified_time is None:
+            self.set_system_metadata(checksum=False)
+        return self._modified_time
+
+    def calculate_size(self, resave=True):
+        """Read the file size from iRODS and record it.
+
+        :param resave: if True, save the recorded size to the database.
+        """
         if self.resource.resource_federation_path:
             if __debug__:
                 assert self.resource_file.name is None or \
                     self.resource_file.name == ''
-            return self.fed_resource_file.size
+            self._size = self.fed_resource_file.size
         else:
             if __debug__:
                 assert self.fed_resource_file.name is None or \
                     self.fed_resource_file.name == ''
-            return self.resource_file.size
+            self._size = self.resource_file.size
+        if resave:
+            self.save(update_fields=['_size'])
+
+    def set_system_metadata(self, resave=True, checksum=True):
+        """Refresh size, checksum and modification time from iRODS.
+
+        :param resave: if True, save the recorded values to the database.
+        :param checksum: if False, the checksum is not refreshed, since ichksum computes the
+               checksum of files iRODS has none for.
+        :return: True if a size or checksum that was recorded was out of date. Values that
+                 were not yet recorded are filled in without counting as out of date.
+        """
+        size, irods_checksum, modified_time = \
+            self.get_irods_system_metadata(checksum=checksum)
+        if not checksum:
+            irods_checksum = self._checksum
+        out_of_date = (self._size >= 0 and size != self._size) or \
+            (self._checksum is not None and irods_checksum != self._checksum)
+        changed = (size, irods_checksum, modified_time) != \
+            (self._size, self._checksum, self._modified_time)
+        self._size = size
+        self._checksum = irods_checksum
+        self._modified_time = modified_time
+        if resave and changed:
+            self.save(update_fields=['_size', '_checksum', '_modified_time'])
+        return out_of_date
+
+    def reset_system_metadata(self, resave=True):
+        """Forget recorded size, checksum and modification time after the file contents
+        change in iRODS, so that they are read from iRODS again when next needed.
+
+        Once read again, the recorded state may equal the one before the change (e.g., a
+        same-size rewrite), so callers also need to invalidate the bag content hash
+        (see hs_bagit.invalidate_bag_hash) for the bag to be regenerated.
+        """
+        self._size = -1
+        self._checksum = None
+        self._modified_time = None
+        if resave:
+            self.save(update_fields=['_size', '_checksum', '_modified_time'])
 
     # TODO: write unit test
     @property
@@ -3002,6 +3156,34 @@ class ResourceFile(ResourceFileIRODSMixin):
                 object_id=resource.id,
                 resource_file__startswith=folder)
 
+    @classmethod
+    def get_storage_path_index(cls, resource, paths):
+        """Map fully qualified storage paths to ResourceFile records in a bounded number of queries.
+
+        :param resource: resource containing the files
+        :param paths: iterable of fully qualified storage paths (as returned by storage_path)
+        :return: dict of storage path -> ResourceFile for those paths that exist in Django
+
+        Logical files are prefetched and the resource is bound to each record so that
+        storage_path, url and logical_file do not issue per-file queries.
+        """
+        paths = list(paths)
+        if not paths:
+            return {}
+        if resource.is_federated:
+            field = 'fed_resource_file'
+        else:
+            field = 'resource_file'
+        res_files = ResourceFile.objects.filter(object_id=resource.id,
+                                                **{field + '__in': paths})\
+            .prefetch_related('logical_file_content_object')
+        index = {}
+        for f in res_files:
+            # avoid re-fetching the resource via the generic foreign key for every file
+            f.content_object = resource
+            index[getattr(f, field).name] = f
+        return index
+
     # TODO: move to BaseResource as instance method
     @classmethod
     def create_folder(cls, resource, folder):
@@ -3137,6 +3319,183 @@ class Bags(models.Model):
         return self.content_object.get_content_model()
 
 
+class BackgroundJob(models.Model):
+    """Base of the models of background jobs run by celery tasks on a resource.
+
+    A job is run by the celery task whose id is task_id, and records its status, the stage
+    it reached with the progress made in that stage, and a message describing its outcome.
+    Where the stage is recorded depends on whether the work of the job runs in a database
+    transaction, whose writes the web processes polling the job cannot see until it
+    commits: see the subclasses.
+    """
+
+    PENDING = 'pending'
+    RUNNING = 'running'
+    SUCCEEDED = 'succeeded'
+    FAILED = 'failed'
+    STATUS_CHOICES = (
+        (PENDING, 'Pending'),
+        (RUNNING, 'Running'),
+        (SUCCEEDED, 'Succeeded'),
+        (FAILED, 'Failed'),
+    )
+    # message of jobs found lost by is_stale
+    STALE_MESSAGE = "The job was stopped before it finished. Please try again."
+
+    task_id = models.CharField(max_length=64, unique=True)
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=PENDING)
+    stage = models.CharField(max_length=20, blank=True, default='')
+    progress = models.IntegerField(default=0)
+    message = models.TextField(blank=True, default='')
+    created = models.DateTimeField(auto_now_add=True)
+    updated = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        abstract = True
+
+    @classmethod
+    def _submit(cls, task, user, **fields):
+        """Start a job with the given field values, running task, and return it.
+
+        If a job with the same field values is pending or running, that job is returned
+        instead of starting another one, unless it is stale (see is_stale): stale jobs are
+        marked failed, and a new job is started.
+        """
+        job = None
+        for active_job in cls.objects.filter(status__in=(cls.PENDING, cls.RUNNING), **fields):
+            if active_job.is_stale():
+                logging.getLogger(__name__).warning(
+                    "{} {} is stale".format(cls.__name__, active_job.task_id))
+                active_job.finish(cls.FAILED, cls.STALE_MESSAGE)
+            else:
+                job = active_job
+        if job is None:
+            job = cls.objects.create(task_id=str(uuid4()), user=user, **fields)
+            task.apply_async((job.pk,), task_id=job.task_id)
+            # the task may have run already (e.g., in tests, where tasks run eagerly)
+            job.refresh_from_db()
+        return job
+
+    @property
+    def finished(self):
+        """Return True if the job succeeded or failed."""
+        return self.status in (self.SUCCEEDED, self.FAILED)
+
+    def is_stale(self):
+        """Return True if the job is pending or running, but its task is lost.
+
+        That is the case when the job was not updated for settings.BACKGROUND_JOB_TIMEOUT
+        seconds, since its worker died or its task was lost, or when celery reports that the
+        task failed or was revoked. Celery reports tasks it does not know about as pending,
+        as it does tasks waiting in the queue, so unknown tasks are found by the timeout.
+        """
+        if self.finished:
+            return False
+        timeout = getattr(settings, 'BACKGROUND_JOB_TIMEOUT', 2 * 60 * 60)
+        if self.updated < now() - timedelta(seconds=timeout):
+            return True
+        try:
+            state = AsyncResult(self.task_id).state
+        except Exception:
+            # no result backend is configured
+            return False
+        return state in (celery_states.FAILURE, celery_states.REVOKED)
+
+    def start(self):
+        """Record that the job is running."""
+        self.status = self.RUNNING
+        self.save(update_fields=['status', 'updated'])
+
+    def finish(self, status, message='', **fields):
+        """Record the outcome of the job, with the values of other fields describing it."""
+        self.status = status
+        self.message = message
+        for name, value in fields.items():
+            setattr(self, name, value)
+        if status == self.SUCCEEDED:
+            self.progress = 100
+        self.save(update_fields=['status', 'stage', 'progress', 'message', 'updated'] +
+                  list(fields))
+
+    def get_stage(self):
+        """Return the stage reached by the job and the progress made in that stage."""
+        return self.stage, self.progress
+
+    def to_dict(self):
+        """Return the status of the job as a dict."""
+        stage, progress = self.get_stage()
+        return {
+            'task_id': self.task_id,
+            'resource_id': self.resource.short_id,
+            'status': self.status,
+            'stage': stage,
+            'progress': progress,
+            'message': self.message,
+        }
+
+
+class ZipJob(BackgroundJob):
+    """Represent a background job zipping a folder or unzipping a file of a resource.
+
+    The job is run by the celery task hs_core.tasks.zip_job_task, with
+    hs_core.views.utils.zip_folder or unzip_file. zip_folder and unzip_file do not run in a
+    transaction, so the stage and progress they report are saved to the database as they
+    are reached, where the web processes polling the job read them.
+    """
+
+    ZIP = 'zip'
+    UNZIP = 'unzip'
+    OPERATION_CHOICES = (
+        (ZIP, 'Zip'),
+        (UNZIP, 'Unzip'),
+    )
+
+    resource = models.ForeignKey('BaseResource', on_delete=models.CASCADE,
+                                 related_name='zip_jobs')
+    operation = models.CharField(max_length=10, choices=OPERATION_CHOICES)
+    # input_coll_path of zip_folder or zip_with_rel_path of unzip_file
+    path = models.CharField(max_length=4096)
+    # output_zip_fname of zip_folder
+    output_zip_fname = models.CharField(max_length=4096, blank=True, default='')
+    remove_original = models.BooleanField(default=False)
+    # True if the job failed because of iRODS or the server rather than the request
+    server_error = models.BooleanField(default=False)
+    # size of the zip file created by a zip job
+    zip_size = models.BigIntegerField(null=True, blank=True)
+
+    @classmethod
+    def submit(cls, resource, user, operation, path, output_zip_fname='',
+               remove_original=False):
+        """Start a job zipping a folder or unzipping a file, and return it.
+
+        The same job, if pending or running, is returned instead (see BackgroundJob._submit).
+        """
+        # had to import it here to avoid import loop
+        from hs_core.tasks import zip_job_task
+
+        return cls._submit(zip_job_task, user, resource=resource, operation=operation,
+                           path=path, output_zip_fname=output_zip_fname,
+                           remove_original=remove_original)
+
+    def set_progress(self, stage, done=0, total=0):
+        """Record the stage reached; used as the progress callback of zip_folder and unzip_file.
+
+        :param stage: name of the stage
+        :param done: number of items of the stage processed so far
+        :param total: number of items of the stage, or 0 if not known
+        """
+        self.stage = stage
+        self.progress = 100 * done // total if total else 0
+        self.save(update_fields=['stage', 'progress', 'updated'])
+
+    def to_dict(self):
+        """Return the status of the job as a dict."""
+        job_status = super(ZipJob, self).to_dict()
+        job_status['operation'] = self.operation
+        return job_status
+
+
 class PublicResourceManager(models.Manager):
     """Extend Django model Manager to allow for public resource access."""
 
@@ -3357,7 +3716,7 @@ class BaseResource(Page, AbstractResource):
 
     @property
     def size(self):
-        """Return the total size of all data files in iRODS.
+        """Return the total size of all data files in iRODS, as recorded in the database.
 
         This size does not include metadata. Just files. Specifically,
         resourcemetadata.xml, systemmetadata.xml are not included in this
@@ -3365,9 +3724,10 @@ class BaseResource(Page, AbstractResource):
 
         Raises SessionException if iRODS fails.
         """
-        # compute the total file size for the resource
-        f_sizes = [f.size for f in self.files.all()]
-        return sum(f_sizes)
+        # record sizes not yet known, then sum in the database
+        for f in self.files.filter(_size__lt=0):
+            f.calculate_size()
+        return self.files.aggregate(total=models.Sum('_size'))['total'] or 0
 
     @property
     def verbose_name(self):
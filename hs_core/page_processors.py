@@ -18,6 +18,7 @@ from hs_core.views.utils import authorize, ACTION_TO_AUTHORIZE, show_relations_s
     can_user_copy_resource
 from hs_core.hydroshare.resource import METADATA_STATUS_SUFFICIENT, METADATA_STATUS_INSUFFICIENT
 from hs_tools_resource.utils import parse_app_url_template
+from hs_access_control.request_cache import get_resource_permissions
 
 
 @processor_for(GenericResource)
@@ -153,7 +154,10 @@ def get_page_context(page, user, resource_edit=False, extended_metadata_layout=N
 
     bag_url = content_model.bag_url
 
-    if user.is_authenticated():
+    if user.is_authenticated() and request is not None:
+        # memoized by the can_view check above
+        show_content_files = get_resource_permissions(request, user, content_model).can_view
+    elif user.is_authenticated():
         show_content_files = user.uaccess.can_view_resource(content_model)
     else:
         # if anonymous user getting access to a private resource (since resource is discoverable),
@@ -1,14 +1,207 @@
 """Define search indexes for hs_core module."""
 
+from collections import defaultdict
+
 from haystack import indexes
 from hs_core.models import BaseResource
+from hs_core.hydroshare.utils import get_resource_types
+from hs_access_control.models import PrivilegeCodes, ResourceAccess, \
+    UserResourcePrivilege, GroupResourcePrivilege, UserGroupPrivilege
 from hs_geographic_feature_resource.models import GeographicFeatureMetaData
 from hs_app_netCDF.models import NetcdfMetaData
 from ref_ts.models import RefTSMetadata
 from hs_app_timeseries.models import TimeSeriesMetaData
-from django.db.models import Q
+from django.contrib.contenttypes.models import ContentType
+from django.db.models import Q, QuerySet
+from django.db.models.query import prefetch_related_objects
 from datetime import datetime
 
+# metadata relations read while indexing, prefetched for every chunk of resources
+CORE_METADATA_LOOKUPS = ['_title', '_description', '_language', '_publisher', 'creators',
+                         'contributors', 'subjects', 'coverages', 'formats', 'identifiers',
+                         'sources', 'relations']
+EXTRA_METADATA_LOOKUPS = {
+    GeographicFeatureMetaData: ['geometryinformations', 'fieldinformations'],
+    NetcdfMetaData: ['variables'],
+    RefTSMetadata: ['variables', 'sites', 'methods', 'quality_levels', 'datasources'],
+    TimeSeriesMetaData: ['_variables', '_sites', '_methods', '_time_series_results'],
+}
+
+
+def _first(elements):
+    """Return the element with the lowest id, like QuerySet.first() does, or None."""
+    return min(elements, key=lambda e: e.pk) if elements else None
+
+
+class ResourceIndexContext(object):
+    """Metadata and access lists of one resource, as read by BaseResourceIndex.
+
+    All attributes are plain values or lists, so that preparing any number of fields does
+    not query the database. Contexts are built in bulk by load_index_contexts().
+    """
+
+    def __init__(self, verbose_name, metadata, raccess, comments, owners, viewers, editors):
+        self.verbose_name = verbose_name
+        self.metadata = metadata
+        self.raccess = raccess
+        self.comments = comments
+        self.owners = owners
+        self.viewers = viewers
+        self.editors = editors
+
+        def related(name):
+            if metadata is None or not hasattr(metadata, name):
+                return []
+            return list(getattr(metadata, name).all())
+
+        self.title = _first(related('_title'))
+        self.description = _first(related('_description'))
+        self.language = _first(related('_language'))
+        self.publisher = _first(related('_publisher'))
+        self.creators = related('creators')
+        self.contributors = related('contributors')
+        self.subjects = related('subjects')
+        self.coverages = related('coverages')
+        self.formats = related('formats')
+        self.identifiers = related('identifiers')
+        self.sources = related('sources')
+        self.relations = related('relations')
+
+        self.geometry_information = None
+        self.field_information = None
+        self.variables = []
+        self.sites = []
+        self.methods = []
+        self.quality_levels = []
+        self.data_sources = []
+        self.time_series_results = []
+        if isinstance(metadata, GeographicFeatureMetaData):
+            self.geometry_information = _first(related('geometryinformations'))
+            self.field_information = _first(related('fieldinformations'))
+        elif isinstance(metadata, NetcdfMetaData):
+            self.variables = related('variables')
+        elif isinstance(metadata, RefTSMetadata):
+            self.variables = related('variables')
+            self.sites = related('sites')
+            self.methods = related('methods')
+            self.quality_levels = related('quality_levels')
+            self.data_sources = related('datasources')
+        elif isinstance(metadata, TimeSeriesMetaData):
+            self.variables = related('_variables')
+            self.sites = related('_sites')
+            self.methods = related('_methods')
+            self.time_series_results = related('_time_series_results')
+
+
+def _load_access_lists(resource_ids):
+    """Return dicts of resource id -> {user id: user} for owners, viewers and editors.
+
+    These are the users of ResourceAccess.owners, view_users and edit_users, found with
+    three queries for all resources rather than three per resource and field.
+    """
+    owners = defaultdict(dict)
+    viewers = defaultdict(dict)
+    editors = defaultdict(dict)
+
+    for urp in UserResourcePrivilege.objects\
+            .filter(resource_id__in=resource_ids,
+                    privilege__lte=PrivilegeCodes.VIEW,
+                    user__is_active=True)\
+            .select_related('user'):
+        if urp.privilege == PrivilegeCodes.OWNER:
+            owners[urp.resource_id][urp.user_id] = urp.user
+        if urp.privilege <= PrivilegeCodes.CHANGE:
+            editors[urp.resource_id][urp.user_id] = urp.user
+        viewers[urp.resource_id][urp.user_id] = urp.user
+
+    # group id -> list of (resource id, privilege of the group over the resource)
+    group_privileges = defaultdict(list)
+    for group_id, resource_id, privilege in GroupResourcePrivilege.objects\
+            .filter(resource_id__in=resource_ids,
+                    privilege__lte=PrivilegeCodes.VIEW,
+                    group__gaccess__active=True)\
+            .values_list('group_id', 'resource_id', 'privilege'):
+        group_privileges[group_id].append((resource_id, privilege))
+
+    if group_privileges:
+        for ugp in UserGroupPrivilege.objects\
+                .filter(group_id__in=list(group_privileges.keys()),
+                        user__is_active=True)\
+                .select_related('user'):
+            for resource_id, privilege in group_privileges[ugp.group_id]:
+                if privilege <= PrivilegeCodes.CHANGE:
+                    editors[resource_id][ugp.user_id] = ugp.user
+                viewers[resource_id][ugp.user_id] = ugp.user
+
+    return owners, viewers, editors
+
+
+def load_index_contexts(resources):
+    """Attach a ResourceIndexContext to each of resources as resource.index_context.
+
+    The number of queries depends on the number of metadata types among resources, but not
+    on the number of resources or of indexed fields.
+    """
+    resources = list(resources)
+    if not resources:
+        return resources
+    resource_ids = [res.id for res in resources]
+
+    # metadata objects, with their elements prefetched, by (content type id, object id)
+    object_ids = defaultdict(set)
+    for res in resources:
+        if res.content_type_id is not None and res.object_id is not None:
+            object_ids[res.content_type_id].add(res.object_id)
+    metadata = {}
+    for content_type_id, ids in object_ids.items():
+        model = ContentType.objects.get_for_id(content_type_id).model_class()
+        lookups = list(CORE_METADATA_LOOKUPS)
+        for md_class, extra_lookups in EXTRA_METADATA_LOOKUPS.items():
+            if issubclass(model, md_class):
+                lookups += extra_lookups
+        mds = list(model.objects.filter(id__in=ids))
+        prefetch_related_objects(mds, lookups)
+        for md in mds:
+            metadata[(content_type_id, md.id)] = md
+
+    raccess = {ra.resource_id: ra
+               for ra in ResourceAccess.objects.filter(resource_id__in=resource_ids)}
+    prefetch_related_objects(resources, ['comments'])
+    owners, viewers, editors = _load_access_lists(resource_ids)
+
+    def users(by_id):
+        return [by_id[user_id] for user_id in sorted(by_id)]
+
+    # BaseResource.verbose_name would fetch the content model of each resource
+    verbose_names = {model._meta.model_name: model._meta.verbose_name
+                     for model in get_resource_types()}
+
+    for res in resources:
+        access = raccess.get(res.id)
+        verbose_name = verbose_names.get(res.content_model)
+        res.index_context = ResourceIndexContext(
+            verbose_name=verbose_name if verbose_name is not None else res.verbose_name,
+            metadata=metadata.get((res.content_type_id, res.object_id)),
+            raccess=access,
+            comments=list(res.comments.all()),
+            owners=users(owners[res.id]),
+            viewers=users(viewers[res.id]),
+            # edit_users is empty for immutable resources
+            editors=[] if access is None or access.immutable else users(editors[res.id]))
+    return resources
+
+
+class ResourceIndexQuerySet(QuerySet):
+    """QuerySet of resources that loads the index context of each chunk it fetches.
+
+    update_index and rebuild_index fetch the index queryset in slices of the index batch
+    size, so each batch of resources is prepared with a constant number of queries.
+    """
+
+    def iterator(self):
+        resources = list(super(ResourceIndexQuerySet, self).iterator())
+        return iter(load_index_contexts(resources))
+
 
 class BaseResourceIndex(indexes.SearchIndex, indexes.Indexable):
     """Define base class for resource indexes."""
@@ -17,6 +210,7 @@ class BaseResourceIndex(indexes.SearchIndex, indexes.Indexable):
     short_id = indexes.CharField(model_attr='short_id')
     doi = indexes.CharField(model_attr='doi', null=True)
     author = indexes.CharField(faceted=True)
+    author_description = indexes.CharField(indexed=False, null=True)
     title = indexes.CharField(faceted=True)
     abstract = indexes.CharField()
     creators = indexes.MultiValueField(faceted=True)
@@ -84,96 +278,105 @@ class BaseResourceIndex(indexes.SearchIndex, indexes.Indexable):
 
     def index_queryset(self, using=None):
         """Return queryset including discoverable and public resources."""
-        return self.get_model().objects.filter(Q(raccess__discoverable=True) |
-                                               Q(raccess__public=True))
+        return ResourceIndexQuerySet(self.get_model())\
+            .filter(Q(raccess__discoverable=True) | Q(raccess__public=True))
+
+    def prepare(self, obj):
+        """Prepare all fields of obj from its index context, loading it if necessary.
+
+        Resources from index_queryset() come with their context; resources indexed one at a
+        time (e.g., by the realtime signal processor) get a context of their own here.
+        """
+        self.get_index_context(obj)
+        return super(BaseResourceIndex, self).prepare(obj)
+
+    def get_index_context(self, obj):
+        """Return the ResourceIndexContext of obj, loading it if necessary."""
+        if getattr(obj, 'index_context', None) is None:
+            load_index_contexts([obj])
+        return obj.index_context
 
     def prepare_title(self, obj):
         """Return metadata title if exists, otherwise return none."""
-        if hasattr(obj, 'metadata') and obj.metadata.title.value is not None:
-            return obj.metadata.title.value
+        ctx = self.get_index_context(obj)
+        if ctx.title is not None and ctx.title.value is not None:
+            return ctx.title.value
         else:
             return 'none'
 
     def prepare_abstract(self, obj):
         """Return metadata abstract if exists, otherwise return none."""
-        if hasattr(obj, 'metadata') and obj.metadata.description is not None and \
-                obj.metadata.description.abstract is not None:
-            return obj.metadata.description.abstract
+        ctx = self.get_index_context(obj)
+        if ctx.description is not None and ctx.description.abstract is not None:
+            return ctx.description.abstract
         else:
             return 'none'
 
     def prepare_author(self, obj):
         """Return metadata author if exists, otherwise return none."""
-        if hasattr(obj, 'metadata'):
-            first_creator = obj.metadata.creators.filter(order=1).first()
-            if first_creator.name is not None:
-                return first_creator.name
-            else:
-                return 'none'
+        ctx = self.get_index_context(obj)
+        first_creator = _first([creator for creator in ctx.creators if creator.order == 1])
+        if first_creator is not None and first_creator.name is not None:
+            return first_creator.name
         else:
             return 'none'
 
+    def prepare_author_description(self, obj):
+        """Return description of metadata author if exists, otherwise return none."""
+        ctx = self.get_index_context(obj)
+        first_creator = _first([creator for creator in ctx.creators if creator.order == 1])
+        if first_creator is not None:
+            return first_creator.description
+        else:
+            return None
+
     def prepare_creators(self, obj):
         """Return metadata creators if exists, otherwise return empty array."""
-        if hasattr(obj, 'metadata'):
-            return [creator.name for creator in obj.metadata.creators.all()
-                    .exclude(name__isnull=True)]
-        else:
-            return []
+        ctx = self.get_index_context(obj)
+        return [creator.name for creator in ctx.creators if creator.name is not None]
 
     def prepare_contributors(self, obj):
         """Return metadata contributors if exists, otherwise return empty array."""
-        if hasattr(obj, 'metadata'):
-            return [contributor.name for contributor in obj.metadata.contributors.all()
-                    .exclude(name__isnull=True)]
-        else:
-            return []
+        ctx = self.get_index_context(obj)
+        return [contributor.name for contributor in ctx.contributors
+                if contributor.name is not None]
 
     def prepare_subjects(self, obj):
         """Return metadata subjects if exists, otherwise return empty array."""
-        if hasattr(obj, 'metadata'):
-            return [subject.value for subject in obj.metadata.subjects.all()
-                    .exclude(value__isnull=True)]
-        else:
-            return []
+        ctx = self.get_index_context(obj)
+        return [subject.value for subject in ctx.subjects if subject.value is not None]
 
     def prepare_organizations(self, obj):
         """Return metadata organizations if exists, otherwise return empty array."""
         organizations = []
         none = False  # only enter one value "none"
-        if hasattr(obj, 'metadata'):
-            for creator in obj.metadata.creators.all():
-                if(creator.organization is not None):
-                    organizations.append(creator.organization)
-                else:
-                    if not none:
-                        none = True
-                        organizations.append('none')
+        for creator in self.get_index_context(obj).creators:
+            if(creator.organization is not None):
+                organizations.append(creator.organization)
+            else:
+                if not none:
+                    none = True
+                    organizations.append('none')
         return organizations
 
     def prepare_publisher(self, obj):
         """Return metadata publisher if exists, otherwise return none."""
-        if hasattr(obj, 'metadata'):
-            publisher = obj.metadata.publisher
-            if publisher is not None:
-                return publisher
-            else:
-                return 'none'
+        publisher = self.get_index_context(obj).publisher
+        if publisher is not None:
+            return publisher
         else:
             return 'none'
 
     def prepare_author_emails(self, obj):
         """Return metadata emails if exists, otherwise return empty array."""
-        if hasattr(obj, 'metadata'):
-            return [creator.email for creator in obj.metadata.creators.all()
-                    .exclude(email__isnull=True)]
-        else:
-            return []
+        ctx = self.get_index_context(obj)
+        return [creator.email for creator in ctx.creators if creator.email is not None]
 
     def prepare_discoverable(self, obj):
         """Return resource discoverability if exists, otherwise return False."""
-        if hasattr(obj, 'raccess'):
-            if obj.raccess.public or obj.raccess.discoverable:
+        raccess = self.get_index_context(obj).raccess
+        if raccess is not None:
+            if raccess.public or raccess.discoverable:
                 return True
             else:
                 return False
@@ -182,8 +385,9 @@ class BaseResourceIndex(indexes.SearchIndex, indexes.Indexable):
 
     def prepare_public(self, obj):
         """Return resource access if exists, otherwise return False."""
-        if hasattr(obj, 'raccess'):
-            if obj.raccess.public:
+        raccess = self.get_index_context(obj).raccess
+        if raccess is not None:
+            if raccess.public:
                 return True
             else:
                 return False
@@ -192,8 +396,9 @@ class BaseResourceIndex(indexes.SearchIndex, indexes.Indexable):
 
     def prepare_published(self, obj):
         """Return resource published status if exists, otherwise return False."""
-        if hasattr(obj, 'raccess'):
-            if obj.raccess.published:
+        raccess = self.get_index_context(obj).raccess
+        if raccess is not None:
+            if raccess.published:
                 return True
             else:
                 return False
@@ -202,30 +407,23 @@ class BaseResourceIndex(indexes.SearchIndex, indexes.Indexable):
 
     def prepare_is_replaced_by(self, obj):
         """Return 'isReplacedBy' attribute if exists, otherwise return False."""
-        if hasattr(obj, 'metadata'):
-            return obj.metadata.relations.all().filter(type='isReplacedBy').exists()
-        else:
-            return False
+        ctx = self.get_index_context(obj)
+        return any(relation.type == 'isReplacedBy' for relation in ctx.relations)
 
     def prepare_coverages(self, obj):
         """Return resource coverage if exists, otherwise return empty array."""
         # TODO: reject empty coverages
-        if hasattr(obj, 'metadata'):
-            return [coverage._value for coverage in obj.metadata.coverages.all()]
-        else:
-            return []
+        return [coverage._value for coverage in self.get_index_context(obj).coverages]
 
     def prepare_coverage_types(self, obj):
         """Return resource coverage types if exists, otherwise return empty array."""
-        if hasattr(obj, 'metadata'):
-            return [coverage.type for coverage in obj.metadata.coverages.all()]
-        else:
-            return []
+        return [coverage.type for coverage in self.get_index_context(obj).coverages]
 
     def prepare_coverage_east(self, obj):
         """Return resource coverage east bound if exists, otherwise return none."""
-        if hasattr(obj, 'metadata'):
-            for coverage in obj.metadata.coverages.all():
+        ctx = self.get_index_context(obj)
+        if ctx.metadata is not None:
+            for coverage in ctx.coverages:
                 if coverage.type == 'point':
                     return float(coverage.value["east"])
                 elif coverage.type == 'box':
@@ -236,8 +434,9 @@ class BaseResourceIndex(indexes.SearchIndex, indexes.Indexable):
 
     def prepare_coverage_north(self, obj):
         """Return resource coverage north bound if exists, otherwise return none."""
-        if hasattr(obj, 'metadata'):
-            for coverage in obj.metadata.coverages.all():
+        ctx = self.get_index_context(obj)
+        if ctx.metadata is not None:
+            for coverage in ctx.coverages:
                 if coverage.type == 'point':
                     return float(coverage.value["north"])
                 elif coverage.type == 'box':
@@ -248,8 +447,9 @@ class BaseResourceIndex(indexes.SearchIndex, indexes.Indexable):
 
     def prepare_coverage_northlimit(self, obj):
         """Return resource coverage north limit if exists, otherwise return none."""
-        if hasattr(obj, 'metadata'):
-            for coverage in obj.metadata.coverages.all():
+        ctx = self.get_index_context(obj)
+        if ctx.metadata is not None:
+            for coverage in ctx.coverages:
                 if coverage.type == 'box':
                     return coverage.value["northlimit"]
         else:
@@ -257,8 +457,9 @@ class BaseResourceIndex(indexes.SearchIndex, indexes.Indexable):
 
     def prepare_coverage_eastlimit(self, obj):
         """Return resource coverage east limit if exists, otherwise return none."""
-        if hasattr(obj, 'metadata'):
-            for coverage in obj.metadata.coverages.all():
+        ctx = self.get_index_context(obj)
+        if ctx.metadata is not None:
+            for coverage in ctx.coverages:
                 if coverage.type == 'box':
                     return coverage.value["eastlimit"]
         else:
@@ -266,8 +467,9 @@ class BaseResourceIndex(indexes.SearchIndex, indexes.Indexable):
 
     def prepare_coverage_southlimit(self, obj):
         """Return resource coverage south limit if exists, otherwise return none."""
-        if hasattr(obj, 'metadata'):
-            for coverage in obj.metadata.coverages.all():
+        ctx = self.get_index_context(obj)
+        if ctx.metadata is not None:
+            for coverage in ctx.coverages:
                 if coverage.type == 'box':
                     return coverage.value["southlimit"]
         else:
@@ -275,8 +477,9 @@ class BaseResourceIndex(indexes.SearchIndex, indexes.Indexable):
 
     def prepare_coverage_westlimit(self, obj):
         """Return resource coverage west limit if exists, otherwise return none."""
-        if hasattr(obj, 'metadata'):
-            for coverage in obj.metadata.coverages.all():
+        ctx = self.get_index_context(obj)
+        if ctx.metadata is not None:
+            for coverage in ctx.coverages:
                 if coverage.type == 'box':
                     return coverage.value["westlimit"]
         else:
@@ -284,8 +487,9 @@ class BaseResourceIndex(indexes.SearchIndex, indexes.Indexable):
 
     def prepare_coverage_start_date(self, obj):
         """Return resource coverage start date if exists, otherwise return none."""
-        if hasattr(obj, 'metadata'):
-            for coverage in obj.metadata.coverages.all():
+        ctx = self.get_index_context(obj)
+        if ctx.metadata is not None:
+            for coverage in ctx.coverages:
                 if coverage.type == 'period':
                     clean_date = coverage.value["start"][:10]
                     if "/" in clean_date:
@@ -301,8 +505,9 @@ class BaseResourceIndex(indexes.SearchIndex, indexes.Indexable):
 
     def prepare_coverage_end_date(self, obj):
         """Return resource coverage end date if exists, otherwise return none."""
-        if hasattr(obj, 'metadata'):
-            for coverage in obj.metadata.coverages.all():
+        ctx = self.get_index_context(obj)
+        if ctx.metadata is not None:
+            for coverage in ctx.coverages:
                 if coverage.type == 'period' and 'end' in coverage.value:
                     clean_date = coverage.value["end"][:10]
                     if "/" in clean_date:
@@ -318,46 +523,35 @@ class BaseResourceIndex(indexes.SearchIndex, indexes.Indexable):
 
     def prepare_formats(self, obj):
         """Return metadata formats if metadata exists, otherwise return empty array."""
-        if hasattr(obj, 'metadata'):
-            return [format.value for format in obj.metadata.formats.all()]
-        else:
-            return []
+        return [format.value for format in self.get_index_context(obj).formats]
 
     def prepare_identifiers(self, obj):
         """Return metadata identifiers if metadata exists, otherwise return empty array."""
-        if hasattr(obj, 'metadata'):
-            return [identifier.name for identifier in obj.metadata.identifiers.all()]
-        else:
-            return []
+        return [identifier.name for identifier in self.get_index_context(obj).identifiers]
 
     def prepare_language(self, obj):
         """Return resource language if exists, otherwise return none."""
-        if hasattr(obj, 'metadata'):
-            return obj.metadata.language.code
+        language = self.get_index_context(obj).language
+        if language is not None:
+            return language.code
         else:
             return 'none'
 
     def prepare_sources(self, obj):
         """Return resource sources if exists, otherwise return empty array."""
-        if hasattr(obj, 'metadata'):
-            return [source.derived_from for source in obj.metadata.sources.all()]
-        else:
-            return []
+        return [source.derived_from for source in self.get_index_context(obj).sources]
 
     def prepare_relations(self, obj):
         """Return resource relations if exists, otherwise return empty array."""
-        if hasattr(obj, 'metadata'):
-            return [relation.value for relation in obj.metadata.relations.all()]
-        else:
-            return []
+        return [relation.value for relation in self.get_index_context(obj).relations]
 
     def prepare_resource_type(self, obj):
         """Return verbose_name attribute of obj argument."""
-        return obj.verbose_name
+        return self.get_index_context(obj).verbose_name
 
     def prepare_comments(self, obj):
         """Return list of all comments on resource."""
-        return [comment.comment for comment in obj.comments.all()]
+        return [comment.comment for comment in self.get_index_context(obj).comments]
 
     def prepare_comments_count(self, obj):
         """Return count of resource comments."""
@@ -365,263 +559,167 @@ class BaseResourceIndex(indexes.SearchIndex, indexes.Indexable):
 
     def prepare_owners_logins(self, obj):
         """Return list of usernames that have ownership access to resource."""
-        if hasattr(obj, 'raccess'):
-            return [owner.username for owner in obj.raccess.owners.all()]
-        else:
-            return []
+        return [owner.username for owner in self.get_index_context(obj).owners]
 
     def prepare_owners_names(self, obj):
         """Return list of names of resource owners."""
         names = []
-        if hasattr(obj, 'raccess'):
-            for owner in obj.raccess.owners.all():
-                name = owner.first_name + ' ' + owner.last_name
-                names.append(name)
+        for owner in self.get_index_context(obj).owners:
+            name = owner.first_name + ' ' + owner.last_name
+            names.append(name)
         return names
 
     def prepare_owners_count(self, obj):
         """Return count of resource owners if 'raccess' attribute exists, othrerwise return 0."""
-        if hasattr(obj, 'raccess'):
-            return obj.raccess.owners.all().count()
-        else:
-            return 0
+        return len(self.get_index_context(obj).owners)
 
     def prepare_viewers_logins(self, obj):
         """Return usernames of users that can view resource, otherwise return empty array."""
-        if hasattr(obj, 'raccess'):
-            return [viewer.username for viewer in obj.raccess.view_users.all()]
-        else:
-            return []
+        return [viewer.username for viewer in self.get_index_context(obj).viewers]
 
     def prepare_viewers_names(self, obj):
         """Return full names of users that can view resource, otherwise return empty array."""
         names = []
-        if hasattr(obj, 'raccess'):
-            for viewer in obj.raccess.view_users.all():
-                name = viewer.first_name + ' ' + viewer.last_name
-                names.append(name)
+        for viewer in self.get_index_context(obj).viewers:
+            name = viewer.first_name + ' ' + viewer.last_name
+            names.append(name)
         return names
 
     def prepare_viewers_count(self, obj):
         """Return count of users who can view resource, otherwise return 0."""
-        if hasattr(obj, 'raccess'):
-            return obj.raccess.view_users.all().count()
-        else:
-            return 0
+        return len(self.get_index_context(obj).viewers)
 
     def prepare_editors_logins(self, obj):
         """Return usernames of editors of a resource, otherwise return 0."""
-        if hasattr(obj, 'raccess'):
-            return [editor.username for editor in obj.raccess.edit_users.all()]
+        ctx = self.get_index_context(obj)
+        if ctx.raccess is not None:
+            return [editor.username for editor in ctx.editors]
         else:
             return 0
 
     def prepare_editors_names(self, obj):
         """Return full names of editors of a resource, otherwise return empty array."""
         names = []
-        if hasattr(obj, 'raccess'):
-            for editor in obj.raccess.edit_users.all():
-                name = editor.first_name + ' ' + editor.last_name
-                names.append(name)
+        for editor in self.get_index_context(obj).editors:
+            name = editor.first_name + ' ' + editor.last_name
+            names.append(name)
         return names
 
     def prepare_editors_count(self, obj):
         """Return count of editors of a resource, otherwise return 0."""
-        if hasattr(obj, 'raccess'):
-            return obj.raccess.edit_users.all().count()
-        else:
-            return 0
+        return len(self.get_index_context(obj).editors)
 
     def prepare_geometry_type(self, obj):
         """Return geometry type if metadata exists, otherwise return 'none'."""
-        if hasattr(obj, 'metadata'):
-            if isinstance(obj.metadata, GeographicFeatureMetaData):
-                geometry_info = obj.metadata.geometryinformation
-                if geometry_info is not None:
-                    return geometry_info.geometryType
-                else:
-                    return 'none'
-            else:
-                return 'none'
+        geometry_info = self.get_index_context(obj).geometry_information
+        if geometry_info is not None:
+            return geometry_info.geometryType
         else:
             return 'none'
 
     def prepare_field_name(self, obj):
         """Return metadata field name if exists, otherwise return 'none'."""
-        if hasattr(obj, 'metadata'):
-            if isinstance(obj.metadata, GeographicFeatureMetaData):
-                field_info = obj.metadata.fieldinformations.all().first()
-                if field_info is not None:
-                    return field_info.fieldName
-                else:
-                    return 'none'
-            else:
-                return 'none'
+        field_info = self.get_index_context(obj).field_information
+        if field_info is not None:
+            return field_info.fieldName
         else:
             return 'none'
 
     def prepare_field_type(self, obj):
         """Return metadata field type if exists, otherwise return 'none'."""
-        if hasattr(obj, 'metadata'):
-            if isinstance(obj.metadata, GeographicFeatureMetaData):
-                field_info = obj.metadata.fieldinformations.all().first()
-                if field_info is not None:
-                    return field_info.fieldType
-                else:
-                    return 'none'
-            else:
-                return 'none'
+        field_info = self.get_index_context(obj).field_information
+        if field_info is not None:
+            return field_info.fieldType
         else:
             return 'none'
 
     def prepare_field_type_code(self, obj):
         """Return metadata field type code if exists, otherwise return 'none'."""
-        if hasattr(obj, 'metadata'):
-            if isinstance(obj.metadata, GeographicFeatureMetaData):
-                field_info = obj.metadata.fieldinformations.all().first()
-                if field_info is not None:
-                    return field_info.fieldTypeCode
-                else:
-                    return 'none'
-            else:
-                return 'none'
+        field_info = self.get_index_context(obj).field_information
+        if field_info is not None:
+            return field_info.fieldTypeCode
         else:
             return 'none'
 
     def prepare_variable_names(self, obj):
         """Return metadata variable names if exists, otherwise return empty array."""
-        variable_names = []
-        if hasattr(obj, 'metadata'):
-            if isinstance(obj.metadata, NetcdfMetaData):
-                for variable in obj.metadata.variables.all():
-                    variable_names.append(variable.name)
-            elif isinstance(obj.metadata, RefTSMetadata):
-                for variable in obj.metadata.variables.all():
-                    variable_names.append(variable.name)
-            elif isinstance(obj.metadata, TimeSeriesMetaData):
-                for variable in obj.metadata.variables:
-                    variable_names.append(variable.variable_name)
-        return variable_names
+        ctx = self.get_index_context(obj)
+        if isinstance(ctx.metadata, TimeSeriesMetaData):
+            return [variable.variable_name for variable in ctx.variables]
+        return [variable.name for variable in ctx.variables]
 
     def prepare_variable_types(self, obj):
         """Return metadata variable types if exists, otherwise return empty array."""
-        variable_types = []
-        if hasattr(obj, 'metadata'):
-            if isinstance(obj.metadata, NetcdfMetaData):
-                for variable in obj.metadata.variables.all():
-                    variable_types.append(variable.type)
-            elif isinstance(obj.metadata, RefTSMetadata):
-                for variable in obj.metadata.variables.all():
-                    variable_types.append(variable.data_type)
-            elif isinstance(obj.metadata, TimeSeriesMetaData):
-                for variable in obj.metadata.variables:
-                    variable_types.append(variable.variable_type)
-        return variable_types
+        ctx = self.get_index_context(obj)
+        if isinstance(ctx.metadata, NetcdfMetaData):
+            return [variable.type for variable in ctx.variables]
+        elif isinstance(ctx.metadata, RefTSMetadata):
+            return [variable.data_type for variable in ctx.variables]
+        elif isinstance(ctx.metadata, TimeSeriesMetaData):
+            return [variable.variable_type for variable in ctx.variables]
+        return []
 
     def prepare_variable_shapes(self, obj):
         """Return metadata variable shapes if exists, otherwise return empty array."""
-        variable_shapes = []
-        if hasattr(obj, 'metadata'):
-            if isinstance(obj.metadata, NetcdfMetaData):
-                for variable in obj.metadata.variables.all():
-                    variable_shapes.append(variable.shape)
-        return variable_shapes
+        ctx = self.get_index_context(obj)
+        if isinstance(ctx.metadata, NetcdfMetaData):
+            return [variable.shape for variable in ctx.variables]
+        return []
 
     def prepare_variable_descriptive_names(self, obj):
         """Return metadata variable descriptive names if exists, otherwise return empty array."""
-        variable_descriptive_names = []
-        if hasattr(obj, 'metadata'):
-            if isinstance(obj.metadata, NetcdfMetaData):
-                for variable in obj.metadata.variables.all():
-                    variable_descriptive_names.append(variable.descriptive_name)
-        return variable_descriptive_names
+        ctx = self.get_index_context(obj)
+        if isinstance(ctx.metadata, NetcdfMetaData):
+            return [variable.descriptive_name for variable in ctx.variables]
+        return []
 
     def prepare_variable_speciations(self, obj):
         """Return metadata variable speciations if exists, otherwise return empty array."""
-        variable_speciations = []
-        if hasattr(obj, 'metadata'):
-            if isinstance(obj.metadata, TimeSeriesMetaData):
-                for variable in obj.metadata.variables:
-                    variable_speciations.append(variable.speciation)
-        return variable_speciations
+        ctx = self.get_index_context(obj)
+        if isinstance(ctx.metadata, TimeSeriesMetaData):
+            return [variable.speciation for variable in ctx.variables]
+        return []
 
     def prepare_sites(self, obj):
         """Return metadata sites if exists, otherwise return empty array."""
-        sites = []
-        if hasattr(obj, 'metadata'):
-            if isinstance(obj.metadata, RefTSMetadata):
-                for site in obj.metadata.sites.all():
-                    sites.append(site.name)
-            elif isinstance(obj.metadata, TimeSeriesMetaData):
-                for site in obj.metadata.sites:
-                    sites.append(site.site_name)
-        return sites
+        ctx = self.get_index_context(obj)
+        if isinstance(ctx.metadata, TimeSeriesMetaData):
+            return [site.site_name for site in ctx.sites]
+        return [site.name for site in ctx.sites]
 
     def prepare_methods(self, obj):
         """Return metadata methods if exists, otherwise return empty array."""
-        methods = []
-        if hasattr(obj, 'metadata'):
-            if isinstance(obj.metadata, RefTSMetadata):
-                for method in obj.metadata.methods.all():
-                    methods.append(method.description)
-            elif isinstance(obj.metadata, TimeSeriesMetaData):
-                for method in obj.metadata.methods:
-                    methods.append(method.method_description)
-        return methods
+        ctx = self.get_index_context(obj)
+        if isinstance(ctx.metadata, TimeSeriesMetaData):
+            return [method.method_description for method in ctx.methods]
+        return [method.description for method in ctx.methods]
 
     def prepare_quality_levels(self, obj):
         """Return metadata quality levels if exists, otherwise return empty array."""
-        quality_levels = []
-        if hasattr(obj, 'metadata'):
-            if isinstance(obj.metadata, RefTSMetadata):
-                for quality_level in obj.metadata.quality_levels.all():
-                    quality_levels.append(quality_level.code)
-        return quality_levels
+        return [quality_level.code for quality_level in self.get_index_context(obj).quality_levels]
 
     def prepare_data_sources(self, obj):
         """Return metadata datasources if exists, otherwise return empty array."""
-        data_sources = []
-        if hasattr(obj, 'metadata'):
-            if isinstance(obj.metadata, RefTSMetadata):
-                for data_source in obj.metadata.datasources.all():
-                    data_sources.append(data_source.code)
-        return data_sources
+        return [data_source.code for data_source in self.get_index_context(obj).data_sources]
 
     def prepare_sample_mediums(self, obj):
         """Return metadata sample mediums if exists, otherwise return empty array."""
-        sample_mediums = []
-        if hasattr(obj, 'metadata'):
-            if isinstance(obj.metadata, TimeSeriesMetaData):
-                for time_series_result in obj.metadata.time_series_results:
-                    sample_mediums.append(time_series_result.sample_medium)
-            elif isinstance(obj.metadata, RefTSMetadata):
-                for variable in obj.metadata.variables.all():
-                    sample_mediums.append(variable.sample_medium)
-        return sample_mediums
+        ctx = self.get_index_context(obj)
+        if isinstance(ctx.metadata, TimeSeriesMetaData):
+            return [result.sample_medium for result in ctx.time_series_results]
+        elif isinstance(ctx.metadata, RefTSMetadata):
+            return [variable.sample_medium for variable in ctx.variables]
+        return []
 
     def prepare_units_names(self, obj):
         """Return metadata units names if exists, otherwise return empty array."""
-        units_names = []
-        if hasattr(obj, 'metadata'):
-            if isinstance(obj.metadata, TimeSeriesMetaData):
-                for time_series_result in obj.metadata.time_series_results:
-                    units_names.append(time_series_result.units_name)
-        return units_names
+        return [result.units_name for result in self.get_index_context(obj).time_series_results]
 
     def prepare_units_types(self, obj):
         """Return metadata units types if exists, otherwise return empty array."""
-        units_types = []
-        if hasattr(obj, 'metadata'):
-            if isinstance(obj.metadata, TimeSeriesMetaData):
-                for time_series_result in obj.metadata.time_series_results:
-                    units_types.append(time_series_result.units_type)
-        return units_types
+        return [result.units_type for result in self.get_index_context(obj).time_series_results]
 
     def prepare_aggregation_statistics(self, obj):
         """Return metadata aggregation statistics if exists, otherwise return empty array."""
-        aggregation_statistics = []
-        if hasattr(obj, 'metadata'):
-            if isinstance(obj.metadata, TimeSeriesMetaData):
-                for time_series_result in obj.metadata.time_series_results:
-                    aggregation_statistics.append(time_series_result.aggregation_statistics)
-        return aggregation_statistics
+        return [result.aggregation_statistics
+                for result in self.get_index_context(obj).time_series_results]
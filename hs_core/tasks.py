@@ -13,6 +13,7 @@ import requests
 from xml.etree import ElementTree
 
 from rest_framework import status
+from rest_framework.exceptions import ValidationError
 
 from django.conf import settings
 from django.core.mail import send_mail
@@ -21,11 +22,16 @@ from celery.task import periodic_task
 from celery.schedules import crontab
 from celery import shared_task
 
-from hs_core.models import BaseResource
+from hs_core.models import BaseResource, ZipJob
 from hs_core.hydroshare import utils
-from hs_core.hydroshare.hs_bagit import create_bag_files
+from hs_core.counters import increment_counter
+from hs_core.hydroshare.hs_bagit import create_bag_files, get_bag_content_hash, BAG_HASH_AVU, \
+    BAG_COUNTERS
 from hs_core.hydroshare.resource import get_activated_doi, get_resource_doi, \
     get_crossref_url, deposit_res_metadata_with_crossref
+from hs_core.hydro_realtime_signal_processor import pop_queued_resources, \
+    queue_resource_update, update_solr_for_resources
+from hs_core.views.utils import zip_folder, unzip_file
 
 from django_irods.icommands import SessionException
 
@@ -36,6 +42,11 @@ from django_irods.icommands import SessionException
 # by celery, despite our catch-all handler).
 logger = logging.getLogger('django')
 
+UNZIP_IRODS_ERROR_MESSAGE = "iRODS error resulted in unzip being cancelled. This may be due " \
+                            "to protection from overwriting existing files. Unzip in a " \
+                            "different location (e.g., folder) or move or rename the file " \
+                            "being overwritten. iRODS error follows: "
+
 
 @periodic_task(ignore_result=True, run_every=crontab(minute=0, hour=0))
 def check_doi_activation():
@@ -108,6 +119,24 @@ def check_doi_activation():
         send_mail(subject, email_msg, settings.DEFAULT_FROM_EMAIL, [settings.DEFAULT_SUPPORT_EMAIL])
 
 
+@shared_task
+def update_solr_index():
+    """Push the resource changes queued by the Solr signal processor to Solr in one batch.
+
+    This task is scheduled by queue_resource_update() when settings.SOLR_UPDATE_MODE is
+    'queued'. All resources queued since the task was scheduled are handled together, and
+    repeated saves of a resource result in one update.
+    """
+    resource_ids = pop_queued_resources()
+    try:
+        update_solr_for_resources(resource_ids)
+    except Exception:
+        # queue the resources again so that their changes are not lost while Solr is down
+        for resource_id in resource_ids:
+            queue_resource_update(resource_id)
+        raise
+
+
 @shared_task
 def add_zip_file_contents_to_resource(pk, zip_file_path):
     """Add zip file to existing resource and remove tmp zip file."""
@@ -161,13 +190,16 @@ def add_zip_file_contents_to_resource(pk, zip_file_path):
 
 
 @shared_task
-def create_bag_by_irods(resource_id):
+def create_bag_by_irods(resource_id, force=False):
     """Create a resource bag on iRODS side by running the bagit rule and ibun zip.
 
     This function runs as a celery task, invoked asynchronously so that it does not
     block the main web thread when it creates bags for very large files which will take some time.
+    The bagit rule and zip are skipped if the bag exists and the metadata documents and
+    recorded file states are unchanged since the bag was last created.
     :param
     resource_id: the resource uuid that is used to look for the resource to create the bag for.
+    force: if True, recreate the bag even if its content is unchanged.
 
     :return: True if bag creation operation succeeds;
              False if there is an exception raised or resource does not exist.
@@ -181,7 +213,7 @@ def create_bag_by_irods(resource_id):
     # if metadata has been changed, then regenerate metadata xml files
     if metadata_dirty is None or metadata_dirty.lower() == "true":
         try:
-            create_bag_files(res)
+            create_bag_files(res, force=force)
         except Exception as ex:
             logger.error('Failed to create bag files. Error:{}'.format(ex.message))
             return False
@@ -229,6 +261,13 @@ def create_bag_by_irods(resource_id):
     # only proceed when the resource is not deleted potentially by another request
     # when being downloaded
     if is_exist:
+        bag_hash = get_bag_content_hash(res, istorage)
+        if not force and istorage.getAVU(res.root_path, BAG_HASH_AVU) == bag_hash and \
+                istorage.exists(bag_full_name):
+            istorage.setAVU(irods_bagit_input_path, 'bag_modified', "false")
+            increment_counter(BAG_COUNTERS, 'bag_skipped')
+            return True
+
         # if bagit readme.txt does not exist, add it.
         if not is_bagit_readme_exist:
             from_file_name = getattr(settings, 'HS_BAGIT_README_FILE_WITH_PATH',
@@ -247,6 +286,8 @@ def create_bag_by_irods(resource_id):
             istorage.runBagitRule(bagit_rule_file, bagit_input_path, bagit_input_resource)
             istorage.zipup(irods_bagit_input_path, bag_full_name)
             istorage.setAVU(irods_bagit_input_path, 'bag_modified', "false")
+            istorage.setAVU(res.root_path, BAG_HASH_AVU, bag_hash)
+            increment_counter(BAG_COUNTERS, 'bag_rebuilt')
             return True
         except SessionException as ex:
             # if an exception occurs, delete incomplete files potentially being generated by
@@ -259,3 +300,42 @@ def create_bag_by_irods(resource_id):
     else:
         logger.error('Resource does not exist.')
         return False
+
+
+@shared_task
+def zip_job_task(job_id):
+    """Run a ZipJob, zipping a folder or unzipping a file of a resource.
+
+    Nothing is done for a finished job. iRODS errors are not retried: ibun refuses to
+    overwrite existing files, so a repeated attempt would fail the same way.
+    """
+    job = ZipJob.objects.filter(pk=job_id).select_related('resource', 'user').first()
+    if job is None or job.finished:
+        return
+
+    job.start()
+    res_id = job.resource.short_id
+    try:
+        if job.operation == ZipJob.ZIP:
+            _, zip_size = zip_folder(job.user, res_id, job.path, job.output_zip_fname,
+                                     job.remove_original, progress=job.set_progress)
+        else:
+            zip_size = None
+            unzip_file(job.user, res_id, job.path, job.remove_original,
+                       progress=job.set_progress)
+    except ValidationError as ex:
+        # detail is a list of messages
+        message = ex.detail if isinstance(ex.detail, basestring) else ' '.join(ex.detail)
+        job.finish(ZipJob.FAILED, message)
+    except SessionException as ex:
+        logger.error("{} job {} failed: {}".format(job.operation, job.task_id, ex.stderr))
+        if job.operation == ZipJob.UNZIP:
+            job.finish(ZipJob.FAILED, UNZIP_IRODS_ERROR_MESSAGE + ex.stderr, server_error=True)
+        else:
+            job.finish(ZipJob.FAILED, ex.stderr, server_error=True)
+    except Exception as ex:
+        logger.exception("{} job {} failed".format(job.operation, job.task_id))
+        job.finish(ZipJob.FAILED, "Error when running {} job: {}".format(job.operation, ex),
+                   server_error=True)
+    else:
+        job.finish(ZipJob.SUCCEEDED, zip_size=zip_size)
@@ -4,8 +4,10 @@ from future.builtins import int
 from django.utils.html import format_html
 
 from mezzanine import template
+from mezzanine.core.request import current_request
 
 from hs_core.hydroshare.utils import get_resource_by_shortkey
+from hs_access_control.request_cache import get_resource_permissions
 
 
 register = template.Library()
@@ -16,7 +18,17 @@ def user_permission(content, arg):
     user_pk = arg
     permission = "None"
     res_obj = content.get_content_model()
-    if res_obj.raccess.owners.filter(pk=user_pk).exists():
+    request = current_request()
+    if request is not None and user_pk is not None and request.user.pk == user_pk:
+        # permissions of the requesting user are memoized for the request
+        permissions = get_resource_permissions(request, request.user, res_obj)
+        if permissions.owns:
+            permission = "Owner"
+        elif permissions.is_editor:
+            permission = "Edit"
+        elif permissions.is_viewer:
+            permission = "View"
+    elif res_obj.raccess.owners.filter(pk=user_pk).exists():
         permission = "Owner"
     elif res_obj.raccess.edit_users.filter(pk=user_pk).exists():
         permission = "Edit"
@@ -45,6 +45,80 @@ class MockIRODSTestCaseMixin(object):
         super(MockIRODSTestCaseMixin, self).tearDown()
 
 
+class MockRedis(object):
+    """
+    In-memory stand-in for the redis connection of settings.REDIS_CONNECTION.
+
+    Only the commands used by HydroShare are supported; values are returned as strings, as
+    by redis. Expiry times are ignored.
+    """
+
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def set(self, key, value, ex=None, nx=False):
+        if nx and key in self.data:
+            return None
+        self.data[key] = str(value)
+        return True
+
+    def delete(self, *keys):
+        return len([self.data.pop(key) for key in keys if key in self.data])
+
+    def incr(self, key, amount=1):
+        value = int(self.data.get(key, 0)) + amount
+        self.data[key] = str(value)
+        return value
+
+    def sadd(self, key, *values):
+        members = self.data.setdefault(key, set())
+        added = set(str(value) for value in values) - members
+        members.update(added)
+        return len(added)
+
+    def smembers(self, key):
+        return set(self.data.get(key, set()))
+
+    def hincrby(self, key, field, amount=1):
+        values = self.data.setdefault(key, {})
+        value = int(values.get(field, 0)) + amount
+        values[field] = str(value)
+        return value
+
+    def hset(self, key, field, value):
+        values = self.data.setdefault(key, {})
+        added = field not in values
+        values[field] = str(value)
+        return int(added)
+
+    def hgetall(self, key):
+        return dict(self.data.get(key, {}))
+
+    def pipeline(self):
+        return MockRedisPipeline(self)
+
+
+class MockRedisPipeline(object):
+    """Pipeline of MockRedis: commands are run in order by execute()."""
+
+    def __init__(self, redis):
+        self.redis = redis
+        self.commands = []
+
+    def __getattr__(self, name):
+        def command(*args, **kwargs):
+            self.commands.append((getattr(self.redis, name), args, kwargs))
+            return self
+        return command
+
+    def execute(self):
+        commands, self.commands = self.commands, []
+        return [method(*args, **kwargs) for method, args, kwargs in commands]
+
+
 class TestCaseCommonUtilities(object):
     """Enable common utilities for iRODS testing."""
 
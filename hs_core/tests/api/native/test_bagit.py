@@ -1,8 +1,18 @@
+import os
+import tempfile
+from StringIO import StringIO
+
+from rdflib import Graph
+from rdflib.compare import isomorphic
+from rdflib.namespace import DCTERMS
+
 from django.contrib.auth.models import Group, User
 from django.test import TestCase
 
 from hs_core import hydroshare
+from hs_core.counters import get_counters, reset_counters
 from hs_core.hydroshare import hs_bagit
+from hs_core.hydroshare.utils import current_site_url, replace_resource_file_on_irods
 from hs_core.tasks import create_bag_by_irods
 from hs_core.models import GenericResource
 from django_irods.storage import IrodsStorage
@@ -52,6 +62,75 @@ class TestBagIt(TestCase):
         irods_storage_obj = hs_bagit.create_bag_files(self.test_res)
         self.assertTrue(isinstance(irods_storage_obj, IrodsStorage))
 
+    def test_create_bag_files_skips_unchanged_documents(self):
+        hs_bagit.create_bag_files(self.test_res, force=True)
+        reset_counters(hs_bagit.BAG_COUNTERS)
+
+        # nothing changed since the documents were uploaded
+        hs_bagit.create_bag_files(self.test_res)
+        counters = get_counters(hs_bagit.BAG_COUNTERS)
+        self.assertEquals(counters.get('metadata_skipped'), 1)
+        self.assertEquals(counters.get('resmap_skipped'), 1)
+        self.assertEquals(counters.get('metadata_uploaded'), None)
+
+        # a title change changes both documents
+        self.test_res.metadata.update_element('title', self.test_res.metadata.title.id,
+                                              value='My Changed Resource')
+        hs_bagit.create_bag_files(self.test_res)
+        counters = get_counters(hs_bagit.BAG_COUNTERS)
+        self.assertEquals(counters.get('metadata_uploaded'), 1)
+        self.assertEquals(counters.get('resmap_uploaded'), 1)
+
+    def test_create_bag_by_irods_skips_unchanged_bag(self):
+        self.assertTrue(create_bag_by_irods(self.test_res.short_id, force=True))
+        reset_counters(hs_bagit.BAG_COUNTERS)
+        self.assertTrue(create_bag_by_irods(self.test_res.short_id))
+        self.assertEquals(get_counters(hs_bagit.BAG_COUNTERS).get('bag_skipped'), 1)
+
+    def test_create_bag_by_irods_rebuilds_after_same_size_replacement(self):
+        temp_dir = tempfile.mkdtemp()
+        file_path = os.path.join(temp_dir, 'file1.txt')
+        with open(file_path, 'w') as test_file:
+            test_file.write('original contents')
+        with open(file_path, 'r') as test_file:
+            hydroshare.add_resource_files(self.test_res.short_id, test_file)
+        res_file = self.test_res.files.first()
+        # recording the size leaves the recorded file state as (size, None, None)
+        self.assertEquals(self.test_res.size, len('original contents'))
+        self.assertTrue(create_bag_by_irods(self.test_res.short_id, force=True))
+
+        # replace the file with different contents of the same size
+        with open(file_path, 'w') as test_file:
+            test_file.write('replaced contents')
+        replace_resource_file_on_irods(file_path, res_file, self.user)
+        self.assertEquals(self.test_res.size, len('replaced contents'))
+
+        reset_counters(hs_bagit.BAG_COUNTERS)
+        self.assertTrue(create_bag_by_irods(self.test_res.short_id))
+        counters = get_counters(hs_bagit.BAG_COUNTERS)
+        self.assertEquals(counters.get('bag_rebuilt'), 1)
+        self.assertEquals(counters.get('bag_skipped'), None)
+        os.remove(file_path)
+        os.rmdir(temp_dir)
+
+    def test_streamed_resource_map_matches_serializer(self):
+        site_url = current_site_url()
+        entries = [('{}/resource/{}/data/contents/folder/file{}.txt'
+                    .format(site_url, self.test_res.short_id, n), 'text/plain')
+                   for n in range(20)]
+
+        streamed = StringIO()
+        hs_bagit.write_resource_map(streamed, self.test_res, site_url, lambda: iter(entries))
+        streamed_graph = Graph().parse(data=streamed.getvalue())
+        reference_graph = Graph().parse(
+            data=hs_bagit.serialize_resource_map(self.test_res, site_url, entries))
+
+        # serialization timestamps differ between any two documents
+        for graph in (streamed_graph, reference_graph):
+            for predicate in (DCTERMS.created, DCTERMS.modified):
+                graph.remove((None, predicate, None))
+        self.assertTrue(isomorphic(streamed_graph, reference_graph))
+
     def test_create_bag_by_irods(self):
         try:
             # this is the api call we testing
@@ -0,0 +1,45 @@
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from mock import Mock
+from redis import RedisError
+
+from hs_core.counters import get_counters, increment_counter, reset_counters, set_counter
+from hs_core.testing import MockRedis
+
+
+class TestCounters(TestCase):
+    def setUp(self):
+        self.redis = MockRedis()
+        self.redis_settings = override_settings(REDIS_CONNECTION=self.redis)
+        self.redis_settings.enable()
+
+    def tearDown(self):
+        self.redis_settings.disable()
+
+    def test_counters(self):
+        increment_counter('test', 'events')
+        increment_counter('test', 'events', 2)
+        set_counter('test', 'depth', 5)
+        set_counter('test', 'depth', 3)
+        increment_counter('other', 'events')
+        # counters are kept in one redis hash per group, shared by all processes
+        self.assertEqual(self.redis.hgetall('hs_counters:test'), {'events': '3', 'depth': '3'})
+        self.assertEqual(get_counters('test'), {'events': 3, 'depth': 3})
+
+        call_command('counters', 'test', reset=True)
+        self.assertEqual(get_counters('test'), {})
+        self.assertEqual(get_counters('other'), {'events': 1})
+
+        reset_counters('other')
+        self.assertEqual(get_counters('other'), {})
+
+    def test_counters_without_redis(self):
+        redis = Mock()
+        redis.hincrby.side_effect = redis.hset.side_effect = redis.hgetall.side_effect = \
+            redis.delete.side_effect = RedisError
+        with override_settings(REDIS_CONNECTION=redis):
+            # counters are advisory: nothing fails while redis is not available
+            increment_counter('test', 'events')
+            set_counter('test', 'depth', 5)
+            self.assertEqual(get_counters('test'), {})
+            reset_counters('test')
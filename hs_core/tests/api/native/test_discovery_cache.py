@@ -0,0 +1,97 @@
+from unittest import TestCase
+
+from django.core.cache import cache
+from django.test import override_settings
+from mock import Mock
+from redis import RedisError
+
+from hs_core.counters import get_counters, reset_counters
+from hs_core.discovery_cache import facet_cache_key, get_facet_counts, FACET_COUNTERS
+from hs_core.hydro_realtime_signal_processor import bump_index_version, get_index_version
+from hs_core.testing import MockRedis
+
+FACET_FIELDS = ['creators', 'subjects']
+
+
+def _form(q, selected_facets=(), **filters):
+    data = {'q': q, 'NElat': u'', 'start_date': None}
+    data.update(filters)
+    return Mock(cleaned_data=data, selected_facets=list(selected_facets),
+                is_valid=Mock(return_value=True))
+
+
+class TestDiscoveryCache(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.redis = MockRedis()
+        self.redis_settings = override_settings(REDIS_CONNECTION=self.redis)
+        self.redis_settings.enable()
+        reset_counters(FACET_COUNTERS)
+
+    def tearDown(self):
+        self.redis_settings.disable()
+
+    def test_cache_key_normalization(self):
+        key = facet_cache_key(_form(u'water  quality', [u'subjects:a', u'creators:b']),
+                              FACET_FIELDS)
+        # whitespace, facet order, repeated and empty facets do not change the key
+        self.assertEqual(key, facet_cache_key(
+            _form(u' water quality ', [u'creators:b', u'subjects:a', u'subjects:a',
+                                       u'owners_names:']), FACET_FIELDS))
+        self.assertNotEqual(key, facet_cache_key(_form(u'water'), FACET_FIELDS))
+        self.assertNotEqual(key, facet_cache_key(
+            _form(u'water quality', [u'subjects:a', u'creators:b'], NElat=u'40'),
+            FACET_FIELDS))
+
+        # changes to the index change the key
+        bump_index_version()
+        self.assertNotEqual(key, facet_cache_key(
+            _form(u'water quality', [u'subjects:a', u'creators:b']), FACET_FIELDS))
+
+    def test_facet_counts_shared(self):
+        queryset = Mock()
+        queryset.facet_counts.return_value = {'fields': {'subjects': [('a', 1)]}}
+
+        for n in range(3):
+            facets = get_facet_counts(_form(u'water'), queryset, FACET_FIELDS)
+            self.assertEqual(facets, {'fields': {'subjects': [('a', 1)]}})
+        self.assertEqual(queryset.facet_counts.call_count, 1)
+        self.assertEqual(get_counters(FACET_COUNTERS), {'misses': 1, 'hits': 2})
+
+        bump_index_version()
+        get_facet_counts(_form(u'water'), queryset, FACET_FIELDS)
+        self.assertEqual(queryset.facet_counts.call_count, 2)
+
+        # invalid forms are not cached
+        form = _form(u'water')
+        form.is_valid.return_value = False
+        get_facet_counts(form, queryset, FACET_FIELDS)
+        self.assertEqual(queryset.facet_counts.call_count, 3)
+
+    def test_index_version_shared(self):
+        version = get_index_version()
+        self.assertEqual(get_index_version(), version)
+
+        # a bump by another process, through redis, is seen without the local cache
+        self.redis.incr('hs_solr_index_version')
+        cache.clear()
+        self.assertNotEqual(get_index_version(), version)
+
+        # a lost version is started again
+        self.redis.data.clear()
+        bump_index_version()
+        self.assertIsNotNone(get_index_version())
+
+    def test_facet_counts_without_redis(self):
+        queryset = Mock()
+        queryset.facet_counts.return_value = {'fields': {}}
+        redis = Mock()
+        redis.get.side_effect = redis.set.side_effect = redis.incr.side_effect = RedisError
+        with override_settings(REDIS_CONNECTION=redis):
+            # the index version is unknown, so facet counts are not cached
+            bump_index_version()
+            self.assertIsNone(facet_cache_key(_form(u'water'), FACET_FIELDS))
+            get_facet_counts(_form(u'water'), queryset, FACET_FIELDS)
+            get_facet_counts(_form(u'water'), queryset, FACET_FIELDS)
+        self.assertEqual(queryset.facet_counts.call_count, 2)
+        self.assertEqual(get_counters(FACET_COUNTERS), {})
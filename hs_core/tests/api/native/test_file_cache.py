@@ -0,0 +1,114 @@
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+from django.core.cache import cache
+from django.test import override_settings
+from mock import Mock
+
+from hs_core import file_cache
+from hs_core.counters import get_counters, reset_counters
+from hs_core.testing import MockRedis
+
+
+def _res_file(storage_path, modified_time):
+    res_file = Mock(storage_path=storage_path)
+    res_file.get_irods_system_metadata.return_value = (100, None, modified_time)
+    return res_file
+
+
+class TestFileCache(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.tmp_dir = tempfile.mkdtemp()
+        self.cache_dir = os.path.join(self.tmp_dir, 'cache')
+        self.settings = override_settings(IRODS_FILE_CACHE_DIR=self.cache_dir,
+                                          IRODS_FILE_CACHE_SIZE=1000,
+                                          REDIS_CONNECTION=MockRedis())
+        self.settings.enable()
+        reset_counters(file_cache.FILE_CACHE_COUNTERS)
+        self.contents = {}
+        self.istorage = Mock(getFile=Mock(side_effect=self._get_file))
+
+    def tearDown(self):
+        self.settings.disable()
+        shutil.rmtree(self.tmp_dir)
+
+    def _get_file(self, storage_path, target_path):
+        with open(target_path, 'w') as target:
+            target.write(self.contents[storage_path])
+
+    def _copy(self, res_file):
+        target_path = os.path.join(self.tmp_dir, 'copy')
+        file_cache.copy_file_from_irods(res_file, self.istorage, target_path)
+        with open(target_path) as target:
+            return target.read()
+
+    def test_hits_and_versions(self):
+        self.contents['res/data/contents/a.nc'] = 'version 1'
+        res_file = _res_file('res/data/contents/a.nc', 'time1')
+        self.assertEqual(self._copy(res_file), 'version 1')
+        self.assertEqual(self._copy(res_file), 'version 1')
+        self.assertEqual(self.istorage.getFile.call_count, 1)
+        # the version is read from iRODS without computing a checksum
+        res_file.get_irods_system_metadata.assert_called_with(checksum=False)
+
+        # a new modification time is a new version of the file
+        self.contents['res/data/contents/a.nc'] = 'version 2'
+        res_file.get_irods_system_metadata.return_value = (100, None, 'time2')
+        self.assertEqual(self._copy(res_file), 'version 2')
+        self.assertEqual(self.istorage.getFile.call_count, 2)
+        self.assertEqual(get_counters(file_cache.FILE_CACHE_COUNTERS),
+                         {'hits': 1, 'misses': 2})
+
+    def test_invalidate(self):
+        self.contents['res/data/contents/a.nc'] = 'version 1'
+        res_file = _res_file('res/data/contents/a.nc', 'time1')
+        self._copy(res_file)
+        file_cache.invalidate('res/data/contents/a.nc')
+        self._copy(res_file)
+        self.assertEqual(self.istorage.getFile.call_count, 2)
+
+    def test_evict_least_recently_used(self):
+        for name in ('a', 'b', 'c'):
+            self.contents[name] = name * 400
+        self._copy(_res_file('a', 'a'))
+        self._copy(_res_file('b', 'b'))
+        for name, used in (('a', 100), ('b', 200)):
+            path_key = file_cache._path_key(name)
+            version = file_cache._file_version(_res_file(name, name))
+            os.utime(file_cache._entry_dir(path_key, version), (used, used))
+        # copying a again makes b the least recently used entry
+        self._copy(_res_file('a', 'a'))
+        self._copy(_res_file('c', 'c'))
+
+        self.istorage.getFile.reset_mock()
+        self._copy(_res_file('a', 'a'))
+        self.assertEqual(self.istorage.getFile.call_count, 0)
+        self._copy(_res_file('b', 'b'))
+        self.assertEqual(self.istorage.getFile.call_count, 1)
+
+    def test_cached_file(self):
+        self.contents['a'] = 'contents'
+        with file_cache.cached_file(_res_file('a', 'a'), self.istorage) as path:
+            # the path is that of the cache entry, not of a copy
+            self.assertTrue(path.startswith(self.cache_dir))
+            with open(path) as cached:
+                self.assertEqual(cached.read(), 'contents')
+        self.assertEqual(self._copy(_res_file('a', 'a')), 'contents')
+        self.assertEqual(self.istorage.getFile.call_count, 1)
+
+        with override_settings(IRODS_FILE_CACHE_SIZE=0, TEMP_FILE_DIR=self.tmp_dir):
+            with file_cache.cached_file(_res_file('a', 'a'), self.istorage) as path:
+                self.assertFalse(path.startswith(self.cache_dir))
+            self.assertFalse(os.path.exists(path))
+        self.assertEqual(self.istorage.getFile.call_count, 2)
+
+    def test_disabled(self):
+        self.contents['a'] = 'contents'
+        with override_settings(IRODS_FILE_CACHE_SIZE=0):
+            self._copy(_res_file('a', 'a'))
+            self._copy(_res_file('a', 'a'))
+        self.assertEqual(self.istorage.getFile.call_count, 2)
+        self.assertFalse(os.path.exists(self.cache_dir))
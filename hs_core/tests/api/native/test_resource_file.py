@@ -167,6 +167,66 @@ class TestResourceFileAPI(MockIRODSTestCaseMixin,
         # delete resources to clean up
         hydroshare.delete_resource(self.res.short_id)
 
+    def test_storage_path_index(self):
+        """ the storage path index maps qualified paths to the files that exist in Django """
+        ResourceFile.create_folder(self.res, 'foo')
+        hydroshare.add_resource_files(self.res.short_id, self.test_file_1, folder='foo')
+        resfile = self.res.files.all()[0]
+
+        shortpath = os.path.join(self.res.short_id, "data", "contents", "foo", "file1.txt")
+        otherpath = os.path.join(self.res.short_id, "data", "contents", "foo", "file2.txt")
+        index = ResourceFile.get_storage_path_index(self.res, [shortpath, otherpath])
+
+        self.assertEqual(index.keys(), [shortpath])
+        self.assertEqual(index[shortpath].pk, resfile.pk)
+        self.assertEqual(index[shortpath].storage_path, shortpath)
+        self.assertEqual(ResourceFile.get_storage_path_index(self.res, []), {})
+
+        # delete resources to clean up
+        hydroshare.delete_resource(self.res.short_id)
+
+    def test_recorded_system_metadata(self):
+        """ file sizes are recorded in Django at creation and refreshed from iRODS on demand """
+        hydroshare.add_resource_files(self.res.short_id, self.test_file_1)
+        resfile = self.res.files.all()[0]
+        file_size = os.path.getsize(self.test_file_name1)
+
+        # size is recorded when the file is created and served from Django
+        self.assertEqual(resfile._size, file_size)
+        self.assertEqual(resfile.size, file_size)
+        self.assertEqual(self.res.size, file_size)
+        # checksum and modification time are not recorded until read from iRODS
+        self.assertIsNone(resfile._checksum)
+        self.assertIsNone(resfile._modified_time)
+
+        # checking files does not compute checksums unless asked to refresh file metadata
+        self.res.check_irods_files(echo_errors=False, log_errors=False)
+        self.assertIsNone(ResourceFile.objects.get(pk=resfile.pk)._checksum)
+
+        # refreshing fills in values never recorded without reporting them as out of date
+        errors, _ = self.res.check_irods_files(echo_errors=False, log_errors=False,
+                                               return_errors=True, refresh_file_metadata=True)
+        self.assertFalse([error for error in errors if 'out of date' in error])
+        self.assertIsNotNone(ResourceFile.objects.get(pk=resfile.pk)._checksum)
+
+        # a forgotten size is read back from iRODS and recorded again
+        resfile.reset_system_metadata()
+        self.assertEqual(ResourceFile.objects.get(pk=resfile.pk)._size, -1)
+        # the modification time is forgotten too, to be read from iRODS when needed
+        self.assertIsNone(ResourceFile.objects.get(pk=resfile.pk)._modified_time)
+        self.assertEqual(self.res.size, file_size)
+        self.assertEqual(ResourceFile.objects.get(pk=resfile.pk)._size, file_size)
+
+        # refreshing records checksum and modification time
+        resfile = ResourceFile.objects.get(pk=resfile.pk)
+        self.assertFalse(resfile.set_system_metadata())
+        self.assertNotEqual(resfile.checksum, None)
+        self.assertNotEqual(resfile.modified_time, None)
+        self.assertFalse(resfile.set_system_metadata())
+
+        # delete resources to clean up
+        hydroshare.delete_resource(self.res.short_id)
+
     def test_federated_root_path_logic(self):
         """ a federated file path in the root folder has the proper state after state changes """
         # resource should not have any files at this point
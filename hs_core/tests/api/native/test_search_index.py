@@ -0,0 +1,83 @@
+from unittest import TestCase
+
+from django.contrib.auth.models import Group, User
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from hs_access_control.models import PrivilegeCodes
+from hs_core import hydroshare
+from hs_core.models import BaseResource, GenericResource
+from hs_core.search_indexes import BaseResourceIndex, load_index_contexts
+from hs_core.testing import MockIRODSTestCaseMixin
+
+
+class TestBaseResourceIndex(MockIRODSTestCaseMixin, TestCase):
+    def setUp(self):
+        super(TestBaseResourceIndex, self).setUp()
+        self.hs_group, _ = Group.objects.get_or_create(name='Hydroshare Author')
+        self.owner = hydroshare.create_account(
+            'index_owner@email.com',
+            username='indexowner',
+            first_name='owner_first_name',
+            last_name='owner_last_name',
+            superuser=False,
+            groups=[self.hs_group]
+        )
+        self.viewer = hydroshare.create_account(
+            'index_viewer@email.com',
+            username='indexviewer',
+            first_name='viewer_first_name',
+            last_name='viewer_last_name',
+            superuser=False,
+            groups=[self.hs_group]
+        )
+        self.res_one = hydroshare.create_resource('GenericResource', self.owner,
+                                                  'Indexed Resource One',
+                                                  keywords=['one', 'indexed'])
+        self.res_two = hydroshare.create_resource('GenericResource', self.owner,
+                                                  'Indexed Resource Two')
+        self.owner.uaccess.share_resource_with_user(self.res_one, self.viewer,
+                                                    PrivilegeCodes.VIEW)
+        self.index = BaseResourceIndex()
+        self.prepare_methods = [getattr(self.index, name) for name in dir(self.index)
+                                if name.startswith('prepare_')]
+
+    def tearDown(self):
+        super(TestBaseResourceIndex, self).tearDown()
+        User.objects.all().delete()
+        Group.objects.all().delete()
+        GenericResource.objects.all().delete()
+
+    def test_prepare_from_index_context(self):
+        resources = list(BaseResource.objects.filter(id__in=[self.res_one.id,
+                                                             self.res_two.id]))
+        load_index_contexts(resources)
+
+        # all fields are prepared from the context, without querying the database
+        with CaptureQueriesContext(connection) as queries:
+            for res in resources:
+                for prepare in self.prepare_methods:
+                    prepare(res)
+        self.assertEqual(len(queries), 0)
+
+        res_one = [res for res in resources if res.id == self.res_one.id][0]
+        self.assertEqual(self.index.prepare_title(res_one), 'Indexed Resource One')
+        self.assertEqual(sorted(self.index.prepare_subjects(res_one)), ['indexed', 'one'])
+        self.assertEqual(self.index.prepare_owners_logins(res_one), ['indexowner'])
+        self.assertEqual(self.index.prepare_editors_logins(res_one), ['indexowner'])
+        self.assertEqual(sorted(self.index.prepare_viewers_logins(res_one)),
+                         ['indexowner', 'indexviewer'])
+        self.assertEqual(self.index.prepare_viewers_count(res_one), 2)
+
+        # the context agrees with the access control querysets
+        self.assertEqual(sorted(self.index.prepare_viewers_logins(res_one)),
+                         sorted(u.username for u in self.res_one.raccess.view_users))
+        self.assertEqual(sorted(self.index.prepare_editors_logins(res_one)),
+                         sorted(u.username for u in self.res_one.raccess.edit_users))
+
+    def test_prepare_without_index_context(self):
+        # resources indexed one at a time load their own context
+        res = BaseResource.objects.get(id=self.res_two.id)
+        self.assertEqual(self.index.prepare_title(res), 'Indexed Resource Two')
+        self.assertEqual(self.index.prepare_owners_count(res), 1)
+        self.assertIsNotNone(res.index_context)
@@ -0,0 +1,137 @@
+from django.contrib.auth.models import Group
+from django.test import TestCase, override_settings
+from mock import patch, Mock
+from redis import RedisError
+
+from hs_core import hydroshare
+from hs_core.counters import get_counters, reset_counters
+from hs_core.hydro_realtime_signal_processor import SOLR_COUNTERS, SOLR_QUEUE_KEY, \
+    SOLR_QUEUE_SCHEDULED_KEY, SOLR_INDEX_VERSION_KEY, queue_resource_update
+from hs_core.search_indexes import BaseResourceIndex
+from hs_core.tasks import update_solr_index
+from hs_core.testing import MockIRODSTestCaseMixin, MockRedis
+
+
+class TestQueuedSolrUpdate(MockIRODSTestCaseMixin, TestCase):
+    def setUp(self):
+        super(TestQueuedSolrUpdate, self).setUp()
+        self.redis = MockRedis()
+        self.solr_settings = override_settings(REDIS_CONNECTION=self.redis,
+                                               SOLR_UPDATE_MODE='queued',
+                                               SOLR_UPDATE_DELAY=10)
+        self.solr_settings.enable()
+        self.apply_async = patch.object(update_solr_index, 'apply_async')
+        self.apply_async.start()
+
+        Group.objects.get_or_create(name='Hydroshare Author')
+        self.user = hydroshare.create_account(
+            'solr_user@nowhere.com',
+            username='solruser',
+            first_name='Creator_FirstName',
+            last_name='Creator_LastName',
+            superuser=False,
+            groups=[]
+        )
+        self.public_res = hydroshare.create_resource('GenericResource', self.user,
+                                                     'Public Resource')
+        self.public_res.raccess.public = True
+        self.public_res.raccess.save()
+        self.private_res = hydroshare.create_resource('GenericResource', self.user,
+                                                      'Private Resource')
+        self._reset_queue()
+
+    def tearDown(self):
+        self.public_res.delete()
+        self.private_res.delete()
+        self.apply_async.stop()
+        self.solr_settings.disable()
+        super(TestQueuedSolrUpdate, self).tearDown()
+
+    def _reset_queue(self):
+        self.redis.data.clear()
+        update_solr_index.apply_async.reset_mock()
+        reset_counters(SOLR_COUNTERS)
+
+    def _mock_solr(self):
+        """Patch the haystack connections with a mock backend and return it."""
+        backend = Mock()
+        patchers = [patch('hs_core.hydro_realtime_signal_processor.connections'),
+                    patch('hs_core.hydro_realtime_signal_processor.connection_router')]
+        connections, router = [patcher.start() for patcher in patchers]
+        for patcher in patchers:
+            self.addCleanup(patcher.stop)
+        connection = connections.__getitem__.return_value
+        connection.get_backend.return_value = backend
+        connection.get_unified_index.return_value.get_index.return_value = BaseResourceIndex()
+        router.for_write.return_value = ['default']
+        return backend
+
+    def test_saves_coalesced(self):
+        for n in range(3):
+            self.public_res.save()
+        self.public_res.raccess.save()
+
+        self.assertEqual(self.redis.smembers(SOLR_QUEUE_KEY), {str(self.public_res.id)})
+        # one task is scheduled for the ids queued within SOLR_UPDATE_DELAY
+        update_solr_index.apply_async.assert_called_once_with(countdown=10)
+        counters = get_counters(SOLR_COUNTERS)
+        self.assertEqual(counters['queued'], 1)
+        self.assertGreaterEqual(counters['coalesced'], 3)
+
+    def test_disabled(self):
+        with override_settings(SOLR_UPDATE_MODE='disabled'):
+            self.public_res.save()
+            self.private_res.raccess.save()
+        # nothing is queued, nor updated in Solr, which would bump the index version
+        self.assertEqual(self.redis.data, {})
+        self.assertFalse(update_solr_index.apply_async.called)
+
+    def test_update_queued_resources(self):
+        backend = self._mock_solr()
+        deleted_id = self.private_res.id + 1000
+        for resource_id in (self.public_res.id, self.private_res.id, deleted_id):
+            queue_resource_update(resource_id)
+
+        update_solr_index()
+
+        # the public resource is indexed; the private and deleted ones are removed
+        self.assertEqual(backend.update.call_count, 1)
+        index, resources = backend.update.call_args[0]
+        self.assertEqual([res.id for res in resources], [self.public_res.id])
+        self.assertEqual(sorted(call[0][0] for call in backend.remove.call_args_list),
+                         sorted('hs_core.baseresource.{}'.format(resource_id)
+                                for resource_id in (self.private_res.id, deleted_id)))
+        self.assertEqual(self.redis.smembers(SOLR_QUEUE_KEY), set())
+        self.assertNotIn(SOLR_QUEUE_SCHEDULED_KEY, self.redis.data)
+        self.assertIn(SOLR_INDEX_VERSION_KEY, self.redis.data)
+        counters = get_counters(SOLR_COUNTERS)
+        self.assertEqual(counters['updated'], 1)
+        self.assertEqual(counters['removed'], 2)
+
+    def test_queue_without_redis(self):
+        backend = self._mock_solr()
+        redis = Mock()
+        redis.sadd.side_effect = redis.set.side_effect = redis.incr.side_effect = RedisError
+        with override_settings(REDIS_CONNECTION=redis):
+            # saving does not fail: the resource is updated in Solr right away
+            self.public_res.save()
+        self.assertFalse(update_solr_index.apply_async.called)
+        self.assertTrue(backend.update.called)
+        index, resources = backend.update.call_args[0]
+        self.assertEqual([res.id for res in resources], [self.public_res.id])
+
+    def test_update_failure_requeues(self):
+        backend = self._mock_solr()
+        backend.update.side_effect = Exception('Solr is down')
+        queue_resource_update(self.public_res.id)
+        queue_resource_update(self.private_res.id)
+        update_solr_index.apply_async.reset_mock()
+
+        with self.assertRaises(Exception):
+            update_solr_index()
+
+        # the ids stay queued for another task
+        self.assertEqual(self.redis.smembers(SOLR_QUEUE_KEY),
+                         {str(self.public_res.id), str(self.private_res.id)})
+        update_solr_index.apply_async.assert_called_once_with(countdown=10)
+        self.assertNotIn(SOLR_INDEX_VERSION_KEY, self.redis.data)
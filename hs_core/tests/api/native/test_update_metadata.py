@@ -4,6 +4,7 @@ from django.contrib.auth.models import Group
 from django.test import TestCase
 
 from hs_core import hydroshare
+from hs_core.models import Coverage
 from hs_core.testing import MockIRODSTestCaseMixin
 
 
@@ -188,6 +189,17 @@ class TestUpdateMetadata(MockIRODSTestCaseMixin, TestCase):
         self.assertEquals(cov_box.value['westlimit'], 16.6789)
         self.assertEquals(cov_box.value['units'], 'decimal deg')
 
+        # the bounding box of the coverage is recorded and follows updates of its value
+        self.assertEquals((cov_box._bbox_xmin, cov_box._bbox_xmax), (16.6789, 130.6789))
+        self.assertEquals((cov_box._bbox_ymin, cov_box._bbox_ymax), (16.45678, 56.45678))
+        self.assertIn(cov_box, Coverage.filter_by_bbox(north=20, south=0, east=40, west=10))
+        self.res.metadata.update_element('coverage', cov_box.id, type='box',
+                                         value={'northlimit': '-10', 'eastlimit': '30',
+                                                'southlimit': '-20', 'westlimit': '20',
+                                                'units': 'decimal deg'})
+        self.assertNotIn(cov_box, Coverage.filter_by_bbox(north=20, south=0, east=40, west=10))
+        self.assertIn(cov_box, Coverage.filter_by_bbox(north=-10, south=-30, east=25, west=0))
+
     def test_update_metadata_ignored_elements(self):
         # the following elements are ignored
         metadata_dict = [
@@ -1,9 +1,14 @@
 from django.contrib.auth.models import Group
-from django.test import TestCase
+from django.db import connection
+from django.test import TestCase, RequestFactory
+from django.test.utils import CaptureQueriesContext
+from mock import Mock
 
 from hs_core.testing import MockIRODSTestCaseMixin
 from hs_core import hydroshare
-from hs_core.views.utils import create_folder, move_to_folder, list_folder, rename_file_or_folder
+from hs_core.views.utils import create_folder, move_to_folder, list_folder, \
+    rename_file_or_folder, get_my_resources_list, get_irods_folder_tree_file_sizes
+from hs_access_control.models import PrivilegeCodes
 
 
 class TestViewUtils(MockIRODSTestCaseMixin, TestCase):
@@ -85,4 +90,83 @@ class TestViewUtils(MockIRODSTestCaseMixin, TestCase):
 
         resource.delete()
 
+    def test_get_my_resources_list(self):
+        group, _ = Group.objects.get_or_create(name='Hydroshare Author')
+
+        owner = hydroshare.create_account(
+            'owner@nowhere.com',
+            username='owner',
+            first_name='Owner_FirstName',
+            last_name='Owner_LastName',
+            superuser=False,
+            groups=[]
+        )
+        editor = hydroshare.create_account(
+            'editor@nowhere.com',
+            username='editor',
+            first_name='Editor_FirstName',
+            last_name='Editor_LastName',
+            superuser=False,
+            groups=[]
+        )
+
+        owned = hydroshare.create_resource('GenericResource', owner, 'owned resource')
+        shared = hydroshare.create_resource('GenericResource', editor, 'shared resource')
+        editor.uaccess.share_resource_with_user(shared, owner, PrivilegeCodes.CHANGE)
+        owner.ulabels.favorite_resource(owned)
+        owner.ulabels.label_resource(owned, 'b label')
+        owner.ulabels.label_resource(owned, 'a label')
+
+        request = RequestFactory().get('/my-resources/')
+        request.user = owner
+
+        def get_resources_and_query_count():
+            with CaptureQueriesContext(connection) as queries:
+                resources = get_my_resources_list(request)
+                # read what the My Resources table shows for each resource
+                for res in resources:
+                    unicode(res.list_title)
+                    list(res.list_metadata.creators.all())
+                    list(res.list_metadata.subjects.all())
+            return resources, len(queries)
+
+        get_resources_and_query_count()  # warm up caches (e.g., of content types)
+        resources, query_count = get_resources_and_query_count()
+
+        self.assertEqual([res.short_id for res in resources], [owned.short_id, shared.short_id])
+        self.assertTrue(resources[0].owned)
+        self.assertTrue(resources[0].is_favorite)
+        self.assertEqual(resources[0].labels, ['a label', 'b label'])
+        self.assertEqual(resources[0].list_title.value, 'owned resource')
+        self.assertEqual(resources[0].list_first_creator.name,
+                         'Owner_FirstName Owner_LastName')
+        self.assertTrue(resources[1].editable)
+        self.assertFalse(resources[1].is_favorite)
+
+        # the number of queries does not depend on the number of resources
+        another = hydroshare.create_resource('GenericResource', owner, 'another resource')
+        resources, another_query_count = get_resources_and_query_count()
+        self.assertEqual(len(resources), 3)
+        self.assertEqual(another_query_count, query_count)
+
+        owned.delete()
+        shared.delete()
+        another.delete()
+
+    def test_get_irods_folder_tree_file_sizes(self):
+        listing = "/hydroshareZone/home/proxy/abc/data/contents/foo:\n" \
+                  "  rods              0 demoResc          283 2017-06-20.16:42 & a b.txt\n" \
+                  "  rods              1 replResc          283 2017-06-20.16:42 & a b.txt\n" \
+                  "  C- /hydroshareZone/home/proxy/abc/data/contents/foo/bar\n" \
+                  "/hydroshareZone/home/proxy/abc/data/contents/foo/bar:\n" \
+                  "  rods              0 demoResc            5 2017-06-20.16:42 & c.csv\n"
+        istorage = Mock()
+        istorage.session.run.return_value = (listing, '')
+
+        sizes = get_irods_folder_tree_file_sizes(istorage, 'abc/data/contents/foo')
+
+        self.assertEqual(sizes, {'a b.txt': 283, 'bar/c.csv': 5})
+        istorage.session.run.assert_called_once_with("ils", None, '-lr',
+                                                     'abc/data/contents/foo')
+
     # TODO: test_irods_path_is_directory(self):
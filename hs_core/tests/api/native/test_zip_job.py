@@ -0,0 +1,64 @@
+from datetime import timedelta
+
+from django.contrib.auth.models import Group
+from django.test import TestCase
+from django.utils.timezone import now
+from mock import patch
+
+from hs_core import hydroshare
+from hs_core.models import ZipJob
+from hs_core.tasks import zip_job_task
+from hs_core.testing import MockIRODSTestCaseMixin
+
+
+class TestZipJob(MockIRODSTestCaseMixin, TestCase):
+    def setUp(self):
+        super(TestZipJob, self).setUp()
+        Group.objects.get_or_create(name='Hydroshare Author')
+        self.user = hydroshare.create_account(
+            'user1@nowhere.com',
+            username='user1',
+            first_name='Creator_FirstName',
+            last_name='Creator_LastName',
+            superuser=False,
+            groups=[]
+        )
+        self.resource = hydroshare.create_resource('GenericResource', self.user,
+                                                   'Test zip job')
+
+    def tearDown(self):
+        self.resource.delete()
+        super(TestZipJob, self).tearDown()
+
+    def _submit(self):
+        with patch.object(zip_job_task, 'apply_async') as apply_async:
+            job = ZipJob.submit(self.resource, self.user, ZipJob.ZIP, 'data/contents/foo',
+                                'foo.zip')
+        return job, apply_async
+
+    def test_submit_returns_active_job(self):
+        job, _ = self._submit()
+        self.assertEqual(job.status, ZipJob.PENDING)
+        with patch('hs_core.models.AsyncResult') as async_result:
+            async_result.return_value.state = 'PENDING'
+            same_job, apply_async = self._submit()
+        self.assertEqual(same_job, job)
+        self.assertFalse(apply_async.called)
+
+    def test_submit_replaces_stale_job(self):
+        job, _ = self._submit()
+        job.start()
+        job.set_progress('zip', 10, 100)
+        # the worker running the job died long ago
+        ZipJob.objects.filter(pk=job.pk).update(updated=now() - timedelta(days=1))
+        new_job, apply_async = self._submit()
+        self.assertNotEqual(new_job, job)
+        apply_async.assert_called_once_with((new_job.pk,), task_id=new_job.task_id)
+        job.refresh_from_db()
+        self.assertEqual(job.status, ZipJob.FAILED)
+        self.assertEqual(job.message, ZipJob.STALE_MESSAGE)
+
+        # the status of a job includes its operation
+        job_status = new_job.to_dict()
+        self.assertEqual(job_status['operation'], ZipJob.ZIP)
+        self.assertEqual(job_status['status'], ZipJob.PENDING)
@@ -313,3 +313,43 @@ class TestResourceList(HSRESTTestCase):
                                                         'nonsensical': '90',
                                                         'params': '140'}, format='json')
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_resource_list_cursor(self):
+        pids = []
+        for n in range(3):
+            new_res = resource.create_resource('GenericResource',
+                                               self.user,
+                                               'My Test Resource {}'.format(n))
+            pids.append(new_res.short_id)
+            self.resources_to_delete.append(new_res.short_id)
+
+        # pages of 2 resources, ordered by last update
+        response = self.client.get('/hsapi/resource/', {'cursor': '', 'PAGE_SIZE': 2},
+                                   format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        content = json.loads(response.content)
+        self.assertEqual([r['resource_id'] for r in content['results']], pids[:2])
+        self.assertEqual(content['results'][0]['resource_title'], 'My Test Resource 0')
+        self.assertEqual(content['results'][0]['creator'], 'some_first_name some_last_name')
+        self.assertIsNotNone(content['next'])
+
+        response = self.client.get(content['next'], format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        content = json.loads(response.content)
+        self.assertEqual([r['resource_id'] for r in content['results']], pids[2:])
+        self.assertIsNone(content['next'])
+
+        # an invalid page size is ignored
+        response = self.client.get('/hsapi/resource/', {'cursor': '', 'PAGE_SIZE': 'x'},
+                                   format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        content = json.loads(response.content)
+        self.assertEqual([r['resource_id'] for r in content['results']], pids)
+        self.assertIsNone(content['next'])
+
+        response = self.client.get('/hsapi/resource/', {'cursor': 'bad'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+        response = self.client.get('/hsapi/resource/', {'cursor': '', 'start': 1},
+                                   format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
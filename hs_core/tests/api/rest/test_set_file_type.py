@@ -7,6 +7,7 @@ from rest_framework import status
 from hs_core.hydroshare import resource
 from hs_core.hydroshare.utils import resource_file_add_process
 from hs_core.views.utils import create_folder, move_or_rename_file_or_folder
+from hs_file_types.models import SetFileTypeJob
 
 from .base import HSRESTTestCase
 
@@ -50,6 +51,23 @@ class TestSetFileTypeEndPoint(HSRESTTestCase):
         response = self.client.post(set_file_type_url, {}, format='json')
         self.assertEqual(response.status_code, status.HTTP_201_CREATED)
 
+        # the file type was set by a job, whose status can be polled
+        job = SetFileTypeJob.objects.get(resource=self.resource, file_id=res_file.id)
+        job_status_url = "/hsapi/set-file-type-job/{task_id}/status/".format(
+            task_id=job.task_id)
+        response = self.client.get(job_status_url, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['task_id'], job.task_id)
+        self.assertEqual(response.data['status'], SetFileTypeJob.SUCCEEDED)
+        self.assertEqual(response.data['stage'], 'persist')
+        self.assertEqual(response.data['progress'], 100)
+        self.assertIn('spatial_coverage', response.data)
+
+        # polling an unknown job fails
+        response = self.client.get("/hsapi/set-file-type-job/no-such-task/status/",
+                                   format='json')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
     def test_set_file_type_success_2(self):
         # here we will set the tif file (the file being not in root dir)to GeoRaster file type
 
@@ -1,10 +1,13 @@
+import json
 import os
 import tempfile
 # import zipfile
 
+from mock import patch
 from rest_framework import status
 
 from hs_core.hydroshare import resource
+from hs_core.models import ZipJob
 
 from .base import HSRESTTestCase
 
@@ -84,6 +87,9 @@ class TestPublicZipEndpoint(HSRESTTestCase):
             "remove_original_after_zip": False
         }, format="json")
         self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(json.loads(response.content)['name'], 'test.zip')
+        self.assertEqual(ZipJob.objects.get(resource__short_id=self.pid).status,
+                         ZipJob.SUCCEEDED)
 
     def test_zip_folder_remove(self):
         zip_url = "/hsapi/resource/%s/functions/zip/" % self.pid
@@ -93,3 +99,37 @@ class TestPublicZipEndpoint(HSRESTTestCase):
             "remove_original_after_zip": True
         }, format="json")
         self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_zip_job_status(self):
+        zip_url = "/hsapi/resource/%s/functions/zip/" % self.pid
+        params = {
+            "input_coll_path": "data/contents/foo",
+            "output_zip_file_name": "test.zip",
+            "remove_original_after_zip": False
+        }
+        # a job that has not finished yet is returned with a REST url for polling its status
+        with patch('hs_core.tasks.zip_job_task.apply_async'):
+            response = self.client.post(zip_url, params, format="json")
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        response_json = json.loads(response.content)
+        job = ZipJob.objects.get(resource__short_id=self.pid)
+        self.assertEqual(response_json['task_id'], job.task_id)
+        status_url = "/hsapi/zip-job/{task_id}/status/".format(task_id=job.task_id)
+        self.assertEqual(response_json['status_url'], status_url)
+
+        response = self.client.get(status_url, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['task_id'], job.task_id)
+        self.assertEqual(response.data['status'], ZipJob.PENDING)
+        self.assertNotIn('result', response.data)
+
+        # once the job finished, its status includes its result
+        job.finish(ZipJob.SUCCEEDED, zip_size=10)
+        response = self.client.get(status_url, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['status'], ZipJob.SUCCEEDED)
+        self.assertEqual(response.data['result']['name'], 'test.zip')
+
+        # polling an unknown job fails
+        response = self.client.get("/hsapi/zip-job/no-such-task/status/", format='json')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
@@ -0,0 +1,47 @@
+import json
+from unittest import TestCase
+
+from hs_core.views.discovery_json_view import cluster_objects, iterate_results, json_array, \
+    map_object
+
+
+class TestDiscoveryJsonView(TestCase):
+    def test_map_object(self):
+        point = map_object({'short_id': 'abc', 'title': 'Point', 'author': 'Doe, John',
+                            'resource_type': 'Generic', 'coverage_types': ['point', 'period'],
+                            'coverage_east': -111.5, 'coverage_north': 41.7})
+        self.assertEqual(point, {'title': 'Point', 'resource_type': 'Generic',
+                                 'get_absolute_url': '/resource/abc/',
+                                 'first_author': 'Doe, John', 'coverage_type': 'point',
+                                 'east': -111.5, 'north': 41.7})
+
+        box = map_object({'short_id': 'def', 'title': 'Box', 'author': 'Doe, John',
+                          'author_description': '/user/1/', 'coverage_types': ['box'],
+                          'coverage_east': 1.0, 'coverage_north': 1.0,
+                          'coverage_northlimit': 2.0, 'coverage_eastlimit': 2.0,
+                          'coverage_southlimit': 0.0, 'coverage_westlimit': 0.0})
+        self.assertEqual(box['coverage_type'], 'box')
+        self.assertEqual(box['first_author_description'], '/user/1/')
+        self.assertEqual((box['northlimit'], box['eastlimit'], box['southlimit'],
+                          box['westlimit']), (2.0, 2.0, 0.0, 0.0))
+        self.assertNotIn('east', box)
+
+        # resources without spatial coverage are not on the map
+        self.assertIsNone(map_object({'short_id': 'ghi', 'coverage_types': ['period']}))
+
+    def test_cluster_objects(self):
+        results = [{'coverage_north': 1.0, 'coverage_east': 1.0},
+                   {'coverage_north': 3.0, 'coverage_east': 3.0},
+                   {'coverage_north': 11.0, 'coverage_east': 1.0},
+                   {'coverage_north': None, 'coverage_east': None}]
+        clusters = sorted(cluster_objects(results, 10.0), key=lambda c: c['north'])
+        self.assertEqual(clusters, [
+            {'coverage_type': 'cluster', 'count': 2, 'north': 2.0, 'east': 2.0},
+            {'coverage_type': 'cluster', 'count': 1, 'north': 11.0, 'east': 1.0}])
+
+    def test_iterate_results_and_json_array(self):
+        results = range(25)
+        self.assertEqual(list(iterate_results(results, chunk_size=10)), range(25))
+        self.assertEqual(json.loads(''.join(json_array([{'a': 1}, {'b': 2}]))),
+                         [{'a': 1}, {'b': 2}])
+        self.assertEqual(''.join(json_array([])), '[]')
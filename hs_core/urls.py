@@ -78,6 +78,9 @@ urlpatterns = patterns('',
         views.resource_folder_hierarchy.data_store_folder_zip),
     url(r'^_internal/data-store-folder-unzip/$',
         views.resource_folder_hierarchy.data_store_folder_unzip),
+    url(r'^_internal/data-store-zip-job/(?P<task_id>[A-z0-9\-]+)/status/$',
+        views.resource_folder_hierarchy.data_store_zip_job_status,
+        name='data_store_zip_job_status'),
     url(r'^_internal/data-store-create-folder/$',
         views.resource_folder_hierarchy.data_store_create_folder),
     url(r'^_internal/data-store-move-or-rename/$',
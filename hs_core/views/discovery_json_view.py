@@ -1,11 +1,95 @@
 import json
-from django.http import HttpResponse
+import math
+
+from django.http import HttpResponseBadRequest, StreamingHttpResponse
 from haystack.generic_views import FacetedSearchView
 from hs_core.discovery_form import DiscoveryForm
 
+# stored index fields (see BaseResourceIndex) from which map results are built
+MAP_FIELDS = ('short_id', 'title', 'author', 'author_description', 'resource_type',
+              'coverage_types', 'coverage_east', 'coverage_north', 'coverage_northlimit',
+              'coverage_eastlimit', 'coverage_southlimit', 'coverage_westlimit')
+# number of search results fetched from Solr at a time
+MAP_CHUNK_SIZE = 1000
+
+
+def iterate_results(sqs, chunk_size=MAP_CHUNK_SIZE):
+    """Yield the results of a search, fetching chunk_size results per Solr query."""
+    start = 0
+    while True:
+        results = list(sqs[start:start + chunk_size])
+        for result in results:
+            yield result
+        if len(results) < chunk_size:
+            return
+        start += chunk_size
+
+
+def map_object(result):
+    """Return the map object of a result of MAP_FIELDS, or None if it has no point or box."""
+    coverage_types = result.get('coverage_types') or []
+    json_obj = {
+        'title': result.get('title'),
+        'resource_type': result.get('resource_type'),
+        'get_absolute_url': '/resource/{}/'.format(result.get('short_id')),
+        'first_author': result.get('author'),
+    }
+    if result.get('author_description'):
+        json_obj['first_author_description'] = result['author_description']
+
+    if 'box' in coverage_types and result.get('coverage_northlimit') is not None:
+        json_obj['coverage_type'] = 'box'
+        for limit in ('northlimit', 'eastlimit', 'southlimit', 'westlimit'):
+            json_obj[limit] = result.get('coverage_' + limit)
+    elif 'point' in coverage_types and result.get('coverage_east') is not None:
+        json_obj['coverage_type'] = 'point'
+        json_obj['east'] = result['coverage_east']
+        json_obj['north'] = result['coverage_north']
+    else:
+        return None
+    return json_obj
+
+
+def cluster_objects(results, cell_size):
+    """
+    Aggregate results by cells of cell_size degrees of the center of their coverage.
+
+    Yields one object per cell, located at the mean center of its resources.
+    """
+    cells = {}
+    for result in results:
+        north, east = result.get('coverage_north'), result.get('coverage_east')
+        if north is None or east is None:
+            continue
+        cell = (int(math.floor(north / cell_size)), int(math.floor(east / cell_size)))
+        count, north_sum, east_sum = cells.get(cell, (0, 0.0, 0.0))
+        cells[cell] = (count + 1, north_sum + north, east_sum + east)
+    for count, north_sum, east_sum in cells.values():
+        yield {'coverage_type': 'cluster', 'count': count,
+               'north': north_sum / count, 'east': east_sum / count}
+
+
+def json_array(objects):
+    """Yield the JSON array of objects in chunks, one per object."""
+    yield '['
+    separator = ''
+    for obj in objects:
+        yield separator + json.dumps(obj)
+        separator = ','
+    yield ']'
+
+
 # View class for generating JSON data format from Haystack
 # returned JSON objects array is used for building the map view
 class DiscoveryJsonView(FacetedSearchView):
+    """
+    Map results of a discovery search, as a streamed JSON array.
+
+    Results are built from the fields stored in the Solr index, without loading resources
+    from the database. The search can be limited to a bounding box with the NElat, NElng,
+    SWlat and SWlng parameters of DiscoveryForm. With the cluster parameter, a cell size in
+    degrees, resources are aggregated into clusters for zoomed-out views.
+    """
     # set facet fields
     facet_fields = ['creators', 'subjects', 'resource_type', 'public', 'owners_names', 'discoverable', 'published', 'variable_names', 'sample_mediums', 'units_names']
     # declare form class to use in this view
@@ -13,50 +97,25 @@ class DiscoveryJsonView(FacetedSearchView):
 
     # overwrite Haystack generic_view.py form_valid() function to generate JSON response
     def form_valid(self, form):
-        # initialize an empty array for holding the result objects with coordinate values
-        coor_values = []
-        # get query set
+        # get query set; facets are not needed for the map
         self.queryset = form.search()
 
         # When we have a GET request with search query, build our JSON objects array
-        if len(self.request.GET):
-
-            # iterate all the search results
-            for result in self.get_queryset():
-                # initialize a null JSON object
-                json_obj = {}
-
-                # assign title and url values to the object
-                json_obj['title'] = result.object.metadata.title.value
-                json_obj['resource_type'] = result.object.verbose_name
-                json_obj['get_absolute_url'] = result.object.get_absolute_url()
-                json_obj['first_author'] = result.object.first_creator.name
-                if result.object.first_creator.description:
-                    json_obj['first_author_description'] = result.object.first_creator.description
-                # iterate all the coverage values
-                for coverage in result.object.metadata.coverages.all():
-
-                    # if coverage type is point, assign 'east' and 'north' coordinates to the object
-                    if coverage.type == 'point':
-                        json_obj['coverage_type'] = coverage.type
-                        json_obj['east'] = coverage.value['east']
-                        json_obj['north'] = coverage.value['north']
-                    # elif coverage type is box, assign 'northlimit', 'eastlimit', 'southlimit' and 'westlimit' coordinates to the object
-                    elif coverage.type == 'box':
-                        json_obj['coverage_type'] = coverage.type
-                        json_obj['northlimit'] = coverage.value['northlimit']
-                        json_obj['eastlimit'] = coverage.value['eastlimit']
-                        json_obj['southlimit'] = coverage.value['southlimit']
-                        json_obj['westlimit'] = coverage.value['westlimit']
-                    # else, skip
-                    else:
-                        continue
-                    # encode object to JSON format
-                    coor_obj = json.dumps(json_obj)
-                    # add JSON object the results array
-                    coor_values.append(coor_obj)
-
-            # encode the results results array to JSON array
-            the_data = json.dumps(coor_values)
-            # return JSON response
-            return HttpResponse(the_data, content_type='application/json')
+        if not len(self.request.GET):
+            objects = []
+        elif self.request.GET.get('cluster'):
+            try:
+                cell_size = float(self.request.GET['cluster'])
+            except ValueError:
+                cell_size = 0
+            if not cell_size > 0:
+                return HttpResponseBadRequest("cluster must be a positive cell size in degrees.")
+            results = iterate_results(self.queryset.values('coverage_north', 'coverage_east'))
+            objects = cluster_objects(results, cell_size)
+        else:
+            results = iterate_results(self.queryset.values(*MAP_FIELDS))
+            objects = (obj for obj in (map_object(result) for result in results)
+                       if obj is not None)
+
+        # return JSON response
+        return StreamingHttpResponse(json_array(objects), content_type='application/json')
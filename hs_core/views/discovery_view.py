@@ -2,6 +2,7 @@ from haystack.generic_views import FacetedSearchView
 from haystack.generic_views import FacetedSearchMixin
 from hs_core.discovery_form import DiscoveryForm
 from haystack.query import SearchQuerySet
+from hs_core.discovery_cache import get_facet_counts
 
 
 class DiscoveryView(FacetedSearchView):
@@ -11,21 +12,6 @@ class DiscoveryView(FacetedSearchView):
     def form_valid(self, form):
 
         self.queryset = form.search()
-        query_text = self.request.GET.get('q', '')
-
-        if not self.request.session.get('current_query', None):
-            if len(query_text):
-                self.request.session['query_changed'] = True
-                self.request.session['current_query'] = query_text
-            else:
-                self.request.session['query_changed'] = False
-
-        else:
-            if self.request.session['current_query'] != query_text:
-                self.request.session['query_changed'] = True
-                self.request.session['current_query'] = query_text
-            else:
-                self.request.session['query_changed'] = False
 
         context = self.get_context_data(**{
             self.form_name: form,
@@ -36,31 +22,11 @@ class DiscoveryView(FacetedSearchView):
 
     def get_context_data(self, **kwargs):
         context = super(FacetedSearchMixin, self).get_context_data(**kwargs)
-        
-        total_results = SearchQuerySet().all().count()
-        # check whether total number of results is set
-        if self.request.session.get('total_results', None):
-            # if total number of results is not updated
-            if total_results == self.request.session['total_results']:
-                # if query changed
-                if self.request.session.get('query_changed', True):
-                    context.update({'facets': self.queryset.facet_counts()})
-                    self.request.session['facets_items'] = self.queryset.facet_counts()
-                else: # if query not changed
-                    # if facets_items is already set
-                    if self.request.session.get('facets_items', None):
-                        context.update({'facets': self.request.session['facets_items']})
-                    else: # initial session variable
-                        context.update({'facets': self.queryset.facet_counts()})
-                        self.request.session['facets_items'] = self.queryset.facet_counts()
-            else: # if total number of results is updated
-                self.request.session['total_results'] = total_results
-                context.update({'facets': self.queryset.facet_counts()})
-                self.request.session['facets_items'] = self.queryset.facet_counts()
-        else: # if total number of results is not set yet
-            self.request.session['total_results'] = total_results
-            context.update({'facets': self.queryset.facet_counts()})
-            self.request.session['facets_items'] = self.queryset.facet_counts()
+
+        # facet counts are shared by all users running the same search
+        # and recomputed when the index changes
+        context.update({'facets': get_facet_counts(kwargs.get(self.form_name), self.queryset,
+                                                   self.facet_fields)})
 
         return context
 
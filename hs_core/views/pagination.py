@@ -1,7 +1,90 @@
+import base64
+from collections import OrderedDict
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
 from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
 
 class SmallDatumPagination(PageNumberPagination):
     """ Only use for requests whose resulting datum elements are small and where
         one wants to force all results to be on one page
     """
     page_size = None
+
+
+class ResourceListPagination(PageNumberPagination):
+    """ Page number pagination, or keyset pagination for requests with a cursor parameter
+
+        Keyset pagination orders resources by (updated, id) and starts each page after the
+        last resource of the previous page, so that every page costs the same however deep
+        it is, and resources are neither skipped nor repeated when the list changes between
+        pages. A request with an empty cursor returns the first page; each page links to
+        the next with the cursor of its last resource:
+
+            {"next": link to next page or null, "results": [...]}
+
+        The queryset must be a values_list query whose first two fields are updated and id.
+        Both kinds of pages hold PAGE_SIZE resources, or the number given in the PAGE_SIZE
+        query parameter, up to max_page_size.
+    """
+    page_size_query_param = 'PAGE_SIZE'
+    max_page_size = 1000
+    cursor_query_param = 'cursor'
+    ordering = ('updated', 'id')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.keyset = self.cursor_query_param in request.query_params
+        if not self.keyset:
+            return super(ResourceListPagination, self).paginate_queryset(queryset, request, view)
+
+        page_size = self.get_page_size(request) or api_settings.PAGE_SIZE or 100
+        queryset = queryset.order_by(*self.ordering)
+        position = self.decode_cursor(request.query_params[self.cursor_query_param])
+        if position is not None:
+            updated, pk = position
+            queryset = queryset.filter(Q(updated__gt=updated) | Q(updated=updated, id__gt=pk))
+
+        # one more row tells whether there is a next page
+        rows = list(queryset[:page_size + 1])
+        self.next_position = rows[page_size - 1][:2] if len(rows) > page_size else None
+        return rows[:page_size]
+
+    def get_paginated_response(self, data):
+        if not self.keyset:
+            return super(ResourceListPagination, self).get_paginated_response(data)
+        return Response(OrderedDict([
+            ('next', self.get_next_cursor_link()),
+            ('results', data)
+        ]))
+
+    def get_next_cursor_link(self):
+        if self.next_position is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param,
+                                   self.encode_cursor(self.next_position))
+
+    @staticmethod
+    def encode_cursor(position):
+        updated, pk = position
+        return base64.urlsafe_b64encode('{}|{}'.format(updated.isoformat(), pk))
+
+    @staticmethod
+    def decode_cursor(cursor):
+        """ Return the (updated, id) position of cursor, or None for the first page """
+        if not cursor:
+            return None
+        try:
+            updated, pk = base64.urlsafe_b64decode(str(cursor)).split('|', 1)
+            position = parse_datetime(updated), int(pk)
+        except (TypeError, ValueError):
+            raise NotFound('Invalid cursor')
+        if position[0] is None:
+            raise NotFound('Invalid cursor')
+        return position
@@ -2,24 +2,30 @@ import json
 import logging
 import os
 
+from django.core.urlresolvers import reverse
 from django.http import HttpResponse
 
 from rest_framework.exceptions import NotFound, status, PermissionDenied, \
     ValidationError as DRF_ValidationError
 from rest_framework.decorators import api_view
+from rest_framework.response import Response
 from django.core.exceptions import ValidationError
 
 from django_irods.icommands import SessionException
 
 from hs_core.hydroshare.utils import get_file_mime_type, \
     get_resource_file_url, resolve_request
-from hs_core.views.utils import authorize, ACTION_TO_AUTHORIZE, zip_folder, unzip_file, \
+from hs_core.views.utils import authorize, ACTION_TO_AUTHORIZE, \
     create_folder, remove_folder, move_or_rename_file_or_folder, move_to_folder, \
-    rename_file_or_folder, get_coverage_data_dict, irods_path_is_directory
-from hs_core.models import ResourceFile
+    rename_file_or_folder, get_coverage_data_dict, irods_path_is_directory, \
+    get_irods_folder_file_sizes
+from hs_core.models import ResourceFile, ZipJob
 
 logger = logging.getLogger(__name__)
 
+# maximum number of files returned per page when a folder listing is paginated
+DATA_STORE_PAGE_SIZE = 1000
+
 
 def data_store_structure(request):
     """
@@ -28,7 +34,10 @@ def data_store_structure(request):
     It is invoked by an AJAX call and returns json object that holds content for files
     and folders under the requested directory/collection/subcollection.
     The AJAX request must be a POST request with input data passed in for res_id and store_path
-    where store_path is the relative path under res_id collection/directory
+    where store_path is the relative path under res_id collection/directory.
+    Optional page (1-based) and page_size POST parameters paginate the files in very large
+    folders; when page is given the response also contains page, page_size, total_files
+    and has_more.
     """
     res_id = request.POST.get('res_id', None)
     if res_id is None:
@@ -60,38 +69,58 @@ def data_store_structure(request):
         return HttpResponse('Bad request - store_path cannot contain /../',
                             status=status.HTTP_400_BAD_REQUEST)
 
+    page = request.POST.get('page', None)
+    page_size = request.POST.get('page_size', DATA_STORE_PAGE_SIZE)
+    if page is not None:
+        try:
+            page = int(page)
+            page_size = min(int(page_size), DATA_STORE_PAGE_SIZE)
+        except ValueError:
+            return HttpResponse('Bad request - page and page_size must be integers',
+                                status=status.HTTP_400_BAD_REQUEST)
+        if page < 1 or page_size < 1:
+            return HttpResponse('Bad request - page and page_size must be positive',
+                                status=status.HTTP_400_BAD_REQUEST)
+
     istorage = resource.get_irods_storage()
     res_coll = os.path.join(resource.root_path, store_path)
     try:
         store = istorage.listdir(res_coll)
+        file_names = store[1]
+        total_files = len(file_names)
+        if page is not None:
+            file_names = sorted(file_names)[(page - 1) * page_size:page * page_size]
+
+        # one query for the Django records and one listing for the sizes of this folder
+        res_file_index = ResourceFile.get_storage_path_index(
+            resource, [os.path.join(res_coll, fname) for fname in file_names])
+        sizes = get_irods_folder_file_sizes(istorage, res_coll) if file_names else {}
+
         files = []
-        for fname in store[1]:  # files
+        for fname in file_names:
             name_with_full_path = os.path.join(res_coll, fname)
-            size = istorage.size(name_with_full_path)
+            f = res_file_index.get(name_with_full_path, None)
+            if f is None:  # file is not found in Django
+                logger.error("data_store_structure: filename {} in iRODs has no analogue in Django"
+                             .format(name_with_full_path))
+                continue
+
+            size = sizes.get(fname, None)
+            if size is None:
+                size = istorage.size(name_with_full_path)
             mtype = get_file_mime_type(fname)
             idx = mtype.find('/')
             if idx >= 0:
                 mtype = mtype[idx + 1:]
-            f_pk = ''
-            f_url = ''
             logical_file_type = ''
             logical_file_id = ''
-            for f in ResourceFile.objects.filter(object_id=resource.id):
-                if name_with_full_path == f.storage_path:
-                    f_pk = f.pk
-                    f_url = get_resource_file_url(f)
-                    if resource.resource_type == "CompositeResource":
-                        logical_file_type = f.logical_file_type_name
-                        logical_file_id = f.logical_file.id
-                    break
-
-            if f_pk:  # file is found in Django
-                files.append({'name': fname, 'size': size, 'type': mtype, 'pk': f_pk, 'url': f_url,
-                              'logical_type': logical_file_type,
-                              'logical_file_id': logical_file_id})
-            else:  # file is not found in Django
-                logger.error("data_store_structure: filename {} in iRODs has no analogue in Django"
-                             .format(name_with_full_path))
+            if resource.resource_type == "CompositeResource":
+                logical_file_type = f.logical_file_type_name
+                logical_file_id = f.logical_file.id
+            files.append({'name': fname, 'size': size, 'type': mtype, 'pk': f.pk,
+                          'url': get_resource_file_url(f),
+                          'logical_type': logical_file_type,
+                          'logical_file_id': logical_file_id})
 
     except SessionException as ex:
         return HttpResponse(ex.stderr, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -99,6 +128,11 @@ def data_store_structure(request):
     return_object = {'files': files,
                      'folders': store[0],
                      'can_be_public': resource.can_be_public_or_discoverable}
+    if page is not None:
+        return_object['page'] = page
+        return_object['page_size'] = page_size
+        return_object['total_files'] = total_files
+        return_object['has_more'] = page * page_size < total_files
 
     if resource.resource_type == "CompositeResource":
         spatial_coverage_dict = get_coverage_data_dict(resource)
@@ -111,17 +145,22 @@ def data_store_structure(request):
     )
 
 
-def data_store_folder_zip(request, res_id=None):
+def data_store_folder_zip(request, res_id=None, status_url_name='data_store_zip_job_status'):
     """
     Zip requested files and folders into a zip file in hydroshareZone or any federated zone
     used for HydroShare resource backend store. It is invoked by an AJAX call and returns
     json object that holds the created zip file name if it succeeds, and an empty string
-    if it fails. The AJAX request must be a POST request with input data passed in for
-    res_id, input_coll_path, output_zip_file_name, and remove_original_after_zip where
+    if it fails. The folder is zipped by a background job (see ZipJob): if the job has not
+    finished when the response is sent, the response is a 202 one holding the status_url
+    of the job instead (see data_store_zip_job_status). The AJAX request must be a POST
+    request with input data passed in for res_id, input_coll_path, output_zip_file_name,
+    and remove_original_after_zip where
     input_coll_path is the relative sub-collection path under res_id collection to be zipped,
     output_zip_file_name is the file name only with no path of the generated zip file name,
     and remove_original_after_zip has a value of "true" or "false" (default is "true") indicating
     whether original files will be deleted after zipping.
+    status_url_name is the name of the url pattern of the status_url returned (see
+    data_store_zip_job_status_public for requests from the REST api).
     """
     res_id = request.POST.get('res_id', res_id)
     if res_id is None:
@@ -173,27 +212,15 @@ def data_store_folder_zip(request, res_id=None):
         if remove_original == 'false':
             bool_remove_original = False
 
-    try:
-        output_zip_fname, size = \
-            zip_folder(user, res_id, input_coll_path, output_zip_fname, bool_remove_original)
-    except SessionException as ex:
-        return HttpResponse(ex.stderr, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-    except DRF_ValidationError as ex:
-        return HttpResponse(ex.detail, status=status.HTTP_400_BAD_REQUEST)
-
-    return_object = {'name': output_zip_fname,
-                     'size': size,
-                     'type': 'zip'}
-
-    return HttpResponse(
-        json.dumps(return_object),
-        content_type="application/json"
-    )
+    job = ZipJob.submit(resource, user, ZipJob.ZIP, input_coll_path,
+                        output_zip_fname=output_zip_fname, remove_original=bool_remove_original)
+    return _zip_job_response(job, status_url_name)
 
 
 @api_view(['POST'])
 def data_store_folder_zip_public(request, pk):
-    return data_store_folder_zip(request, res_id=pk)
+    return data_store_folder_zip(request, res_id=pk,
+                                 status_url_name='data_store_zip_job_status_public')
 
 
 def data_store_folder_unzip(request, **kwargs):
@@ -201,11 +228,13 @@ def data_store_folder_unzip(request, **kwargs):
     Unzip requested zip file while preserving folder structures in hydroshareZone or
     any federated zone used for HydroShare resource backend store. It is invoked by an AJAX call,
     and returns json object that holds the root path that contains the zipped content if it
-    succeeds, and an empty string if it fails. The AJAX request must be a POST request with
+    succeeds, and an empty string if it fails. The file is unzipped by a background job, as in
+    data_store_folder_zip. The AJAX request must be a POST request with
     input data passed in for res_id, zip_with_rel_path, and remove_original_zip where
     zip_with_rel_path is the zip file name with relative path under res_id collection to be
     unzipped, and remove_original_zip has a value of "true" or "false" (default is "true")
     indicating whether original zip file will be deleted after unzipping.
+    The status_url_name keyword argument is as in data_store_folder_zip.
     """
     res_id = request.POST.get('res_id', kwargs.get('res_id'))
     if res_id is None:
@@ -245,25 +274,80 @@ def data_store_folder_unzip(request, **kwargs):
         if remove_original == 'false':
             bool_remove_original = False
 
+    job = ZipJob.submit(resource, user, ZipJob.UNZIP, zip_with_rel_path,
+                        remove_original=bool_remove_original)
+    return _zip_job_response(job, kwargs.get('status_url_name', 'data_store_zip_job_status'))
+
+
+def _zip_job_response(job, status_url_name='data_store_zip_job_status'):
+    """
+    Return the response to a zip or unzip request, from the job run for it.
+
+    If the job has finished, the response is its outcome: the json object described in
+    data_store_folder_zip or data_store_folder_unzip, or its error message. Otherwise, it is a
+    202 response with the task_id of the job and the status_url from which its progress can
+    be polled, given by the url pattern named status_url_name.
+    """
+    if job.status == ZipJob.SUCCEEDED:
+        if job.operation == ZipJob.ZIP:
+            return_object = {'name': job.output_zip_fname,
+                             'size': job.zip_size,
+                             'type': 'zip'}
+        else:
+            # this unzipped_path can be used for POST request input to data_store_structure()
+            # to list the folder structure after unzipping
+            return_object = {'unzipped_path': os.path.dirname(job.path)}
+        return HttpResponse(json.dumps(return_object), content_type="application/json")
+
+    if job.status == ZipJob.FAILED:
+        if job.server_error:
+            return HttpResponse(job.message, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        return HttpResponse(job.message, status=status.HTTP_400_BAD_REQUEST)
+
+    return_object = job.to_dict()
+    return_object['status_url'] = reverse(status_url_name, kwargs={'task_id': job.task_id})
+    return HttpResponse(json.dumps(return_object), content_type="application/json",
+                        status=status.HTTP_202_ACCEPTED)
+
+
+def data_store_zip_job_status(request, task_id):
+    """
+    Get the status, stage and progress of a zip or unzip job, as returned by
+    data_store_folder_zip or data_store_folder_unzip. The json object returned includes
+    the outcome of finished jobs: 'result' holds the json object of a successful zip or
+    unzip request.
+    """
+    job = ZipJob.objects.filter(task_id=task_id).select_related('resource').first()
+    if job is None:
+        return HttpResponse('Bad request - job not found', status=status.HTTP_404_NOT_FOUND)
     try:
-        unzip_file(user, res_id, zip_with_rel_path, bool_remove_original)
-    except SessionException as ex:
-        specific_msg = "iRODS error resulted in unzip being cancelled. This may be due to " \
-                       "protection from overwriting existing files. Unzip in a different " \
-                       "location (e.g., folder) or move or rename the file being overwritten. " \
-                       "iRODS error follows: "
-        return HttpResponse(specific_msg + ex.stderr, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-    except DRF_ValidationError as ex:
-        return HttpResponse(ex.detail, status=status.HTTP_400_BAD_REQUEST)
+        authorize(request, job.resource.short_id,
+                  needed_permission=ACTION_TO_AUTHORIZE.VIEW_RESOURCE)
+    except NotFound:
+        return HttpResponse('Bad request - resource not found', status=status.HTTP_400_BAD_REQUEST)
+    except PermissionDenied:
+        return HttpResponse('Permission denied', status=status.HTTP_401_UNAUTHORIZED)
 
-    # this unzipped_path can be used for POST request input to data_store_structure()
-    # to list the folder structure after unzipping
-    return_object = {'unzipped_path': os.path.dirname(zip_with_rel_path)}
+    return_object = job.to_dict()
+    if job.status == ZipJob.SUCCEEDED:
+        return_object['result'] = json.loads(_zip_job_response(job).content)
+    return HttpResponse(json.dumps(return_object), content_type="application/json")
 
-    return HttpResponse(
-        json.dumps(return_object),
-        content_type="application/json"
-    )
+
+@api_view(['GET'])
+def data_store_zip_job_status_public(request, task_id):
+    """
+    Public version of data_store_zip_job_status, for polling the status_url returned by
+    data_store_folder_zip_public and data_store_folder_unzip_public
+
+    :param request: an instance of HttpRequest object
+    :param task_id: task id of the job
+    :return: the status of the job, as returned by data_store_zip_job_status
+    """
+    response = data_store_zip_job_status(request, task_id)
+    if response.status_code != status.HTTP_200_OK:
+        return response
+    return Response(data=json.loads(response.content), status=response.status_code)
 
 
 @api_view(['POST'])
@@ -278,7 +362,8 @@ def data_store_folder_unzip_public(request, pk, pathname):
     """
 
     sys_pathname = 'data/contents/%s' % pathname
-    return data_store_folder_unzip(request, res_id=pk, zip_with_rel_path=sys_pathname)
+    return data_store_folder_unzip(request, res_id=pk, zip_with_rel_path=sys_pathname,
+                                   status_url_name='data_store_zip_job_status_public')
 
 
 def data_store_create_folder(request):
@@ -7,6 +7,7 @@ import logging
 import json
 
 from django.core.urlresolvers import reverse
+from django.conf import settings
 from django.core.exceptions import ObjectDoesNotExist, SuspiciousFileOperation
 from django.http import HttpResponseRedirect
 from django.shortcuts import redirect
@@ -20,7 +21,9 @@ from rest_framework.request import Request
 from rest_framework.exceptions import ValidationError, NotAuthenticated, PermissionDenied, NotFound
 
 from hs_core import hydroshare
-from hs_core.models import AbstractResource
+from django_irods.storage import IrodsStorage
+
+from hs_core.models import AbstractResource, FedStorage, Title, Creator, Coverage
 from hs_core.hydroshare.utils import get_resource_by_shortkey, get_resource_types
 from hs_core.views import utils as view_utils
 from hs_core.views.utils import ACTION_TO_AUTHORIZE
@@ -64,6 +67,137 @@ class ResourceToListItemMixin(object):
         return resource_list_item
 
 
+# fields of the resource rows that resource lists are built from; ResourceListPagination
+# orders rows by the first two
+RESOURCE_LIST_FIELDS = ('updated', 'id', 'short_id', 'resource_type', 'created', 'slug',
+                        'content_type_id', 'object_id', 'resource_federation_path',
+                        'raccess__public', 'raccess__discoverable', 'raccess__shareable',
+                        'raccess__immutable', 'raccess__published')
+
+# resource id in the urls reversed for url templates; matches all resource url patterns
+_URL_TEMPLATE_ID = '0' * 32
+
+
+def _url_template(name, **kwargs):
+    """ Return the url of name as a format string taking the resource id """
+    if kwargs:
+        kwargs = {key: value.format(_URL_TEMPLATE_ID) for key, value in kwargs.items()}
+        url = reverse(name, kwargs=kwargs)
+    else:
+        url = reverse(name, args=[_URL_TEMPLATE_ID])
+    return url.replace(_URL_TEMPLATE_ID, '{}')
+
+
+def _load_list_metadata(rows):
+    """ Return dicts of (content type id, object id) of resource metadata -> title,
+    first creator name and list of coverages, for the metadata of resource list rows
+    """
+    content_type_ids = set(row[6] for row in rows)
+    object_ids = set(row[7] for row in rows)
+    titles = {}
+    creators = {}
+    coverages = {}
+    if not object_ids:
+        return titles, creators, coverages
+
+    for content_type_id, object_id, value in Title.objects\
+            .filter(content_type_id__in=content_type_ids, object_id__in=object_ids)\
+            .order_by('id').values_list('content_type_id', 'object_id', 'value'):
+        titles.setdefault((content_type_id, object_id), value)
+    for content_type_id, object_id, name in Creator.objects\
+            .filter(content_type_id__in=content_type_ids, object_id__in=object_ids, order=1)\
+            .order_by('id').values_list('content_type_id', 'object_id', 'name'):
+        creators.setdefault((content_type_id, object_id), name)
+    for content_type_id, object_id, coverage_type, value in Coverage.objects\
+            .filter(content_type_id__in=content_type_ids, object_id__in=object_ids)\
+            .order_by('id').values_list('content_type_id', 'object_id', 'type', '_value'):
+        coverages.setdefault((content_type_id, object_id), []).append(
+            {"type": coverage_type, "value": json.loads(value)})
+    return titles, creators, coverages
+
+
+class ResourceListMixin(ResourceToListItemMixin):
+    """ List resources from rows of RESOURCE_LIST_FIELDS
+
+    Each page of the list is read with one query for the resources, and one per metadata
+    element for all resources of the page; site url and url patterns are resolved once.
+    """
+    pagination_class = pagination.ResourceListPagination
+
+    def get(self, request):
+        return self.list(request)
+
+    def list(self, request, *args, **kwargs):
+        rows = self.paginate_queryset(self.get_queryset())
+        serializer = self.get_serializer(self.resourceRowsToResourceListItems(rows), many=True)
+        return self.get_paginated_response(serializer.data)
+
+    # needed for list of resources
+    def get_queryset(self):
+        resource_list_request_validator = serializers.ResourceListRequestValidator(
+            data=self.request.query_params)
+        if not resource_list_request_validator.is_valid():
+            raise ValidationError(detail=resource_list_request_validator.errors)
+
+        filter_parms = resource_list_request_validator.validated_data
+        filter_parms['user'] = (self.request.user if self.request.user.is_authenticated() else None)
+        if len(filter_parms['type']) == 0:
+            filter_parms['type'] = None
+        else:
+            filter_parms['type'] = list(filter_parms['type'])
+
+        filter_parms['public'] = not self.request.user.is_authenticated()
+
+        if self.paginator.cursor_query_param in self.request.query_params and \
+                (filter_parms['start'] is not None or filter_parms['count'] is not None):
+            raise ValidationError(detail={'cursor': ['cursor cannot be combined with start '
+                                                     'or count.']})
+
+        return hydroshare.get_resource_list(**filter_parms).values_list(*RESOURCE_LIST_FIELDS)
+
+    def get_serializer_class(self):
+        return serializers.ResourceListItemSerializer
+
+    def resourceRowsToResourceListItems(self, rows):
+        site_url = hydroshare.utils.current_site_url()
+        science_metadata_url = site_url + _url_template('get_update_science_metadata')
+        resource_map_url = site_url + _url_template('get_resource_map')
+        # resources are mezzanine pages; see Page.get_absolute_url
+        resource_url = site_url + _url_template('page', slug='resource/{}')
+        bag_path = "{path}/{{}}.{postfix}".format(
+            path=getattr(settings, 'IRODS_BAGIT_PATH', 'bags'),
+            postfix=getattr(settings, 'IRODS_BAGIT_POSTFIX', 'zip'))
+        storages = {}
+        titles, creators, coverages = _load_list_metadata(rows)
+
+        items = []
+        for (updated, _, short_id, resource_type, created, slug, content_type_id, object_id,
+             federation_path, public, discoverable, shareable, immutable, published) in rows:
+            federated = bool(federation_path)
+            if federated not in storages:
+                storages[federated] = FedStorage() if federated else IrodsStorage()
+            metadata_key = (content_type_id, object_id)
+            items.append(serializers.ResourceListItem(
+                resource_type=resource_type,
+                resource_id=short_id,
+                resource_title=titles.get(metadata_key),
+                creator=creators.get(metadata_key),
+                public=public,
+                discoverable=discoverable,
+                shareable=shareable,
+                immutable=immutable,
+                published=published,
+                date_created=created,
+                date_last_updated=updated,
+                bag_url=site_url + storages[federated].url(bag_path.format(short_id)),
+                coverages=coverages.get(metadata_key, []),
+                science_metadata_url=science_metadata_url.format(short_id),
+                resource_map_url=resource_map_url.format(short_id),
+                resource_url=resource_url.format(short_id) if slug == 'resource/' + short_id
+                else site_url + reverse('page', kwargs={'slug': slug})))
+        return items
+
+
 class ResourceFileToListItemMixin(object):
     def resourceFileToListItem(self, f):
         site_url = hydroshare.utils.current_site_url()
@@ -134,7 +268,7 @@ class ResourceTypes(generics.ListAPIView):
         return serializers.ResourceTypesSerializer
 
 
-class ResourceList(ResourceToListItemMixin, generics.ListAPIView):
+class ResourceList(ResourceListMixin, generics.ListAPIView):
     """
     Get a list of resources based on the following filter query parameters
     DEPRECATED: See GET /resource/ in CreateResource
@@ -192,37 +326,6 @@ class ResourceList(ResourceToListItemMixin, generics.ListAPIView):
         }
 
     """
-    pagination_class = PageNumberPagination
-
-    def get(self, request):
-        return self.list(request)
-
-    # needed for list of resources
-    def get_queryset(self):
-        resource_list_request_validator = serializers.ResourceListRequestValidator(
-            data=self.request.query_params)
-        if not resource_list_request_validator.is_valid():
-            raise ValidationError(detail=resource_list_request_validator.errors)
-
-        filter_parms = resource_list_request_validator.validated_data
-        filter_parms['user'] = (self.request.user if self.request.user.is_authenticated() else None)
-        if len(filter_parms['type']) == 0:
-            filter_parms['type'] = None
-        else:
-            filter_parms['type'] = list(filter_parms['type'])
-
-        filter_parms['public'] = not self.request.user.is_authenticated()
-
-        filtered_res_list = []
-
-        for r in hydroshare.get_resource_list(**filter_parms):
-            resource_list_item = self.resourceToResourceListItem(r)
-            filtered_res_list.append(resource_list_item)
-
-        return filtered_res_list
-
-    def get_serializer_class(self):
-        return serializers.ResourceListItemSerializer
 
 
 class CheckTaskStatus(generics.RetrieveAPIView):
@@ -298,7 +401,7 @@ class ResourceReadUpdateDelete(ResourceToListItemMixin, generics.RetrieveUpdateD
         return serializers.ResourceListItemSerializer
 
 
-class ResourceListCreate(ResourceToListItemMixin, generics.ListCreateAPIView):
+class ResourceListCreate(ResourceListMixin, generics.ListCreateAPIView):
     """
     Create a new resource or list existing resources
 
@@ -520,39 +623,6 @@ class ResourceListCreate(ResourceToListItemMixin, generics.ListCreateAPIView):
 
         return Response(data=response_data,  status=status.HTTP_201_CREATED)
 
-    pagination_class = PageNumberPagination
-
-    def get(self, request):
-        return self.list(request)
-
-    # needed for list of resources
-    # copied from ResourceList
-    def get_queryset(self):
-        resource_list_request_validator = serializers.ResourceListRequestValidator(
-            data=self.request.query_params)
-        if not resource_list_request_validator.is_valid():
-            raise ValidationError(detail=resource_list_request_validator.errors)
-
-        filter_parms = resource_list_request_validator.validated_data
-        filter_parms['user'] = (self.request.user if self.request.user.is_authenticated() else None)
-        if len(filter_parms['type']) == 0:
-            filter_parms['type'] = None
-        else:
-            filter_parms['type'] = list(filter_parms['type'])
-
-        filter_parms['public'] = not self.request.user.is_authenticated()
-        filtered_res_list = []
-
-        for r in hydroshare.get_resource_list(**filter_parms):
-            resource_list_item = self.resourceToResourceListItem(r)
-            filtered_res_list.append(resource_list_item)
-
-        return filtered_res_list
-
-    # covers serialization of output from GET request
-    def get_serializer_class(self):
-        return serializers.ResourceListItemSerializer
-
 
 class SystemMetadataRetrieve(ResourceToListItemMixin, APIView):
     """
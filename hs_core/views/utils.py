@@ -2,8 +2,9 @@ from __future__ import absolute_import
 
 import json
 import os
+import re
 import string
-from collections import namedtuple
+from collections import namedtuple, defaultdict
 import paramiko
 import logging
 from dateutil import parser
@@ -23,14 +24,16 @@ from mezzanine.utils.email import subject_template, default_token_generator, sen
 from mezzanine.utils.urls import next_url
 from mezzanine.conf import settings
 
-from hs_core import hydroshare
+from hs_core import file_cache, hydroshare
 from hs_core.hydroshare import check_resource_type, delete_resource_file
 from hs_core.models import AbstractMetaDataElement, BaseResource, GenericResource, Relation, \
     ResourceFile, get_user
 from hs_core.signals import pre_metadata_element_create, post_delete_file_from_resource
 from hs_core.hydroshare.utils import get_file_mime_type
 from django_irods.storage import IrodsStorage
-from hs_access_control.models import PrivilegeCodes
+from hs_access_control.models import PrivilegeCodes, UserResourceEffectivePrivilege
+from hs_access_control.request_cache import get_cached_resource, get_resource_permissions
+from hs_labels.models import FlagCodes, UserResourceFlags, UserResourceLabels
 
 ActionToAuthorize = namedtuple('ActionToAuthorize',
                                'VIEW_METADATA, '
@@ -43,6 +46,11 @@ ActionToAuthorize = namedtuple('ActionToAuthorize',
                                'EDIT_RESOURCE_ACCESS')
 ACTION_TO_AUTHORIZE = ActionToAuthorize(0, 1, 2, 3, 4, 5, 6, 7)
 
+# number of ResourceFile records created per query when linking a folder to Django
+LINK_BATCH_SIZE = 1000
+
+logger = logging.getLogger(__name__)
+
 
 def json_or_jsonp(r, i, code=200):
     if not isinstance(i, basestring):
@@ -187,37 +195,43 @@ def authorize(request, res_id, needed_permission=ACTION_TO_AUTHORIZE.VIEW_RESOUR
        needed_permission=ACTION_TO_AUTHORIZE.CREATE_RESOURCE_VERSION)
 
     Note: resource 'shareable' status has no effect on authorization
+
+    The resource and the user's privilege over it are memoized for the rest of the request
+    (see hs_access_control.request_cache), so that repeated checks do not query again.
     """
     authorized = False
     user = get_user(request)
 
     try:
-        res = hydroshare.utils.get_resource_by_shortkey(res_id, or_404=False)
+        res = get_cached_resource(request, res_id,
+                                  lambda short_id: hydroshare.utils.get_resource_by_shortkey(
+                                      short_id, or_404=False))
     except ObjectDoesNotExist:
         raise NotFound(detail="No resource was found for resource id:%s" % res_id)
 
+    permissions = get_resource_permissions(request, user, res)
     if needed_permission == ACTION_TO_AUTHORIZE.VIEW_METADATA:
-        if res.raccess.discoverable or res.raccess.public:
+        if permissions.discoverable or permissions.public:
             authorized = True
-        elif user.is_authenticated() and user.is_active:
-            authorized = user.uaccess.can_view_resource(res)
-    elif user.is_authenticated() and user.is_active:
+        elif permissions.active:
+            authorized = permissions.can_view
+    elif permissions.active:
         if needed_permission == ACTION_TO_AUTHORIZE.VIEW_RESOURCE:
-            authorized = user.uaccess.can_view_resource(res)
+            authorized = permissions.can_view
         elif needed_permission == ACTION_TO_AUTHORIZE.EDIT_RESOURCE:
-            authorized = user.uaccess.can_change_resource(res)
+            authorized = permissions.can_change
         elif needed_permission == ACTION_TO_AUTHORIZE.DELETE_RESOURCE:
-            authorized = user.uaccess.can_delete_resource(res)
+            authorized = permissions.can_delete
         elif needed_permission == ACTION_TO_AUTHORIZE.SET_RESOURCE_FLAG:
-            authorized = user.uaccess.can_change_resource_flags(res)
+            authorized = permissions.can_change_flags
         elif needed_permission == ACTION_TO_AUTHORIZE.CREATE_RESOURCE_VERSION:
-            authorized = user.uaccess.owns_resource(res)
+            authorized = permissions.owns
         elif needed_permission == ACTION_TO_AUTHORIZE.VIEW_RESOURCE_ACCESS:
-            authorized = user.uaccess.can_view_resource(res)
+            authorized = permissions.can_view
         elif needed_permission == ACTION_TO_AUTHORIZE.EDIT_RESOURCE_ACCESS:
             authorized = user.uaccess.can_share_resource(res, 2)
     elif needed_permission == ACTION_TO_AUTHORIZE.VIEW_RESOURCE:
-        authorized = res.raccess.public
+        authorized = permissions.public
 
     if raises_exception and not authorized:
         raise PermissionDenied()
@@ -346,56 +360,98 @@ def create_form(formclass, request):
     return params
 
 
+def load_list_display_data(resources):
+    """
+    Attach to each of resources the data shown for it in resource lists, with a number of
+    queries that does not depend on the number of resources:
+
+    * list_metadata: the metadata object, with title, creators and subjects prefetched
+    * list_title: the title, or None
+    * list_first_creator: the first creator, or None
+    * list_type: the verbose name of the resource type
+    """
+    object_ids = defaultdict(set)
+    for res in resources:
+        if res.content_type_id is not None and res.object_id is not None:
+            object_ids[res.content_type_id].add(res.object_id)
+    metadata = {}
+    for content_type_id, ids in object_ids.items():
+        model = ContentType.objects.get_for_id(content_type_id).model_class()
+        for md in model.objects.filter(id__in=ids)\
+                .prefetch_related('_title', 'creators', 'subjects'):
+            metadata[(content_type_id, md.id)] = md
+
+    verbose_names = {model.__name__: model._meta.verbose_name
+                     for model in hydroshare.get_resource_types()}
+    for res in resources:
+        md = metadata.get((res.content_type_id, res.object_id))
+        res.list_metadata = md
+        # like metadata.title, from the prefetched titles; .first() would query again
+        titles = [] if md is None else list(md._title.all())
+        res.list_title = min(titles, key=lambda t: t.pk) if titles else None
+        # like first_creator; with several creators of order 1, the lowest id wins
+        first_creators = [] if md is None else \
+            [creator for creator in md.creators.all() if creator.order == 1]
+        res.list_first_creator = min(first_creators, key=lambda c: c.pk) \
+            if first_creators else None
+        res.list_type = verbose_names.get(res.resource_type, res.resource_type)
+    return resources
+
+
 def get_my_resources_list(request):
+    """
+    Return the resources of the My Resources page of the requesting user.
+
+    These are the resources the user has access to (from the effective privileges of
+    UserResourceEffectivePrivilege, excluding obsoleted resources), followed by resources the
+    user added to My Resources from the Discover page. Each resource is marked as owned,
+    editable, or viewable, and has is_favorite and labels set. Resources are merged with
+    sets and dicts keyed by resource id, with a constant number of queries.
+    """
     user = request.user
-    # get a list of resources with effective OWNER privilege
-    owned_resources = user.uaccess.get_resources_with_explicit_access(PrivilegeCodes.OWNER)
-    # remove obsoleted resources from the owned_resources
-    owned_resources = owned_resources.exclude(object_id__in=Relation.objects.filter(
-        type='isReplacedBy').values('object_id'))
-
-    # get a list of resources with effective CHANGE privilege (should include resources that the
-    # user has access to via group
-    editable_resources = user.uaccess.get_resources_with_explicit_access(PrivilegeCodes.CHANGE,
-                                                                         via_group=True)
-    # remove obsoleted resources from the editable_resources
-    editable_resources = editable_resources.exclude(object_id__in=Relation.objects.filter(
-        type='isReplacedBy').values('object_id'))
-
-    # get a list of resources with effective VIEW privilege (should include resources that the
-    # user has access via group
-    viewable_resources = user.uaccess.get_resources_with_explicit_access(PrivilegeCodes.VIEW,
-                                                                         via_group=True)
-    # remove obsoleted resources from the viewable_resources
-    viewable_resources = viewable_resources.exclude(object_id__in=Relation.objects.filter(
-        type='isReplacedBy').values('object_id'))
-
-    owned_resources = list(owned_resources)
-    editable_resources = list(editable_resources)
-    viewable_resources = list(viewable_resources)
-    favorite_resources = list(user.ulabels.favorited_resources)
-    labeled_resources = list(user.ulabels.labeled_resources)
-    discovered_resources = list(user.ulabels.my_resources)
-
-    for res in owned_resources:
-        res.owned = True
-
-    for res in editable_resources:
-        res.editable = True
-
-    for res in viewable_resources:
-        res.viewable = True
-
-    for res in (owned_resources + editable_resources + viewable_resources + discovered_resources):
-        res.is_favorite = False
-        if res in favorite_resources:
-            res.is_favorite = True
-        if res in labeled_resources:
-            res.labels = res.rlabels.get_labels(user)
-
-    resource_collection = (owned_resources + editable_resources + viewable_resources +
-                           discovered_resources)
-    return resource_collection
+    obsoleted = Relation.objects.filter(type='isReplacedBy').values('object_id')
+
+    # one query for the resources the user has access to, with their effective privilege
+    owned_resources = []
+    editable_resources = []
+    viewable_resources = []
+    for effective in UserResourceEffectivePrivilege.objects\
+            .filter(user=user)\
+            .exclude(resource__object_id__in=obsoleted)\
+            .select_related('resource', 'resource__raccess'):
+        res, privilege = effective.resource, effective.privilege
+        if privilege == PrivilegeCodes.OWNER:
+            res.owned = True
+            owned_resources.append(res)
+        elif privilege == PrivilegeCodes.CHANGE and not res.raccess.immutable:
+            res.editable = True
+            editable_resources.append(res)
+        else:
+            # CHANGE over an immutable resource is VIEW
+            res.viewable = True
+            viewable_resources.append(res)
+
+    resource_collection = owned_resources + editable_resources + viewable_resources
+    accessible_ids = set(res.id for res in resource_collection)
+    discovered_resources = [discovered for discovered
+                            in user.ulabels.my_resources.select_related('raccess')
+                            if discovered.id not in accessible_ids]
+    resource_collection += discovered_resources
+
+    favorite_ids = set(UserResourceFlags.objects
+                       .filter(user=user, kind=FlagCodes.FAVORITE)
+                       .values_list('resource_id', flat=True))
+    labels = defaultdict(list)
+    for resource_id, label in UserResourceLabels.objects\
+            .filter(user=user).order_by('label').values_list('resource_id', 'label'):
+        labels[resource_id].append(label)
+
+    for res in resource_collection:
+        res.is_favorite = res.id in favorite_ids
+        if res.id in labels:
+            res.labels = labels[res.id]
+
+    return load_list_display_data(resource_collection)
 
 
 def send_action_to_take_email(request, user, action_type, **kwargs):
@@ -486,35 +542,75 @@ def link_irods_file_to_django(resource, filepath):
             resource.set_default_logical_file()
 
 
-def link_irods_folder_to_django(resource, istorage, foldername, exclude=()):
+def no_progress(stage, done=0, total=0):
+    """ default progress callback of zip_folder, unzip_file and link_irods_folder_to_django
+
+    :param stage: name of the stage reached
+    :param done: number of items of the stage processed so far
+    :param total: number of items of the stage, or 0 if not known
+    """
+    pass
+
+
+def link_irods_folder_to_django(resource, istorage, foldername, exclude=(),
+                                progress=no_progress):
     """
-    Recursively Link irods folder and all files and sub-folders inside the folder to Django
-    Database after iRODS file and folder operations to get Django and iRODS in sync
+    Link all files inside an irods folder and its sub-folders to Django Database after
+    iRODS file and folder operations to get Django and iRODS in sync
+
+    The folder is listed once (see get_irods_folder_tree_file_sizes), and the files that are
+    not linked yet are created with bulk_create in batches of LINK_BATCH_SIZE, so that folders
+    with many files (e.g., unzipped archives) are linked in a bounded number of queries.
 
     :param resource: the BaseResource object representing a HydroShare resource
     :param istorage: REDUNDANT: IrodsStorage object
     :param foldername: the folder name, as a fully qualified path
-    :param exclude: UNUSED: a tuple that includes file names to be excluded from
-        linking under the folder;
-    :return:
+    :param exclude: a tuple that includes file names to be excluded from linking under the
+        folder and its sub-folders
+    :param progress: called with ('link', files linked, files to link) after each batch
+    :return: number of files linked
     """
     if __debug__:
         assert(isinstance(resource, BaseResource))
     if istorage is None:
         istorage = resource.get_irods_storage()
 
-    if foldername:
-        store = istorage.listdir(foldername)
-        # add files into Django resource model
-        for file in store[1]:
-            if file not in exclude:
-                file_path = os.path.join(foldername, file)
-                # This assumes that file_path is a full path
-                link_irods_file_to_django(resource, file_path)
-        # recursively add sub-folders into Django resource model
-        for folder in store[0]:
-            link_irods_folder_to_django(resource,
-                                        istorage, os.path.join(foldername, folder), exclude)
+    if not foldername:
+        return 0
+
+    foldername = foldername.rstrip('/')
+    # the FileField holding the storage paths of the files of this resource
+    field = 'fed_resource_file' if resource.is_federated else 'resource_file'
+    linked_paths = set(ResourceFile.list_folder(resource, foldername + '/')
+                       .values_list(field, flat=True))
+    new_files = []
+    sizes = get_irods_folder_tree_file_sizes(istorage, foldername)
+    for rel_path in sorted(sizes):
+        if os.path.basename(rel_path) in exclude:
+            continue
+        file_path = os.path.join(foldername, rel_path)
+        if file_path in linked_paths:
+            continue
+        folder, base = ResourceFile.resource_path_is_acceptable(resource, file_path,
+                                                                test_exists=False)
+        # the file exists in iRODS already, as with ResourceFile.create(resource, base, folder)
+        new_files.append(ResourceFile(content_object=resource, file_folder=folder,
+                                      _size=sizes[rel_path], **{field: file_path}))
+
+    total = len(new_files)
+    for start in range(0, total, LINK_BATCH_SIZE):
+        ResourceFile.objects.bulk_create(new_files[start:start + LINK_BATCH_SIZE])
+        progress('link', min(start + LINK_BATCH_SIZE, total), total)
+
+    if new_files:
+        format_values = set(mime.value for mime in resource.metadata.formats.all())
+        for file_format_type in set(get_file_mime_type(f.storage_path) for f in new_files):
+            if file_format_type not in format_values:
+                resource.metadata.create_element('format', value=file_format_type)
+        # this should assign a logical file object to the new files
+        # if this resource supports logical file
+        resource.set_default_logical_file()
+    return total
 
 
 def rename_irods_file_or_folder_in_django(resource, src_name, tgt_name):
@@ -554,37 +650,56 @@ def rename_irods_file_or_folder_in_django(resource, src_name, tgt_name):
 def remove_irods_folder_in_django(resource, istorage, folderpath, user):
     """
     Remove all files inside a folder in Django DB after the folder is removed from iRODS
+
+    The files are deleted with one set-based delete rather than one by one; their format
+    metadata is updated once per file extension.
     :param resource: the BaseResource object representing a HydroShare resource
     :param istorage: IrodsStorage object (redundant; equal to resource.get_irods_storage())
     :param foldername: the folder name that has been removed from iRODS
     :user  user who initiated the folder delete operation
-    :return:
+    :return: number of files removed
     """
     # TODO: Istorage parameter is redundant; derived from resource; can be deleted.
-    if resource and istorage and folderpath:
-        if not folderpath.endswith('/'):
-            folderpath += '/'
-        res_file_set = ResourceFile.objects.filter(object_id=resource.id)
-
-        # then delete resource file objects
-        for f in res_file_set:
-            filename = f.storage_path
-            if filename.startswith(folderpath):
-                # TODO: integrate deletion of logical file with ResourceFile.delete
-                # delete the logical file object if the resource file has one
-                if f.has_logical_file:
-                    # this should delete the logical file and any associated metadata
-                    # but does not delete the resource files that are part of the logical file
-                    f.logical_file.logical_delete(user, delete_res_files=False)
-                f.delete()
-                hydroshare.delete_format_metadata_after_delete_file(resource, filename)
-
-        # send the post-delete signal
-        post_delete_file_from_resource.send(sender=resource.__class__, resource=resource)
+    if not (resource and istorage and folderpath):
+        return 0
+
+    if not folderpath.endswith('/'):
+        folderpath += '/'
+    res_file_set = ResourceFile.list_folder(resource, folderpath)
+
+    storage_paths = []
+    logical_files = {}
+    for f in res_file_set.prefetch_related('logical_file_content_object'):
+        # avoid re-fetching the resource via the generic foreign key for every file
+        f.content_object = resource
+        storage_paths.append(f.storage_path)
+        if f.has_logical_file:
+            logical_files[(f.logical_file_content_type_id, f.logical_file_object_id)] = \
+                f.logical_file
+
+    # TODO: integrate deletion of logical file with ResourceFile.delete
+    for logical_file in logical_files.values():
+        # this should delete the logical file and any associated metadata
+        # but does not delete the resource files that are part of the logical file
+        logical_file.logical_delete(user, delete_res_files=False)
+
+    # the files are gone from iRODS, so the records need not be deleted by ResourceFile.delete
+    res_file_set.delete()
+    for storage_path in storage_paths:
+        file_cache.invalidate(storage_path)
+
+    file_names_by_extension = dict((os.path.splitext(path)[1], path) for path in storage_paths)
+    for file_name in file_names_by_extension.values():
+        hydroshare.delete_format_metadata_after_delete_file(resource, file_name)
+
+    # send the post-delete signal
+    post_delete_file_from_resource.send(sender=resource.__class__, resource=resource)
+    return len(storage_paths)
 
 
 # TODO: shouldn't we be able to zip to a different subfolder?  Currently this is not possible.
-def zip_folder(user, res_id, input_coll_path, output_zip_fname, bool_remove_original):
+def zip_folder(user, res_id, input_coll_path, output_zip_fname, bool_remove_original,
+               progress=no_progress):
     """
     Zip input_coll_path into a zip file in hydroshareZone or any federated zone used for HydroShare
     resource backend store and modify HydroShare Django site accordingly.
@@ -595,6 +710,7 @@ def zip_folder(user, res_id, input_coll_path, output_zip_fname, bool_remove_orig
     :param output_zip_fname: file name only with no path of the generated zip file name
     :param bool_remove_original: a boolean indicating whether original files will be deleted
     after zipping.
+    :param progress: called with the stages reached: 'archive', 'link' and 'delete'
     :return: output_zip_fname and output_zip_size pair
     """
     if __debug__:
@@ -616,20 +732,21 @@ def zip_folder(user, res_id, input_coll_path, output_zip_fname, bool_remove_orig
 
     content_dir = os.path.dirname(res_coll_input)
     output_zip_full_path = os.path.join(content_dir, output_zip_fname)
+    progress('archive')
     istorage.session.run("ibun", None, '-cDzip', '-f', output_zip_full_path, res_coll_input)
 
     output_zip_size = istorage.size(output_zip_full_path)
 
+    progress('link', 0, 1)
     link_irods_file_to_django(resource, output_zip_full_path)
+    progress('link', 1, 1)
 
     if bool_remove_original:
-        for f in ResourceFile.objects.filter(object_id=resource.id):
-            full_path_name = f.storage_path
-            if res_coll_input in full_path_name and output_zip_full_path not in full_path_name:
-                delete_resource_file(res_id, f.short_path, user)
-
-        # remove empty folder in iRODS
+        progress('delete')
+        # remove the folder in iRODS, and then its files in Django with one query
         istorage.delete(res_coll_input)
+        remove_irods_folder_in_django(resource, istorage, res_coll_input, user)
+        resource.update_public_and_discoverable()  # make private if required
 
     # TODO: should check can_be_public_or_discoverable here
 
@@ -637,7 +754,7 @@ def zip_folder(user, res_id, input_coll_path, output_zip_fname, bool_remove_orig
     return output_zip_fname, output_zip_size
 
 
-def unzip_file(user, res_id, zip_with_rel_path, bool_remove_original):
+def unzip_file(user, res_id, zip_with_rel_path, bool_remove_original, progress=no_progress):
     """
     Unzip the input zip file while preserving folder structures in hydroshareZone or
     any federated zone used for HydroShare resource backend store and keep Django DB in sync.
@@ -647,6 +764,8 @@ def unzip_file(user, res_id, zip_with_rel_path, bool_remove_original):
     be unzipped
     :param bool_remove_original: a bool indicating whether original zip file will be deleted
     after unzipping.
+    :param progress: called with the stages reached: 'extract', 'link' (with the number of
+    files linked so far and the number of files to link) and 'delete'
     :return:
     """
     if __debug__:
@@ -661,10 +780,12 @@ def unzip_file(user, res_id, zip_with_rel_path, bool_remove_original):
 
     unzip_path = os.path.dirname(zip_with_full_path)
     zip_fname = os.path.basename(zip_with_rel_path)
+    progress('extract')
     istorage.session.run("ibun", None, '-xDzip', zip_with_full_path, unzip_path)
-    link_irods_folder_to_django(resource, istorage, unzip_path, (zip_fname,))
+    link_irods_folder_to_django(resource, istorage, unzip_path, (zip_fname,), progress=progress)
 
     if bool_remove_original:
+        progress('delete')
         delete_resource_file(res_id, zip_fname, user)
 
     # TODO: should check can_be_public_or_discoverable here
@@ -891,6 +1012,60 @@ def irods_path_is_directory(istorage, path):
     return base in listing[0]
 
 
+# e.g., "  rods              0 demoResc          283 2017-06-20.16:42 & file1.txt"
+_ILS_LONG_LINE = re.compile(r'^\s+\S+\s+\d+\s+\S+\s+(?P<size>\d+)\s+\S+\s+[&\s]\s*(?P<name>.+)$')
+
+
+def get_irods_folder_file_sizes(istorage, coll_path):
+    """ return a dict of file name -> size for the data objects directly in coll_path.
+
+    This uses a single long listing (ils -l) rather than one size call per file.
+    Subcollections are not included. Names whose size cannot be parsed are omitted, so
+    callers should fall back to istorage.size() for any name missing from the result.
+    """
+    stdout = istorage.session.run("ils", None, '-l', coll_path)[0]
+    sizes = {}
+    for line in stdout.split('\n'):
+        match = _ILS_LONG_LINE.match(line)
+        if match is None:
+            continue
+        name = match.group('name')
+        # only the first replica of a data object is reported
+        if name not in sizes:
+            sizes[name] = int(match.group('size'))
+    return sizes
+
+
+def get_irods_folder_tree_file_sizes(istorage, coll_path):
+    """ return a dict of path -> size for the data objects in coll_path and its subcollections.
+
+    This uses a single recursive long listing (ils -lr) rather than one listing per folder.
+    Paths are relative to coll_path. ils lists each collection under a header line holding
+    its absolute path, so the first header (coll_path itself) gives the prefix to remove.
+    """
+    stdout = istorage.session.run("ils", None, '-lr', coll_path)[0]
+    sizes = {}
+    coll_prefix = None
+    folder = ''
+    for line in stdout.split('\n'):
+        if line.endswith(':') and not line[:1].isspace():
+            coll = line[:-1]
+            if coll_prefix is None:
+                coll_prefix = coll
+            folder = coll[len(coll_prefix):].lstrip('/')
+            continue
+        match = _ILS_LONG_LINE.match(line)
+        if match is None:
+            if line.strip() and not line.strip().startswith('C- '):
+                logger.warning("Unexpected line in listing of {}: {}".format(coll_path, line))
+            continue
+        path = os.path.join(folder, match.group('name'))
+        # only the first replica of a data object is reported
+        if path not in sizes:
+            sizes[path] = int(match.group('size'))
+    return sizes
+
+
 def get_coverage_data_dict(resource, coverage_type='spatial'):
     """Get coverage data as a dict for the specified resource
     :param  resource: An instance of BaseResource for which coverage data is needed
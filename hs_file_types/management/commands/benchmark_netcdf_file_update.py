@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+
+"""
+Benchmark writing metadata back to the header of netcdf files
+
+This writes a synthetic netcdf file and updates its header attributes the way
+netcdf_file_update did before header-only write-back (copy the file, rewrite every
+attribute, regenerate the header text file and copy the file back) and the way it does now
+(read the attribute delta from the file in place, and copy, rewrite and copy back only when
+the delta is not empty). Copies stand for the downloads from and uploads to iRODS. The
+header-only write-back is timed both for a file that is up to date and for a file whose
+title changed.
+
+* By default, benchmarks a NETCDF4 file of 1024 MB.
+* Optional argument --size sets the size of the file in MB.
+* Optional argument --format sets the format of the file, e.g., NETCDF3_CLASSIC.
+
+Nothing is written to iRODS or Django.
+"""
+
+import os
+import shutil
+import tempfile
+import time
+
+import netCDF4
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from hs_file_types.models.netcdf import create_header_info_txt_file, \
+    get_netcdf_attribute_delta, apply_netcdf_attribute_delta
+
+# number of float32 values per row of the synthetic data variable
+ROW_SIZE = 1024 * 256
+
+
+def write_synthetic_netcdf(nc_file_name, size, file_format):
+    """ write a netcdf file of about size MB, and return its (global, variable) attributes """
+    global_attrs = {'title': 'Synthetic dataset', 'keywords': 'benchmark, netcdf',
+                    'time_coverage_start': '2008-01-01', 'time_coverage_end': '2008-12-31',
+                    'geospatial_lat_min': 40.0, 'geospatial_lat_max': 42.0,
+                    'geospatial_lon_min': -112.0, 'geospatial_lon_max': -110.0}
+    variable_attrs = {'data': {'units': 'm', 'long_name': 'synthetic data',
+                               'comment': 'generated', 'missing_value': '-9999'}}
+    nc_dataset = netCDF4.Dataset(nc_file_name, 'w', format=file_format)
+    try:
+        rows = max(size * 1024 * 1024 // (4 * ROW_SIZE), 1)
+        nc_dataset.createDimension('time', rows)
+        nc_dataset.createDimension('cell', ROW_SIZE)
+        data = nc_dataset.createVariable('data', 'f4', ('time', 'cell'))
+        for row in range(rows):
+            data[row, :] = np.arange(ROW_SIZE, dtype='f4') + row
+        for attr_name, value in global_attrs.items():
+            nc_dataset.setncattr(attr_name, value)
+        for attr_name, value in variable_attrs['data'].items():
+            if attr_name == 'missing_value':
+                value = np.array([float(value)], dtype='f4')
+            data.setncattr(attr_name, value)
+    finally:
+        nc_dataset.close()
+    return global_attrs, variable_attrs
+
+
+def previous_update(nc_file_name, temp_dir, global_attrs, variable_attrs):
+    """ update the header as netcdf_file_update did before header-only write-back """
+    temp_nc_file = os.path.join(temp_dir, 'previous.nc')
+    shutil.copyfile(nc_file_name, temp_nc_file)
+    nc_dataset = netCDF4.Dataset(temp_nc_file, 'a')
+    try:
+        targets = [(nc_dataset, global_attrs)] + \
+            [(nc_dataset.variables[name], attrs) for name, attrs in variable_attrs.items()]
+        for target, attrs in targets:
+            for attr_name, value in attrs.items():
+                if attr_name in target.ncattrs():
+                    target.delncattr(attr_name)
+                if value is not None:
+                    target.setncattr(attr_name, value)
+    finally:
+        nc_dataset.close()
+    create_header_info_txt_file(temp_nc_file, 'previous')
+    shutil.copyfile(temp_nc_file, os.path.join(temp_dir, 'uploaded.nc'))
+
+
+def header_only_update(nc_file_name, temp_dir, global_attrs, variable_attrs):
+    """ update the header as netcdf_file_update does; return the number of changes """
+    nc_dataset = netCDF4.Dataset(nc_file_name, 'r')
+    try:
+        delta = get_netcdf_attribute_delta(nc_dataset, global_attrs, variable_attrs)
+    finally:
+        nc_dataset.close()
+    if delta:
+        temp_nc_file = os.path.join(temp_dir, 'header_only.nc')
+        shutil.copyfile(nc_file_name, temp_nc_file)
+        nc_dataset = netCDF4.Dataset(temp_nc_file, 'a')
+        try:
+            apply_netcdf_attribute_delta(nc_dataset, delta)
+        finally:
+            nc_dataset.close()
+        create_header_info_txt_file(temp_nc_file, 'header_only')
+        shutil.copyfile(temp_nc_file, os.path.join(temp_dir, 'uploaded.nc'))
+    return len(delta)
+
+
+class Command(BaseCommand):
+    help = "Benchmark writing metadata back to the header of netcdf files."
+
+    def add_arguments(self, parser):
+
+        # Named (optional) arguments
+        parser.add_argument(
+            '--size',
+            type=int,
+            dest='size',  # value is options['size']
+            default=1024,
+            help='size of the synthetic netcdf file in MB'
+        )
+
+        parser.add_argument(
+            '--format',
+            dest='format',  # value is options['format']
+            default='NETCDF4',
+            help='format of the synthetic netcdf file, e.g., NETCDF4 or NETCDF3_CLASSIC'
+        )
+
+    def handle(self, *args, **options):
+        temp_dir = tempfile.mkdtemp()
+        try:
+            nc_file_name = os.path.join(temp_dir, 'synthetic.nc')
+            global_attrs, variable_attrs = write_synthetic_netcdf(
+                nc_file_name, options['size'], options['format'])
+            size = os.path.getsize(nc_file_name) / (1024.0 * 1024.0)
+            changed_attrs = dict(global_attrs, title='Synthetic dataset, new title')
+
+            updates = [
+                ('previous', lambda: previous_update(nc_file_name, temp_dir, global_attrs,
+                                                     variable_attrs)),
+                ('header only, up to date', lambda: header_only_update(
+                    nc_file_name, temp_dir, global_attrs, variable_attrs)),
+                ('header only, title changed', lambda: header_only_update(
+                    nc_file_name, temp_dir, changed_attrs, variable_attrs)),
+            ]
+            for name, update in updates:
+                start = time.time()
+                update()
+                elapsed = time.time() - start
+                print("{} update of a {:.0f} MB {} file: {:.2f}s"
+                      .format(name, size, options['format'], elapsed))
+        finally:
+            shutil.rmtree(temp_dir)
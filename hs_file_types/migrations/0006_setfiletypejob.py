@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+from django.conf import settings
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('hs_core', '0037_coverage_bbox'),
+        ('hs_file_types', '0005_reftimeseriesfilemetadata_reftimeserieslogicalfile'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SetFileTypeJob',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', serialize=False, auto_created=True, primary_key=True)),
+                ('task_id', models.CharField(unique=True, max_length=64)),
+                ('file_id', models.IntegerField()),
+                ('hs_file_type', models.CharField(max_length=50)),
+                ('status', models.CharField(default='pending', max_length=20, choices=[('pending', 'Pending'), ('running', 'Running'), ('succeeded', 'Succeeded'), ('failed', 'Failed')])),
+                ('stage', models.CharField(default='', max_length=20, blank=True)),
+                ('progress', models.IntegerField(default=0)),
+                ('message', models.TextField(default='', blank=True)),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('updated', models.DateTimeField(auto_now=True)),
+                ('resource', models.ForeignKey(related_name='set_file_type_jobs', to='hs_core.BaseResource')),
+                ('user', models.ForeignKey(to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
@@ -4,3 +4,4 @@ from raster import GeoRasterFileMetaData, GeoRasterLogicalFile  # noqa
 from netcdf import NetCDFFileMetaData, NetCDFLogicalFile        # noqa
 from geofeature import GeoFeatureFileMetaData, GeoFeatureLogicalFile    # noqa
 from reftimeseries import RefTimeseriesFileMetaData, RefTimeseriesLogicalFile   # noqa
+from job import SetFileTypeJob, SET_FILE_TYPE_CLASSES     # noqa
@@ -18,6 +18,11 @@ from hs_core.hydroshare.utils import get_resource_file_name_and_extension, curre
 from hs_core.models import ResourceFile, AbstractMetaDataElement, Coverage, CoreMetaData
 
 
+def no_progress(stage):
+    """ Default progress callback of set_file_type, which ignores the stages reached """
+    pass
+
+
 class AbstractFileMetaData(models.Model):
     """ base class for HydroShare file type metadata """
 
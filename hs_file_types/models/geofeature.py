@@ -24,7 +24,7 @@ from hs_core.forms import CoverageTemporalForm
 from hs_geographic_feature_resource.models import GeographicFeatureMetaDataMixin, \
     OriginalCoverage, GeometryInformation, FieldInformation
 
-from base import AbstractFileMetaData, AbstractLogicalFile
+from base import AbstractFileMetaData, AbstractLogicalFile, no_progress
 
 UNKNOWN_STR = "unknown"
 
@@ -208,12 +208,14 @@ class GeoFeatureLogicalFile(AbstractLogicalFile):
         return False
 
     @classmethod
-    def set_file_type(cls, resource, file_id, user):
+    def set_file_type(cls, resource, file_id, user, progress=no_progress):
         """
         Sets a .shp or .zip resource file to GeoFeatureFile type
         :param resource: an instance of resource type CompositeResource
         :param file_id: id of the resource file to be set as GeoFeatureFile type
         :param user: user who is setting the file type
+        :param progress: callable called with the name of each stage reached (see
+        SetFileTypeJob.STAGES)
         :return:
         """
 
@@ -235,7 +237,8 @@ class GeoFeatureLogicalFile(AbstractLogicalFile):
             raise ValidationError("Selected file must be part of a generic file type.")
 
         try:
-            meta_dict, shape_files, shp_res_files = extract_metadata_and_files(resource, res_file)
+            meta_dict, shape_files, shp_res_files = extract_metadata_and_files(
+                resource, res_file, progress=progress)
         except ValidationError as ex:
             log.exception(ex.message)
             raise ex
@@ -267,6 +270,7 @@ class GeoFeatureLogicalFile(AbstractLogicalFile):
             try:
                 # create a folder for the geofeature file type using the base file
                 # name as the name for the new folder
+                progress('upload')
                 new_folder_path = cls.compute_file_type_folder(resource, file_folder,
                                                                base_file_name)
                 create_folder(resource.short_id, new_folder_path)
@@ -290,6 +294,7 @@ class GeoFeatureLogicalFile(AbstractLogicalFile):
                     logical_file.add_resource_file(new_res_file)
 
                 log.info("GeoFeature file type - files were added to the file type.")
+                progress('persist')
                 add_metadata(resource, meta_dict, xml_file, logical_file)
                 log.info("GeoFeature file type and resource level metadata updated.")
                 # delete the original resource files used as part of setting file type
@@ -313,18 +318,21 @@ class GeoFeatureLogicalFile(AbstractLogicalFile):
             raise ValidationError(msg)
 
 
-def extract_metadata_and_files(resource, res_file, file_type=True):
+def extract_metadata_and_files(resource, res_file, file_type=True, progress=no_progress):
     """
     validates shape files and extracts metadata
 
     :param resource: an instance of BaseResource
     :param res_file: an instance of ResourceFile
     :param file_type: A flag to control if extraction being done for file type or resource type
+    :param progress: callable called with the name of each stage reached
     :return: a dict of extracted metadata, a list file paths of shape related files on the
     temp directory, a list of resource files retrieved from iRODS for this processing
     """
+    progress('download')
     shape_files, shp_res_files = get_all_related_shp_files(resource, res_file, file_type=file_type)
     temp_dir = os.path.dirname(shape_files[0])
+    progress('validate')
     if not _check_if_shape_files(shape_files):
         if res_file.extension.lower() == '.shp':
             err_msg = "One or more dependent shape files are missing at location: " \
@@ -342,6 +350,7 @@ def extract_metadata_and_files(resource, res_file, file_type=True):
         if f.lower().endswith('.shp'):
             shp_file = f
             break
+    progress('extract')
     try:
         meta_dict = extract_metadata(shp_file_full_path=shp_file)
         return meta_dict, shape_files, shp_res_files
@@ -0,0 +1,102 @@
+import logging
+
+from redis import RedisError
+
+from django.conf import settings
+from django.db import models
+
+from hs_core.models import BaseResource, BackgroundJob
+
+from raster import GeoRasterLogicalFile
+from netcdf import NetCDFLogicalFile
+from geofeature import GeoFeatureLogicalFile
+from reftimeseries import RefTimeseriesLogicalFile
+
+# logical file classes by the file type names of set_file_type requests
+SET_FILE_TYPE_CLASSES = {
+    'GeoRaster': GeoRasterLogicalFile,
+    'NetCDF': NetCDFLogicalFile,
+    'GeoFeature': GeoFeatureLogicalFile,
+    'RefTimeseries': RefTimeseriesLogicalFile,
+}
+
+logger = logging.getLogger(__name__)
+
+# seconds the stage of a running job is kept in redis
+JOB_STAGE_TIMEOUT = 24 * 60 * 60
+
+
+class SetFileTypeJob(BackgroundJob):
+    """ A background job setting a resource file to a file type
+
+    The job is run by the celery task hs_file_types.tasks.set_file_type_task. Unlike the
+    stages of a ZipJob, the stage of a running job is kept in redis
+    (settings.REDIS_CONNECTION), where the web processes polling the job can read it, since
+    the stages set_file_type reaches inside its transaction are not visible in the database
+    until the transaction commits. The stage is saved to the database when the job finishes.
+    """
+    # stages of set_file_type, in order
+    STAGES = ('download', 'validate', 'extract', 'upload', 'persist')
+
+    resource = models.ForeignKey(BaseResource, on_delete=models.CASCADE,
+                                 related_name='set_file_type_jobs')
+    file_id = models.IntegerField()
+    hs_file_type = models.CharField(max_length=50)
+
+    @classmethod
+    def submit(cls, resource, file_id, hs_file_type, user):
+        """ Start a job setting a file to a file type, and return it
+
+        A job setting the same file to the same file type, if pending or running, is returned
+        instead (see BackgroundJob._submit).
+        """
+        # had to import it here to avoid import loop
+        from hs_file_types.tasks import set_file_type_task
+
+        return cls._submit(set_file_type_task, user, resource=resource, file_id=file_id,
+                           hs_file_type=hs_file_type)
+
+    @property
+    def logical_file_class(self):
+        return SET_FILE_TYPE_CLASSES[self.hs_file_type]
+
+    def _stage_key(self):
+        return 'hs_file_types:set_file_type_job:{}'.format(self.task_id)
+
+    def set_stage(self, stage):
+        """ Record that the job reached stage, one of STAGES; used as set_file_type progress """
+        self.stage = stage
+        self.progress = max(self.progress, 100 * self.STAGES.index(stage) // len(self.STAGES))
+        try:
+            settings.REDIS_CONNECTION.set(self._stage_key(),
+                                          '{}:{}'.format(self.stage, self.progress),
+                                          ex=JOB_STAGE_TIMEOUT)
+        except RedisError:
+            # progress is informational; the job goes on without it
+            logger.warning("Stage of set file type job {} not recorded".format(self.task_id))
+
+    def finish(self, status, message=''):
+        """ Record the outcome of the job """
+        super(SetFileTypeJob, self).finish(status, message)
+        try:
+            settings.REDIS_CONNECTION.delete(self._stage_key())
+        except RedisError:
+            # the stage expires after JOB_STAGE_TIMEOUT, and is not read once the job finished
+            pass
+
+    def get_stage(self):
+        if self.status == self.RUNNING:
+            try:
+                value = settings.REDIS_CONNECTION.get(self._stage_key())
+            except RedisError:
+                value = None
+            if value:
+                stage, progress = value.split(':')
+                return stage, int(progress)
+        return self.stage, self.progress
+
+    def to_dict(self):
+        job_status = super(SetFileTypeJob, self).to_dict()
+        job_status['file_id'] = self.file_id
+        job_status['hs_file_type'] = self.hs_file_type
+        return job_status
@@ -4,9 +4,11 @@ import logging
 import re
 
 from functools import partial, wraps
+from uuid import uuid4
 import netCDF4
 import numpy as np
 
+from django.conf import settings
 from django.db import models, transaction
 from django.core.exceptions import ValidationError
 from django.core.files.uploadedfile import UploadedFile
@@ -15,6 +17,7 @@ from django.forms.models import formset_factory, BaseFormSet
 
 from dominate.tags import div, legend, form, button, p, textarea, strong, input
 
+from hs_core import file_cache
 from hs_core.hydroshare import utils
 from hs_core.hydroshare.resource import delete_resource_file
 from hs_core.forms import CoverageTemporalForm, CoverageSpatialForm
@@ -23,7 +26,7 @@ from hs_core.models import Creator, Contributor
 from hs_app_netCDF.models import NetCDFMetaDataMixin, OriginalCoverage, Variable
 from hs_app_netCDF.forms import VariableForm, VariableValidationForm, OriginalCoverageForm
 
-from base import AbstractFileMetaData, AbstractLogicalFile
+from base import AbstractFileMetaData, AbstractLogicalFile, no_progress
 import hs_file_types.nc_functions.nc_utils as nc_utils
 import hs_file_types.nc_functions.nc_dump as nc_dump
 import hs_file_types.nc_functions.nc_meta as nc_meta
@@ -340,12 +343,14 @@ class NetCDFLogicalFile(AbstractLogicalFile):
         netcdf_file_update(self, nc_res_file, txt_res_file, user)
 
     @classmethod
-    def set_file_type(cls, resource, file_id, user):
+    def set_file_type(cls, resource, file_id, user, progress=no_progress):
         """
             Sets a tif or zip raster resource file to GeoRasterFile type
             :param resource: an instance of resource type CompositeResource
             :param file_id: id of the resource file to be set as GeoRasterFile type
             :param user: user who is setting the file type
+            :param progress: callable called with the name of each stage reached (see
+            SetFileTypeJob.STAGES)
             :return:
             """
 
@@ -374,13 +379,16 @@ class NetCDFLogicalFile(AbstractLogicalFile):
         upload_folder = ''
         if res_file.has_generic_logical_file:
             # get the file from irods to temp dir
+            progress('download')
             temp_file = utils.get_file_from_irods(res_file)
             temp_dir = os.path.dirname(temp_file)
             files_to_add_to_resource.append(temp_file)
             # file validation and metadata extraction
+            progress('validate')
             nc_dataset = nc_utils.get_nc_dataset(temp_file)
             if isinstance(nc_dataset, netCDF4.Dataset):
                 # Extract the metadata from netcdf file
+                progress('extract')
                 res_dublin_core_meta, res_type_specific_meta = nc_meta.get_nc_meta_dict(temp_file)
                 # populate resource_metadata and file_type_metadata lists with extracted metadata
                 add_metadata_to_list(resource_metadata, res_dublin_core_meta,
@@ -408,6 +416,7 @@ class NetCDFLogicalFile(AbstractLogicalFile):
                     try:
                         # create a folder for the netcdf file type using the base file
                         # name as the name for the new folder
+                        progress('upload')
                         new_folder_path = cls.compute_file_type_folder(resource, file_folder,
                                                                        nc_file_name)
 
@@ -433,6 +442,7 @@ class NetCDFLogicalFile(AbstractLogicalFile):
                         log.info("NetCDF file type - new files were added to the resource.")
 
                         # use the extracted metadata to populate resource metadata
+                        progress('persist')
                         for element in resource_metadata:
                             # here k is the name of the element
                             # v is a dict of all element attributes/field names and field values
@@ -790,204 +800,233 @@ def create_header_info_txt_file(nc_temp_file, nc_file_name):
     return dump_file
 
 
-def netcdf_file_update(instance, nc_res_file, txt_res_file, user):
-    log = logging.getLogger()
-    # check the instance type
+def get_netcdf_attributes(instance):
+    """
+    Get the attributes the netcdf file of *instance* should have according to its metadata
+    :param instance: a NetCDFLogicalFile or a NetcdfResource
+    :return: a (global attributes, variable attributes) pair; global attributes is a dict of
+    attribute name -> value, where None means that the attribute is to be removed; variable
+    attributes is a dict of variable name -> dict of attribute name -> value. Attributes not
+    included are left as they are. missing_value is the string of the variable metadata, which
+    is converted to the type of the variable by get_netcdf_attribute_delta.
+    """
     file_type = isinstance(instance, NetCDFLogicalFile)
+    global_attrs = {}
+
+    # title
+    title = instance.dataset_name if file_type else instance.metadata.title.value
+    if title.lower() != 'untitled resource':
+        global_attrs['title'] = title
+
+    # keywords
+    keywords = instance.metadata.keywords if file_type \
+        else [item.value for item in instance.metadata.subjects.all()]
+    global_attrs['keywords'] = ', '.join(keywords) if keywords else None
+
+    # key/value metadata
+    extra_metadata_dict = instance.metadata.extra_metadata if file_type \
+        else instance.extra_metadata
+    global_attrs['hs_extra_metadata'] = None
+    if extra_metadata_dict:
+        extra_metadata = []
+        for k, v in extra_metadata_dict.items():
+            extra_metadata.append("{}:{}".format(k, v))
+        global_attrs['hs_extra_metadata'] = ', '.join(extra_metadata)
+
+    # temporal coverage
+    temporal_coverage = instance.metadata.temporal_coverage if file_type \
+        else instance.metadata.coverages.all().filter(type='period').first()
+    global_attrs['time_coverage_start'] = \
+        temporal_coverage.value['start'] if temporal_coverage else None
+    global_attrs['time_coverage_end'] = \
+        temporal_coverage.value['end'] if temporal_coverage else None
+
+    # spatial coverage
+    spatial_coverage = instance.metadata.spatial_coverage if file_type \
+        else instance.metadata.coverages.all().filter(type='box').first()
+    for attr_name, limit in (('geospatial_lat_min', 'southlimit'),
+                             ('geospatial_lat_max', 'northlimit'),
+                             ('geospatial_lon_min', 'westlimit'),
+                             ('geospatial_lon_max', 'eastlimit')):
+        global_attrs[attr_name] = spatial_coverage.value[limit] if spatial_coverage else None
+
+    # variables
+    variable_attrs = {}
+    for variable in instance.metadata.variables.all():
+        attrs = {
+            'units': variable.unit if variable.unit != 'Unknown' else None,
+            'long_name': variable.descriptive_name or None,
+            'comment': variable.method or None,
+        }
+        if variable.missing_value:
+            attrs['missing_value'] = variable.missing_value
+        variable_attrs[variable.name] = attrs
+
+    # metadata elements that only apply to netCDF resource
+    if not file_type:
+        # summary
+        global_attrs['summary'] = instance.metadata.description.abstract \
+            if instance.metadata.description else None
+
+        # contributor
+        contributor_list = instance.metadata.contributors.all()
+        global_attrs['contributor_name'] = \
+            ', '.join([contributor.name for contributor in contributor_list]) \
+            if contributor_list else None
+
+        # creator
+        for attr_name in ['creator_name', 'creator_email', 'creator_url']:
+            global_attrs[attr_name] = None
+        creator = instance.metadata.creators.all().filter(order=1).first()
+        if creator:
+            global_attrs['creator_name'] = creator.name if creator.name \
+                else creator.organization
+            if creator.email:
+                global_attrs['creator_email'] = creator.email
+            if creator.description or creator.homepage:
+                global_attrs['creator_url'] = creator.homepage if creator.homepage \
+                    else 'https://www.hydroshare.org' + creator.description
+
+        # license
+        global_attrs['license'] = None
+        if instance.metadata.rights:
+            global_attrs['license'] = "{0} {1}".format(instance.metadata.rights.statement,
+                                                       instance.metadata.rights.url)
+
+        # reference
+        reference_list = instance.metadata.relations.all().filter(type='cites')
+        global_attrs['references'] = \
+            ' \n'.join([reference.value for reference in reference_list]) \
+            if reference_list else None
+
+        # source
+        source_list = instance.metadata.sources.all()
+        global_attrs['source'] = \
+            ' \n'.join([source.derived_from for source in source_list]) \
+            if source_list else None
+
+    return global_attrs, variable_attrs
+
+
+def _netcdf_attribute_equal(current, value):
+    """ return True if a netcdf attribute value (string, number or array) equals value """
+    if isinstance(current, basestring) or isinstance(value, basestring):
+        return isinstance(current, basestring) and isinstance(value, basestring) and \
+            current == value
+    try:
+        return np.array_equal(np.atleast_1d(current), np.atleast_1d(value))
+    except (TypeError, ValueError):
+        return False
 
-    # get the file from irods to temp dir
-    temp_nc_file = utils.get_file_from_irods(nc_res_file)
-    nc_dataset = netCDF4.Dataset(temp_nc_file, 'a')
 
-    try:
-        # update title
-        title = instance.dataset_name if file_type else instance.metadata.title.value
-
-        if title.lower() != 'untitled resource':
-            if hasattr(nc_dataset, 'title'):
-                delattr(nc_dataset, 'title')
-            nc_dataset.title = title
-
-        # update keywords
-        keywords = instance.metadata.keywords if file_type \
-            else [item.value for item in instance.metadata.subjects.all()]
-
-        if hasattr(nc_dataset, 'keywords'):
-            delattr(nc_dataset, 'keywords')
-
-        if keywords:
-            nc_dataset.keywords = ', '.join(keywords)
-
-        # update key/value metadata
-        extra_metadata_dict = instance.metadata.extra_metadata if file_type \
-            else instance.extra_metadata
-
-        if hasattr(nc_dataset, 'hs_extra_metadata'):
-            delattr(nc_dataset, 'hs_extra_metadata')
-
-        if extra_metadata_dict:
-            extra_metadata = []
-            for k, v in extra_metadata_dict.items():
-                extra_metadata.append("{}:{}".format(k, v))
-            nc_dataset.hs_extra_metadata = ', '.join(extra_metadata)
-
-        # update temporal coverage
-        temporal_coverage = instance.metadata.temporal_coverage if file_type \
-            else instance.metadata.coverages.all().filter(type='period').first()
-
-        for attr_name in ['time_coverage_start', 'time_coverage_end']:
-            if hasattr(nc_dataset, attr_name):
-                delattr(nc_dataset, attr_name)
-
-        if temporal_coverage:
-            nc_dataset.time_coverage_start = temporal_coverage.value['start']
-            nc_dataset.time_coverage_end = temporal_coverage.value['end']
-
-        # update spatial coverage
-        spatial_coverage = instance.metadata.spatial_coverage if file_type \
-            else instance.metadata.coverages.all().filter(type='box').first()
-
-        for attr_name in ['geospatial_lat_min', 'geospatial_lat_max', 'geospatial_lon_min',
-                          'geospatial_lon_max']:
-            if hasattr(nc_dataset, attr_name):
-                delattr(nc_dataset, attr_name)
-
-        if spatial_coverage:
-            nc_dataset.geospatial_lat_min = spatial_coverage.value['southlimit']
-            nc_dataset.geospatial_lat_max = spatial_coverage.value['northlimit']
-            nc_dataset.geospatial_lon_min = spatial_coverage.value['westlimit']
-            nc_dataset.geospatial_lon_max = spatial_coverage.value['eastlimit']
-
-        # update variables
-        if instance.metadata.variables.all():
-            dataset_variables = nc_dataset.variables
-            for variable in instance.metadata.variables.all():
-                if variable.name in dataset_variables.keys():
-                    dataset_variable = dataset_variables[variable.name]
-
-                    # update units
-                    if hasattr(dataset_variable, 'units'):
-                        delattr(dataset_variable, 'units')
-                    if variable.unit != 'Unknown':
-                        dataset_variable.setncattr('units', variable.unit)
-
-                    # update long_name
-                    if hasattr(dataset_variable, 'long_name'):
-                        delattr(dataset_variable, 'long_name')
-                    if variable.descriptive_name:
-                        dataset_variable.setncattr('long_name', variable.descriptive_name)
-
-                    # update method
-                    if hasattr(dataset_variable, 'comment'):
-                        delattr(dataset_variable, 'comment')
-                    if variable.method:
-                        dataset_variable.setncattr('comment', variable.method)
-
-                    # update missing value
-                    if variable.missing_value:
-                        if hasattr(dataset_variable, 'missing_value'):
-                            missing_value = dataset_variable.missing_value
-                            delattr(dataset_variable, 'missing_value')
-                        else:
-                            missing_value = ''
-                        try:
-                            dt = np.dtype(dataset_variable.datatype.name)
-                            missing_value = np.fromstring(variable.missing_value + ' ',
-                                                          dtype=dt.type, sep=" ")
-                        except:
-                            pass
-
-                        if missing_value:
-                            dataset_variable.setncattr('missing_value', missing_value)
-
-        # Update metadata element that only apply to netCDF resource
-        if not file_type:
-
-            # update summary
-            if hasattr(nc_dataset, 'summary'):
-                delattr(nc_dataset, 'summary')
-            if instance.metadata.description:
-                nc_dataset.summary = instance.metadata.description.abstract
-
-            # update contributor
-            if hasattr(nc_dataset, 'contributor_name'):
-                delattr(nc_dataset, 'contributor_name')
-
-            contributor_list = instance.metadata.contributors.all()
-            if contributor_list:
-                res_contri_name = []
-                for contributor in contributor_list:
-                    res_contri_name.append(contributor.name)
-
-                nc_dataset.contributor_name = ', '.join(res_contri_name)
-
-            # update creator
-            for attr_name in ['creator_name', 'creator_email', 'creator_url']:
-                if hasattr(nc_dataset, attr_name):
-                    delattr(nc_dataset, attr_name)
-
-            creator = instance.metadata.creators.all().filter(order=1).first()
-            if creator:
-                nc_dataset.creator_name = creator.name if creator.name else creator.organization
-
-                if creator.email:
-                    nc_dataset.creator_email = creator.email
-                if creator.description or creator.homepage:
-                    nc_dataset.creator_url = creator.homepage if creator.homepage \
-                        else 'https://www.hydroshare.org' + creator.description
-
-            # update license
-            if hasattr(nc_dataset, 'license'):
-                delattr(nc_dataset, 'license')
-            if instance.metadata.rights:
-                nc_dataset.license = "{0} {1}".format(instance.metadata.rights.statement,
-                                                      instance.metadata.rights.url)
-
-            # update reference
-            if hasattr(nc_dataset, 'references'):
-                delattr(nc_dataset, 'references')
-
-            reference_list = instance.metadata.relations.all().filter(type='cites')
-            if reference_list:
-                res_meta_ref = []
-                for reference in reference_list:
-                    res_meta_ref.append(reference.value)
-                nc_dataset.references = ' \n'.join(res_meta_ref)
-
-            # update source
-            if hasattr(nc_dataset, 'source'):
-                delattr(nc_dataset, 'source')
-
-            source_list = instance.metadata.sources.all()
-            if source_list:
-                res_meta_source = []
-                for source in source_list:
-                    res_meta_source.append(source.derived_from)
-                nc_dataset.source = ' \n'.join(res_meta_source)
-
-        # close nc dataset
-        nc_dataset.close()
-
-    except Exception as ex:
-        log.exception(ex.message)
-        if os.path.exists(temp_nc_file):
-            shutil.rmtree(os.path.dirname(temp_nc_file))
-        raise ex
-
-    # create the ncdump text file
-    nc_file_name = os.path.basename(temp_nc_file).split(".")[0]
-    temp_text_file = create_header_info_txt_file(temp_nc_file, nc_file_name)
-
-    # push the updated nc file and the txt file to iRODS
-    utils.replace_resource_file_on_irods(temp_nc_file, nc_res_file,
-                                         user)
-    utils.replace_resource_file_on_irods(temp_text_file, txt_res_file,
-                                         user)
+def get_netcdf_attribute_delta(nc_dataset, global_attrs, variable_attrs):
+    """
+    Get the attribute changes needed for *nc_dataset* to have the given attributes
+    :param nc_dataset: an open netCDF4.Dataset
+    :param global_attrs: global attributes, as returned by get_netcdf_attributes
+    :param variable_attrs: variable attributes, as returned by get_netcdf_attributes
+    :return: a list of (variable name or None for global attributes, attribute name, value)
+    tuples for the attributes that differ, where a value of None means that the attribute is
+    to be removed; an empty list if the file is up to date
+    """
+    delta = []
+    targets = [(None, nc_dataset, global_attrs)]
+    for var_name, attrs in sorted(variable_attrs.items()):
+        if var_name in nc_dataset.variables:
+            targets.append((var_name, nc_dataset.variables[var_name], attrs))
+
+    for var_name, target, attrs in targets:
+        current_attrs = target.ncattrs()
+        for attr_name, value in sorted(attrs.items()):
+            current = target.getncattr(attr_name) if attr_name in current_attrs else None
+            if var_name is not None and attr_name == 'missing_value':
+                try:
+                    dt = np.dtype(target.datatype.name)
+                    value = np.fromstring(value + ' ', dtype=dt.type, sep=" ")
+                except Exception:
+                    # a value that can not be converted leaves the attribute as it is
+                    value = current
+                if value is not None and not np.size(value):
+                    value = None
+            if value is None:
+                if current is not None:
+                    delta.append((var_name, attr_name, None))
+            elif current is None or not _netcdf_attribute_equal(current, value):
+                delta.append((var_name, attr_name, value))
+    return delta
+
+
+def apply_netcdf_attribute_delta(nc_dataset, delta):
+    """
+    Apply attribute changes to *nc_dataset*, which must be open for writing
+    :param delta: attribute changes, as returned by get_netcdf_attribute_delta
+    """
+    for var_name, attr_name, value in delta:
+        target = nc_dataset if var_name is None else nc_dataset.variables[var_name]
+        if value is None:
+            target.delncattr(attr_name)
+        else:
+            target.setncattr(attr_name, value)
+
+
+def netcdf_file_update(instance, nc_res_file, txt_res_file, user):
+    """
+    Write the metadata of *instance* back to the header of its netcdf file
+
+    Only the header attributes that differ from the metadata are written: the current
+    attributes are read from the local cache of iRODS files (see hs_core.file_cache) without
+    copying the file, and when the file is up to date, nothing is copied or uploaded.
+    Otherwise, the changes are made on a local copy of the file already fetched, and the
+    netcdf file and the regenerated header text file are uploaded.
+    :param instance: a NetCDFLogicalFile or a NetcdfResource
+    :param nc_res_file: the netcdf resource file of *instance*
+    :param txt_res_file: the header text resource file of *instance*
+    :param user: the user requesting the update
+    """
+    log = logging.getLogger()
+    global_attrs, variable_attrs = get_netcdf_attributes(instance)
+
+    istorage = nc_res_file.resource.get_irods_storage()
+    with file_cache.cached_file(nc_res_file, istorage) as nc_file_path:
+        nc_dataset = netCDF4.Dataset(nc_file_path, 'r')
+        try:
+            delta = get_netcdf_attribute_delta(nc_dataset, global_attrs, variable_attrs)
+        finally:
+            nc_dataset.close()
+
+        if delta:
+            # copy the file fetched above to temp dir, rather than get it from irods again
+            # (e.g., when the cache is disabled or the file does not fit in it)
+            temp_nc_file = os.path.join(settings.TEMP_FILE_DIR, uuid4().hex,
+                                        os.path.basename(nc_file_path))
+            os.makedirs(os.path.dirname(temp_nc_file))
+            shutil.copyfile(nc_file_path, temp_nc_file)
+
+    if delta:
+        try:
+            nc_dataset = netCDF4.Dataset(temp_nc_file, 'a')
+            try:
+                apply_netcdf_attribute_delta(nc_dataset, delta)
+            finally:
+                nc_dataset.close()
+
+            # create the ncdump text file
+            nc_file_name = os.path.basename(temp_nc_file).split(".")[0]
+            temp_text_file = create_header_info_txt_file(temp_nc_file, nc_file_name)
+
+            # push the updated nc file and the txt file to iRODS
+            utils.replace_resource_file_on_irods(temp_nc_file, nc_res_file,
+                                                 user)
+            utils.replace_resource_file_on_irods(temp_text_file, txt_res_file,
+                                                 user)
+        except Exception as ex:
+            log.exception(ex.message)
+            raise
+        finally:
+            # cleanup the temp dir
+            if os.path.exists(temp_nc_file):
+                shutil.rmtree(os.path.dirname(temp_nc_file))
 
     metadata = instance.metadata
     metadata.is_dirty = False
     metadata.save()
-
-    # cleanup the temp dir
-    if os.path.exists(temp_nc_file):
-        shutil.rmtree(os.path.dirname(temp_nc_file))
@@ -27,7 +27,7 @@ from hs_geo_raster_resource.models import CellInformation, BandInformation, Orig
 from hs_geo_raster_resource.forms import BandInfoForm, BaseBandInfoFormSet, BandInfoValidationForm
 
 from hs_file_types import raster_meta_extract
-from base import AbstractFileMetaData, AbstractLogicalFile
+from base import AbstractFileMetaData, AbstractLogicalFile, no_progress
 
 
 class GeoRasterFileMetaData(GeoRasterMetaDataMixin, AbstractFileMetaData):
@@ -248,12 +248,14 @@ class GeoRasterLogicalFile(AbstractLogicalFile):
         return False
 
     @classmethod
-    def set_file_type(cls, resource, file_id, user):
+    def set_file_type(cls, resource, file_id, user, progress=no_progress):
         """
             Sets a tif or zip raster resource file to GeoRasterFile type
             :param resource: an instance of resource type CompositeResource
             :param file_id: id of the resource file to be set as GeoRasterFile type
             :param user: user who is setting the file type
+            :param progress: callable called with the name of each stage reached (see
+            SetFileTypeJob.STAGES)
             :return:
             """
 
@@ -273,13 +275,16 @@ class GeoRasterLogicalFile(AbstractLogicalFile):
         upload_folder = ''
         if res_file is not None and res_file.has_generic_logical_file:
             # get the file from irods to temp dir
+            progress('download')
             temp_file = utils.get_file_from_irods(res_file)
+            temp_dir = os.path.dirname(temp_file)
             # validate the file
+            progress('validate')
             error_info, files_to_add_to_resource = raster_file_validation(raster_file=temp_file)
             if not error_info:
                 log.info("Geo raster file type file validation successful.")
                 # extract metadata
-                temp_dir = os.path.dirname(temp_file)
+                progress('extract')
                 temp_vrt_file_path = [os.path.join(temp_dir, f) for f in os.listdir(temp_dir) if
                                       '.vrt' == os.path.splitext(f)[1]].pop()
                 metadata = extract_metadata(temp_vrt_file_path)
@@ -295,6 +300,7 @@ class GeoRasterLogicalFile(AbstractLogicalFile):
                     try:
                         # create a folder for the raster file type using the base file name as the
                         # name for the new folder
+                        progress('upload')
                         new_folder_path = cls.compute_file_type_folder(resource, file_folder,
                                                                        file_name)
 
@@ -320,6 +326,7 @@ class GeoRasterLogicalFile(AbstractLogicalFile):
                         log.info("Geo raster file type - new files were added to the resource.")
 
                         # use the extracted metadata to populate file metadata
+                        progress('persist')
                         for element in metadata:
                             # here k is the name of the element
                             # v is a dict of all element attributes/field names and field values
@@ -349,6 +356,9 @@ class GeoRasterLogicalFile(AbstractLogicalFile):
                 err_msg = "Geo raster file type file validation failed.{}".format(
                     ' '.join(error_info))
                 log.info(err_msg)
+                # remove temp dir
+                if os.path.isdir(temp_dir):
+                    shutil.rmtree(temp_dir)
                 raise ValidationError(err_msg)
         else:
             if res_file is None:
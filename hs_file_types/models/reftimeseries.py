@@ -20,7 +20,7 @@ from hs_core.hydroshare.resource import delete_resource_file
 from hs_core.hydroshare import utils
 from hs_core.models import CoreMetaData
 
-from base import AbstractFileMetaData, AbstractLogicalFile
+from base import AbstractFileMetaData, AbstractLogicalFile, no_progress
 
 
 class TimeSeries(object):
@@ -618,12 +618,14 @@ class RefTimeseriesLogicalFile(AbstractLogicalFile):
         return cls.objects.create(metadata=rf_ts_metadata)
 
     @classmethod
-    def set_file_type(cls, resource, file_id, user):
+    def set_file_type(cls, resource, file_id, user, progress=no_progress):
         """
             Sets a json resource file to RefTimeseriesFile type
             :param resource: an instance of resource type CompositeResource
             :param file_id: id of the resource file to be set as RefTimeSeriesFile type
             :param user: user who is setting the file type
+            :param progress: callable called with the name of each stage reached (see
+            SetFileTypeJob.STAGES)
             :return:
             """
 
@@ -640,6 +642,8 @@ class RefTimeseriesLogicalFile(AbstractLogicalFile):
 
         files_to_add_to_resource = []
         if res_file.has_generic_logical_file:
+            # the json file is read from irods and validated
+            progress('validate')
             try:
                 json_file_content = _validate_json_file(res_file)
             except Exception as ex:
@@ -650,6 +654,7 @@ class RefTimeseriesLogicalFile(AbstractLogicalFile):
             temp_dir = os.path.dirname(temp_file)
             files_to_add_to_resource.append(temp_file)
             file_folder = res_file.file_folder
+            progress('upload')
             with transaction.atomic():
                 # first delete the json file that we retrieved from irods
                 # for setting it to reftimeseries file type
@@ -676,6 +681,7 @@ class RefTimeseriesLogicalFile(AbstractLogicalFile):
                     logical_file.dataset_name = logical_file.metadata.title
                     logical_file.save()
                     # extract metadata
+                    progress('persist')
                     _extract_metadata(resource, logical_file)
                     log.info("RefTimeseries file type - json file was added to the resource.")
                 except Exception as ex:
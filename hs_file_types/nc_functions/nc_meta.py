@@ -131,18 +131,22 @@ def extract_nc_coverage_meta(nc_dataset):
 
     projection_info = get_projection_info(nc_dataset)
 
-    period_info = get_period_info(nc_dataset)
+    # the coordinate variables are looked up and scanned once for the period and the boxes
+    coor_type_mapping = get_nc_variables_coordinate_type_mapping(nc_dataset)
+
+    period_info = get_period_info(nc_dataset, coor_type_mapping)
+
+    original_box_info = get_original_box_info(nc_dataset, coor_type_mapping)
+
+    box_info = get_box_info(nc_dataset, original_box_info=dict(original_box_info))
+    for name in box_info.keys():
+        box_info[name] = str(box_info[name])
 
-    original_box_info = get_original_box_info(nc_dataset)
     for name in original_box_info.keys():
         original_box_info[name] = str(original_box_info[name])
         if name == 'units' and original_box_info[name].lower() == 'm':
             original_box_info[name] = 'Meter'
 
-    box_info = get_box_info(nc_dataset)
-    for name in box_info.keys():
-        box_info[name] = str(box_info[name])
-
     nc_coverage_meta = {
         'projection-info': projection_info,
         'period': period_info,
@@ -164,9 +168,9 @@ def get_projection_info(nc_dataset):
     return projection_info
 
 
-def get_period_info(nc_dataset):
+def get_period_info(nc_dataset, coor_type_mapping=None):
     """
-    (object)-> dict
+    (object, dict)-> dict
 
     Return: the netCDF original coverage period info
     """
@@ -174,7 +178,7 @@ def get_period_info(nc_dataset):
     if get_period_info_by_acdd_convention(nc_dataset):
         period_info = get_period_info_by_acdd_convention(nc_dataset)
     else:
-        period_info = get_period_info_by_data(nc_dataset)
+        period_info = get_period_info_by_data(nc_dataset, coor_type_mapping)
 
     return period_info
 
@@ -196,15 +200,16 @@ def get_period_info_by_acdd_convention(nc_dataset):
     return period_info
 
 
-def get_period_info_by_data(nc_dataset):
+def get_period_info_by_data(nc_dataset, coor_type_mapping=None):
     """
-    (object)-> dict
+    (object, dict)-> dict
 
     Return: the netCDF original coverage period info by looking into the data
     """
 
     period_info = {}
-    coor_type_mapping = get_nc_variables_coordinate_type_mapping(nc_dataset)
+    if coor_type_mapping is None:
+        coor_type_mapping = get_nc_variables_coordinate_type_mapping(nc_dataset)
     for coor_type in ['TA', 'TC']:
         limit_meta = get_limit_meta_by_coor_type(nc_dataset, coor_type, coor_type_mapping)
         try:
@@ -219,14 +224,16 @@ def get_period_info_by_data(nc_dataset):
     return period_info
 
 
-def get_box_info(nc_dataset):
+def get_box_info(nc_dataset, original_box_info=None):
     """
-    (object)-> dict
+    (object, dict)-> dict
 
-    Return: the netCDF coverage box info as wgs84 crs
+    Return: the netCDF coverage box info as wgs84 crs, from the original coverage box info
+            (computed if not given, which may be changed)
     """
     box_info = {}
-    original_box_info = get_original_box_info(nc_dataset)
+    if original_box_info is None:
+        original_box_info = get_original_box_info(nc_dataset)
 
     if original_box_info:
         if original_box_info.get('units', '').lower() == 'degree':  # geographic coor x, y
@@ -309,14 +316,14 @@ def check_lon_limit(westlimit, eastlimit):
     return [westlimit, eastlimit]
 
 
-def get_original_box_info(nc_dataset):
+def get_original_box_info(nc_dataset, coor_type_mapping=None):
     """
-    (object)-> dict
+    (object, dict)-> dict
 
     Return: the netCDF original coverage box info
     """
 
-    original_box_info = get_original_box_info_by_data(nc_dataset)
+    original_box_info = get_original_box_info_by_data(nc_dataset, coor_type_mapping)
 
     if original_box_info.get('units', '') == 'degree' and \
             get_original_box_info_by_acdd_convention(nc_dataset):
@@ -348,17 +355,19 @@ def get_original_box_info_by_acdd_convention(nc_dataset):
     return original_box_info
 
 
-def get_original_box_info_by_data(nc_dataset):
+def get_original_box_info_by_data(nc_dataset, coor_type_mapping=None):
     """
-    (object)-> dict
+    (object, dict)-> dict
 
     Return: the netCDF original coverage box info by looking into the data
     """
 
     original_box_info = {}
+    if coor_type_mapping is None:
+        coor_type_mapping = get_nc_variables_coordinate_type_mapping(nc_dataset)
 
     for info_source in ['A', 'C']:  # check auxiliary and coordinate variables
-        limits_info = get_limits_info(nc_dataset, info_source)
+        limits_info = get_limits_info(nc_dataset, info_source, coor_type_mapping)
         if limits_info:
             original_box_info = limits_info
             original_box_info['projection'] = get_nc_grid_mapping_crs_name(nc_dataset)
@@ -367,15 +376,16 @@ def get_original_box_info_by_data(nc_dataset):
     return original_box_info
 
 
-def get_limits_info(nc_dataset, info_source):
+def get_limits_info(nc_dataset, info_source, coor_type_mapping=None):
     """
-    (obj, str) -> dict
+    (obj, str, dict) -> dict
 
     Return: dictionary including the 4 box limits name and their values and the units
     """
 
     limits_info = {}
-    coor_type_mapping = get_nc_variables_coordinate_type_mapping(nc_dataset)
+    if coor_type_mapping is None:
+        coor_type_mapping = get_nc_variables_coordinate_type_mapping(nc_dataset)
 
     # get all limits values and units
     for coor_dir in ['X', 'Y']:
@@ -410,7 +420,8 @@ def get_limit_meta_by_coor_type(nc_dataset, coor_type, coor_type_mapping):
         if coor_type_name in coor_type_list:
             index = coor_type_list.index(coor_type_name)
             var_name = var_name_list[index]
-            var_coor_meta = get_nc_variable_coordinate_meta(nc_dataset, var_name)
+            var_coor_meta = get_nc_variable_coordinate_meta(nc_dataset, var_name,
+                                                            coor_type_mapping)
 
             if var_coor_meta.get('coordinate_start') is not None:
                 coor_start.append(var_coor_meta.get('coordinate_start'))
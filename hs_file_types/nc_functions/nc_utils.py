@@ -142,26 +142,26 @@ def get_nc_variable_coordinate_type(nc_variable):
     return 'Unknown'
 
 
-def get_nc_variable_coordinate_meta(nc_dataset, nc_variable_name):
+def get_nc_variable_coordinate_meta(nc_dataset, nc_variable_name, coor_type_mapping=None):
     """
-    (object)-> dict
+    (object, string, dict)-> dict
 
     Return: coordinate meta data if the variable is related to a coordinate type:
             coordinate or auxiliary coordinate variable or bounds variable
+            coor_type_mapping is the result of get_nc_variables_coordinate_type_mapping for
+            the dataset, which is computed if not given
     """
-    nc_variables_coordinate_type_mapping = get_nc_variables_coordinate_type_mapping(nc_dataset)
+    if coor_type_mapping is None:
+        coor_type_mapping = get_nc_variables_coordinate_type_mapping(nc_dataset)
+    nc_variables_coordinate_type_mapping = coor_type_mapping
     nc_variable_coordinate_meta = {}
     if nc_variable_name in nc_variables_coordinate_type_mapping.keys():
         nc_variable = nc_dataset.variables[nc_variable_name]
-        nc_variable_data = nc_variable[:]
         nc_variable_coordinate_type = nc_variables_coordinate_type_mapping[nc_variable_name]
-        coordinate_max = None
-        coordinate_min = None
-        if nc_variable_data.size:
-            coordinate_min = nc_variable_data[numpy.unravel_index(nc_variable_data.argmin(),
-                                                                  nc_variable_data.shape)]
-            coordinate_max = nc_variable_data[numpy.unravel_index(nc_variable_data.argmax(),
-                                                                  nc_variable_data.shape)]
+        # coordinate variables and their bounds are monotonic (CF convention)
+        monotonic = nc_variable_coordinate_type.split('_')[0].endswith('C')
+        coordinate_min, coordinate_max = get_nc_variable_range(nc_variable, monotonic)
+        if coordinate_min is not None:
             coordinate_units = nc_variable.units if hasattr(nc_variable, 'units') else ''
 
             if nc_variable_coordinate_type in ['TC', 'TA', 'TC_bnd', 'TA_bnd']:
@@ -192,6 +192,98 @@ def get_nc_variable_coordinate_meta(nc_dataset, nc_variable_name):
     return nc_variable_coordinate_meta
 
 
+# Functions for the range of variable values
+# Variables are never read whole: big model outputs have 2-D auxiliary coordinate grids and
+# long time axes which would not fit in memory.
+
+# maximum number of values read at a time when scanning a variable for its range
+NC_RANGE_CHUNK_SIZE = 2 ** 22
+# number of values of a monotonic variable sampled to check that it is monotonic
+NC_MONOTONIC_SAMPLE_SIZE = 64
+
+
+def get_nc_variable_range(nc_variable, monotonic=False):
+    """
+    (object, bool)-> (value, value)
+
+    Return: the minimum and maximum values of the variable, or (None, None) if it has no
+            valid value. The variable is read in chunks of at most NC_RANGE_CHUNK_SIZE values.
+            If monotonic is True (e.g., for coordinate variables and their bounds), only a
+            sample of the variable along its first dimension, including its first and last
+            values, is read; the whole variable is scanned if the sample is not monotonic.
+    """
+    if not nc_variable.size:
+        return None, None
+
+    if monotonic and len(nc_variable.shape) >= 1:
+        value_range = get_nc_monotonic_variable_range(nc_variable)
+        if value_range is not None:
+            return value_range
+
+    value_min = value_max = None
+    for index in get_nc_variable_chunks(nc_variable.shape):
+        data = nc_variable[index]
+        if not numpy.ma.count(data):
+            continue
+        chunk_min = data[numpy.unravel_index(data.argmin(), data.shape)]
+        chunk_max = data[numpy.unravel_index(data.argmax(), data.shape)]
+        value_min = chunk_min if value_min is None else min(value_min, chunk_min)
+        value_max = chunk_max if value_max is None else max(value_max, chunk_max)
+
+    return value_min, value_max
+
+
+def get_nc_monotonic_variable_range(nc_variable):
+    """
+    (object)-> (value, value)
+
+    Return: the minimum and maximum values of a variable that is monotonic along its first
+            dimension, from its first and last values, or None if a sample of the variable
+            is not strictly monotonic or has missing values
+    """
+    length = nc_variable.shape[0]
+    step = max(1, length // NC_MONOTONIC_SAMPLE_SIZE)
+    samples = [nc_variable[::step]]
+    if (length - 1) % step:
+        samples.append(nc_variable[length - 1:length])
+    sample = numpy.ma.concatenate(samples)
+
+    diffs = numpy.diff(sample, axis=0)
+    if numpy.ma.getmaskarray(sample).any() or \
+            not ((diffs > 0).all() or (diffs < 0).all()):
+        return None
+
+    # the extreme values of a monotonic variable are its first and last values
+    ends = numpy.ma.concatenate([sample[:1], sample[-1:]])
+    return (ends[numpy.unravel_index(ends.argmin(), ends.shape)],
+            ends[numpy.unravel_index(ends.argmax(), ends.shape)])
+
+
+def get_nc_variable_chunks(shape, chunk_size=None):
+    """
+    (tuple, int)-> generator
+
+    Return: the indexes of the chunks of at most chunk_size (default NC_RANGE_CHUNK_SIZE)
+            values, or single rows of the last dimensions if they are bigger, that cover a
+            variable of the given shape
+    """
+    if chunk_size is None:
+        chunk_size = NC_RANGE_CHUNK_SIZE
+
+    # the chunks span the dimensions from split on
+    split = 0
+    while numpy.prod(shape[split:], dtype=numpy.int64) > chunk_size:
+        split += 1
+    if split == 0:
+        yield Ellipsis
+        return
+
+    rows = max(1, chunk_size // int(numpy.prod(shape[split:], dtype=numpy.int64)))
+    for index in numpy.ndindex(*shape[:split - 1]):
+        for start in range(0, shape[split - 1], rows):
+            yield index + (slice(start, start + rows),)
+
+
 # Functions for Coordinate Variable
 # coordinate variable has the following attributes:
 # 1) it has 1 dimension
@@ -10,6 +10,13 @@ using-python-gdal-bindings
 
 Update Notes
 This is used to process the vrt raster and to extract max, min value of each raster band.
+The raster is opened once for all metadata, without changing the working directory, so that
+extraction is thread-safe. Band statistics are computed in parallel, in one of the modes of
+RASTER_STATISTICS_MODE:
+- 'exact': full scan of each band (GDAL ComputeStatistics)
+- 'approximate': GDAL approximate statistics, from overviews or a subset of the band
+- 'sampled': minimum and maximum of RASTER_STATISTICS_SAMPLE_BLOCKS blocks of each band,
+  evenly spread over the band
 """
 
 
@@ -17,23 +24,36 @@ import gdal
 from gdalconst import GA_ReadOnly
 from osgeo import osr
 from collections import OrderedDict
+from multiprocessing.pool import ThreadPool
+import os
 import re
 import logging
+import xml.etree.ElementTree as ET
 import pycrs
 import numpy
 
+from django.conf import settings
 
-def get_raster_meta_dict(raster_file_name):
+STATISTICS_MODES = ('exact', 'approximate', 'sampled')
+STATISTICS_MODE = getattr(settings, 'RASTER_STATISTICS_MODE', 'exact')
+STATISTICS_SAMPLE_BLOCKS = getattr(settings, 'RASTER_STATISTICS_SAMPLE_BLOCKS', 64)
+STATISTICS_THREADS = getattr(settings, 'RASTER_STATISTICS_THREADS', 4)
+
+
+def get_raster_meta_dict(raster_file_name, statistics_mode=None):
     """
-    (string)-> dict
+    (string, string)-> dict
 
-    Return: the raster science metadata extracted from the raster file
+    Return: the raster science metadata extracted from the raster file, with band statistics
+    computed in statistics_mode (RASTER_STATISTICS_MODE by default)
     """
 
     # get the metadata info from raster files
-    spatial_coverage_info = get_spatial_coverage_info(raster_file_name)
-    cell_info = get_cell_info(raster_file_name)
-    band_info = get_band_info(raster_file_name)
+    raster_dataset = open_raster(raster_file_name)
+    spatial_coverage_info = get_spatial_coverage_info(raster_dataset)
+    cell_info = get_cell_info(raster_dataset)
+    band_info = get_band_info(raster_dataset, raster_file_name, statistics_mode)
+    raster_dataset = None
 
     # write meta as dictionary
     raster_meta_dict = {
@@ -45,16 +65,53 @@ def get_raster_meta_dict(raster_file_name):
     return raster_meta_dict
 
 
-def get_spatial_coverage_info(raster_file_name):
+def open_raster(raster_file_name):
+    """
+    (string) --> object
+
+    Return: the raster dataset opened read-only, or None if it cannot be opened. Relative
+    source files of a vrt raster are resolved against the directory of the vrt file, as
+    GDAL would do after changing to that directory.
     """
-    (string) --> dict
+    if raster_file_name.lower().endswith('.vrt'):
+        vrt_xml = get_absolute_vrt_xml(raster_file_name)
+        if vrt_xml is not None:
+            return gdal.Open(vrt_xml, GA_ReadOnly)
+    return gdal.Open(raster_file_name, GA_ReadOnly)
+
+
+def get_absolute_vrt_xml(vrt_file_name):
+    """
+    (string) --> string
+
+    Return: the xml of the vrt file with absolute source file paths, or None if the vrt file
+    has no relative source file path or cannot be parsed
+    """
+    try:
+        vrt_tree = ET.parse(vrt_file_name)
+    except (ET.ParseError, IOError):
+        return None
+    vrt_dir = os.path.dirname(os.path.abspath(vrt_file_name))
+    changed = False
+    for source in vrt_tree.iter('SourceFilename'):
+        path = (source.text or '').strip()
+        if not path or os.path.isabs(path) or path.startswith('/vsi'):
+            continue
+        source.text = os.path.join(vrt_dir, path)
+        source.set('relativeToVRT', '0')
+        changed = True
+    return ET.tostring(vrt_tree.getroot()) if changed else None
+
+
+def get_spatial_coverage_info(raster_dataset):
+    """
+    (object) --> dict
 
     Return: meta of spatial extent and projection of raster includes both original info
     and wgs84 info
     """
-    raster_dataset = gdal.Open(raster_file_name, GA_ReadOnly)
     original_coverage_info = get_original_coverage_info(raster_dataset)
-    wgs84_coverage_info = get_wgs84_coverage_info(raster_dataset)
+    wgs84_coverage_info = get_wgs84_coverage_info(raster_dataset, original_coverage_info)
     spatial_coverage_info = {
         'original_coverage_info': original_coverage_info,
         'wgs84_coverage_info': wgs84_coverage_info
@@ -155,9 +212,9 @@ def get_original_coverage_info(raster_dataset):
     return spatial_coverage_info
 
 
-def get_wgs84_coverage_info(raster_dataset):
+def get_wgs84_coverage_info(raster_dataset, original_coverage_info=None):
     """
-    (object) --> dict
+    (object, dict) --> dict
     Return: meta of spatial extent as wgs84 geographic coordinate system of raster
     """
     # get original coordinate system
@@ -173,7 +230,8 @@ def get_wgs84_coverage_info(raster_dataset):
         proj = None
 
     wgs84_coverage_info = OrderedDict()
-    original_coverage_info = get_original_coverage_info(raster_dataset)
+    if original_coverage_info is None:
+        original_coverage_info = get_original_coverage_info(raster_dataset)
 
     if proj and (None not in original_coverage_info.values()):
 
@@ -235,15 +293,13 @@ def get_wgs84_coverage_info(raster_dataset):
     return wgs84_coverage_info
 
 
-def get_cell_info(raster_file_name):
+def get_cell_info(raster_dataset):
     """
     (object) --> dict
 
     Return: meta info of cells in raster
     """
 
-    raster_dataset = gdal.Open(raster_file_name, GA_ReadOnly)
-
     # get cell size info
     if raster_dataset:
         rows = raster_dataset.RasterYSize
@@ -274,52 +330,138 @@ def get_cell_info(raster_file_name):
     return cell_info
 
 
-def get_band_info(raster_file_name):
-
-    raster_dataset = gdal.Open(raster_file_name, GA_ReadOnly)
+def get_band_info(raster_dataset, raster_file_name, statistics_mode=None):
+    """
+    (object, string, string) --> dict
 
-    import os
-    ori_dir = os.getcwd()
-    os.chdir(os.path.dirname(raster_file_name))
+    Return: meta info of the bands of raster, keyed by band number. Band statistics are
+    computed in statistics_mode (RASTER_STATISTICS_MODE by default), in parallel threads for
+    multiband rasters. GDAL datasets must not be shared between threads, so each thread
+    opens raster_file_name.
+    """
+    statistics_mode = statistics_mode or STATISTICS_MODE
+    if statistics_mode not in STATISTICS_MODES:
+        raise ValueError("Unknown raster statistics mode: {}".format(statistics_mode))
 
     # get raster band count
     if raster_dataset:
-        band_info = {}
         band_count = raster_dataset.RasterCount
+        threads = min(STATISTICS_THREADS, band_count)
+        if threads > 1:
+            def get_statistics(band_number):
+                # each thread uses its own dataset
+                dataset = open_raster(raster_file_name)
+                return get_band_statistics(dataset.GetRasterBand(band_number), statistics_mode)
+
+            pool = ThreadPool(threads)
+            try:
+                band_stats = pool.map(get_statistics, range(1, band_count + 1))
+            finally:
+                pool.close()
+        else:
+            band_stats = [get_band_statistics(raster_dataset.GetRasterBand(i + 1),
+                                              statistics_mode)
+                          for i in range(band_count)]
 
-        for i in range(0, band_count):
-            band = raster_dataset.GetRasterBand(i+1)
-            minimum, maximum, _, _ = band.ComputeStatistics(False)
-            no_data = band.GetNoDataValue()
-            new_no_data = None
-
-            if no_data and numpy.allclose(minimum, no_data):
-                new_no_data = minimum
-            elif no_data and numpy.allclose(maximum, no_data):
-                new_no_data = maximum
-
-            if new_no_data is not None:
-                band.SetNoDataValue(new_no_data)
-                minimum, maximum, _, _ = band.ComputeStatistics(False)
-
+        band_info = {}
+        for i, (unit, no_data, minimum, maximum) in enumerate(band_stats):
             band_info[i+1] = {
                 'name': 'Band_'+str(i+1),
                 'variableName': '',
-                'variableUnit': band.GetUnitType(),
-                'noDataValue': band.GetNoDataValue(),
+                'variableUnit': unit,
+                'noDataValue': no_data,
                 'maximumValue': maximum,
                 'minimumValue': minimum,
                 }
     else:
-        band_info = {
+        band_info = {1: {
                 'name': 'Band_1',
                 'variableName': '',
                 'variableUnit': '',
                 'noDataValue': None,
                 'maximumValue': None,
                 'minimumValue': None,
-        }
+        }}
 
-    raster_dataset = None
-    os.chdir(ori_dir)
     return band_info
+
+
+def get_band_statistics(band, statistics_mode):
+    """
+    (object, string) --> tuple
+
+    Return: (unit, no data value, minimum, maximum) of a raster band. A no data value that
+    approximately matches the minimum or maximum of the band is replaced by that extreme, so
+    that the extreme is excluded from the statistics.
+    """
+    no_data = band.GetNoDataValue()
+    if statistics_mode == 'sampled':
+        lows, highs = get_sampled_extremes(band, no_data)
+        new_no_data = None
+        if no_data and lows and numpy.allclose(lows[0], no_data):
+            new_no_data = lows[0]
+        elif no_data and highs and numpy.allclose(highs[-1], no_data):
+            new_no_data = highs[-1]
+
+        if new_no_data is not None:
+            no_data = float(new_no_data)
+            lows = [value for value in lows if value != new_no_data]
+            highs = [value for value in highs if value != new_no_data]
+        minimum = lows[0] if lows else None
+        maximum = highs[-1] if highs else None
+        return band.GetUnitType(), no_data, minimum, maximum
+
+    approx_ok = statistics_mode == 'approximate'
+    minimum, maximum, _, _ = band.ComputeStatistics(approx_ok)
+    new_no_data = None
+
+    if no_data and numpy.allclose(minimum, no_data):
+        new_no_data = minimum
+    elif no_data and numpy.allclose(maximum, no_data):
+        new_no_data = maximum
+
+    if new_no_data is not None:
+        band.SetNoDataValue(new_no_data)
+        minimum, maximum, _, _ = band.ComputeStatistics(approx_ok)
+
+    return band.GetUnitType(), band.GetNoDataValue(), minimum, maximum
+
+
+def get_sampled_extremes(band, no_data, sample_blocks=None):
+    """
+    (object, float, int) --> tuple
+
+    Return: the two lowest and the two highest distinct values, in increasing order, of
+    sample_blocks blocks (RASTER_STATISTICS_SAMPLE_BLOCKS by default) of a raster band,
+    evenly spread over the band. No data and NaN values are excluded. The second values
+    give the extremes once the first ones are excluded, without reading the band again.
+    """
+    sample_blocks = sample_blocks or STATISTICS_SAMPLE_BLOCKS
+    block_x, block_y = band.GetBlockSize()
+    columns, rows = band.XSize, band.YSize
+    blocks_per_row = (columns + block_x - 1) // block_x
+    block_count = blocks_per_row * ((rows + block_y - 1) // block_y)
+    step = max(1.0, float(block_count) / sample_blocks)
+
+    lows, highs = set(), set()
+    for block in [int(i * step) for i in range(min(block_count, sample_blocks))]:
+        x_off = (block % blocks_per_row) * block_x
+        y_off = (block // blocks_per_row) * block_y
+        data = band.ReadAsArray(x_off, y_off, min(block_x, columns - x_off),
+                                min(block_y, rows - y_off))
+        if data is None:
+            continue
+        values = data.ravel()
+        if numpy.issubdtype(values.dtype, numpy.floating):
+            values = values[~numpy.isnan(values)]
+        if no_data is not None:
+            values = values[values != no_data]
+        for extremes, pick in ((lows, numpy.min), (highs, numpy.max)):
+            remaining = values
+            for _ in range(2):
+                if not remaining.size:
+                    break
+                extreme = pick(remaining)
+                extremes.add(extreme.item())
+                remaining = remaining[remaining != extreme]
+    return sorted(lows)[:2], sorted(highs)[-2:]
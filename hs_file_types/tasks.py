@@ -0,0 +1,63 @@
+"""Define celery tasks for hs_file_types app."""
+
+from __future__ import absolute_import
+
+import logging
+
+from celery import shared_task
+from django.core.exceptions import ValidationError
+
+from django_irods.icommands import SessionException
+from hs_core.hydroshare.utils import resource_modified
+from hs_core.models import ResourceFile
+from hs_file_types.models import SetFileTypeJob
+
+# Pass 'django' into getLogger instead of __name__
+# for celery tasks (as this seems to be the
+# only way to successfully log in code executed
+# by celery, despite our catch-all handler).
+logger = logging.getLogger('django')
+
+SET_FILE_TYPE_SUCCESS_MESSAGE = "File was successfully set to selected file type. " \
+                                "Metadata extraction was successful."
+
+
+@shared_task(bind=True, max_retries=3, default_retry_delay=60)
+def set_file_type_task(self, job_id):
+    """
+    Run a SetFileTypeJob.
+
+    The task is idempotent: it does nothing for a finished job, and a job whose file is gone
+    when the job is run again (on retry, or when a worker died running it) has succeeded,
+    since deleting the original file is the last step of set_file_type. Failed attempts are
+    cleaned up by set_file_type, which rolls back its transaction and removes the files it
+    added. iRODS errors are retried.
+    """
+    job = SetFileTypeJob.objects.filter(pk=job_id).select_related('resource', 'user').first()
+    if job is None or job.finished:
+        return
+
+    if job.status == SetFileTypeJob.RUNNING and \
+            not ResourceFile.objects.filter(pk=job.file_id).exists():
+        job.finish(SetFileTypeJob.SUCCEEDED, SET_FILE_TYPE_SUCCESS_MESSAGE)
+        return
+
+    job.start()
+    resource = job.resource.get_content_model()
+    try:
+        job.logical_file_class.set_file_type(resource=resource, file_id=job.file_id,
+                                             user=job.user, progress=job.set_stage)
+        resource_modified(resource, job.user, overwrite_bag=False)
+    except ValidationError as ex:
+        job.finish(SetFileTypeJob.FAILED, ex.message)
+    except SessionException as ex:
+        if self.request.retries < self.max_retries:
+            logger.warning("Set file type job {} will be retried: {}".format(
+                job.task_id, ex.stderr))
+            raise self.retry(exc=ex)
+        job.finish(SetFileTypeJob.FAILED, ex.stderr)
+    except Exception as ex:
+        logger.exception("Set file type job {} failed".format(job.task_id))
+        job.finish(SetFileTypeJob.FAILED, "Error when setting file type: {}".format(ex))
+    else:
+        job.finish(SetFileTypeJob.SUCCEEDED, SET_FILE_TYPE_SUCCESS_MESSAGE)
@@ -0,0 +1,113 @@
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+import netCDF4
+import numpy
+from mock import patch
+
+from hs_file_types.nc_functions import nc_utils
+
+
+class TestNetcdfVariableRange(TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        nc_file_name = os.path.join(self.tmp_dir, 'test.nc')
+        nc_dataset = netCDF4.Dataset(nc_file_name, 'w')
+        nc_dataset.createDimension('x', 10)
+        nc_dataset.createDimension('lat', 3)
+        nc_dataset.createDimension('lon', 4)
+        nc_dataset.createDimension('time', 3)
+        nc_dataset.createDimension('row', 4)
+        nc_dataset.createDimension('col', 5)
+
+        # monotonic coordinates, increasing and decreasing
+        nc_dataset.createVariable('x', 'f8', ('x',))[:] = numpy.arange(10) * 2.5
+        nc_dataset.createVariable('lat', 'f8', ('lat',))[:] = [40, 30, 20]
+        # a wrapped longitude coordinate is not monotonic
+        nc_dataset.createVariable('lon', 'f8', ('lon',))[:] = [180, 270, 0, 90]
+        # a coordinate with a missing value at an end
+        lon_fill = nc_dataset.createVariable('lon_fill', 'f8', ('lon',), fill_value=-9999)
+        lon_fill[:] = [-9999, 10, 20, 30]
+        time = nc_dataset.createVariable('time', 'f8', ('time',))
+        time.units = 'days since 2000-01-01 00:00:00'
+        time[:] = [0, 31, 60]
+
+        # a 2-D grid with missing values, whose extremes are in different chunks
+        grid = nc_dataset.createVariable('grid', 'f8', ('row', 'col'), fill_value=-9999)
+        values = numpy.arange(20, dtype='f8').reshape(4, 5) + 100
+        values[0, 4] = 500  # max
+        values[3, 3] = 1  # min
+        values[1, 0] = -9999  # missing
+        grid[:] = values
+        empty = nc_dataset.createVariable('empty', 'f8', ('row', 'col'), fill_value=-9999)
+        empty[:] = numpy.ones((4, 5)) * -9999
+        nc_dataset.close()
+
+        self.nc_dataset = netCDF4.Dataset(nc_file_name, 'r')
+
+    def tearDown(self):
+        self.nc_dataset.close()
+        shutil.rmtree(self.tmp_dir)
+
+    def test_monotonic_range(self):
+        variables = self.nc_dataset.variables
+        self.assertEqual(nc_utils.get_nc_variable_range(variables['x'], monotonic=True),
+                         (0, 22.5))
+        self.assertEqual(nc_utils.get_nc_variable_range(variables['lat'], monotonic=True),
+                         (20, 40))
+        # the range of a monotonic variable is read from a sample including its ends
+        with patch.object(nc_utils, 'NC_MONOTONIC_SAMPLE_SIZE', 2):
+            self.assertEqual(nc_utils.get_nc_monotonic_variable_range(variables['x']),
+                             (0, 22.5))
+
+    def test_non_monotonic_range(self):
+        lon = self.nc_dataset.variables['lon']
+        self.assertIsNone(nc_utils.get_nc_monotonic_variable_range(lon))
+        # the variable is scanned when it is not monotonic
+        self.assertEqual(nc_utils.get_nc_variable_range(lon, monotonic=True), (0, 270))
+        self.assertEqual(nc_utils.get_nc_variable_range(lon), (0, 270))
+
+    def test_masked_range(self):
+        variables = self.nc_dataset.variables
+        # a missing value at an end is not a range limit
+        self.assertIsNone(nc_utils.get_nc_monotonic_variable_range(variables['lon_fill']))
+        self.assertEqual(nc_utils.get_nc_variable_range(variables['lon_fill'], monotonic=True),
+                         (10, 30))
+        self.assertEqual(nc_utils.get_nc_variable_range(variables['grid']), (1, 500))
+        self.assertEqual(nc_utils.get_nc_variable_range(variables['empty']), (None, None))
+
+    def test_chunked_range(self):
+        grid = self.nc_dataset.variables['grid']
+        # chunks of 3 values split the rows of 5 values, so the max and min of the grid
+        # are read in other chunks than the values next to them
+        with patch.object(nc_utils, 'NC_RANGE_CHUNK_SIZE', 3):
+            chunks = list(nc_utils.get_nc_variable_chunks(grid.shape))
+            self.assertEqual(nc_utils.get_nc_variable_range(grid), (1, 500))
+        self.assertEqual(len(chunks), 8)
+        self.assertEqual(chunks[:2], [(0, slice(0, 3)), (0, slice(3, 6))])
+        covered = numpy.zeros(grid.shape, dtype=int)
+        for index in chunks:
+            covered[index] += 1
+        self.assertTrue((covered == 1).all())
+
+        # a variable that fits in a chunk is read at once
+        self.assertEqual(list(nc_utils.get_nc_variable_chunks(grid.shape)), [Ellipsis])
+        self.assertEqual(list(nc_utils.get_nc_variable_chunks(grid.shape, 20)), [Ellipsis])
+        self.assertEqual(len(list(nc_utils.get_nc_variable_chunks(grid.shape, 19))), 2)
+
+    def test_coordinate_meta(self):
+        with patch.object(nc_utils, 'get_nc_variables_coordinate_type_mapping') as mapping:
+            meta = nc_utils.get_nc_variable_coordinate_meta(self.nc_dataset, 'time',
+                                                            {'time': 'TC'})
+        # the mapping given is not computed again
+        self.assertFalse(mapping.called)
+        self.assertEqual(meta['coordinate_type'], 'TC')
+        self.assertEqual(meta['coordinate_units'], 'days since 2000-01-01 00:00:00')
+        self.assertEqual(meta['coordinate_start'].strftime('%Y-%m-%d'), '2000-01-01')
+        self.assertEqual(meta['coordinate_end'].strftime('%Y-%m-%d'), '2000-03-01')
+
+        meta = nc_utils.get_nc_variable_coordinate_meta(self.nc_dataset, 'lat',
+                                                        {'lat': 'YC'})
+        self.assertEqual((meta['coordinate_start'], meta['coordinate_end']), (20, 40))
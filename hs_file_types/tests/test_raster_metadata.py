@@ -18,6 +18,7 @@ from hs_core.hydroshare.utils import resource_post_create_actions, \
 from hs_core.views.utils import remove_folder, move_or_rename_file_or_folder
 
 from hs_file_types.models import GeoRasterLogicalFile, GeoRasterFileMetaData, GenericLogicalFile
+from hs_file_types import raster_meta_extract
 from utils import assert_raster_file_type_metadata
 from hs_geo_raster_resource.models import OriginalCoverage, CellInformation, BandInformation
 
@@ -202,6 +203,37 @@ class RasterFileTypeMetaData(MockIRODSTestCaseMixin, TransactionTestCase):
 
         self.composite_resource.delete()
 
+    def test_raster_statistics_modes(self):
+        # test band statistics in each statistics mode give the same metadata otherwise
+        raster_file = os.path.join(self.temp_dir, self.raster_file_name)
+        meta = {}
+        for mode in raster_meta_extract.STATISTICS_MODES:
+            meta[mode] = raster_meta_extract.get_raster_meta_dict(raster_file, mode)
+        exact_band_info = meta['exact']['band_info'][1]
+        self.assertAlmostEqual(exact_band_info['maximumValue'], 2880.00708008)
+        self.assertAlmostEqual(exact_band_info['minimumValue'], 2274.95898438)
+        for mode in ('approximate', 'sampled'):
+            self.assertEqual(meta[mode]['spatial_coverage_info'],
+                             meta['exact']['spatial_coverage_info'])
+            self.assertEqual(meta[mode]['cell_info'], meta['exact']['cell_info'])
+            band_info = meta[mode]['band_info'][1]
+            self.assertEqual(band_info['noDataValue'], exact_band_info['noDataValue'])
+            self.assertLessEqual(band_info['maximumValue'], exact_band_info['maximumValue'])
+            self.assertGreaterEqual(band_info['minimumValue'], exact_band_info['minimumValue'])
+
+        # sampling every block of the band gives the exact statistics
+        dataset = raster_meta_extract.open_raster(raster_file)
+        band = dataset.GetRasterBand(1)
+        lows, highs = raster_meta_extract.get_sampled_extremes(
+            band, band.GetNoDataValue(), sample_blocks=band.XSize * band.YSize)
+        self.assertAlmostEqual(lows[0], exact_band_info['minimumValue'])
+        self.assertAlmostEqual(highs[-1], exact_band_info['maximumValue'])
+
+        with self.assertRaises(ValueError):
+            raster_meta_extract.get_raster_meta_dict(raster_file, 'fast')
+
+        self.composite_resource.delete()
+
     def test_set_file_type_to_geo_raster_invalid_file_1(self):
         # here we are using an invalid raster tif file for setting it
         # to Geo Raster file type which should fail
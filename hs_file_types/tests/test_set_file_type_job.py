@@ -0,0 +1,113 @@
+from datetime import timedelta
+
+from celery import states
+from mock import MagicMock, patch
+from redis import RedisError
+
+from django.contrib.auth.models import Group
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils.timezone import now
+
+from hs_core import hydroshare
+from hs_core.testing import MockIRODSTestCaseMixin, MockRedis
+from hs_file_types.models import SetFileTypeJob
+from hs_file_types.tasks import set_file_type_task
+
+
+class TestSetFileTypeJob(MockIRODSTestCaseMixin, TestCase):
+    def setUp(self):
+        super(TestSetFileTypeJob, self).setUp()
+        Group.objects.get_or_create(name='Hydroshare Author')
+        self.user = hydroshare.create_account(
+            'user1@nowhere.com',
+            username='user1',
+            first_name='Creator_FirstName',
+            last_name='Creator_LastName',
+            superuser=False,
+            groups=[]
+        )
+        self.resource = hydroshare.create_resource('CompositeResource', self.user,
+                                                   'Test set file type job')
+        self.job = SetFileTypeJob.objects.create(task_id='test-task', resource=self.resource,
+                                                 file_id=1, hs_file_type='GeoRaster',
+                                                 user=self.user)
+
+    def tearDown(self):
+        self.resource.delete()
+        super(TestSetFileTypeJob, self).tearDown()
+
+    def test_stage_shared_with_other_processes(self):
+        redis = MockRedis()
+        with override_settings(REDIS_CONNECTION=redis):
+            # the job as run by the celery worker
+            self.job.start()
+            self.job.set_stage('download')
+            self.job.set_stage('extract')
+            cache.clear()
+
+            # the job as polled by a web process: the stage is not in the database yet
+            polled_job = SetFileTypeJob.objects.get(pk=self.job.pk)
+            self.assertEqual((polled_job.stage, polled_job.progress), ('', 0))
+            job_status = polled_job.to_dict()
+            self.assertEqual(job_status['status'], SetFileTypeJob.RUNNING)
+            self.assertEqual(job_status['stage'], 'extract')
+            self.assertEqual(job_status['progress'], 40)
+
+            # once finished, the job is read from the database
+            self.job.finish(SetFileTypeJob.SUCCEEDED, 'done')
+            self.assertEqual(redis.data, {})
+            job_status = SetFileTypeJob.objects.get(pk=self.job.pk).to_dict()
+            self.assertEqual(job_status['status'], SetFileTypeJob.SUCCEEDED)
+            self.assertEqual(job_status['stage'], 'extract')
+            self.assertEqual(job_status['progress'], 100)
+
+    def test_stage_without_redis(self):
+        redis = MagicMock()
+        redis.set.side_effect = redis.get.side_effect = redis.delete.side_effect = RedisError
+        with override_settings(REDIS_CONNECTION=redis):
+            # the job runs on without recording its stage
+            self.job.start()
+            self.job.set_stage('validate')
+            job_status = SetFileTypeJob.objects.get(pk=self.job.pk).to_dict()
+            self.assertEqual(job_status['stage'], '')
+            self.assertEqual(job_status['progress'], 0)
+
+            self.job.finish(SetFileTypeJob.FAILED, 'failed')
+            job_status = SetFileTypeJob.objects.get(pk=self.job.pk).to_dict()
+            self.assertEqual(job_status['status'], SetFileTypeJob.FAILED)
+            self.assertEqual(job_status['stage'], 'validate')
+
+    def _submit(self):
+        return SetFileTypeJob.submit(self.resource, 1, 'GeoRaster', self.user)
+
+    def test_submit_returns_active_job(self):
+        with patch('hs_core.models.AsyncResult') as async_result, \
+                patch.object(set_file_type_task, 'apply_async') as apply_async:
+            async_result.return_value.state = states.PENDING
+            self.assertEqual(self._submit(), self.job)
+            self.assertFalse(apply_async.called)
+
+    def test_submit_replaces_stale_job(self):
+        # the worker running the job died long ago
+        self.job.start()
+        SetFileTypeJob.objects.filter(pk=self.job.pk).update(
+            updated=now() - timedelta(hours=3))
+        with override_settings(BACKGROUND_JOB_TIMEOUT=60 * 60), \
+                patch.object(set_file_type_task, 'apply_async') as apply_async:
+            job = self._submit()
+        self.assertNotEqual(job, self.job)
+        self.assertEqual(job.status, SetFileTypeJob.PENDING)
+        apply_async.assert_called_once_with((job.pk,), task_id=job.task_id)
+        self.assertEqual(SetFileTypeJob.objects.get(pk=self.job.pk).status,
+                         SetFileTypeJob.FAILED)
+
+    def test_submit_replaces_failed_task(self):
+        # celery reports that the task of the job failed without finishing the job
+        with patch('hs_core.models.AsyncResult') as async_result, \
+                patch.object(set_file_type_task, 'apply_async'):
+            async_result.return_value.state = states.FAILURE
+            job = self._submit()
+        self.assertNotEqual(job, self.job)
+        self.assertEqual(SetFileTypeJob.objects.get(pk=self.job.pk).status,
+                         SetFileTypeJob.FAILED)
@@ -15,8 +15,8 @@ from hs_core.hydroshare.utils import resource_post_create_actions
 from hs_core.testing import MockIRODSTestCaseMixin
 from hs_file_types.views import set_file_type, add_metadata_element, update_metadata_element, \
     update_key_value_metadata, delete_key_value_metadata, add_keyword_metadata, \
-    delete_keyword_metadata, update_netcdf_file
-from hs_file_types.models import GeoRasterLogicalFile, NetCDFLogicalFile
+    delete_keyword_metadata, update_netcdf_file, set_file_type_job_status
+from hs_file_types.models import GeoRasterLogicalFile, NetCDFLogicalFile, SetFileTypeJob
 
 
 class TestFileTypeViewFunctions(MockIRODSTestCaseMixin, TestCase):
@@ -89,6 +89,20 @@ class TestFileTypeViewFunctions(MockIRODSTestCaseMixin, TestCase):
         self.assertIn("File was successfully set to selected file type.",
                       response_dict['message'])
 
+        # the file type was set by a job, whose status can be retrieved
+        job = SetFileTypeJob.objects.get(task_id=response_dict['task_id'])
+        self.assertEqual(job.status, SetFileTypeJob.SUCCEEDED)
+        self.assertEqual(job.stage, 'persist')
+        self.assertEqual(job.progress, 100)
+        url = reverse('set_file_type_job_status', kwargs={'task_id': job.task_id})
+        request = self.factory.get(url)
+        request.user = self.user
+        response = set_file_type_job_status(request, task_id=job.task_id)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response_dict = json.loads(response.content)
+        self.assertEqual(response_dict['status'], SetFileTypeJob.SUCCEEDED)
+        self.assertIn('spatial_coverage', response_dict)
+
         # there should be 2 file now (vrt file was generated by the system
         self.assertEqual(self.composite_resource.files.all().count(), 2)
         res_file = self.composite_resource.files.first()
@@ -8,6 +8,10 @@ urlpatterns = patterns(
             views.set_file_type,
             name="set_file_type"),
 
+    url(r'^_internal/set-file-type-job/(?P<task_id>[A-z0-9\-]+)/status/$',
+        views.set_file_type_job_status,
+        name="set_file_type_job_status"),
+
     url(r'^_internal/(?P<resource_id>[0-9a-f-]+)/'
         r'(?P<hs_file_type>[A-z]+)/(?P<file_type_id>[0-9]+)/delete-file-type/$',
         views.delete_file_type,
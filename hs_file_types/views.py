@@ -7,6 +7,8 @@ from django.contrib import messages
 from django.core.exceptions import ValidationError
 from django.db import Error
 from django.contrib.contenttypes.models import ContentType
+from django.core.urlresolvers import reverse
+from django.shortcuts import get_object_or_404
 from django.template import Template, Context
 
 from rest_framework import status
@@ -19,13 +21,17 @@ from hs_core.hydroshare import METADATA_STATUS_SUFFICIENT, METADATA_STATUS_INSUF
 from hs_core.views.utils import ACTION_TO_AUTHORIZE, authorize, get_coverage_data_dict
 from hs_core.hydroshare.utils import resource_modified
 
-from .models import GeoRasterLogicalFile, NetCDFLogicalFile, GeoFeatureLogicalFile, \
-    RefTimeseriesLogicalFile
+from .models import GeoRasterLogicalFile, SetFileTypeJob, SET_FILE_TYPE_CLASSES
 
 
 @login_required
 def set_file_type(request, resource_id, file_id, hs_file_type,  **kwargs):
     """Set a file (*file_id*) to a specific file type (*hs_file_type*)
+
+    The file type is set by a background job (see SetFileTypeJob). If the job finishes
+    before the response is sent (e.g., when celery tasks run eagerly), the response is the
+    outcome of the job; otherwise it is a 202 response with the task_id of the job and the
+    status_url from which its progress can be polled.
     :param  request: an instance of HttpRequest
     :param  resource_id: id of the resource in which this file type needs to be set
     :param  file_id: id of the file which needs to be set to a file type
@@ -35,9 +41,6 @@ def set_file_type(request, resource_id, file_id, hs_file_type,  **kwargs):
     res, authorized, _ = authorize(request, resource_id,
                                    needed_permission=ACTION_TO_AUTHORIZE.EDIT_RESOURCE,
                                    raises_exception=False)
-    file_type_map = {"GeoRaster": GeoRasterLogicalFile, "NetCDF": NetCDFLogicalFile,
-                     'GeoFeature': GeoFeatureLogicalFile,
-                     'RefTimeseries': RefTimeseriesLogicalFile}
     response_data = {}
     if not authorized:
         err_msg = "Permission denied"
@@ -49,26 +52,50 @@ def set_file_type(request, resource_id, file_id, hs_file_type,  **kwargs):
         response_data['message'] = err_msg
         return JsonResponse(response_data, status=status.HTTP_400_BAD_REQUEST)
 
-    if hs_file_type not in file_type_map:
-        err_msg = "Unsupported file type. Supported file types are: {}".format(file_type_map.keys())
+    if hs_file_type not in SET_FILE_TYPE_CLASSES:
+        err_msg = "Unsupported file type. Supported file types are: {}".format(
+            SET_FILE_TYPE_CLASSES.keys())
         response_data['message'] = err_msg
         return JsonResponse(response_data, status=status.HTTP_400_BAD_REQUEST)
 
-    try:
-        logical_file_type_class = file_type_map[hs_file_type]
-        logical_file_type_class.set_file_type(resource=res, file_id=file_id, user=request.user)
-        resource_modified(res, request.user, overwrite_bag=False)
-        msg = "File was successfully set to selected file type. " \
-              "Metadata extraction was successful."
-        response_data['message'] = msg
-        spatial_coverage_dict = get_coverage_data_dict(res)
-        response_data['spatial_coverage'] = spatial_coverage_dict
-        return JsonResponse(response_data, status=status.HTTP_201_CREATED)
+    job = SetFileTypeJob.submit(res, int(file_id), hs_file_type, request.user)
+    return _set_file_type_job_response(job, res)
 
-    except ValidationError as ex:
-        response_data['message'] = ex.message
+
+def _set_file_type_job_response(job, resource):
+    response_data = job.to_dict()
+    if job.status == SetFileTypeJob.SUCCEEDED:
+        response_data['spatial_coverage'] = get_coverage_data_dict(resource)
+        return JsonResponse(response_data, status=status.HTTP_201_CREATED)
+    if job.status == SetFileTypeJob.FAILED:
         return JsonResponse(response_data, status=status.HTTP_400_BAD_REQUEST)
 
+    response_data['message'] = "Setting file type in progress."
+    response_data['status_url'] = reverse('set_file_type_job_status',
+                                          kwargs={'task_id': job.task_id})
+    return JsonResponse(response_data, status=status.HTTP_202_ACCEPTED)
+
+
+@login_required
+def set_file_type_job_status(request, task_id, **kwargs):
+    """Get the status, stage and progress of a set file type job (*task_id*)
+    :param  request: an instance of HttpRequest
+    :param  task_id: celery task id of the job, as returned by set_file_type
+    :return an instance of JsonResponse type; spatial_coverage is included once the job
+    succeeded
+    """
+    job = get_object_or_404(SetFileTypeJob, task_id=task_id)
+    res, authorized, _ = authorize(request, job.resource.short_id,
+                                   needed_permission=ACTION_TO_AUTHORIZE.VIEW_RESOURCE,
+                                   raises_exception=False)
+    if not authorized:
+        return JsonResponse({'message': "Permission denied"},
+                            status=status.HTTP_401_UNAUTHORIZED)
+    response = _set_file_type_job_response(job, res)
+    # the status of the job was retrieved successfully, whatever the status of the job
+    response.status_code = status.HTTP_200_OK
+    return response
+
 
 @api_view(['POST'])
 def set_file_type_public(request, pk, file_path, hs_file_type):
@@ -111,12 +138,36 @@ def set_file_type_public(request, pk, file_path, hs_file_type):
     # call the internal api for setting the file type
     json_response = set_file_type(request=request, resource_id=pk, file_id=res_file.id,
                                   hs_file_type=hs_file_type)
-    # only return the message part of the above response
+    # only return the message part of the above response, and the task id of jobs in progress
+    # with the url from which their status can be polled (see set_file_type_job_status_public)
     response_dict = json.loads(json_response.content)
+    if json_response.status_code == status.HTTP_202_ACCEPTED:
+        task_id = response_dict['task_id']
+        status_url = reverse('set_file_type_job_status_public', kwargs={'task_id': task_id})
+        return Response(data={'message': response_dict['message'],
+                              'task_id': task_id,
+                              'status_url': status_url},
+                        status=json_response.status_code)
     return Response(data=response_dict['message'],
                     status=json_response.status_code)
 
 
+@api_view(['GET'])
+def set_file_type_job_status_public(request, task_id):
+    """
+    Get the status, stage and progress of a set file type job
+
+    :param request: an instance of HttpRequest object
+    :param task_id: task id of the job, as returned by set_file_type_public
+    :return: the status of the job (see SetFileTypeJob.to_dict)
+    """
+
+    # call the internal api for getting the status of the job
+    json_response = set_file_type_job_status(request=request, task_id=task_id)
+    return Response(data=json.loads(json_response.content),
+                    status=json_response.status_code)
+
+
 @login_required
 def delete_file_type(request, resource_id, hs_file_type, file_type_id, **kwargs):
     """deletes an instance of a specific file type and all its associated resource files"""
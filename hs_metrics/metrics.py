@@ -0,0 +1,106 @@
+"""
+Site metrics, computed with aggregate queries and cached.
+
+compute_site_metrics counts resources, users and their demography with GROUP BY queries,
+so its cost does not grow with the number of resources loaded into python. The result is
+stored in redis (settings.REDIS_CONNECTION) for SITE_METRICS_CACHE_TIMEOUT seconds, where
+all web processes read it, and is refreshed before it expires by the periodic celery task
+hs_metrics.tasks.refresh_site_metrics. The metrics page computes the metrics only when
+they are not in redis, e.g., before the task first ran or while redis is not available.
+"""
+
+import logging
+import pickle
+from collections import Counter
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db.models import Count
+from django.utils import timezone
+from mezzanine.generic.models import Rating, ThreadedComment
+from redis import RedisError
+
+from theme.models import UserProfile  # fixme switch to party model
+from hs_core.hydroshare import get_resource_types
+from hs_core.models import BaseResource
+
+logger = logging.getLogger(__name__)
+
+SITE_METRICS_CACHE_KEY = 'hs_metrics:site_metrics'
+SITE_METRICS_CACHE_TIMEOUT = getattr(settings, 'SITE_METRICS_CACHE_TIMEOUT', 60 * 60)
+
+
+def get_resource_stats():
+    """Return (number of resources, [(resource type verbose name, count)])."""
+    type_names = {}
+    for res_model in get_resource_types():
+        type_names[res_model.__name__] = res_model._meta.verbose_name \
+            if hasattr(res_model._meta, 'verbose_name') else res_model._meta.model_name
+
+    resource_type_counts = Counter()
+    for resource_type, count in BaseResource.objects\
+            .filter(resource_type__in=type_names.keys())\
+            .values_list('resource_type').annotate(count=Count('id')):
+        resource_type_counts[type_names[resource_type]] += count
+    return sum(resource_type_counts.values()), sorted(resource_type_counts.items())
+
+
+def get_user_stats():
+    """Return a dict of user demography counts, grouped in the database."""
+    profiles = UserProfile.objects.all()
+
+    def counts(field):
+        return sorted(profiles.values_list(field).annotate(count=Count('id')))
+
+    # subject areas are comma-separated lists; only distinct lists are split here
+    user_subject_areas = Counter()
+    for subject_areas, count in profiles.exclude(subject_areas=None).exclude(subject_areas='')\
+            .values_list('subject_areas').annotate(count=Count('id')):
+        for area in subject_areas.split(','):
+            user_subject_areas[area.strip()] += count
+
+    # profiles without an organization are not counted as an institution
+    institutions = profiles.exclude(organization__isnull=True).exclude(organization='')
+
+    # FIXME revisit this with the hs_party application: profiles do not record the
+    # organization type, so agencies cannot be told apart from host institutions.
+    return {
+        'n_host_institutions': institutions.values('organization').distinct().count(),
+        'n_agencies': 0,
+        'user_titles': counts('title'),
+        'user_professions': counts('user_type'),
+        'user_subject_areas': sorted(user_subject_areas.items()),
+    }
+
+
+def compute_site_metrics():
+    """Compute the site metrics and store them in redis."""
+    n_resources, resource_type_counts = get_resource_stats()
+    metrics = {
+        'n_registered_users': User.objects.count(),
+        'n_resources': n_resources,
+        'resource_type_counts': resource_type_counts,
+        'n_ratings': Rating.objects.count(),
+        'n_comments': ThreadedComment.objects.count(),
+        'computed': timezone.now(),
+    }
+    metrics.update(get_user_stats())
+    try:
+        settings.REDIS_CONNECTION.set(SITE_METRICS_CACHE_KEY,
+                                      pickle.dumps(metrics, pickle.HIGHEST_PROTOCOL),
+                                      ex=SITE_METRICS_CACHE_TIMEOUT)
+    except RedisError:
+        logger.warning("Site metrics not stored: redis is not available.")
+    return metrics
+
+
+def get_site_metrics():
+    """Return the site metrics stored in redis, computing them if they are not there."""
+    try:
+        metrics = settings.REDIS_CONNECTION.get(SITE_METRICS_CACHE_KEY)
+    except RedisError:
+        logger.warning("Site metrics not available from redis.")
+        metrics = None
+    if metrics is None:
+        return compute_site_metrics()
+    return pickle.loads(metrics)
@@ -0,0 +1,14 @@
+"""Define celery tasks for hs_metrics app."""
+
+from __future__ import absolute_import
+
+from celery.task import periodic_task
+from celery.schedules import crontab
+
+from .metrics import compute_site_metrics
+
+
+@periodic_task(ignore_result=True, run_every=crontab(minute='*/30'))
+def refresh_site_metrics():
+    """Recompute the site metrics stored in redis before they expire."""
+    compute_site_metrics()
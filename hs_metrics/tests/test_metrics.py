@@ -0,0 +1,77 @@
+import pickle
+
+from django.contrib.auth.models import Group
+from django.test import TestCase, override_settings
+from mock import patch
+
+from hs_core import hydroshare
+from hs_core.testing import MockRedis
+from hs_metrics.metrics import get_user_stats, compute_site_metrics, get_site_metrics, \
+    SITE_METRICS_CACHE_KEY
+from hs_metrics.tasks import refresh_site_metrics
+
+
+class TestSiteMetrics(TestCase):
+    def setUp(self):
+        super(TestSiteMetrics, self).setUp()
+        self.redis = MockRedis()
+        self.redis_settings = override_settings(REDIS_CONNECTION=self.redis)
+        self.redis_settings.enable()
+        Group.objects.get_or_create(name='Hydroshare Author')
+        organizations = ['Utah State University', 'Utah State University', 'CUAHSI', None, '']
+        self.users = []
+        for i, organization in enumerate(organizations):
+            user = hydroshare.create_account(
+                'user{}@nowhere.com'.format(i),
+                username='user{}'.format(i),
+                first_name='User{}_FirstName'.format(i),
+                last_name='User{}_LastName'.format(i),
+                superuser=False,
+                groups=[]
+            )
+            user.userprofile.organization = organization
+            user.userprofile.subject_areas = 'Hydrology, Water Management' if i % 2 else None
+            user.userprofile.save()
+            self.users.append(user)
+
+    def tearDown(self):
+        self.redis_settings.disable()
+        super(TestSiteMetrics, self).tearDown()
+
+    def test_user_stats(self):
+        stats = get_user_stats()
+        # users without an organization are not counted as an institution
+        self.assertEqual(stats['n_host_institutions'], 2)
+        self.assertEqual(stats['n_agencies'], 0)
+        self.assertEqual(stats['user_subject_areas'],
+                         [('Hydrology', 2), ('Water Management', 2)])
+
+    def test_site_metrics_cached(self):
+        metrics = compute_site_metrics()
+        n_users = metrics['n_registered_users']
+        self.assertGreaterEqual(n_users, len(self.users))
+        self.assertEqual(metrics['n_host_institutions'], 2)
+        # the metrics are shared with all processes through redis
+        self.assertEqual(pickle.loads(self.redis.get(SITE_METRICS_CACHE_KEY)), metrics)
+
+        # the cached metrics are returned until they are computed again
+        hydroshare.create_account(
+            'user9@nowhere.com',
+            username='user9',
+            first_name='User9_FirstName',
+            last_name='User9_LastName',
+            superuser=False,
+            groups=[]
+        )
+        with patch('hs_metrics.metrics.get_user_stats') as get_user_stats_mock:
+            self.assertEqual(get_site_metrics()['n_registered_users'], n_users)
+            self.assertFalse(get_user_stats_mock.called)
+
+        # the periodic task refreshes them
+        refresh_site_metrics()
+        self.assertEqual(get_site_metrics()['n_registered_users'], n_users + 1)
+
+        # the metrics are computed when they are not in redis
+        self.redis.delete(SITE_METRICS_CACHE_KEY)
+        self.assertEqual(get_site_metrics()['n_registered_users'], n_users + 1)
+        self.assertIsNotNone(self.redis.get(SITE_METRICS_CACHE_KEY))
@@ -119,6 +119,14 @@ urlpatterns = patterns(
         views.resource_rest_api.CheckTaskStatus.as_view(),
         name='get_task_status'),
 
+    url(r'^set-file-type-job/(?P<task_id>[A-z0-9\-]+)/status/$',
+        file_type_views.set_file_type_job_status_public,
+        name="set_file_type_job_status_public"),
+
+    url(r'^zip-job/(?P<task_id>[A-z0-9\-]+)/status/$',
+        views.resource_folder_hierarchy.data_store_zip_job_status_public,
+        name="data_store_zip_job_status_public"),
+
     url(r'^user/$',
         views.user_rest_api.UserInfo.as_view(), name='get_logged_in_user_info'),
 
@@ -0,0 +1,143 @@
+from django.contrib.auth.models import Group
+from django.core.cache import cache
+from django.test import TestCase, Client
+from mock import patch
+
+from hs_core import hydroshare
+from hs_core.testing import MockIRODSTestCaseMixin
+from hs_sitemap import views
+
+
+class TestSitemapViews(MockIRODSTestCaseMixin, TestCase):
+    def setUp(self):
+        super(TestSitemapViews, self).setUp()
+        cache.clear()
+        Group.objects.get_or_create(name='Hydroshare Author')
+        self.user = hydroshare.create_account(
+            'user1@nowhere.com',
+            username='user1',
+            first_name='Creator_FirstName',
+            last_name='Creator_LastName',
+            superuser=False,
+            groups=[]
+        )
+        self.resources = []
+        for title in ('first resource', 'second resource'):
+            resource = hydroshare.create_resource('GenericResource', self.user, title)
+            resource.raccess.public = True
+            resource.raccess.save()
+            self.resources.append(resource)
+        # private resources are not in the site map
+        self.private = hydroshare.create_resource('GenericResource', self.user,
+                                                  'private resource')
+        self.client = Client()
+        # one resource per section
+        self.page_size = patch('hs_sitemap.views.SITEMAP_PAGE_SIZE', 1)
+        self.page_size.start()
+
+    def tearDown(self):
+        self.page_size.stop()
+        for resource in self.resources + [self.private]:
+            resource.delete()
+        super(TestSitemapViews, self).tearDown()
+
+    def _section_xml(self, page, **headers):
+        response = self.client.get('/sitemap/GenericResource/{}.xml'.format(page), **headers)
+        content = ''.join(response.streaming_content) if response.streaming else \
+            response.content
+        return response, content
+
+    def test_sitemap_index(self):
+        response = self.client.get('/sitemap/resources.xml')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/xml')
+        self.assertIn('/sitemap/GenericResource/1.xml', response.content)
+        self.assertIn('/sitemap/GenericResource/2.xml', response.content)
+        self.assertNotIn('/sitemap/GenericResource/3.xml', response.content)
+
+        response = self.client.get('/sitemap/')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('/sitemap/GenericResource/2/', response.content)
+
+    def test_sitemap_sections(self):
+        first, second = sorted(self.resources, key=lambda r: r.id)
+        response, content = self._section_xml(1)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('/resource/{}/'.format(first.short_id), content)
+        self.assertNotIn('/resource/{}/'.format(second.short_id), content)
+        self.assertNotIn('/resource/{}/'.format(self.private.short_id), content)
+
+        response, content = self._section_xml(2)
+        self.assertIn('/resource/{}/'.format(second.short_id), content)
+
+        response = self.client.get('/sitemap/GenericResource/2/')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('second resource', response.content)
+
+        # pages past the last section and unknown types are not found
+        self.assertEqual(self._section_xml(3)[0].status_code, 404)
+        self.assertEqual(self._section_xml(0)[0].status_code, 404)
+        self.assertEqual(self.client.get('/sitemap/NoSuchResource/1.xml').status_code, 404)
+
+    def test_sitemap_etag(self):
+        response, _ = self._section_xml(1)
+        etag = response['ETag']
+        self.assertTrue(response.has_header('Last-Modified'))
+
+        # an unchanged section is not sent again
+        response, _ = self._section_xml(1, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        # updating a resource of the type changes the section
+        self.resources[0].save()
+        response, _ = self._section_xml(1, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+        response = self.client.get('/sitemap/resources.xml')
+        response = self.client.get('/sitemap/resources.xml', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_sitemap_section_per_user(self):
+        other_user = hydroshare.create_account(
+            'user2@nowhere.com',
+            username='user2',
+            first_name='Other_FirstName',
+            last_name='Other_LastName',
+            superuser=False,
+            groups=[],
+            password='mypassword2'
+        )
+        self.user.set_password('mypassword1')
+        self.user.save()
+        for user, password, other in ((self.user, 'mypassword1', other_user),
+                                      (other_user, 'mypassword2', self.user)):
+            client = Client()
+            self.assertTrue(client.login(username=user.username, password=password))
+            response = client.get('/sitemap/GenericResource/1/')
+            self.assertEqual(response.status_code, 200)
+            # the page shows the menu of the user viewing it, not of an earlier visitor
+            self.assertIn(user.email, response.content)
+            self.assertNotIn(other.email, response.content)
+            self.assertFalse(response.has_header('ETag'))
+
+        # HTML pages are not answered with a 304, since they differ from user to user
+        response = self.client.get('/sitemap/')
+        self.assertFalse(response.has_header('ETag'))
+        self.assertFalse(response.has_header('Last-Modified'))
+
+    def test_sitemap_section_cached(self):
+        with patch('hs_sitemap.views._section_rows', wraps=views._section_rows) as section_rows:
+            _, content = self._section_xml(1)
+            _, cached_content = self._section_xml(1)
+            self.assertEqual(cached_content, content)
+            self.assertEqual(section_rows.call_count, 1)
+
+            self.client.get('/sitemap/GenericResource/1/')
+            self.client.get('/sitemap/GenericResource/1/')
+            self.assertEqual(section_rows.call_count, 2)
+
+            # a changed section is generated again
+            self.resources[0].save()
+            self._section_xml(1)
+            self.assertEqual(section_rows.call_count, 3)
@@ -1,16 +1,181 @@
+"""
+Site map of the public and discoverable resources.
+
+The site map is split in sections, one per resource type and page of at most
+SITEMAP_PAGE_SIZE resources (capped at the 50,000 URLs of the sitemaps.org protocol):
+
+- /sitemap/ is a page listing the sections, and /sitemap/<type>/<page>/ lists the
+  resources of a section;
+- /sitemap/resources.xml is a sitemap index of the sections, served to crawlers as
+  /sitemap/<type>/<page>.xml.
+
+Sections are generated from values_list queries rather than resource instances, and are
+cached for SITEMAP_CACHE_TIMEOUT seconds under a version made of the number of resources
+of the type and the latest time one of them was updated. The same version is used as
+ETag and Last-Modified of the XML views, so crawlers revisiting an unchanged section get
+a 304. The HTML pages show the menu of the user viewing them, so only the resources of
+a section are cached for them, and the pages are rendered for every request.
+"""
+
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.urlresolvers import reverse
+from django.db.models import Q, Count, Max
+from django.http import Http404, HttpResponse, StreamingHttpResponse
 from django.shortcuts import render
-from django.db.models import Q
+from django.utils.html import escape
+from django.views.decorators.http import condition
 
 from hs_core.hydroshare.utils import get_resource_types
+from hs_core.models import BaseResource
+
+# maximum number of URLs in a sitemap, per the sitemaps.org protocol
+SITEMAP_MAX_URLS = 50000
+SITEMAP_PAGE_SIZE = min(getattr(settings, 'SITEMAP_PAGE_SIZE', SITEMAP_MAX_URLS),
+                        SITEMAP_MAX_URLS)
+SITEMAP_CACHE_TIMEOUT = getattr(settings, 'SITEMAP_CACHE_TIMEOUT', 60 * 60)
+
+_REQUEST_ATTRIBUTE = '_hs_sitemap_sections'
+
+
+def _discoverable_resources():
+    return BaseResource.objects.filter(Q(raccess__public=True) | Q(raccess__discoverable=True))
+
+
+def _get_sections(request):
+    """
+    Return {resource type name: (number of resources, latest update)} of the discoverable
+    resources, queried once per request.
+    """
+    sections = getattr(request, _REQUEST_ATTRIBUTE, None)
+    if sections is None:
+        type_names = [rt.__name__ for rt in get_resource_types()]
+        sections = {}
+        for resource_type, count, latest in _discoverable_resources()\
+                .filter(resource_type__in=type_names)\
+                .values_list('resource_type')\
+                .annotate(count=Count('id'), latest=Max('updated')):
+            sections[resource_type] = (count, latest)
+        setattr(request, _REQUEST_ATTRIBUTE, sections)
+    return sections
+
+
+def _get_section(request, resource_type, page):
+    """Return (number of resources, latest update) of a section, or raise Http404."""
+    count, latest = _get_sections(request).get(resource_type, (0, None))
+    page = int(page)
+    if page < 1 or (page - 1) * SITEMAP_PAGE_SIZE >= count:
+        raise Http404("Site map section not found.")
+    return count, latest
+
+
+def _page_count(count):
+    return (count + SITEMAP_PAGE_SIZE - 1) // SITEMAP_PAGE_SIZE
+
+
+def _version(*parts):
+    return hashlib.md5(repr(parts)).hexdigest()
+
+
+def _index_etag(request, *args, **kwargs):
+    return _version(sorted(_get_sections(request).items()))
+
+
+def _index_last_modified(request, *args, **kwargs):
+    latest = [latest for count, latest in _get_sections(request).values() if latest is not None]
+    return max(latest) if latest else None
+
+
+def _section_etag(request, resource_type, page):
+    return _version(resource_type, page, _get_section(request, resource_type, page))
+
+
+def _section_last_modified(request, resource_type, page):
+    return _get_section(request, resource_type, page)[1]
+
+
+def _section_rows(resource_type, page):
+    """Yield (short_id, title, updated) of the resources of a section, ordered by id."""
+    page = int(page)
+    return _discoverable_resources()\
+        .filter(resource_type=resource_type)\
+        .order_by('id')\
+        .values_list('short_id', 'title', 'updated')[(page - 1) * SITEMAP_PAGE_SIZE:
+                                                     page * SITEMAP_PAGE_SIZE]\
+        .iterator()
+
+
+def _lastmod(updated):
+    return '<lastmod>{}</lastmod>'.format(updated.isoformat()) if updated is not None else ''
+
+
+def _caching(key, chunks):
+    """Yield chunks, and cache their concatenation once all have been generated."""
+    content = []
+    for chunk in chunks:
+        content.append(chunk)
+        yield chunk
+    cache.set(key, ''.join(content), SITEMAP_CACHE_TIMEOUT)
 
 
 def sitemap(request):
-    resource_types = (
-        (rt.__name__, {
-            "resources": rt.objects.filter(Q(raccess__public=True) | Q(raccess__discoverable=True)),
-        })
-        for rt in get_resource_types()
-    )
+    sections = _get_sections(request)
+    resource_types = [
+        (name, {"count": sections[name][0],
+                "pages": range(1, _page_count(sections[name][0]) + 1)})
+        for name in sorted(sections)
+    ]
     return render(request, "sitemap.html", {
         "resource_types": resource_types,
     })
+
+
+def sitemap_section(request, resource_type, page):
+    key = 'hs_sitemap:rows:' + _section_etag(request, resource_type, page)
+    resources = cache.get(key)
+    if resources is None:
+        resources = list(_section_rows(resource_type, page))
+        cache.set(key, resources, SITEMAP_CACHE_TIMEOUT)
+    return render(request, "sitemap_section.html", {
+        "resource_type": resource_type,
+        "page": int(page),
+        "resources": resources,
+    })
+
+
+@condition(etag_func=_index_etag, last_modified_func=_index_last_modified)
+def sitemap_index_xml(request):
+    sections = _get_sections(request)
+    lines = ['<?xml version="1.0" encoding="UTF-8"?>',
+             '<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">']
+    for name in sorted(sections):
+        count, latest = sections[name]
+        for page in range(1, _page_count(count) + 1):
+            url = request.build_absolute_uri(
+                reverse('sitemap_section_xml', kwargs={'resource_type': name, 'page': page}))
+            lines.append('<sitemap><loc>{}</loc>{}</sitemap>'.format(escape(url), _lastmod(latest)))
+    lines.append('</sitemapindex>')
+    return HttpResponse('\n'.join(lines), content_type='application/xml')
+
+
+@condition(etag_func=_section_etag, last_modified_func=_section_last_modified)
+def sitemap_section_xml(request, resource_type, page):
+    key = 'hs_sitemap:xml:' + _section_etag(request, resource_type, page)
+    content = cache.get(key)
+    if content is not None:
+        return HttpResponse(content, content_type='application/xml')
+
+    # the resource URLs are those of the resource landing pages, /resource/<short_id>/
+    base_url = request.build_absolute_uri('/resource/')
+
+    def generate():
+        yield '<?xml version="1.0" encoding="UTF-8"?>\n' \
+              '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n'
+        for short_id, title, updated in _section_rows(resource_type, page):
+            yield '<url><loc>{}{}/</loc>{}</url>\n'.format(
+                escape(base_url), short_id, _lastmod(updated))
+        yield '</urlset>\n'
+
+    return StreamingHttpResponse(_caching(key, generate()), content_type='application/xml')
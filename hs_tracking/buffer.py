@@ -0,0 +1,125 @@
+"""
+Buffered recording of tracking variables.
+
+The tracking middleware records a 'visit' for every successful human request. Rather than
+inserting each visit in the request, visits are appended to an in-process buffer and
+written with one bulk_create by a background thread, every TRACKING_FLUSH_INTERVAL seconds
+or as soon as TRACKING_FLUSH_SIZE visits are waiting. At most TRACKING_BUFFER_SIZE visits
+are held; visits beyond that are dropped and counted, so that a slow database does not
+exhaust memory. Visits still buffered when the process exits are flushed at exit.
+
+Counters (group 'tracking', see hs_core.counters) report the buffer depth at the last
+flush by any process, and the numbers of visits flushed and dropped by all processes. They
+are kept in redis, so that they can be read with the `counters` management command.
+"""
+
+import atexit
+import logging
+import os
+import threading
+from collections import deque
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils import timezone
+
+from hs_core.counters import increment_counter, set_counter
+
+from .models import Variable
+
+logger = logging.getLogger(__name__)
+
+TRACKING_COUNTERS = 'tracking'
+
+
+class VariableBuffer(object):
+    """A bounded, thread-safe buffer of Variable records flushed in bulk."""
+
+    def __init__(self, max_size, flush_size, flush_interval):
+        """
+        :param max_size: number of records held before records are dropped
+        :param flush_size: number of records that triggers a flush
+        :param flush_interval: seconds between flushes by the background thread, or None
+            for no thread; records are then flushed in the request that fills flush_size
+        """
+        self.max_size = max_size
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self._records = deque()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._pid = None
+
+    def __len__(self):
+        return len(self._records)
+
+    def record(self, session_id, name, value=None):
+        """
+        Queue a variable of the tracking session with id session_id, timestamped now.
+
+        :return: True if the variable was queued, False if it was dropped because the
+            buffer is full.
+        """
+        variable = Variable(session_id=session_id, timestamp=timezone.now(), name=name,
+                            type=Variable.get_type_code(value), value=Variable.encode(value))
+        with self._lock:
+            full = len(self._records) >= self.max_size
+            if not full:
+                self._records.append(variable)
+            depth = len(self._records)
+        if full:
+            # counted outside of the lock, so that requests do not wait for redis
+            increment_counter(TRACKING_COUNTERS, 'dropped')
+            return False
+
+        if depth >= self.flush_size:
+            if self.flush_interval:
+                self._wakeup.set()
+            else:
+                self.flush()
+        self._ensure_thread()
+        return True
+
+    def flush(self):
+        """Write all buffered records with one bulk_create; returns the number written."""
+        with self._lock:
+            records = list(self._records)
+            self._records.clear()
+        set_counter(TRACKING_COUNTERS, 'buffer_depth', len(records))
+        if not records:
+            return 0
+
+        try:
+            close_old_connections()
+            Variable.objects.bulk_create(records)
+        except Exception:
+            logger.exception("Failed to write %d tracking variables.", len(records))
+            increment_counter(TRACKING_COUNTERS, 'dropped', len(records))
+            return 0
+        increment_counter(TRACKING_COUNTERS, 'flushed', len(records))
+        return len(records)
+
+    def _ensure_thread(self):
+        # a forked worker process does not inherit the thread of its parent
+        if not self.flush_interval or self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='hs_tracking_flush')
+            self._thread.daemon = True
+            self._thread.start()
+        atexit.register(self.flush)
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+
+
+visit_buffer = VariableBuffer(max_size=getattr(settings, 'TRACKING_BUFFER_SIZE', 10000),
+                              flush_size=getattr(settings, 'TRACKING_FLUSH_SIZE', 500),
+                              flush_interval=getattr(settings, 'TRACKING_FLUSH_INTERVAL', 5))
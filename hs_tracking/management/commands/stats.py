@@ -7,12 +7,13 @@ from optparse import make_option
 
 from django.contrib.auth.models import User
 from django.core.management.base import BaseCommand
-from django.db.models import Q
+from django.db.models import Sum
 from django.utils import timezone
-from hs_core.models import BaseResource
+from hs_core.models import BaseResource, ResourceFile, Date, Title
 from theme.models import UserProfile
 
 from ... import models as hs_tracking
+from ...rollups import rollup_days, rollup_pending
 
 # Add logger for stderr messages.
 err = logging.getLogger('stats-command')
@@ -37,6 +38,14 @@ def month_year_iter(start, end):
         yield timezone.datetime(y, m, d, tzinfo=timezone.pytz.utc)
 
 
+def monthly_active_users(start_date, end_date):
+    """Return the number of distinct users active from start_date to end_date, from the
+    daily rollups."""
+    return hs_tracking.DailyActiveUser.objects\
+        .filter(date__gte=start_date, date__lte=end_date)\
+        .values('user_id').distinct().count()
+
+
 class Command(BaseCommand):
     help = "Output engagement stats about HydroShare"
 
@@ -77,6 +86,30 @@ class Command(BaseCommand):
             action="store_true",
             help="dump tracking variables collected today",
         ),
+        make_option(
+            "--monthly-activity",
+            dest="monthly_activity",
+            action="store_true",
+            help="visits, sessions, active users and downloads by month",
+        ),
+        make_option(
+            "--resources-downloads",
+            dest="resources_downloads",
+            action="store_true",
+            help="number of downloads of each resource",
+        ),
+        make_option(
+            "--rollup",
+            dest="rollup",
+            action="store_true",
+            help="roll up tracking variables of the days not yet rolled up",
+        ),
+        make_option(
+            "--backfill",
+            dest="backfill",
+            metavar="YYYY-MM-DD",
+            help="recompute daily rollups from this day through yesterday, a day at a time",
+        ),
     )
 
     def print_var(self, var_name, value, period=None):
@@ -100,17 +133,33 @@ class Command(BaseCommand):
         org_count = profiles.values('organization').distinct().count()
         self.print_var("monthly_orgs_counts", org_count, (start_date, end_date))
 
-    def monthly_users_by_type(self, start_date, end_date):
-        user_types = UserProfile.objects.values('user_type').distinct()
-        for ut in [_['user_type'] for _ in user_types]:
-            ut_users = User.objects.filter(userprofile__user_type=ut)
-            sessions = hs_tracking.Session.objects.filter(
-                Q(begin__gte=start_date) &
-                Q(begin__lte=end_date) &
-                Q(visitor__user__in=ut_users)
-            )
+    def monthly_users_by_type(self, start_date, end_date, user_types):
+        # sessions begun in the month, from the daily rollups
+        sessions = dict(hs_tracking.DailyUserTypeActivity.objects
+                        .filter(date__gte=start_date, date__lte=end_date)
+                        .values_list('user_type')
+                        .annotate(Sum('sessions')))
+        for ut in user_types:
             self.print_var("active_{}".format(ut),
-                           sessions.count(), (end_date, start_date))
+                           sessions.get(ut, 0), (end_date, start_date))
+
+    def monthly_activity(self, start_date, end_date):
+        totals = hs_tracking.DailyActivity.objects\
+            .filter(date__gte=start_date, date__lte=end_date)\
+            .aggregate(Sum('visits'), Sum('sessions'), Sum('downloads'))
+        # users active on several days count once, so they are counted from the daily
+        # active users rather than summed
+        totals['users__sum'] = monthly_active_users(start_date, end_date)
+        for name in ('visits', 'sessions', 'users', 'downloads'):
+            self.print_var("monthly_{}".format(name),
+                           totals['{}__sum'.format(name)] or 0, (start_date, end_date))
+
+    def resources_downloads(self):
+        w = csv.writer(sys.stdout)
+        w.writerow(['resource id', 'downloads'])
+        for resource_id, downloads in hs_tracking.DailyResourceDownloads.objects\
+                .values_list('resource_id').annotate(Sum('downloads')).order_by('resource_id'):
+            w.writerow([resource_id, downloads])
 
     def users_details(self):
         w = csv.writer(sys.stdout)
@@ -152,12 +201,29 @@ class Command(BaseCommand):
         ]
         w.writerow(fields)
 
-        for r in BaseResource.objects.all():
+        # read the metadata of all resources in bulk rather than resource by resource;
+        # metadata elements are keyed by their metadata object
+        created = dict(((ct, oid), start_date) for ct, oid, start_date in
+                       Date.objects.filter(type="created")
+                                   .values_list('content_type_id', 'object_id', 'start_date'))
+        titles = dict(((ct, oid), value) for ct, oid, value in
+                      Title.objects.values_list('content_type_id', 'object_id', 'value'))
+        # file sizes recorded in the database; unknown sizes are computed by r.size
+        sizes = dict(ResourceFile.objects.filter(_size__gte=0)
+                                         .values_list('object_id')
+                                         .annotate(Sum('_size')))
+        unknown = set(ResourceFile.objects.filter(_size__lt=0)
+                                          .values_list('object_id', flat=True))
+
+        for r in BaseResource.objects.select_related('raccess', 'user__userprofile')\
+                .iterator():
+            metadata_key = (r.content_type_id, r.object_id)
+            created_date = created.get(metadata_key)
             values = [
-                r.metadata.dates.get(type="created").start_date.strftime("%m/%d/%Y %H:%M:%S.%f"),
-                r.metadata.title.value,
+                created_date.strftime("%m/%d/%Y %H:%M:%S.%f") if created_date else "",
+                titles.get(metadata_key, ""),
                 r.resource_type,
-                r.size,
+                r.size if r.id in unknown else sizes.get(r.id, 0),
                 r.raccess.sharing_status,
                 r.user.userprofile.user_type,
                 r.user_id
@@ -205,10 +271,23 @@ class Command(BaseCommand):
                 self.monthly_orgs_counts(start_date, month_end)
         if options["users_details"]:
             self.users_details()
+        if options["backfill"]:
+            first_day = datetime.datetime.strptime(options["backfill"], "%Y-%m-%d").date()
+            days = rollup_days(first_day, end_date.date() - datetime.timedelta(days=1))
+            self.print_var("rolled_up_days", days)
+        if options["rollup"]:
+            self.print_var("rolled_up_days", rollup_pending())
         if options["monthly_users_by_type"]:
+            user_types = list(UserProfile.objects.values_list('user_type', flat=True).distinct())
+            for month_end in month_year_iter(start_date, end_date):
+                month_start = month_end.replace(day=1)
+                self.monthly_users_by_type(month_start.date(), month_end.date(), user_types)
+        if options["monthly_activity"]:
             for month_end in month_year_iter(start_date, end_date):
                 month_start = month_end.replace(day=1)
-                self.monthly_users_by_type(month_start, month_end)
+                self.monthly_activity(month_start.date(), month_end.date())
+        if options["resources_downloads"]:
+            self.resources_downloads()
         if options["resources_details"]:
             self.resources_details()
         if options["yesterdays_variables"]:
@@ -1,10 +1,50 @@
-from .models import Session
+import time
+
+from .models import Session, SESSION_TIMEOUT
+from .buffer import visit_buffer
 import utils
 
+# key of the tracking session details cached in the django session
+VISIT_INFO_KEY = 'hs_tracking_visit'
+# seconds between updates of the cached time of last visit, to limit django session writes
+VISIT_SEEN_RESOLUTION = 60
+
+
+def get_visit_info(request):
+    """Return (tracking session id, user type, user email domain) for a request.
+
+    These are cached in the django session while the tracking session is active, so that
+    most requests resolve them without querying the tracking tables.
+    """
+    user = getattr(request, 'user', None)
+    user_id = user.pk if user is not None and user.is_authenticated() else None
+    signed_id = request.session.get('hs_tracking_id')
+    now = time.time()
+
+    info = request.session.get(VISIT_INFO_KEY)
+    if info is None or info['signed_id'] != signed_id or info['user_id'] != user_id or \
+            now - info['seen'] >= SESSION_TIMEOUT:
+        session = Session.objects.for_request(request)
+        info = {'signed_id': request.session.get('hs_tracking_id'),
+                'session_id': session.id,
+                'user_id': user_id,
+                'user_type': utils.get_user_type(session),
+                'email_domain': utils.get_user_email_domain(session),
+                'seen': now}
+        request.session[VISIT_INFO_KEY] = info
+    elif now - info['seen'] >= VISIT_SEEN_RESOLUTION:
+        info['seen'] = now
+        request.session[VISIT_INFO_KEY] = info
+
+    return info['session_id'], info['user_type'], info['email_domain']
+
 
 class Tracking(object):
     """The default tracking middleware logs all successful responses as a 'visit' variable with
-    the URL path as its value."""
+    the URL path as its value.
+
+    Visits are queued in hs_tracking.buffer.visit_buffer and written to the database in bulk.
+    """
 
     def process_response(self, request, response):
 
@@ -23,9 +63,7 @@ class Tracking(object):
             return response
 
         # get user info that will be recorded in the visit log
-        session = Session.objects.for_request(request)
-        usertype = utils.get_user_type(session)
-        emaildomain = utils.get_user_email_domain(session)
+        session_id, usertype, emaildomain = get_visit_info(request)
         ip = utils.get_client_ip(request)
 
         # build the message string (key:value pairs)
@@ -37,7 +75,7 @@ class Tracking(object):
                          'user_email_domain=%s' % emaildomain,
                          'request_url=%s' % request.path]])
 
-        # save the activity in the database
-        session.record('visit', msg)
+        # queue the activity; it is saved in the database in bulk
+        visit_buffer.record(session_id, 'visit', msg)
 
         return response
@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hs_tracking', '0005_auto_20170506_1538'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyActivity',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', serialize=False, auto_created=True, primary_key=True)),
+                ('date', models.DateField(unique=True)),
+                ('visits', models.IntegerField(default=0)),
+                ('sessions', models.IntegerField(default=0)),
+                ('users', models.IntegerField(default=0, help_text=b'distinct authenticated users active')),
+                ('downloads', models.IntegerField(default=0)),
+                ('computed', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='DailyResourceDownloads',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', serialize=False, auto_created=True, primary_key=True)),
+                ('date', models.DateField(db_index=True)),
+                ('resource_id', models.CharField(help_text=b'resource short_id', max_length=32, db_index=True)),
+                ('downloads', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='DailyUserTypeActivity',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', serialize=False, auto_created=True, primary_key=True)),
+                ('date', models.DateField(db_index=True)),
+                ('user_type', models.CharField(max_length=1024, null=True, blank=True)),
+                ('visits', models.IntegerField(default=0)),
+                ('sessions', models.IntegerField(default=0)),
+                ('users', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.AlterUniqueTogether(
+            name='dailyusertypeactivity',
+            unique_together=set([('date', 'user_type')]),
+        ),
+        migrations.AlterUniqueTogether(
+            name='dailyresourcedownloads',
+            unique_together=set([('date', 'resource_id')]),
+        ),
+    ]
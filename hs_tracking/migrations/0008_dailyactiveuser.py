@@ -0,0 +1,26 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hs_tracking', '0007_variable_timestamp_default'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyActiveUser',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', serialize=False, auto_created=True, primary_key=True)),
+                ('date', models.DateField(db_index=True)),
+                ('user_id', models.IntegerField(db_index=True)),
+            ],
+        ),
+        migrations.AlterUniqueTogether(
+            name='dailyactiveuser',
+            unique_together=set([('date', 'user_id')]),
+        ),
+    ]
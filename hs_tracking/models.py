@@ -2,6 +2,7 @@ from datetime import datetime, timedelta
 
 from django.db import models
 from django.core import signing
+from django.utils import timezone
 from django.conf import settings
 from django.core.exceptions import ImproperlyConfigured
 
@@ -117,7 +118,8 @@ class Variable(models.Model):
     ]
 
     session = models.ForeignKey(Session)
-    timestamp = models.DateTimeField(auto_now_add=True)
+    # not auto_now_add, which would stamp buffered variables when they are written
+    timestamp = models.DateTimeField(default=timezone.now)
     name = models.CharField(max_length=32)
     type = models.IntegerField(choices=TYPE_CHOICES)
     # change value to TextField to be less restrictive as max_length of CharField has been
@@ -146,18 +148,19 @@ class Variable(models.Model):
         return ' '.join(msg_items)
 
     @classmethod
-    def record(cls, session, name, value=None):
+    def get_type_code(cls, value):
         for i, (label, coercer) in enumerate(cls.TYPES, 0):
             try:
                 if value == coercer(value):
-                    type_code = i
-                    break
+                    return i
             except (ValueError, TypeError):
                 continue
-        else:
-            raise TypeError("Unable to record variable of unrecognized type %s",
-                            type(value).__name__)
-        return Variable.objects.create(session=session, name=name, type=type_code,
+        raise TypeError("Unable to record variable of unrecognized type %s",
+                        type(value).__name__)
+
+    @classmethod
+    def record(cls, session, name, value=None):
+        return Variable.objects.create(session=session, name=name, type=cls.get_type_code(value),
                                        value=cls.encode(value))
 
     @classmethod
@@ -171,3 +174,51 @@ class Variable(models.Model):
         else:
             raise ValueError("Unknown type (%s) for tracking variable: %r",
                              type(value).__name__, value)
+
+
+class DailyActivity(models.Model):
+    """Totals of the tracking variables of one day (UTC), computed by hs_tracking.rollups.
+
+    A row exists for every day that has been rolled up, including days without activity.
+    """
+    date = models.DateField(unique=True)
+    visits = models.IntegerField(default=0)
+    sessions = models.IntegerField(default=0)
+    users = models.IntegerField(default=0, help_text='distinct authenticated users active')
+    downloads = models.IntegerField(default=0)
+    computed = models.DateTimeField(auto_now=True)
+
+
+class DailyUserTypeActivity(models.Model):
+    """Activity of authenticated users of one user type in one day (UTC)."""
+    date = models.DateField(db_index=True)
+    user_type = models.CharField(max_length=1024, null=True, blank=True)
+    visits = models.IntegerField(default=0)
+    sessions = models.IntegerField(default=0)
+    users = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ('date', 'user_type')
+
+
+class DailyActiveUser(models.Model):
+    """An authenticated user active in one day (UTC).
+
+    Distinct users of longer periods cannot be summed from the daily counts of users, so
+    they are counted from these rows.
+    """
+    date = models.DateField(db_index=True)
+    user_id = models.IntegerField(db_index=True)
+
+    class Meta:
+        unique_together = ('date', 'user_id')
+
+
+class DailyResourceDownloads(models.Model):
+    """Number of file downloads from one resource in one day (UTC)."""
+    date = models.DateField(db_index=True)
+    resource_id = models.CharField(max_length=32, db_index=True, help_text='resource short_id')
+    downloads = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ('date', 'resource_id')
@@ -0,0 +1,119 @@
+"""
+Daily rollups of the tracking variables.
+
+Engagement statistics are read from small per-day tables rather than by scanning Session
+and Variable. Each day (UTC) is rolled up once it is over, by the nightly celery task
+rollup_tracking_variables or by `manage.py stats --rollup`; history is backfilled a day
+at a time with `manage.py stats --backfill`. Rolling up a day replaces its rows, so a day
+can safely be rolled up again.
+"""
+
+import datetime
+import re
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Count
+from django.utils import timezone
+
+from .models import Session, Variable, DailyActivity, DailyActiveUser, \
+    DailyUserTypeActivity, DailyResourceDownloads
+
+# resource short_id recorded in 'download' variables
+_RESOURCE_GUID = re.compile(r'(?:^| )resource_guid=(\S+)')
+
+
+def day_range(day):
+    """Return the (start, end) datetimes (UTC) of a day."""
+    start = datetime.datetime.combine(day, datetime.time.min).replace(tzinfo=timezone.utc)
+    return start, start + datetime.timedelta(days=1)
+
+
+def rollup_day(day):
+    """Compute the rollups of one day from Session and Variable, replacing existing rows."""
+    start, end = day_range(day)
+    variables = Variable.objects.filter(timestamp__gte=start, timestamp__lt=end)
+    sessions = Session.objects.filter(begin__gte=start, begin__lt=end)
+
+    # authenticated activity, by user type
+    visits_by_type = defaultdict(int)
+    users_by_type = defaultdict(int)
+    user_ids = set()
+    sessions_by_type = defaultdict(int)
+    visits = 0
+    for user_id, user_type, count in variables.filter(name='visit')\
+            .values_list('session__visitor__user_id',
+                         'session__visitor__user__userprofile__user_type')\
+            .annotate(count=Count('id')):
+        visits += count
+        if user_id is not None:
+            visits_by_type[user_type] += count
+    for user_id, user_type in variables.exclude(session__visitor__user=None)\
+            .values_list('session__visitor__user_id',
+                         'session__visitor__user__userprofile__user_type').distinct():
+        users_by_type[user_type] += 1
+        user_ids.add(user_id)
+    session_count = 0
+    for user_id, user_type, count in sessions\
+            .values_list('visitor__user_id', 'visitor__user__userprofile__user_type')\
+            .annotate(count=Count('id')):
+        session_count += count
+        if user_id is not None:
+            sessions_by_type[user_type] += count
+
+    downloads = defaultdict(int)
+    for value in variables.filter(name='download').values_list('value', flat=True).iterator():
+        match = _RESOURCE_GUID.search(value)
+        if match:
+            downloads[match.group(1)] += 1
+
+    user_types = set(visits_by_type) | set(users_by_type) | set(sessions_by_type)
+    with transaction.atomic():
+        DailyUserTypeActivity.objects.filter(date=day).delete()
+        DailyUserTypeActivity.objects.bulk_create([
+            DailyUserTypeActivity(date=day, user_type=user_type,
+                                  visits=visits_by_type[user_type],
+                                  sessions=sessions_by_type[user_type],
+                                  users=users_by_type[user_type])
+            for user_type in user_types])
+        DailyActiveUser.objects.filter(date=day).delete()
+        DailyActiveUser.objects.bulk_create([
+            DailyActiveUser(date=day, user_id=user_id) for user_id in user_ids])
+        DailyResourceDownloads.objects.filter(date=day).delete()
+        DailyResourceDownloads.objects.bulk_create([
+            DailyResourceDownloads(date=day, resource_id=resource_id, downloads=count)
+            for resource_id, count in downloads.items()])
+        DailyActivity.objects.update_or_create(
+            date=day, defaults={'visits': visits,
+                                'sessions': session_count,
+                                'users': sum(users_by_type.values()),
+                                'downloads': sum(downloads.values())})
+
+
+def rollup_days(first_day, last_day):
+    """Roll up each day from first_day through last_day, one transaction per day.
+
+    :return: number of days rolled up
+    """
+    count = 0
+    day = first_day
+    while day <= last_day:
+        rollup_day(day)
+        count += 1
+        day += datetime.timedelta(days=1)
+    return count
+
+
+def rollup_pending(today=None):
+    """Roll up the days that are over and not yet rolled up.
+
+    Days after the last rolled up day are computed through yesterday. If nothing has been
+    rolled up yet, only yesterday is computed; use rollup_days to backfill history.
+    :return: number of days rolled up
+    """
+    if today is None:
+        today = timezone.now().date()
+    yesterday = today - datetime.timedelta(days=1)
+    last = DailyActivity.objects.order_by('-date').values_list('date', flat=True).first()
+    first_day = last + datetime.timedelta(days=1) if last is not None else yesterday
+    return rollup_days(first_day, yesterday)
@@ -0,0 +1,19 @@
+"""Define celery tasks for hs_tracking app."""
+
+from __future__ import absolute_import
+
+import logging
+
+from celery.task import periodic_task
+from celery.schedules import crontab
+
+from .rollups import rollup_pending
+
+logger = logging.getLogger('django')
+
+
+@periodic_task(ignore_result=True, run_every=crontab(minute=30, hour=0))
+def rollup_tracking_variables():
+    """Roll up the tracking variables of the days that are over into the daily tables."""
+    days = rollup_pending()
+    logger.info("Rolled up tracking variables of {} days.".format(days))
@@ -1,15 +1,25 @@
 from datetime import datetime, timedelta
 import csv
+import time
 from cStringIO import StringIO
 
-from django.test import TestCase
+from django.test import TestCase, override_settings
 from django.contrib.auth.models import User
+from django.utils import timezone
 from django.test import Client
 from django.http import HttpRequest, QueryDict, response
 from mock import patch, Mock
 
-from .models import Variable, Session, Visitor, SESSION_TIMEOUT, VISITOR_FIELDS
+from hs_core.counters import get_counters
+from hs_core.testing import MockRedis
+
+from .models import Variable, Session, Visitor, SESSION_TIMEOUT, VISITOR_FIELDS, \
+    DailyActivity, DailyActiveUser, DailyUserTypeActivity, DailyResourceDownloads
+from .rollups import rollup_day, rollup_pending
+from .management.commands.stats import monthly_active_users
 from .views import AppLaunch
+from .buffer import VariableBuffer, TRACKING_COUNTERS
+from .middleware import get_visit_info
 import utils
 import urllib
 
@@ -191,6 +201,66 @@ class TrackingTests(TestCase):
         self.assertNotEqual(session1.id, session2.id)
         self.assertNotEqual(session1.visitor.id, session2.visitor.id)
 
+    def test_visit_info_cached(self):
+        request = self.createRequest(user=self.user)
+        request.session = {}
+        session_id, _, email_domain = get_visit_info(request)
+        self.assertEqual(email_domain, 'com')
+        with self.assertNumQueries(0):
+            self.assertEqual(get_visit_info(request)[0], session_id)
+
+        # a new tracking session is resolved when the cached one has expired
+        with patch('hs_tracking.middleware.time') as time_mock:
+            time_mock.time.return_value = time.time() + SESSION_TIMEOUT
+            with patch('hs_tracking.models.datetime') as dt_mock:
+                dt_mock.now.return_value = datetime.now() + timedelta(seconds=SESSION_TIMEOUT)
+                self.assertNotEqual(get_visit_info(request)[0], session_id)
+
+    def test_buffered_variables(self):
+        buf = VariableBuffer(max_size=2, flush_size=10, flush_interval=None)
+        self.assertTrue(buf.record(self.session.id, 'visit', 'request_url=/a/'))
+        self.assertTrue(buf.record(self.session.id, 'visit', 'request_url=/b/'))
+        # the buffer is full
+        self.assertFalse(buf.record(self.session.id, 'visit', 'request_url=/c/'))
+        self.assertEqual(Variable.objects.filter(name='visit').count(), 0)
+
+        self.assertEqual(buf.flush(), 2)
+        self.assertEqual(len(buf), 0)
+        self.assertEqual(sorted(self.session.getlist('visit')),
+                         ['request_url=/a/', 'request_url=/b/'])
+
+        # without a flush thread, filling flush_size flushes
+        buf = VariableBuffer(max_size=2, flush_size=1, flush_interval=None)
+        buf.record(self.session.id, 'visit', 'request_url=/d/')
+        self.assertEqual(len(buf), 0)
+        self.assertEqual(Variable.objects.filter(name='visit').count(), 3)
+
+    def test_buffered_variable_counters(self):
+        with override_settings(REDIS_CONNECTION=MockRedis()):
+            buf = VariableBuffer(max_size=2, flush_size=10, flush_interval=None)
+            for path in ('/a/', '/b/', '/c/'):
+                buf.record(self.session.id, 'visit', 'request_url=' + path)
+            buf.flush()
+            # counters are shared by all processes, so that they can be read by any process
+            self.assertEqual(get_counters(TRACKING_COUNTERS),
+                             {'dropped': 1, 'buffer_depth': 2, 'flushed': 2})
+
+            with patch.object(Variable.objects, 'bulk_create', side_effect=Exception):
+                buf.record(self.session.id, 'visit', 'request_url=/d/')
+                buf.flush()
+            self.assertEqual(get_counters(TRACKING_COUNTERS),
+                             {'dropped': 2, 'buffer_depth': 1, 'flushed': 2})
+
+    def test_buffered_variable_timestamp(self):
+        # variables keep the time they were recorded, not the time they were flushed
+        recorded = timezone.now() - timedelta(seconds=30)
+        buf = VariableBuffer(max_size=2, flush_size=10, flush_interval=None)
+        with patch('hs_tracking.buffer.timezone') as timezone_mock:
+            timezone_mock.now.return_value = recorded
+            buf.record(self.session.id, 'visit', 'request_url=/a/')
+        buf.flush()
+        self.assertEqual(Variable.objects.get(name='visit').timestamp, recorded)
+
     def test_export_visitor_info(self):
         request = self.createRequest(user=self.user)
         request.session = {}
@@ -375,3 +445,64 @@ class UtilsTests(TestCase):
         session = Session.objects.create(visitor=visitor)
         usrtype = utils.get_user_type(session)
         self.assertTrue(usrtype is None)
+
+
+class RollupTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create(username='testuser', email='testuser@example.com')
+        self.user.userprofile.user_type = 'Researcher'
+        self.user.userprofile.save()
+
+        self.anonymous = Session.objects.create(visitor=Visitor.objects.create())
+        self.session = Session.objects.create(visitor=Visitor.objects.create(user=self.user))
+
+    def test_rollup_day(self):
+        self.anonymous.record('visit', 'request_url=/')
+        self.session.record('visit', 'request_url=/')
+        self.session.record('visit', 'request_url=/my-resources/')
+        self.session.record('download', 'filename=a.txt resource_guid=abc123 user_ip=1.2.3.4')
+        self.anonymous.record('download', 'resource_guid=abc123 filename=b.txt')
+
+        today = datetime.utcnow().date()
+        rollup_day(today)
+        # rolling up again replaces the rows of the day
+        rollup_day(today)
+
+        activity = DailyActivity.objects.get(date=today)
+        self.assertEqual((activity.visits, activity.sessions, activity.users, activity.downloads),
+                         (3, 2, 1, 2))
+        by_type = DailyUserTypeActivity.objects.get(date=today)
+        self.assertEqual((by_type.user_type, by_type.visits, by_type.sessions, by_type.users),
+                         ('Researcher', 2, 1, 1))
+        self.assertEqual(list(DailyActiveUser.objects.filter(date=today)
+                              .values_list('user_id', flat=True)), [self.user.id])
+        downloads = DailyResourceDownloads.objects.get(date=today)
+        self.assertEqual((downloads.resource_id, downloads.downloads), ('abc123', 2))
+
+    def test_monthly_active_users(self):
+        today = datetime.utcnow().date()
+        self.session.record('visit', 'request_url=/')
+        self.anonymous.record('visit', 'request_url=/')
+        # a visit of the same user on another day of the month
+        yesterday = self.session.record('visit', 'request_url=/my-resources/')
+        yesterday.timestamp = yesterday.timestamp - timedelta(days=1)
+        yesterday.save()
+        rollup_day(today)
+        rollup_day(today - timedelta(days=1))
+        # the count is read from the rollups, not from the tracking variables
+        Variable.objects.all().delete()
+
+        # the user is active on two days, but is one user of the month
+        self.assertEqual(sum(DailyActivity.objects.values_list('users', flat=True)), 2)
+        self.assertEqual(monthly_active_users(today - timedelta(days=1), today), 1)
+        self.assertEqual(monthly_active_users(today + timedelta(days=1),
+                                              today + timedelta(days=2)), 0)
+
+    def test_rollup_pending(self):
+        today = datetime.utcnow().date()
+        # without previous rollups only yesterday is rolled up
+        self.assertEqual(rollup_pending(today), 1)
+        self.assertEqual(rollup_pending(today), 0)
+        self.assertEqual(rollup_pending(today + timedelta(days=3)), 3)
+        self.assertEqual(DailyActivity.objects.count(), 4)
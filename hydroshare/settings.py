@@ -178,8 +178,11 @@ FILE_UPLOAD_TEMP_DIR = "/hs_tmp"
 
 # Sitemap for robots
 ROBOTS_SITEMAP_URLS = [
-    'http://localhost:8000/sitemap/',
+    'http://localhost:8000/sitemap/resources.xml',
 ]
+# resources per site map section, at most 50000 (see hs_sitemap.views)
+SITEMAP_PAGE_SIZE = 50000
+SITEMAP_CACHE_TIMEOUT = 60 * 60
 
 #############
 # DATABASES #
@@ -505,6 +508,14 @@ HAYSTACK_CONNECTIONS = {
     },
 }
 HAYSTACK_SIGNAL_PROCESSOR = "hs_core.hydro_realtime_signal_processor.HydroRealtimeSignalProcessor"
+# How resource changes reach Solr: 'realtime' updates Solr within the request,
+# 'queued' has a celery task update Solr in batches, coalescing the changes made within
+# SOLR_UPDATE_DELAY seconds (requires REDIS_CONNECTION), 'disabled' leaves updates to
+# the update_index command.
+SOLR_UPDATE_MODE = 'realtime'
+SOLR_UPDATE_DELAY = 10  # in seconds
+# seconds discovery facet counts are cached between index changes (see hs_core.discovery_cache)
+DISCOVERY_FACET_CACHE_TIMEOUT = 60 * 60
 
 
 # customized value for password reset token and email verification link token to expire in 1 day
@@ -513,8 +524,22 @@ PASSWORD_RESET_TIMEOUT_DAYS = 1
 #
 RESOURCE_LOCK_TIMEOUT_SECONDS = 300 # in seconds
 
+# seconds after which a pending or running background job (set file type, zip or unzip)
+# that did not record progress is considered lost, so that it can be submitted again
+BACKGROUND_JOB_TIMEOUT = 2 * 60 * 60
+
 # customized temporary file path for large files retrieved from iRODS user zone for metadata extraction
 TEMP_FILE_DIR = '/hs_tmp'
+# local cache of files copied from iRODS for metadata extraction (see hs_core.file_cache);
+# its size is in bytes, and 0 disables it
+IRODS_FILE_CACHE_DIR = os.path.join(TEMP_FILE_DIR, 'irods_file_cache')
+IRODS_FILE_CACHE_SIZE = 10 * 1024 ** 3
+
+# raster band statistics: 'exact', 'approximate' (GDAL, from overviews) or 'sampled' (from
+# RASTER_STATISTICS_SAMPLE_BLOCKS blocks of each band); see hs_file_types.raster_meta_extract
+RASTER_STATISTICS_MODE = 'exact'
+RASTER_STATISTICS_SAMPLE_BLOCKS = 64
+RASTER_STATISTICS_THREADS = 4
 
 ####################
 # OAUTH TOKEN SETTINGS #
@@ -592,6 +617,13 @@ LOGGING = {
 TRACKING_SESSION_TIMEOUT = 60 * 15
 TRACKING_PROFILE_FIELDS = ["title", "user_type", "subject_areas", "public", "state", "country"]
 TRACKING_USER_FIELDS = ["username", "email", "first_name", "last_name"]
+# visits are buffered in each process and written in bulk (see hs_tracking.buffer)
+TRACKING_BUFFER_SIZE = 10000
+TRACKING_FLUSH_SIZE = 500
+TRACKING_FLUSH_INTERVAL = 5
+
+# seconds the site metrics are kept in redis (see hs_metrics.metrics)
+SITE_METRICS_CACHE_TIMEOUT = 60 * 60
 
 # info django that a reverse proxy sever (nginx) is handling ssl/https for it
 SECURE_PROXY_SSL_HEADER = ('HTTP_X_FORWARDED_PROTO', 'https')
@@ -56,6 +56,12 @@ urlpatterns = i18n_patterns("",
     url(r'^search/$', DiscoveryView.as_view(), name='haystack_search'),
     url(r'^searchjson/$', DiscoveryJsonView.as_view(), name='haystack_json_search'),
     url(r'^sitemap/$', 'hs_sitemap.views.sitemap', name='sitemap'),
+    url(r'^sitemap/resources\.xml$', 'hs_sitemap.views.sitemap_index_xml',
+        name='sitemap_index_xml'),
+    url(r'^sitemap/(?P<resource_type>\w+)/(?P<page>[0-9]+)/$', 'hs_sitemap.views.sitemap_section',
+        name='sitemap_section'),
+    url(r'^sitemap/(?P<resource_type>\w+)/(?P<page>[0-9]+)\.xml$',
+        'hs_sitemap.views.sitemap_section_xml', name='sitemap_section_xml'),
     url(r'^collaborate/$', hs_core_views.CollaborateView.as_view(), name='collaborate'),
     url(r'^my-groups/$', hs_core_views.MyGroupsView.as_view(), name='my_groups'),
     url(r'^group/(?P<group_id>[0-9]+)', hs_core_views.GroupView.as_view(), name='group'),
@@ -1,17 +1,94 @@
+import argparse
 import csv
+import time
 from collections import namedtuple
 
 from django.core.management.base import BaseCommand
-from django.core.mail import send_mail
-from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, When, Value, F, FloatField, IntegerField
 
+from hs_core.hydroshare.utils import convert_file_size_to_unit
 from theme.models import UserQuota, QuotaMessage
-from theme.utils import get_quota_message
+from theme.tasks import send_quota_warning_email
 
 
 INPUT_FIELDS = namedtuple('FIELDS', 'user_name used_value storage_zone')
 input_fields = INPUT_FIELDS(0, 1, 2)
 
+# number of quotas updated per UPDATE query
+DEFAULT_BATCH_SIZE = 1000
+
+
+def _field(row, index):
+    """Return the stripped value of a field of a row, or None if it is empty."""
+    value = row[index]
+    if value:
+        value = value.strip()
+    return value or None
+
+
+def parse_row(row):
+    """
+    Return (user name, used value in bytes, storage zone) of a row of the input file, or None if
+    any field is missing or empty. Raise ValueError if the used value is not an integer, as for
+    the header row.
+    """
+    if len(row) < 3:
+        # some fields are empty, ignore this row
+        return None
+    uname = _field(row, input_fields.user_name)
+    used_val = _field(row, input_fields.used_value)
+    zone = _field(row, input_fields.storage_zone)
+    if uname is None or used_val is None or zone is None:
+        return None
+    return uname, int(used_val), zone
+
+
+def update_quota(uq, used_val, qmsg):
+    """
+    Set the used value of a quota from a size in bytes and update its grace period, without
+    saving it. Return True if the user should be warned about the quota.
+    """
+    uq.used_value = convert_file_size_to_unit(used_val, uq.unit)
+    used_percent = uq.used_percent
+    if used_percent >= qmsg.soft_limit_percent:
+        if used_percent >= 100 and used_percent < qmsg.hard_limit_percent:
+            if uq.remaining_grace_period < 0:
+                # triggers grace period counting
+                uq.remaining_grace_period = qmsg.grace_period
+            elif uq.remaining_grace_period > 0:
+                # reduce remaining_grace_period by one day
+                uq.remaining_grace_period -= 1
+        elif used_percent >= qmsg.hard_limit_percent:
+            # set grace period to 0 when user quota exceeds hard limit
+            uq.remaining_grace_period = 0
+        return True
+    if uq.remaining_grace_period >= 0:
+        # turn grace period off now that the user is below quota soft limit
+        uq.remaining_grace_period = -1
+    return False
+
+
+def bulk_update_quotas(quotas, batch_size=DEFAULT_BATCH_SIZE):
+    """Save the used values and grace periods of quotas, with one query per batch."""
+    for start in range(0, len(quotas), batch_size):
+        batch = quotas[start:start + batch_size]
+        UserQuota.objects.filter(pk__in=[uq.pk for uq in batch]).update(
+            used_value=Case(*[When(pk=uq.pk, then=Value(uq.used_value)) for uq in batch],
+                            default=F('used_value'), output_field=FloatField()),
+            remaining_grace_period=Case(*[When(pk=uq.pk, then=Value(uq.remaining_grace_period))
+                                          for uq in batch],
+                                        default=F('remaining_grace_period'),
+                                        output_field=IntegerField()))
+
+
+def positive_int(value):
+    """Return a command line argument as an int; raise ArgumentTypeError if it is not > 0."""
+    number = int(value)
+    if number <= 0:
+        raise argparse.ArgumentTypeError("{} is not greater than 0".format(value))
+    return number
+
 
 class Command(BaseCommand):
     help = "Update used storage space in UserQuota table for all users in HydroShare by reading " \
@@ -19,85 +96,57 @@ class Command(BaseCommand):
            "information in the format of 'User name' 'Used value' 'Storage zone' " \
            "separated by comma. A header may also be included for informational purposes." \
            "This input file is created by a quota calculation script that runs nightly on a " \
-           "HydroShare server."
+           "HydroShare server. Quotas are loaded with one query and updated in batches in a " \
+           "single transaction, and warning emails are sent by a celery task."
 
     def add_arguments(self, parser):
         parser.add_argument('input_file_name_with_path', help='input file name with path')
+        parser.add_argument('--batch-size', type=positive_int, default=DEFAULT_BATCH_SIZE,
+                            help='number of quotas updated per query')
 
     def handle(self, *args, **options):
+        start_time = time.time()
+        n_rows = 0
+        # the used value of each (user name, zone); a later row overrides an earlier one
+        used_values = {}
         with open(options['input_file_name_with_path'], 'r') as csvfile:
             freader = csv.reader(csvfile)
-            if not QuotaMessage.objects.exists():
-                QuotaMessage.objects.create()
-            qmsg = QuotaMessage.objects.first()
             for row in freader:
+                n_rows += 1
                 try:
-                    if len(row) < 3:
-                        # some fields are empty, ignore this row
-                        continue
-                    uname = row[input_fields.user_name]
-                    if not uname:
-                        # user name is empty, ignore this row
-                        continue
-                    uname = uname.strip()
-                    if not uname:
-                        # user name is empty after stripping, ignore this row
-                        continue
-
-                    used_val = row[input_fields.used_value]
-                    if not used_val:
-                        # used_value is empty, ignore this row
-                        continue
-                    used_val = used_val.strip()
-                    if not used_val:
-                        # used_val is empty after stripping, ignore this row
-                        continue
-                    used_val = int(used_val)
-
-                    zone = row[input_fields.storage_zone]
-                    if not zone:
-                        # zone is empty, ignore this row
-                        continue
-                    zone = zone.strip()
-                    if not zone:
-                        # zone is empty after stripping, ignore this row
-                        continue
-
-                    uq = UserQuota.objects.filter(user__username=uname, zone=zone).first()
-                    if uq is None:
-                        # the quota row does not exist in Django
-                        continue
-                    uq.update_used_value(used_val)
-
-                    used_percent = uq.used_percent
-                    if used_percent >= qmsg.soft_limit_percent:
-                        if used_percent >= 100 and used_percent < qmsg.hard_limit_percent:
-                            if uq.remaining_grace_period < 0:
-                                # triggers grace period counting
-                                uq.remaining_grace_period = qmsg.grace_period
-                            elif uq.remaining_grace_period > 0:
-                                # reduce remaining_grace_period by one day
-                                uq.remaining_grace_period -= 1
-                        elif used_percent >= qmsg.hard_limit_percent:
-                            # set grace period to 0 when user quota exceeds hard limit
-                            uq.remaining_grace_period = 0
-                        uq.save()
-                        user = uq.user
-                        uemail = user.email
-                        msg_str = 'Dear ' + uname + ':\n\n'
-                        msg_str += get_quota_message(user)
-
-                        msg_str += '\n\nHydroShare Support'
-                        subject = 'Quota warning'
-                        # send email for people monitoring and follow-up as needed
-                        send_mail(subject, msg_str, settings.DEFAULT_FROM_EMAIL,
-                                  [uemail])
-                    else:
-                        if uq.remaining_grace_period >= 0:
-                            # turn grace period off now that the user is below quota soft limit
-                            uq.remaining_grace_period = -1
-                            uq.save()
-
+                    parsed = parse_row(row)
                 except ValueError as ex:   # header row, continue
                     print "Skip the header row:" + ex.message
                     continue
+                if parsed is not None:
+                    uname, used_val, zone = parsed
+                    used_values[(uname, zone)] = used_val
+
+        if not QuotaMessage.objects.exists():
+            QuotaMessage.objects.create()
+        qmsg = QuotaMessage.objects.first()
+
+        quotas = []
+        warned_user_ids = set()
+        unames = set(uname for uname, zone in used_values)
+        for uq in UserQuota.objects.filter(user__username__in=unames).select_related('user'):
+            used_val = used_values.get((uq.user.username, uq.zone))
+            if used_val is None:
+                # the quota of this zone is not listed in the input file
+                continue
+            if update_quota(uq, used_val, qmsg):
+                warned_user_ids.add(uq.user_id)
+            quotas.append(uq)
+
+        with transaction.atomic():
+            bulk_update_quotas(quotas, options['batch_size'])
+
+        # emails are queued once the quotas they report are committed
+        for user_id in warned_user_ids:
+            send_quota_warning_email.apply_async((user_id,))
+
+        elapsed = time.time() - start_time
+        print "Processed {} rows, updated {} quotas and queued {} quota warning emails in " \
+              "{:.1f} seconds ({:.0f} rows/sec)".format(n_rows, len(quotas),
+                                                        len(warned_user_ids), elapsed,
+                                                        n_rows / elapsed if elapsed else n_rows)
@@ -732,36 +732,81 @@ function makeTimeSeriesMetaDataElementFormReadOnly(form_id, element_id){
 }
 
 function set_file_type_ajax_submit(url) {
-    var $alert_success = '<div class="alert alert-success" id="error-alert"> \
-        <button type="button" class="close" data-dismiss="alert">x</button> \
-        <strong>Success! </strong> \
-        File type was successful.\
-    </div>';
-
+    // file types are set by background jobs: a 202 response means the job is in progress,
+    // and its status is polled until it finishes
     var waitDialog = showWaitDialog();
-    return $.ajax({
+    var deferred = $.Deferred();
+    $.ajax({
         type: "POST",
         url: url,
         dataType: 'html',
         async: true,
-        success: function (result) {
-            waitDialog.dialog("close");
-            var json_response = JSON.parse(result);
-            var spatialCoverage = json_response.spatial_coverage;
-            updateResourceSpatialCoverage(spatialCoverage);
-            $alert_success = $alert_success.replace("File type was successful.", json_response.message);
-            $("#fb-inner-controls").before($alert_success);
-            $(".alert-success").fadeTo(2000, 500).slideUp(1000, function(){
-                $(".alert-success").alert('close');
-            });
+        success: function (result, textStatus, xhr) {
+            if (xhr.status === 202) {
+                poll_set_file_type_job(JSON.parse(result).status_url, waitDialog, deferred);
+            }
+            else {
+                set_file_type_done(result, waitDialog, deferred);
+            }
         },
         error: function (xhr, textStatus, errorThrown) {
-            waitDialog.dialog("close");
-            var jsonResponse = JSON.parse(xhr.responseText);
-            display_error_message('Failed to set file type', jsonResponse.message);
-            $(".file-browser-container, #fb-files-container").css("cursor", "auto");
+            set_file_type_failed(xhr.responseText, waitDialog, deferred);
         }
     });
+    return deferred.promise();
+}
+
+function poll_set_file_type_job(status_url, waitDialog, deferred) {
+    setTimeout(function () {
+        $.ajax({
+            type: "GET",
+            url: status_url,
+            dataType: 'html',
+            async: true,
+            success: function (result) {
+                var json_response = JSON.parse(result);
+                if (json_response.status === 'succeeded') {
+                    set_file_type_done(result, waitDialog, deferred);
+                }
+                else if (json_response.status === 'failed') {
+                    set_file_type_failed(result, waitDialog, deferred);
+                }
+                else {
+                    poll_set_file_type_job(status_url, waitDialog, deferred);
+                }
+            },
+            error: function (xhr, textStatus, errorThrown) {
+                set_file_type_failed(xhr.responseText, waitDialog, deferred);
+            }
+        });
+    }, 2000);
+}
+
+function set_file_type_done(result, waitDialog, deferred) {
+    var $alert_success = '<div class="alert alert-success" id="error-alert"> \
+        <button type="button" class="close" data-dismiss="alert">x</button> \
+        <strong>Success! </strong> \
+        File type was successful.\
+    </div>';
+
+    waitDialog.dialog("close");
+    var json_response = JSON.parse(result);
+    var spatialCoverage = json_response.spatial_coverage;
+    updateResourceSpatialCoverage(spatialCoverage);
+    $alert_success = $alert_success.replace("File type was successful.", json_response.message);
+    $("#fb-inner-controls").before($alert_success);
+    $(".alert-success").fadeTo(2000, 500).slideUp(1000, function(){
+        $(".alert-success").alert('close');
+    });
+    deferred.resolve(result);
+}
+
+function set_file_type_failed(result, waitDialog, deferred) {
+    waitDialog.dialog("close");
+    var jsonResponse = JSON.parse(result);
+    display_error_message('Failed to set file type', jsonResponse.message);
+    $(".file-browser-container, #fb-files-container").css("cursor", "auto");
+    deferred.reject();
 }
 
 function get_file_type_metadata_ajax_submit(url) {
@@ -1030,44 +1075,75 @@ function get_irods_folder_struct_ajax_submit(res_id, store_path) {
     });
 }
 
-function zip_irods_folder_ajax_submit(res_id, input_coll_path, fileName) {
-    $("#fb-files-container, #fb-files-container").css("cursor", "progress");
-    return $.ajax({
+// zip and unzip requests are run by background jobs: a 202 response means the job is in
+// progress, and its status is polled until it finishes
+function zip_job_ajax_submit(url, data, error_title) {
+    var deferred = $.Deferred();
+    $.ajax({
         type: "POST",
-        url: '/hsapi/_internal/data-store-folder-zip/',
+        url: url,
         async: true,
-        data: {
-            res_id: res_id,
-            input_coll_path: input_coll_path,
-            output_zip_file_name: fileName,
-            remove_original_after_zip: "false"
-        },
-        success: function (result) {
+        data: data,
+        success: function (result, textStatus, xhr) {
+            if (xhr.status === 202) {
+                poll_zip_job(result.status_url, error_title, deferred);
+            }
+            else {
+                deferred.resolve(result);
+            }
         },
         error: function (xhr, errmsg, err) {
-            display_error_message('Folder Zipping Failed', xhr.responseText);
+            display_error_message(error_title, xhr.responseText);
+            deferred.reject();
         }
     });
+    return deferred.promise();
+}
+
+function poll_zip_job(status_url, error_title, deferred) {
+    setTimeout(function () {
+        $.ajax({
+            type: "GET",
+            url: status_url,
+            async: true,
+            success: function (result) {
+                if (result.status === 'succeeded') {
+                    deferred.resolve(result.result);
+                }
+                else if (result.status === 'failed') {
+                    display_error_message(error_title, result.message);
+                    deferred.reject();
+                }
+                else {
+                    poll_zip_job(status_url, error_title, deferred);
+                }
+            },
+            error: function (xhr, errmsg, err) {
+                display_error_message(error_title, xhr.responseText);
+                deferred.reject();
+            }
+        });
+    }, 2000);
+}
+
+function zip_irods_folder_ajax_submit(res_id, input_coll_path, fileName) {
+    $("#fb-files-container, #fb-files-container").css("cursor", "progress");
+    return zip_job_ajax_submit('/hsapi/_internal/data-store-folder-zip/', {
+        res_id: res_id,
+        input_coll_path: input_coll_path,
+        output_zip_file_name: fileName,
+        remove_original_after_zip: "false"
+    }, 'Folder Zipping Failed');
 }
 
 function unzip_irods_file_ajax_submit(res_id, zip_with_rel_path) {
     $("#fb-files-container, #fb-files-container").css("cursor", "progress");
-    return $.ajax({
-        type: "POST",
-        url: '/hsapi/_internal/data-store-folder-unzip/',
-        async: true,
-        data: {
-            res_id: res_id,
-            zip_with_rel_path: zip_with_rel_path,
-            remove_original_zip: "false"
-        },
-        success: function (result) {
-            // TODO: handle "File already exists" errors
-        },
-        error: function (xhr, errmsg, err) {
-            display_error_message('File Unzipping Failed', xhr.responseText);
-        }
-    });
+    // TODO: handle "File already exists" errors
+    return zip_job_ajax_submit('/hsapi/_internal/data-store-folder-unzip/', {
+        res_id: res_id,
+        zip_with_rel_path: zip_with_rel_path,
+        remove_original_zip: "false"
+    }, 'File Unzipping Failed');
 }
 
 function create_irods_folder_ajax_submit(res_id, folder_path) {
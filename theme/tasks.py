@@ -0,0 +1,34 @@
+"""Define celery tasks for theme app."""
+
+from __future__ import absolute_import
+
+import logging
+
+from celery import shared_task
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.mail import send_mail
+
+from theme.utils import get_quota_message
+
+# Pass 'django' into getLogger instead of __name__
+# for celery tasks (as this seems to be the
+# only way to successfully log in code executed
+# by celery, despite our catch-all handler).
+logger = logging.getLogger('django')
+
+
+@shared_task
+def send_quota_warning_email(user_id):
+    """Email a user the quota message of their current quotas."""
+    user = User.objects.filter(pk=user_id).first()
+    if user is None:
+        logger.warning("Quota warning not sent: user {} does not exist".format(user_id))
+        return
+    msg_str = 'Dear ' + user.username + ':\n\n'
+    msg_str += get_quota_message(user)
+
+    msg_str += '\n\nHydroShare Support'
+    subject = 'Quota warning'
+    # send email for people monitoring and follow-up as needed
+    send_mail(subject, msg_str, settings.DEFAULT_FROM_EMAIL, [user.email])
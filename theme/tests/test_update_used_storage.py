@@ -0,0 +1,119 @@
+import os
+import tempfile
+
+from mock import patch
+
+from django.contrib.auth.models import Group
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+
+from hs_core import hydroshare
+from theme.models import UserQuota, QuotaMessage
+from theme.management.commands.update_used_storage import parse_row, update_quota, \
+    bulk_update_quotas
+
+GB = 1024 * 1024 * 1024
+
+
+class TestUpdateUsedStorage(TestCase):
+    def setUp(self):
+        super(TestUpdateUsedStorage, self).setUp()
+        Group.objects.get_or_create(name='Hydroshare Author')
+        self.user1 = hydroshare.create_account(
+            'user1@nowhere.com',
+            username='user1',
+            first_name='User1_FirstName',
+            last_name='User1_LastName',
+            superuser=False,
+            groups=[]
+        )
+        self.user2 = hydroshare.create_account(
+            'user2@nowhere.com',
+            username='user2',
+            first_name='User2_FirstName',
+            last_name='User2_LastName',
+            superuser=False,
+            groups=[]
+        )
+        self.qmsg = QuotaMessage.objects.create()
+
+    def test_parse_row(self):
+        self.assertEqual(parse_row(['user1', ' 1024 ', 'hydroshare_internal']),
+                         ('user1', 1024, 'hydroshare_internal'))
+        # rows with missing or empty fields are ignored
+        self.assertIsNone(parse_row(['user1', '1024']))
+        self.assertIsNone(parse_row(['user1', ' ', 'hydroshare_internal']))
+        # the header row has no integer used value
+        with self.assertRaises(ValueError):
+            parse_row(['User name', 'Used value', 'Storage zone'])
+
+    def test_update_quota(self):
+        uq = UserQuota(allocated_value=20, unit='GB')
+
+        # below the soft limit
+        self.assertFalse(update_quota(uq, 10 * GB, self.qmsg))
+        self.assertEqual(uq.used_value, 10)
+        self.assertEqual(uq.remaining_grace_period, -1)
+
+        # over the soft limit, below the allocated value
+        self.assertTrue(update_quota(uq, 17 * GB, self.qmsg))
+        self.assertEqual(uq.remaining_grace_period, -1)
+
+        # over the allocated value: the grace period starts, then counts down
+        self.assertTrue(update_quota(uq, 21 * GB, self.qmsg))
+        self.assertEqual(uq.remaining_grace_period, self.qmsg.grace_period)
+        self.assertTrue(update_quota(uq, 21 * GB, self.qmsg))
+        self.assertEqual(uq.remaining_grace_period, self.qmsg.grace_period - 1)
+
+        # over the hard limit
+        self.assertTrue(update_quota(uq, 30 * GB, self.qmsg))
+        self.assertEqual(uq.remaining_grace_period, 0)
+
+        # back below the soft limit
+        self.assertFalse(update_quota(uq, 1 * GB, self.qmsg))
+        self.assertEqual(uq.remaining_grace_period, -1)
+
+    def test_bulk_update_quotas(self):
+        uq1 = UserQuota.objects.get(user=self.user1)
+        uq2 = UserQuota.objects.get(user=self.user2)
+        uq1.used_value = 5
+        uq1.remaining_grace_period = 3
+        uq2.used_value = 15
+
+        # quotas not passed in are not changed
+        bulk_update_quotas([uq1], batch_size=1)
+        uq1 = UserQuota.objects.get(pk=uq1.pk)
+        self.assertEqual(uq1.used_value, 5)
+        self.assertEqual(uq1.remaining_grace_period, 3)
+        self.assertEqual(UserQuota.objects.get(pk=uq2.pk).used_value, 0)
+
+        # quotas are updated over several batches
+        uq1.used_value = 6
+        bulk_update_quotas([uq1, uq2], batch_size=1)
+        self.assertEqual(UserQuota.objects.get(pk=uq1.pk).used_value, 6)
+        uq2 = UserQuota.objects.get(pk=uq2.pk)
+        self.assertEqual(uq2.used_value, 15)
+        self.assertEqual(uq2.remaining_grace_period, -1)
+
+    def test_update_used_storage_command(self):
+        input_file, input_file_name = tempfile.mkstemp(suffix='.csv')
+        with os.fdopen(input_file, 'w') as f:
+            f.write('User name,Used value,Storage zone\n')
+            f.write('user1,{},hydroshare_internal\n'.format(2 * GB))
+            f.write('user2,{},hydroshare_internal\n'.format(18 * GB))
+            f.write('user3,{},hydroshare_internal\n'.format(GB))
+        try:
+            with patch('theme.management.commands.update_used_storage.'
+                       'send_quota_warning_email') as send_email:
+                call_command('update_used_storage', input_file_name, '--batch-size', '1')
+            self.assertEqual(UserQuota.objects.get(user=self.user1).used_value, 2)
+            self.assertEqual(UserQuota.objects.get(user=self.user2).used_value, 18)
+            # only the user over the soft limit is warned
+            send_email.apply_async.assert_called_once_with((self.user2.pk,))
+
+            # the batch size must be greater than 0
+            with self.assertRaises(CommandError):
+                call_command('update_used_storage', input_file_name, '--batch-size', '0')
+        finally:
+            os.remove(input_file_name)